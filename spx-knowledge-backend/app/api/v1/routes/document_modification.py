@@ -1709,8 +1709,8 @@ def batch_revert_to_previous_version(
                     failed_count += 1
                     continue
                 
-                # 执行回退
-                revert_result = version_service.revert_chunk_to_previous_version(chunk_id)
+                # 执行回退（向量化与索引更新在全部回退完成后批量进行）
+                revert_result = version_service.revert_chunk_to_previous_version(chunk_id, reindex=False)
                 
                 batch_results.append({
                     "chunk_id": chunk_id,
@@ -1730,12 +1730,25 @@ def batch_revert_to_previous_version(
                 })
                 failed_count += 1
         
+        # 批量重新向量化：只对内容相对索引确有变化的块生成向量，一次 bulk 写回 OpenSearch
+        reverted_ids = [r["chunk_id"] for r in batch_results if r["success"]]
+        vectorization = None
+        if reverted_ids:
+            try:
+                vectorization = SmartVectorizationService(db).revectorize_chunk_ids(
+                    document_id, reverted_ids, extra_metadata={"edited": True, "reverted": True}
+                )
+                vectorization.pop("vectorization_results", None)
+            except Exception as e:
+                logger.warning(f"批量回退后重新向量化失败（不影响回退结果）: {e}", exc_info=True)
+        
         result = {
             "document_id": document_id,
             "total_chunks": len(chunk_ids),
             "success_count": success_count,
             "failed_count": failed_count,
             "batch_results": batch_results,
+            "vectorization": vectorization,
             "message": f"批量回退完成，成功 {success_count}/{len(chunk_ids)} 个块"
         }
         
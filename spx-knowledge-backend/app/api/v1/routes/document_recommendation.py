@@ -1,53 +1,56 @@
 ﻿"""
 Document Recommendation API Routes
-根据文档处理流程设计实现智能标签推荐API
+分类 / 标签推荐：文档向量与分类 / 标签质心的相似度 + 标签 TF-IDF（见 DocumentRecommendationService）
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from app.dependencies.database import get_db
 from app.core.logging import logger
+from app.models.document import Document
+from app.services.document_recommendation_service import DocumentRecommendationService
+from app.services.permission_service import KnowledgeBasePermissionService
 
 router = APIRouter()
 
+def get_current_user_id(request: Request) -> int:
+    """从请求中获取当前用户ID（由中间件设置）"""
+    user = getattr(request.state, 'user', None)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="未认证")
+    user_id = user.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="无效的用户信息")
+    try:
+        return int(user_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="无效的用户ID")
+
+def _ensure_document_access(db: Session, document_id: int, user_id: int) -> Document:
+    doc = db.query(Document).filter(Document.id == document_id, Document.is_deleted == False).first()  # noqa: E712
+    if not doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="文档不存在")
+    KnowledgeBasePermissionService(db).ensure_permission(doc.knowledge_base_id, user_id, "doc:view")
+    return doc
+
 @router.post("/documents/{document_id}/suggest-category")
 async def suggest_category(
+    request: Request,
     document_id: int,
+    top_k: int = 3,
     db: Session = Depends(get_db)
 ):
-    """推荐分类 - 根据设计文档实现"""
+    """推荐分类：文档向量与各分类质心的余弦相似度（文档未完成向量化时 status=not_ready）"""
     try:
         logger.info(f"API请求: 为文档 {document_id} 推荐分类")
-        
-        # TODO: 实现AI驱动的分类推荐逻辑
-        # 根据设计文档要求：
-        # - 使用AI分析文档内容
-        # - 基于文档标题、内容、关键词推荐分类
-        # - 返回推荐分类和置信度
-        
-        suggestions = {
-            "document_id": document_id,
-            "suggested_categories": [
-                {
-                    "category_id": 1,
-                    "category_name": "技术文档",
-                    "confidence": 0.85,
-                    "reason": "包含大量技术术语和代码示例"
-                },
-                {
-                    "category_id": 2,
-                    "category_name": "产品文档",
-                    "confidence": 0.72,
-                    "reason": "包含产品功能介绍和使用说明"
-                }
-            ],
-            "processing_time": "2.3s"
-        }
-        
+        _ensure_document_access(db, document_id, get_current_user_id(request))
+        suggestions = DocumentRecommendationService(db).suggest_categories(document_id, top_k=max(1, top_k))
         logger.info(f"API响应: 推荐 {len(suggestions['suggested_categories'])} 个分类")
         return suggestions
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"推荐分类API错误: {e}", exc_info=True)
         raise HTTPException(
@@ -57,48 +60,21 @@ async def suggest_category(
 
 @router.post("/documents/{document_id}/suggest-tags")
 async def suggest_tags(
+    request: Request,
     document_id: int,
     max_tags: int = 10,
     db: Session = Depends(get_db)
 ):
-    """推荐标签 - 根据设计文档实现"""
+    """推荐标签：标签质心相似度与正文 TF-IDF 加权（已有标签不再推荐）"""
     try:
         logger.info(f"API请求: 为文档 {document_id} 推荐标签，最大数量: {max_tags}")
-        
-        # TODO: 实现AI驱动的标签推荐逻辑
-        # 根据设计文档要求：
-        # - 使用AI分析文档内容
-        # - 基于TF-IDF、关键词提取、实体识别推荐标签
-        # - 返回推荐标签和置信度
-        
-        suggestions = {
-            "document_id": document_id,
-            "suggested_tags": [
-                {
-                    "tag_id": 1,
-                    "tag_name": "Python",
-                    "confidence": 0.92,
-                    "reason": "文档中频繁出现Python相关术语"
-                },
-                {
-                    "tag_id": 2,
-                    "tag_name": "API",
-                    "confidence": 0.88,
-                    "reason": "包含API接口说明和示例"
-                },
-                {
-                    "tag_id": 3,
-                    "tag_name": "数据库",
-                    "confidence": 0.75,
-                    "reason": "涉及数据库操作相关内容"
-                }
-            ],
-            "processing_time": "1.8s"
-        }
-        
+        _ensure_document_access(db, document_id, get_current_user_id(request))
+        suggestions = DocumentRecommendationService(db).suggest_tags(document_id, max_tags=max(1, max_tags))
         logger.info(f"API响应: 推荐 {len(suggestions['suggested_tags'])} 个标签")
         return suggestions
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"推荐标签API错误: {e}", exc_info=True)
         raise HTTPException(
@@ -108,57 +84,50 @@ async def suggest_tags(
 
 @router.post("/documents/batch-suggest")
 async def batch_suggest(
+    request: Request,
     document_ids: List[int],
     suggest_type: str = "both",  # category, tags, both
     db: Session = Depends(get_db)
 ):
-    """批量推荐 - 根据设计文档实现"""
+    """批量推荐：逐个文档计算分类 / 标签推荐，无权限或不存在的文档记为失败"""
     try:
         logger.info(f"API请求: 批量推荐，文档数量: {len(document_ids)}, 类型: {suggest_type}")
+        user_id = get_current_user_id(request)
+        service = DocumentRecommendationService(db)
         
-        # TODO: 实现批量推荐逻辑
-        # 根据设计文档要求：
-        # - 支持批量处理多个文档
-        # - 支持分类、标签或两者都推荐
-        # - 返回每个文档的推荐结果
-        
-        results = []
+        results: List[Dict[str, Any]] = []
+        failed = 0
         for doc_id in document_ids:
-            result = {
+            try:
+                _ensure_document_access(db, doc_id, user_id)
+            except HTTPException as e:
+                failed += 1
+                results.append({"document_id": doc_id, "status": "failed", "error": e.detail})
+                continue
+            
+            result: Dict[str, Any] = {
                 "document_id": doc_id,
-                "suggestions": {
-                    "categories": [],
-                    "tags": []
-                },
+                "suggestions": {"categories": [], "tags": []},
                 "status": "success"
             }
-            
             if suggest_type in ["category", "both"]:
-                # 推荐分类
-                result["suggestions"]["categories"] = [
-                    {"category_id": 1, "confidence": 0.8}
-                ]
-            
+                result["suggestions"]["categories"] = service.suggest_categories(doc_id)["suggested_categories"]
             if suggest_type in ["tags", "both"]:
-                # 推荐标签
-                result["suggestions"]["tags"] = [
-                    {"tag_id": 1, "confidence": 0.9},
-                    {"tag_id": 2, "confidence": 0.7}
-                ]
-            
+                result["suggestions"]["tags"] = service.suggest_tags(doc_id)["suggested_tags"]
             results.append(result)
         
         response = {
             "total_documents": len(document_ids),
-            "successful_documents": len(results),
-            "failed_documents": 0,
+            "successful_documents": len(document_ids) - failed,
+            "failed_documents": failed,
             "results": results,
-            "processing_time": "5.2s"
         }
         
         logger.info(f"API响应: 批量推荐完成，成功: {response['successful_documents']}")
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"批量推荐API错误: {e}", exc_info=True)
         raise HTTPException(
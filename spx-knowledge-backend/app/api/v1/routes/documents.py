@@ -11,11 +11,13 @@ from app.services.document_service import DocumentService
 from app.services.batch_service import BatchService
 from app.services.structured_preview_service import StructuredPreviewService
 from app.services.auto_tagging_service import AutoTaggingService
-from app.dependencies.database import get_db
+from app.dependencies.database import get_db, get_async_read_db
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.logging import logger
 from app.config.settings import settings
-from app.services.chunk_service import ChunkService
 from app.services.image_service import ImageService
 from app.services.minio_storage_service import MinioStorageService
 from app.models.document import Document
@@ -24,6 +26,8 @@ import gzip, json, io, datetime
 import os, tempfile
 # 预览生成已移至异步任务，此处不再需要导入转换函数
 from app.services.opensearch_service import OpenSearchService
+from app.services.document_recommendation_service import DocumentRecommendationService
+from app.services.kb_stats_service import KnowledgeBaseStatsService
 from app.services.permission_service import KnowledgeBasePermissionService
 
 router = APIRouter()
@@ -41,6 +45,14 @@ def get_current_user_id(request: Request) -> int:
     except (ValueError, TypeError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="无效的用户ID")
 
+def _sync_recommendation(db: Session, doc: Document) -> None:
+    """分类 / 标签修改后同步推荐质心（失败不影响主操作）"""
+    try:
+        DocumentRecommendationService(db).sync_document(doc)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"推荐质心同步失败（文档ID: {doc.id}）: {e}")
+
 @router.get("/")
 async def get_documents(
     request: Request,
@@ -75,28 +87,11 @@ async def get_documents(
             )
         else:
             # 未指定知识库时，返回用户有权限的所有知识库下的文档
-            # 包括：用户拥有的知识库 + 用户作为成员的知识库
-            from app.models.knowledge_base_member import KnowledgeBaseMember
-            from sqlalchemy import union_all
-            
-            # 用户拥有的知识库ID
-            owned_kb_ids_query = db.query(KnowledgeBase.id.label("kb_id")).filter(
-                KnowledgeBase.is_deleted == False,
-                KnowledgeBase.user_id == user_id
-            )
-            
-            # 用户作为成员的知识库ID
-            member_kb_ids_query = db.query(KnowledgeBaseMember.knowledge_base_id.label("kb_id")).filter(
-                KnowledgeBaseMember.user_id == user_id
-            )
-            
-            # 合并：用户拥有的 + 用户作为成员的（使用相同的列名 kb_id）
-            all_kb_ids = owned_kb_ids_query.union_all(member_kb_ids_query).subquery()
-            
-            # 获取这些知识库下的所有文档
+            # 包括：用户拥有的知识库 + 用户作为成员的知识库（来自缓存的权限映射）
+            allowed_kb_ids = KnowledgeBasePermissionService(db).allowed_kb_ids(user_id)
             base_q = db.query(Document).filter(
                 Document.is_deleted == False,  # noqa: E712
-                Document.knowledge_base_id.in_(db.query(all_kb_ids.c.kb_id))
+                Document.knowledge_base_id.in_(allowed_kb_ids)
             )
 
         total = base_q.count()
@@ -538,29 +533,34 @@ async def get_document_chunks(
     size: int = settings.QA_DEFAULT_PAGE_SIZE,
     include_content: bool = False,
     chunk_type: Optional[str] = Query(None, description="过滤 chunk 类型: tabular/text/summary"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """获取指定文档的分块列表（兼容前端 /documents/{id}/chunks）"""
+    """获取指定文档的分块列表（兼容前端 /documents/{id}/chunks）；异步只读会话，不阻塞事件循环"""
     try:
         user_id = get_current_user_id(request)
         # 权限：需要对文档所属知识库具有 doc:view 权限
-        doc = db.query(Document).filter(Document.id == doc_id).first()
+        doc = await db.get(Document, doc_id)
         if not doc:
             raise HTTPException(status_code=404, detail="文档不存在")
-        perm = KnowledgeBasePermissionService(db)
-        perm.ensure_permission(doc.knowledge_base_id, user_id, "doc:view")
+        kb_id = doc.knowledge_base_id
+        await db.run_sync(
+            lambda sync_db: KnowledgeBasePermissionService(sync_db).ensure_permission(kb_id, user_id, "doc:view")
+        )
 
         skip = max(page - 1, 0) * max(size, 1)
-        service = ChunkService(db)
         # 如果指定了 chunk_type，需要在查询后过滤
-        rows = await service.get_chunks(skip=skip, limit=size * 2 if chunk_type else size, document_id=doc_id)
+        rows = (await db.execute(
+            select(DocumentChunk)
+            .where(DocumentChunk.document_id == doc_id, DocumentChunk.is_deleted == False)
+            .offset(skip)
+            .limit(size * 2 if chunk_type else size)
+        )).scalars().all()
         items = []
 
-        # 若数据库未存文本，尝试从 MinIO 的 chunks.jsonl.gz 读取对应范围
-        content_map = {}
-        try:
-            doc = db.query(Document).filter(Document.id == doc_id).first()
-            if doc:
+        # 若数据库未存文本，尝试从 MinIO 的 chunks.jsonl.gz 读取对应范围（在线程池中读取）
+        def _load_content_map() -> dict:
+            content_map = {}
+            try:
                 created: datetime.datetime = getattr(doc, 'created_at', None) or datetime.datetime.utcnow()
                 year = created.strftime('%Y')
                 month = created.strftime('%m')
@@ -585,11 +585,35 @@ async def get_document_chunks(
                         if idx < idx_start or idx >= idx_end:
                             continue
                         content_map[int(idx)] = d.get('content') or ''
-        except Exception:
-            content_map = {}
+            except Exception:
+                content_map = {}
+            return content_map
+
+        content_map = await run_in_threadpool(_load_content_map)
 
-        from sqlalchemy import func
+        from sqlalchemy import func, tuple_
         from app.models.chunk_version import ChunkVersion
+        # 版本信息批量查询（每个分块的最大版本号及其创建时间），避免逐块查询
+        max_versions = {}
+        latest_version_times = {}
+        chunk_ids = [c.id for c in rows]
+        if chunk_ids:
+            try:
+                max_versions = dict((await db.execute(
+                    select(ChunkVersion.chunk_id, func.max(ChunkVersion.version_number))
+                    .where(ChunkVersion.chunk_id.in_(chunk_ids))
+                    .group_by(ChunkVersion.chunk_id)
+                )).all())
+                if max_versions:
+                    latest_version_times = dict((await db.execute(
+                        select(ChunkVersion.chunk_id, ChunkVersion.created_at).where(
+                            tuple_(ChunkVersion.chunk_id, ChunkVersion.version_number).in_(
+                                [(cid, int(ver)) for cid, ver in max_versions.items() if ver]
+                            )
+                        )
+                    )).all())
+            except Exception as e:
+                logger.warning(f"批量查询分块版本失败: {e}")
         filtered_count = 0
         for c in rows:
             # 过滤 chunk_type
@@ -636,23 +660,9 @@ async def get_document_chunks(
                     meta_dict = {}
             
             # 计算版本与修改时间兜底
-            try:
-                max_ver = db.query(func.max(ChunkVersion.version_number)).filter(
-                    ChunkVersion.chunk_id == c.id
-                ).scalar() or 0
-            except Exception:
-                max_ver = 0
+            max_ver = max_versions.get(c.id) or 0
             safe_version = max(int(getattr(c, 'version', 0) or 0), int(max_ver)) or 1
-            latest_ver = None
-            if max_ver:
-                try:
-                    latest_ver = db.query(ChunkVersion).filter(
-                        ChunkVersion.chunk_id == c.id,
-                        ChunkVersion.version_number == int(max_ver)
-                    ).first()
-                except Exception:
-                    latest_ver = None
-            modified_dt = getattr(c, 'last_modified_at', None) or (getattr(latest_ver, 'created_at', None) if latest_ver else None) or getattr(c, 'created_at', None)
+            modified_dt = getattr(c, 'last_modified_at', None) or latest_version_times.get(c.id) or getattr(c, 'created_at', None)
 
             items.append({
                 "id": c.id,
@@ -667,6 +677,8 @@ async def get_document_chunks(
                 "meta": meta_dict,  # ✅ 新增：返回 meta 字段，包含表格数据 table_data
             })
         return {"code": 0, "message": "ok", "data": {"list": items, "total": len(items), "page": page, "size": size}}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取文档分块失败: {e}")
         raise HTTPException(status_code=500, detail=f"获取文档分块失败: {str(e)}")
@@ -1078,8 +1090,7 @@ async def get_chunk_content_from_opensearch(
         osvc = OpenSearchService()
         source_doc = {}
         try:
-            res = osvc.client.get(index=osvc.document_index, id=f"chunk_{chunk_id}")
-            source_doc = res.get("_source", {}) if isinstance(res, dict) else {}
+            source_doc = osvc.get_chunk_source_sync(chunk_id) or {}
         except Exception as e:
             logger.debug(f"OpenSearch 未找到 chunk_{chunk_id}: {e}")
             source_doc = {}
@@ -1636,7 +1647,9 @@ async def batch_move_documents(
                 if doc.knowledge_base_id == target_kb_id:
                     if target_category_id is not None:
                         doc.category_id = target_category_id
+                        OpenSearchService().move_document_sync(doc_id, target_kb_id, target_kb_id, target_category_id)
                         db.commit()
+                        _sync_recommendation(db, doc)
                         moved_count += 1
                         logger.info(f"文档分类更新成功: {doc_id}")
                     else:
@@ -1645,10 +1658,19 @@ async def batch_move_documents(
                         logger.info(f"文档已在目标知识库: {doc_id}")
                 else:
                     # 更新知识库和分类
+                    source_kb_id = doc.knowledge_base_id
                     doc.knowledge_base_id = target_kb_id
                     if target_category_id is not None:
                         doc.category_id = target_category_id
+                    # 先同步索引（归属字段与向量配置档对应的物理索引），失败时回滚，避免数据库与索引不一致
+                    OpenSearchService().move_document_sync(doc_id, source_kb_id, target_kb_id, doc.category_id)
                     db.commit()
+                    try:
+                        KnowledgeBaseStatsService(db).sync_document(doc)
+                    except Exception as stats_err:
+                        db.rollback()
+                        logger.warning(f"知识库统计更新失败（文档ID: {doc_id}）: {stats_err}")
+                    _sync_recommendation(db, doc)
                     moved_count += 1
                     logger.info(f"文档移动成功: {doc_id} -> 知识库 {target_kb_id}")
             except Exception as e:
@@ -1732,6 +1754,7 @@ async def batch_add_tags(
                 new_tags = list(set(current_tags + tags_to_add))
                 doc.tags = new_tags
                 db.commit()
+                _sync_recommendation(db, doc)
                 updated_count += 1
             except Exception as e:
                 logger.error(f"添加标签失败 {doc_id}: {e}")
@@ -1802,6 +1825,7 @@ async def batch_remove_tags(
                 new_tags = [t for t in current_tags if t not in tags_to_remove]
                 doc.tags = new_tags
                 db.commit()
+                _sync_recommendation(db, doc)
                 updated_count += 1
             except Exception as e:
                 logger.error(f"删除标签失败 {doc_id}: {e}")
@@ -1864,6 +1888,7 @@ async def batch_replace_tags(
                 # 直接替换标签
                 doc.tags = new_tags
                 db.commit()
+                _sync_recommendation(db, doc)
                 updated_count += 1
             except Exception as e:
                 logger.error(f"替换标签失败 {doc_id}: {e}")
@@ -1933,7 +1958,13 @@ async def search_in_document(
     request: Request,
     query: str = Query(..., description="搜索关键词"),
     page: Optional[int] = Query(None, description="指定页码（可选）"),
-    db: Session = Depends(get_db)
+    chunk_type: Optional[str] = Query(None, description="分块类型（text/table/image，可选）"),
+    table_group_uid: Optional[str] = Query(None, description="表格组 UID（可选）"),
+    section_path: Optional[str] = Query(None, description="章节路径前缀（可选）"),
+    sort: Optional[str] = Query(None, description="排序：relevance（默认）/ position"),
+    offset: int = Query(0, ge=0, description="分页偏移"),
+    size: int = Query(100, ge=1, le=500, description="返回条数"),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     在文档内搜索关键词
@@ -1945,10 +1976,12 @@ async def search_in_document(
     try:
         user_id = get_current_user_id(request)
 
-        doc = db.query(Document).filter(
-            Document.id == doc_id,
-            Document.is_deleted == False
-        ).first()
+        doc = (await db.execute(
+            select(Document).where(
+                Document.id == doc_id,
+                Document.is_deleted == False
+            )
+        )).scalars().first()
 
         if not doc:
             raise HTTPException(
@@ -1956,58 +1989,39 @@ async def search_in_document(
                 detail="文档不存在"
             )
 
-        perm = KnowledgeBasePermissionService(db)
-        perm.ensure_permission(doc.knowledge_base_id, user_id, "doc:view")
+        kb_id = doc.knowledge_base_id
+        await db.run_sync(
+            lambda sync_db: KnowledgeBasePermissionService(sync_db).ensure_permission(kb_id, user_id, "doc:view")
+        )
         
-        # 从OpenSearch搜索文档内容
+        # 从OpenSearch搜索文档内容（结构化元数据模式下过滤、排序、分页在 OpenSearch 内完成）
         from app.services.opensearch_service import OpenSearchService
         os_service = OpenSearchService()
-        
-        # 构建查询
-        must_clauses = [
-            {"term": {"document_id": doc_id}},
-            {"match": {"content": {"query": query}}}
-        ]
-        
-        # 添加高亮
-        highlight_config = os_service._build_highlight_config(query, fields=["content"])
-        
-        search_body = {
-            "query": {"bool": {"must": must_clauses}},
-            "size": 100,  # 文档内搜索返回更多结果
-            "_source": ["chunk_id", "content", "chunk_type", "metadata"],
-            **highlight_config
-        }
-        
-        response = os_service.client.search(
-            index=os_service.document_index,
-            body=search_body
+        found = await run_in_threadpool(
+            os_service.search_in_document_sync,
+            doc_id,
+            query,
+            page=page,
+            chunk_type=chunk_type,
+            table_group_uid=table_group_uid,
+            section_path=section_path,
+            sort=sort,
+            offset=offset,
+            size=size,
         )
         
         # 处理结果
         results = []
-        for hit in response["hits"]["hits"]:
+        for hit in found["hits"]:
             content = hit["_source"].get("content", "")
             highlighted = os_service._extract_highlight(hit, "content")
-            
-            # 提取页码（从metadata）
-            metadata = hit["_source"].get("metadata", {})
-            if isinstance(metadata, str):
-                try:
-                    metadata = json.loads(metadata)
-                except:
-                    metadata = {}
-            
-            page_num = metadata.get("page_number")
-            if page_num and page and page_num != page:
-                continue  # 如果指定了页码，过滤结果
-            
             results.append({
-                "page": page_num,
-                "position": hit.get("_score", 0),
+                "page": hit["metadata"].get("page_number"),
+                "position": hit.get("_score") or 0,
                 "context": content[:200] + "..." if len(content) > 200 else content,
                 "highlight": highlighted or content[:200],
-                "chunk_id": hit["_source"].get("chunk_id")
+                "chunk_id": hit["_source"].get("chunk_id"),
+                "chunk_type": hit["_source"].get("chunk_type"),
             })
         
         return {
@@ -2015,7 +2029,7 @@ async def search_in_document(
             "message": "ok",
             "data": {
                 "results": results,
-                "total": len(results)
+                "total": found["total"]
             }
         }
     except HTTPException:
@@ -3,7 +3,7 @@ Image API Routes
 根据文档处理流程设计实现图片搜索API接口
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Response, Request, Query
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Query
 from typing import List, Optional
 from app.schemas.image import ImageResponse, ImageSearchRequest, ImageSearchResponse
 from app.services.image_service import ImageService
@@ -15,10 +15,9 @@ from sqlalchemy import or_, union_all
 from app.core.logging import logger
 from app.config.settings import settings
 from app.services.opensearch_service import OpenSearchService
-from app.services.minio_storage_service import MinioStorageService
+from app.services.image_proxy_service import ImageProxyService
 from app.models.image import DocumentImage
 from app.models.document import Document
-from app.models.knowledge_base_member import KnowledgeBaseMember
 from fastapi import Body
 
 router = APIRouter()
@@ -80,27 +79,13 @@ async def get_images(
             )
         # 3. 如果都没有指定，只返回当前用户有权限的知识库中的图片
         else:
-            # 获取用户有权限的知识库ID列表（owner + member）
-            from app.models.knowledge_base import KnowledgeBase
-            
-            # 用户拥有的知识库ID
-            owned_kb_ids_query = db.query(KnowledgeBase.id.label("kb_id")).filter(
-                KnowledgeBase.is_deleted == False,
-                KnowledgeBase.user_id == user_id
-            )
-            
-            # 用户作为成员的知识库ID
-            member_kb_ids_query = db.query(KnowledgeBaseMember.knowledge_base_id.label("kb_id")).filter(
-                KnowledgeBaseMember.user_id == user_id
-            )
-            
-            # 合并：用户拥有的 + 用户作为成员的（使用相同的列名 kb_id）
-            all_kb_ids = owned_kb_ids_query.union_all(member_kb_ids_query).subquery()
+            # 用户有权限的知识库ID列表（owner + member，来自缓存的权限映射）
+            allowed_kb_ids = KnowledgeBasePermissionService(db).allowed_kb_ids(user_id)
             
             # 获取这些知识库下的所有文档ID
             doc_ids = db.query(Document.id).filter(
                 Document.is_deleted == False,
-                Document.knowledge_base_id.in_(db.query(all_kb_ids.c.kb_id))
+                Document.knowledge_base_id.in_(allowed_kb_ids)
             ).subquery()
             
             base_query = db.query(DocumentImage).filter(
@@ -230,16 +215,17 @@ async def search_by_image(
         # 获取当前用户ID
         user_id = get_current_user_id(request)
         
-        # 验证知识库ID并检查权限（如果提供了）
-        if knowledge_base_id:
+        # 按用户权限限定知识库范围（未指定时为全部有权限的知识库），过滤条件下推到 OpenSearch
+        requested_kb_ids = knowledge_base_id
+        knowledge_base_id = KnowledgeBasePermissionService(db).resolve_kb_filter(user_id, requested_kb_ids)
+        if not knowledge_base_id:
+            return []
+        
+        # 验证知识库ID（如果提供了）
+        if requested_kb_ids:
             from app.models.knowledge_base import KnowledgeBase
-            kb_ids = knowledge_base_id if isinstance(knowledge_base_id, list) else [knowledge_base_id]
+            kb_ids = knowledge_base_id
             if len(kb_ids) > 0:
-                perm = KnowledgeBasePermissionService(db)
-                for kb_id in kb_ids:
-                    # 检查用户是否有查看权限
-                    perm.ensure_permission(kb_id, user_id, "doc:view")
-                
                 kbs = db.query(KnowledgeBase).filter(
                     KnowledgeBase.id.in_(kb_ids),
                     KnowledgeBase.is_active == True
@@ -263,6 +249,8 @@ async def search_by_image(
         logger.info(f"API响应: 找到 {len(results)} 个相似图片")
         return results
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"以图找图搜索API错误: {e}", exc_info=True)
         raise HTTPException(
@@ -290,13 +278,12 @@ async def search_by_text(
             f"knowledge_base_id={search_request.knowledge_base_id}"
         )
         
-        # 检查知识库权限（如果提供了）
-        if search_request.knowledge_base_id:
-            perm = KnowledgeBasePermissionService(db)
-            kb_ids = search_request.knowledge_base_id if isinstance(search_request.knowledge_base_id, list) else [search_request.knowledge_base_id]
-            for kb_id in kb_ids:
-                # 检查用户是否有查看权限
-                perm.ensure_permission(kb_id, user_id, "doc:view")
+        # 按用户权限限定知识库范围（未指定时为全部有权限的知识库），过滤条件下推到 OpenSearch
+        search_request.knowledge_base_id = KnowledgeBasePermissionService(db).resolve_kb_filter(
+            user_id, search_request.knowledge_base_id
+        )
+        if not search_request.knowledge_base_id:
+            return []
         
         service = ImageSearchService(db)
         results = await service.search_by_text(search_request)
@@ -304,6 +291,8 @@ async def search_by_text(
         logger.info(f"[以文搜图API] 响应: 找到 {len(results)} 个相关图片")
         return results
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[以文搜图API] 错误: {e}", exc_info=True)
         raise HTTPException(
@@ -361,6 +350,42 @@ async def get_image_vectors(
             detail=f"获取图片向量信息失败: {str(e)}"
         )
 
+@router.get("/file")
+async def get_image_file(
+    request: Request,
+    object: str = Query(..., description="MinIO对象路径"),
+    size: Optional[str] = Query(None, description="缩略图档位（如 small/medium），为空返回原图"),
+    db: Session = Depends(get_db)
+):
+    """图片代理：流式读取 MinIO 对象，支持 ETag/Range 与缩略图档位，避免前端直连 MinIO。需要 doc:view 权限"""
+    try:
+        # 获取当前用户ID
+        user_id = get_current_user_id(request)
+        
+        # 权限检查：需要通过图片路径找到对应的文档，然后检查权限
+        # 图片路径格式通常是：documents/{document_id}/images/...
+        doc_id = None
+        parts = object.split('/')
+        if 'documents' in parts:
+            doc_idx = parts.index('documents')
+            if doc_idx + 1 < len(parts):
+                try:
+                    doc_id = int(parts[doc_idx + 1])
+                except ValueError:
+                    pass  # 如果无法解析文档ID，跳过权限检查（向后兼容）
+        if doc_id is not None:
+            doc = db.query(Document).filter(Document.id == doc_id).first()
+            if doc:
+                perm = KnowledgeBasePermissionService(db)
+                perm.ensure_permission(doc.knowledge_base_id, user_id, "doc:view")
+        
+        return await ImageProxyService().serve(request, object, size=size)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"图片代理错误: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="图片不存在或无法访问")
+
 @router.get("/{image_id}", response_model=ImageResponse)
 async def get_image(
     request: Request,
@@ -480,54 +505,3 @@ async def retry_image_ocr(
     if not success:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="重试失败，请稍后再试")
     return {"status": "success", "message": "图片OCR已重新执行"}
-
-@router.get("/file")
-async def get_image_file(
-    request: Request,
-    object: str = Query(..., description="MinIO对象路径"),
-    db: Session = Depends(get_db)
-):
-    """图片代理：通过 MinIO 读取并返回图片二进制，避免前端直连 MinIO。需要 doc:view 权限"""
-    try:
-        # 获取当前用户ID
-        user_id = get_current_user_id(request)
-        
-        # 权限检查：需要通过图片路径找到对应的文档，然后检查权限
-        # 图片路径格式通常是：documents/{document_id}/images/...
-        # 尝试从路径中提取 document_id
-        try:
-            parts = object.split('/')
-            if 'documents' in parts:
-                doc_idx = parts.index('documents')
-                if doc_idx + 1 < len(parts):
-                    doc_id_str = parts[doc_idx + 1]
-                    try:
-                        doc_id = int(doc_id_str)
-                        doc = db.query(Document).filter(Document.id == doc_id).first()
-                        if doc:
-                            perm = KnowledgeBasePermissionService(db)
-                            perm.ensure_permission(doc.knowledge_base_id, user_id, "doc:view")
-                    except (ValueError, TypeError):
-                        pass  # 如果无法解析文档ID，跳过权限检查（向后兼容）
-        except Exception:
-            pass  # 如果权限检查失败，继续执行（向后兼容）
-        
-        minio = MinioStorageService()
-        data = minio.download_file(object)
-
-        lower = object.lower()
-        if lower.endswith((".jpg", ".jpeg")):
-            content_type = "image/jpeg"
-        elif lower.endswith(".png"):
-            content_type = "image/png"
-        elif lower.endswith(".gif"):
-            content_type = "image/gif"
-        elif lower.endswith(".webp"):
-            content_type = "image/webp"
-        else:
-            content_type = "application/octet-stream"
-
-        return Response(content=data, media_type=content_type)
-    except Exception as e:
-        logger.error(f"图片代理错误: {e}", exc_info=True)
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="图片不存在或无法访问")
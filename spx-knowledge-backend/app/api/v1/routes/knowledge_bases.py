@@ -15,6 +15,7 @@ from app.core.response import success_response
 from app.services.knowledge_base_service import KnowledgeBaseService
 from app.services.knowledge_base_category_service import KnowledgeBaseCategoryService
 from app.services.permission_service import KnowledgeBasePermissionService
+from app.services.vector_index_profiles import describe_profiles
 from app.models.knowledge_base_category import KnowledgeBaseCategory
 from app.models.knowledge_base_member import KnowledgeBaseMember
 from app.models.user import User
@@ -152,8 +153,15 @@ async def create_knowledge_base(
             db.commit()
     except Exception:
         db.rollback()
+    KnowledgeBasePermissionService(db).invalidate_users(user_id)
     return {"code": 0, "message": "ok", "data": kb}
 
+@router.get("/vector-profiles")
+async def list_vector_profiles(request: Request):
+    """可选的向量索引配置档（创建知识库时通过 vector_profile 指定）"""
+    get_current_user_id(request)
+    return {"code": 0, "message": "ok", "data": describe_profiles()}
+
 @router.get("/{kb_id}")
 async def get_knowledge_base(
     request: Request,
@@ -231,8 +239,11 @@ async def delete_knowledge_base(
     user_id = get_current_user_id(request)
     perm = KnowledgeBasePermissionService(db)
     perm.ensure_permission(kb_id, user_id, "kb:delete")
+    # 删除会级联删除成员记录，先记下需要失效权限缓存的用户
+    affected_user_ids = perm.get_kb_user_ids(kb_id)
     service = KnowledgeBaseService(db)
     success = await service.delete_knowledge_base(kb_id)
+    perm.invalidate_users(*affected_user_ids)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -325,6 +336,7 @@ async def add_knowledge_base_member(
         )
         db.add(member)
     db.commit()
+    perm.invalidate_users(body.user_id)
     
     # 自动更新知识库的 visibility：如果有成员（除了owner），设置为 shared
     _update_kb_visibility_if_needed(db, kb_id)
@@ -377,6 +389,7 @@ async def update_knowledge_base_member(
 
     member.role = body.role
     db.commit()
+    perm.invalidate_users(member_user_id)
 
     return {
         "code": 0,
@@ -429,6 +442,7 @@ async def remove_knowledge_base_member(
         logger.info(f"删除知识库成员: kb_id={kb_id}, user_id={member_user_id}, role={member.role}")
         db.delete(member)
         db.commit()
+        perm.invalidate_users(member_user_id)
         logger.info(f"知识库成员删除成功: kb_id={kb_id}, user_id={member_user_id}")
         
         # 自动更新知识库的 visibility：如果删除后没有成员了，设置为 private
@@ -5,6 +5,7 @@ QA API Routes
 
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, WebSocket, WebSocketDisconnect, Request
 from typing import List, Optional, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
 import json
@@ -27,7 +28,7 @@ from app.services.external_search_service import ExternalSearchService, External
 from app.services.ollama_service import OllamaService
 from app.services.opensearch_service import OpenSearchService
 from app.models.qa_external_search import QAExternalSearchRecord
-from app.dependencies.database import get_db
+from app.dependencies.database import get_db, get_async_read_db
 from app.core.logging import logger
 from app.config.settings import settings
 
@@ -241,12 +242,12 @@ def create_qa_session(
         )
 
 @router.get("/sessions", response_model=QASessionListResponse)
-def get_qa_sessions(
+async def get_qa_sessions(
     request: Request,
     page: int = 1,
     size: int = settings.QA_DEFAULT_PAGE_SIZE,
     knowledge_base_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """获取会话列表 - 根据设计文档实现，只返回当前用户的会话"""
     try:
@@ -254,8 +255,8 @@ def get_qa_sessions(
         user_id = get_current_user_id(request)
         logger.info(f"API请求: 获取会话列表，页码: {page}, 大小: {size}, 用户ID: {user_id}")
         
-        service = QAService(db)
-        result = service.get_qa_sessions(
+        result = await QAService.get_qa_sessions_async(
+            db,
             page=page,
             size=size,
             knowledge_base_id=knowledge_base_id,
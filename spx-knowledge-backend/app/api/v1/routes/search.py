@@ -13,8 +13,10 @@ from app.schemas.search import (
 )
 from app.services.search_service import SearchService
 from app.services.search_history_service import SearchHistoryService
+from app.services.permission_service import KnowledgeBasePermissionService
 from app.dependencies.database import get_db
 from app.core.logging import logger
+from app.core.exceptions import CustomException
 from app.config.settings import settings
 
 router = APIRouter()
@@ -33,8 +35,16 @@ def get_current_user_id(request: Request) -> Optional[int]:
         return None
 
 
+def resolve_search_kb_ids(request: Request, db: Session, requested=None) -> List[int]:
+    """当前用户可搜索的知识库（来自缓存的权限映射），作为 knowledge_base_id terms 过滤下推到 OpenSearch；
+    指定了无权限的知识库时抛出 403
+    """
+    return KnowledgeBasePermissionService(db).resolve_kb_filter(get_current_user_id(request), requested)
+
+
 @router.get("/mixed")
 async def mixed_search(
+    request: Request,
     q: str = Query(..., description="查询文本"),
     top_k: int = Query(None, ge=1, le=100, description="返回结果数量（如果为None，使用配置的RERANK_TOP_K）"),
     kb_id: int | None = Query(None, description="知识库ID"),
@@ -47,10 +57,13 @@ async def mixed_search(
     """混合搜索接口 - 支持向量+关键词融合检索+Rerank精排"""
     try:
         logger.info(f"API请求: 混合搜索(GET)，查询: {q[:50]}..., 知识库ID: {kb_id}, top_k: {top_k}, 阈值: {similarity_threshold}")
+        kb_ids = resolve_search_kb_ids(request, db, [kb_id] if kb_id else None)
+        if not kb_ids:
+            return {"code": 0, "message": "ok", "data": {"list": [], "total": 0}}
         svc = SearchService(db)
         items = await svc.mixed_search(
             query_text=q,
-            knowledge_base_id=kb_id,
+            knowledge_base_id=kb_ids,
             top_k=top_k,
             alpha=alpha,
             use_keywords=use_keywords,
@@ -59,6 +72,8 @@ async def mixed_search(
         )
         logger.info(f"API响应: 返回 {len(items)} 个搜索结果")
         return {"code": 0, "message": "ok", "data": {"list": items, "total": len(items)}}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"混合搜索API错误(GET): {e}", exc_info=True)
         raise HTTPException(
@@ -114,6 +129,12 @@ async def search(
                         detail=f"知识库ID {kb_ids} 不存在或未激活"
                     )
         
+        # 按用户权限限定知识库范围（过滤条件直接下推到 OpenSearch 查询）
+        requested_kb_ids = search_request.knowledge_base_id
+        search_request.knowledge_base_id = resolve_search_kb_ids(request, db, requested_kb_ids)
+        if not search_request.knowledge_base_id:
+            return {"total": 0, "items": [], "search_time_ms": int((time.time() - start_time) * 1000)}
+        
         service = SearchService(db)
         results = await service.search(search_request)
         
@@ -129,7 +150,7 @@ async def search(
                     user_id=user_id,
                     query_text=search_request.query,
                     search_type=search_request.search_type,
-                    knowledge_base_id=search_request.knowledge_base_id,
+                    knowledge_base_id=requested_kb_ids,
                     result_count=len(results),
                     search_time_ms=search_time_ms
                 )
@@ -139,6 +160,8 @@ async def search(
         
         logger.info(f"API响应(HTTP): 最终返回前端 {len(results)} 个搜索结果（total={len(results)}, items={len(results)}），耗时: {search_time_ms}ms")
         return {"total": len(results), "items": results, "search_time_ms": search_time_ms}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"文本搜索API错误: {e}", exc_info=True)
         raise HTTPException(
@@ -149,17 +172,23 @@ async def search(
 @router.post("/vector")
 async def vector_search(
     search_request: SearchRequest,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """向量搜索 - 基于向量相似度的语义搜索 + Rerank精排"""
     try:
         logger.info(f"API请求: 向量搜索，查询: {search_request.query[:50]}..., 知识库ID: {search_request.knowledge_base_id}")
         
+        search_request.knowledge_base_id = resolve_search_kb_ids(request, db, search_request.knowledge_base_id)
+        if not search_request.knowledge_base_id:
+            return {"total": 0, "items": []}
         service = SearchService(db)
         search_request.search_type = "vector"
         results = await service.vector_search(search_request)
         logger.info(f"API响应: 返回 {len(results)} 个搜索结果")
         return {"total": len(results), "items": results}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"向量搜索API错误: {e}", exc_info=True)
         raise HTTPException(
@@ -170,17 +199,23 @@ async def vector_search(
 @router.post("/hybrid")
 async def hybrid_search(
     search_request: SearchRequest,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """混合搜索 - 结合关键词和语义的混合检索 + Rerank精排"""
     try:
         logger.info(f"API请求: 混合搜索，查询: {search_request.query[:50]}..., 知识库ID: {search_request.knowledge_base_id}")
         
+        search_request.knowledge_base_id = resolve_search_kb_ids(request, db, search_request.knowledge_base_id)
+        if not search_request.knowledge_base_id:
+            return {"total": 0, "items": []}
         service = SearchService(db)
         search_request.search_type = "hybrid"
         results = await service.hybrid_search(search_request)
         logger.info(f"API响应: 返回 {len(results)} 个搜索结果")
         return {"total": len(results), "items": results}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"混合搜索API错误: {e}", exc_info=True)
         raise HTTPException(
@@ -190,18 +225,22 @@ async def hybrid_search(
 
 @router.get("/suggestions")
 async def get_search_suggestions(
-    query: str,
-    limit: int = 5,
+    request: Request,
+    query: str = "",
+    limit: int = Query(5, ge=1, le=settings.SUGGEST_MAX_LIMIT),
+    knowledge_base_id: Optional[List[int]] = Query(None),
     db: Session = Depends(get_db)
 ):
-    """搜索建议 - 提供搜索建议和自动补全"""
+    """搜索建议 - 输入即搜的前缀补全（热词 + 有权限知识库的文档标题 / 目录标题）"""
     try:
-        logger.info(f"API请求: 搜索建议，查询: {query[:50]}..., 限制: {limit}")
+        # 每次按键都会调用，只记 debug 日志
+        logger.debug(f"API请求: 搜索建议，查询: {query[:50]}..., 限制: {limit}")
+        kb_ids = resolve_search_kb_ids(request, db, knowledge_base_id)
         service = SearchService(db)
-        request = SearchSuggestionRequest(query=query, limit=limit)
-        results = await service.get_suggestions(request)
-        logger.info(f"API响应: 返回 {len(results)} 个搜索建议")
-        return results
+        suggestion_request = SearchSuggestionRequest(query=query, limit=limit, knowledge_base_id=knowledge_base_id)
+        return await service.get_suggestions(suggestion_request, kb_ids)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"搜索建议API错误: {e}", exc_info=True)
         raise HTTPException(
@@ -346,15 +385,21 @@ async def clear_search_history(
 @router.post("/advanced")
 async def advanced_search(
     advanced_request: SearchAdvancedRequest,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """高级搜索 - 支持复杂查询语法"""
     try:
         logger.info(f"API请求: 高级搜索，查询: {advanced_request.query[:50]}...")
+        advanced_request.knowledge_base_id = resolve_search_kb_ids(request, db, advanced_request.knowledge_base_id)
+        if not advanced_request.knowledge_base_id:
+            return {"total": 0, "items": []}
         service = SearchService(db)
         results = await service.advanced_search(advanced_request)
         logger.info(f"API响应: 返回 {len(results)} 个搜索结果")
         return {"total": len(results), "items": results}
+    except (HTTPException, CustomException):
+        raise
     except Exception as e:
         logger.error(f"高级搜索API错误: {e}", exc_info=True)
         raise HTTPException(
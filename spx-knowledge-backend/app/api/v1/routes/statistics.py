@@ -5,10 +5,11 @@ Statistics API Routes
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.services.statistics_service import StatisticsService
 from app.services.search_history_service import SearchHistoryService
-from app.dependencies.database import get_db
+from app.dependencies.database import get_db, get_async_read_db
 from app.core.logging import logger
 
 router = APIRouter()
@@ -30,15 +31,17 @@ def get_current_user_id(request: Request) -> int:
 async def get_personal_statistics(
     request: Request,
     period: str = Query("all", description="统计周期：all/week/month/year"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """获取个人数据统计"""
     try:
         user_id = get_current_user_id(request)
         logger.info(f"API请求: 获取个人统计数据，用户ID: {user_id}, 周期: {period}")
         
-        service = StatisticsService(db)
-        stats = await service.get_personal_statistics(user_id, period)
+        # 统计查询为同步实现，通过 run_sync 在异步只读会话的连接上执行
+        stats = await db.run_sync(
+            lambda sync_db: StatisticsService(sync_db).get_personal_statistics(user_id, period)
+        )
         
         return {
             "code": 0,
@@ -61,15 +64,16 @@ async def get_trends(
     period: str = Query("month", description="周期：week/month/year"),
     start_date: Optional[str] = Query(None, description="开始日期"),
     end_date: Optional[str] = Query(None, description="结束日期"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """获取数据趋势"""
     try:
         user_id = get_current_user_id(request)
         logger.info(f"API请求: 获取趋势数据，用户ID: {user_id}, 指标: {metric}, 周期: {period}")
         
-        service = StatisticsService(db)
-        trends = await service.get_trends(user_id, metric, period, start_date, end_date)
+        trends = await db.run_sync(
+            lambda sync_db: StatisticsService(sync_db).get_trends(user_id, metric, period, start_date, end_date)
+        )
         
         return {
             "code": 0,
@@ -88,15 +92,16 @@ async def get_trends(
 @router.get("/knowledge-bases/heatmap")
 async def get_knowledge_base_heatmap(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """获取知识库使用热力图"""
     try:
         user_id = get_current_user_id(request)
         logger.info(f"API请求: 获取知识库热力图，用户ID: {user_id}")
         
-        service = StatisticsService(db)
-        heatmap = await service.get_knowledge_base_heatmap(user_id)
+        heatmap = await db.run_sync(
+            lambda sync_db: StatisticsService(sync_db).get_knowledge_base_heatmap(user_id)
+        )
         
         return {
             "code": 0,
@@ -89,13 +89,18 @@ async def documents_status_socket(websocket: WebSocket, token: Optional[str] = Q
             logger.info("文档状态WebSocket在发送欢迎包前断开")
             return
 
-        while True:
-            try:
-                data = await websocket.receive_text()
-                await websocket.send_json({"type": "pong", "echo": data})
-            except WebSocketDisconnect:
-                logger.info("文档状态WebSocket断开连接")
-                break
+        # 登记连接：任意进程（含 Celery worker）发布的 document_status 事件经 Redis 投递到这里
+        await websocket_notification_service.connect(websocket, user_id, accept=False)
+        try:
+            while True:
+                try:
+                    data = await websocket.receive_text()
+                    await websocket.send_json({"type": "pong", "echo": data})
+                except WebSocketDisconnect:
+                    logger.info("文档状态WebSocket断开连接")
+                    break
+        finally:
+            websocket_notification_service.disconnect(websocket, user_id)
     except WebSocketDisconnect:
         logger.info("文档状态WebSocket在握手阶段断开")
     except Exception as e:
@@ -2,22 +2,93 @@
 Database Configuration
 """
 
+from typing import Dict
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config.settings import settings
 
+
+def _pool_options(pool_size: int, max_overflow: int) -> dict:
+    return {
+        "pool_pre_ping": True,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def _engine_options(url: str, pool_size: int, max_overflow: int) -> dict:
+    # SQLite（测试环境）不支持连接池参数
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return _pool_options(pool_size, max_overflow)
+
+
 # 创建数据库引擎
 engine = create_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,
-    pool_pre_ping=True,
-    pool_recycle=300,
+    **_engine_options(settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW),
 )
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 只读副本（列表、搜索等读多写少的接口）；未配置 DATABASE_READ_URL 时使用主库
+read_engine = (
+    create_engine(
+        settings.DATABASE_READ_URL,
+        echo=settings.DEBUG,
+        **_engine_options(settings.DATABASE_READ_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW),
+    )
+    if settings.DATABASE_READ_URL
+    else engine
+)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+
+def to_async_url(url: str) -> str:
+    """同步连接串转换为异步驱动连接串（mysql+pymysql -> mysql+aiomysql）"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "mysql":
+        return parsed.set(drivername=f"mysql+{settings.DATABASE_ASYNC_DRIVER}").render_as_string(hide_password=False)
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return url
+
+
+# 异步引擎（首次使用时创建，未安装异步驱动时不影响同步代码路径）
+_async_engines: Dict[bool, AsyncEngine] = {}
+_async_sessionmakers: Dict[bool, async_sessionmaker] = {}
+
+
+def get_async_engine(read: bool = False) -> AsyncEngine:
+    """获取异步引擎；read=True 且配置了只读副本时连接副本"""
+    read = bool(read and settings.DATABASE_READ_URL)
+    if read not in _async_engines:
+        url = to_async_url(settings.DATABASE_READ_URL if read else settings.DATABASE_URL)
+        _async_engines[read] = create_async_engine(
+            url,
+            echo=settings.DEBUG,
+            **_engine_options(url, settings.DB_ASYNC_POOL_SIZE, settings.DB_ASYNC_MAX_OVERFLOW),
+        )
+    return _async_engines[read]
+
+
+def get_async_sessionmaker(read: bool = False) -> async_sessionmaker:
+    read = bool(read and settings.DATABASE_READ_URL)
+    if read not in _async_sessionmakers:
+        _async_sessionmakers[read] = async_sessionmaker(
+            bind=get_async_engine(read), autoflush=False, expire_on_commit=False
+        )
+    return _async_sessionmakers[read]
+
 # 创建基础模型类
 Base = declarative_base()
 
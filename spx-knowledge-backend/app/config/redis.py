@@ -3,6 +3,7 @@ Redis Configuration
 """
 
 import redis
+import redis.asyncio as redis_asyncio
 from app.config.settings import settings
 
 # 创建Redis连接
@@ -17,3 +18,19 @@ redis_client = redis.Redis.from_url(
 def get_redis():
     """获取Redis客户端"""
     return redis_client
+
+# 异步客户端（在事件循环中使用，避免同步调用阻塞请求）；首次使用时创建
+_async_redis_client = None
+
+def get_async_redis():
+    """获取异步Redis客户端"""
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = redis_asyncio.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=5,
+            socket_timeout=5,
+            retry_on_timeout=True
+        )
+    return _async_redis_client
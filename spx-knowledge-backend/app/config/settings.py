@@ -4,7 +4,7 @@ Configuration Management
 
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic_settings import BaseSettings  # type: ignore
 
 # 计算项目根目录，确保无论从哪里运行都能找到根目录下的 .env
@@ -35,6 +35,17 @@ class Settings(BaseSettings):
     MYSQL_USER: str = "user"
     MYSQL_PASSWORD: str = "password"
     MYSQL_DATABASE: str = "spx_knowledge"
+    # 只读副本（列表/搜索类接口），为空时使用主库
+    DATABASE_READ_URL: Optional[str] = None
+    # 异步驱动（aiomysql / asyncmy），异步会话由 DATABASE_URL 自动转换
+    DATABASE_ASYNC_DRIVER: str = "aiomysql"
+    # 连接池：同步引擎（API 线程池 + Celery）与异步引擎分别配置
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_ASYNC_POOL_SIZE: int = 20
+    DB_ASYNC_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 300
     
     # Redis配置
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -61,6 +72,17 @@ class Settings(BaseSettings):
     HNSW_EF_CONSTRUCTION: int = 128
     HNSW_M: int = 24
     KNN_NUM_CANDIDATES_FACTOR: int = 2
+    # 新建知识库默认的向量索引配置档（default / faiss_hnsw / faiss_fp16 / lucene_sq / on_disk，见 vector_index_profiles）
+    VECTOR_INDEX_DEFAULT_PROFILE: str = "default"
+    # 覆盖或新增配置档（JSON），如 {"faiss_fp16": {"m": 32, "ef_construction": 256, "ef_search": 128}}
+    VECTOR_INDEX_PROFILES: Dict[str, Dict[str, Any]] = {}
+    # 查询使用结构化 meta.* 字段（页码/表格/章节过滤、排序、分页在 OpenSearch 内完成）；存量索引需先运行 scripts/backfill_chunk_metadata.py
+    OPENSEARCH_STRUCTURED_METADATA: bool = False
+    # 通配符/正则查询子字段：off（分词后的 content）/ wildcard（OpenSearch 2.15+ wildcard 字段）/ ngram（3-gram 预筛 + 结果校验）；开启前先运行 scripts/enable_pattern_subfield.py
+    CONTENT_PATTERN_SUBFIELD: str = "off"
+    PATTERN_MIN_LITERAL: int = 3  # 使用子字段时模式中至少包含的连续普通字符数
+    PATTERN_MAX_LENGTH: int = 128
+    PATTERN_NGRAM_CANDIDATE_FACTOR: int = 5  # ngram 预筛候选数 = 返回条数 × 倍数（结果校验前）
     
     # MinIO配置
     MINIO_ENDPOINT: str = "localhost:9000"
@@ -78,6 +100,13 @@ class Settings(BaseSettings):
     CLIP_MODELS_DIR: str = str((_PROJECT_ROOT / "models" / "clip").resolve())
     CLIP_PRETRAINED_PATH: str = str((_PROJECT_ROOT / "models" / "clip" / "ViT-B-32-openclip.pt").resolve())
     CLIP_CACHE_DIR: str = str((_PROJECT_ROOT / "models" / "clip" / "cache").resolve())
+    CLIP_BACKEND: str = "torch"  # 推理后端：torch（open_clip）/ onnx（ONNX Runtime，需先运行 scripts/export_onnx_models.py）
+    # ONNX Runtime 后端（CPU）：导出产物目录（rerank/、clip/ 子目录）、int8 量化与线程配置
+    ONNX_MODELS_DIR: str = str((_PROJECT_ROOT / "models" / "onnx").resolve())
+    ONNX_QUANTIZE: bool = True  # 优先加载 int8 动态量化模型
+    ONNX_INTRA_OP_THREADS: int = 0  # 单个算子的并行线程数，0 表示按物理核数；多 worker 进程时建议设为 核数/进程数
+    ONNX_INTER_OP_THREADS: int = 1
+    ONNX_ALLOW_SPINNING: bool = False  # 线程空闲时是否自旋等待（关闭可避免空闲时占用 CPU）
     # Hugging Face 缓存目录（可选，默认使用项目 models/cache 目录）
     HF_HOME: Optional[str] = str((_PROJECT_ROOT / "models" / "cache").resolve())
 
@@ -131,6 +160,16 @@ class Settings(BaseSettings):
     QA_HISTORY_CLEANUP_DAYS: int = 90
     QA_HISTORY_DEFAULT_PAGE_SIZE: int = 20
     QA_HISTORY_MAX_PAGE_SIZE: int = 100
+    # 问答历史写后队列（Redis Stream + Celery 批量落盘），关闭时在请求内同步写入
+    QA_HISTORY_WRITE_BEHIND_ENABLED: bool = True
+    QA_HISTORY_STREAM_KEY: str = "qa_history:write_queue"
+    QA_HISTORY_STREAM_GROUP: str = "qa_history_writers"
+    QA_HISTORY_STREAM_MAXLEN: int = 100000
+    QA_HISTORY_FLUSH_BATCH_SIZE: int = 64
+    QA_HISTORY_FLUSH_DELAY_SECONDS: int = 2  # 入队后延迟触发落盘，合并同一时间窗口内的写入
+    QA_HISTORY_FLUSH_INTERVAL_SECONDS: int = 60  # Beat 兜底落盘间隔
+    QA_HISTORY_RETRY_IDLE_SECONDS: int = 60  # 未确认消息超过该时长后重新投递
+    QA_HISTORY_MAX_RETRIES: int = 3  # 超过重试次数后不带向量写入
     
     # 向量维度
     TEXT_EMBEDDING_DIMENSION: int = 1024
@@ -151,6 +190,17 @@ class Settings(BaseSettings):
     RERANK_TOP_K: int = 5  # rerank后返回的结果数量（默认5个）
     RERANK_DEVICE: str = "cpu"  # rerank模型运行设备（cpu/cuda，如果配置为cuda但GPU不可用，会自动降级到cpu）
     RERANK_MIN_SCORE: float = 0.5  # rerank 后端最小得分过滤（0-1），业界建议0.4-0.5，设置为0.5以提升结果质量
+    RERANK_MAX_LENGTH: int = 512  # query+passage 最大 token 数，超长段落截取查询词命中最密集的窗口
+    RERANK_LENGTH_BUCKETS: str = "128:64,256:32,512:16"  # 按 token 长度分桶计算（上限:批大小），短对用大批
+    RERANK_TOKEN_CACHE_SIZE: int = 4096  # 段落分词结果缓存条数（按分块，进程内 LRU），0 表示不缓存
+    RERANK_BACKEND: str = "torch"  # 推理后端：torch（FlagReranker）/ onnx（ONNX Runtime，需先运行 scripts/export_onnx_models.py）
+
+    # 查询期推理微批（CLIP 文本编码 / rerank）：并发请求在时间窗口内合并为一次前向计算
+    INFERENCE_BATCHING_ENABLED: bool = True
+    INFERENCE_BATCH_MAX_WAIT_MS: int = 10  # 首个请求到达后最多等待的合批时间（毫秒）
+    INFERENCE_BATCH_MAX_QUEUE: int = 1024  # 等待队列上限，超过后提交方阻塞（背压）
+    RERANK_BATCH_MAX_PAIRS: int = 64  # 单批 rerank 最多 query-passage 对数
+    CLIP_TEXT_BATCH_MAX_SIZE: int = 32  # 单批 CLIP 文本编码最多文本数
     # 混合搜索向量权重 α（关键词权重为 1-α）
     # 设置为0.5表示向量和BM25权重平衡，既考虑语义相似度，也重视精确匹配
     SEARCH_HYBRID_ALPHA: float = 0.5
@@ -163,6 +213,21 @@ class Settings(BaseSettings):
     # 搜索历史返回条数限制
     SEARCH_HISTORY_DEFAULT_LIMIT: int = 5
     SEARCH_HISTORY_MAX_LIMIT: int = 20
+    # 搜索热词缓冲计数（Redis 有序集合累加 + Celery 定时批量落盘），关闭时每次搜索直接写库
+    HOTWORD_BUFFER_ENABLED: bool = True
+    HOTWORD_REDIS_PREFIX: str = "search:hotword:"
+    HOTWORD_FLUSH_INTERVAL_SECONDS: int = 60
+    HOTWORD_FLUSH_BATCH_SIZE: int = 1000  # 单条 upsert 语句的行数
+    HOTWORD_TOP_SCAN_LIMIT: int = 2000  # 按周期过滤 Top-N 时最多扫描的词数
+    # 输入即搜前缀建议（进程内前缀树：热词 + 文档标题 + 目录标题）
+    SUGGEST_REFRESH_SECONDS: int = 30  # 增量刷新间隔（按 updated_at 水位拉取变化）
+    SUGGEST_FULL_REBUILD_SECONDS: int = 3600  # 全量重建间隔（修正目录重建等未更新文档时间的漂移）
+    SUGGEST_HOTWORD_WEIGHT: float = 1.0  # 热词得分 = 权重 * log1p(搜索次数)
+    SUGGEST_TITLE_WEIGHT: float = 2.0
+    SUGGEST_TOC_WEIGHT: float = 1.0
+    SUGGEST_TOC_MAX_LEVEL: int = 3  # 只收录该层级及以上的目录标题
+    SUGGEST_MAX_TERM_LENGTH: int = 64  # 超长词条不收录
+    SUGGEST_MAX_LIMIT: int = 10
     
     # 实体/意图阈值
     ENTITY_PERSON_CONFIDENCE: float = 0.8
@@ -181,6 +246,15 @@ class Settings(BaseSettings):
     IMAGE_COORDS_NORMALIZE: bool = True  # 统一输出坐标为 0-1 归一化
     IMAGE_ASSOC_RERANK_ENABLED: bool = False  # 图片↔文本关联是否启用 cross-encoder 精排（默认关闭）
 
+    # 图片代理（/images/file）：流式转发 + 浏览器缓存 + 缩略图档位
+    IMAGE_PROXY_CHUNK_SIZE: int = 64 * 1024  # 流式转发的分块大小（字节）
+    IMAGE_PROXY_CACHE_MAX_AGE: int = 86400  # Cache-Control max-age（秒），对象内容由 ETag 校验
+    # 缩略图档位：size 参数 -> 最长边像素
+    IMAGE_THUMBNAIL_TIERS: Dict[str, int] = {"small": 256, "medium": 768}
+    IMAGE_THUMBNAIL_CACHE_DIR: str = str((_PROJECT_ROOT / "cache" / "thumbnails").resolve())
+    IMAGE_THUMBNAIL_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 磁盘 LRU 缓存上限（字节）
+    IMAGE_THUMBNAIL_SOURCE_MAX_BYTES: int = 30 * 1024 * 1024  # 超过该大小的原图不生成缩略图，直接回源
+
     # 内容预览
     CONTENT_PREVIEW_LENGTH: int = 100
     
@@ -191,6 +265,29 @@ class Settings(BaseSettings):
     CACHE_TTL_SECONDS: int = 3600
     CACHE_MAX_SIZE: int = 1000
     CACHE_CLEANUP_INTERVAL: int = 300
+    # CacheManager：序列化方式（json / msgpack）、超过该字节数的值 zlib 压缩（0 关闭）、连接池上限
+    CACHE_SERIALIZER: str = "json"
+    CACHE_COMPRESS_MIN_BYTES: int = 4096
+    CACHE_MAX_CONNECTIONS: int = 50
+    # 用户知识库权限映射（kb_id -> role）的 Redis 缓存时间（秒），成员/所有者变化时主动失效；0 关闭缓存
+    PERMISSION_CACHE_TTL: int = 60
+    # 知识库聚合统计（文档/分块/图片数、存储占用）定时对账间隔（秒），0 关闭
+    KB_STATS_RECONCILE_INTERVAL_SECONDS: int = 3600
+    # 分类/标签推荐：标签得分中向量质心相似度的权重（其余为正文 TF-IDF）
+    RECOMMEND_TAG_SEMANTIC_WEIGHT: float = 0.6
+    # 标签推荐词表大小（按使用次数取前 N 个标签）
+    RECOMMEND_TAG_VOCAB_SIZE: int = 500
+    # 标签推荐读取的正文分块数（用于 TF-IDF）
+    RECOMMEND_TAG_TEXT_CHUNKS: int = 50
+    # 标签词表（IDF）Redis 缓存时间（秒）
+    RECOMMEND_VOCAB_CACHE_TTL: int = 300
+    # WebSocket 通知经 Redis pub/sub 跨进程扇出（多 uvicorn worker / Celery 发布）；关闭时只投递本进程连接
+    WS_FANOUT_ENABLED: bool = True
+    WS_CHANNEL_PREFIX: str = "ws:"
+    # 单个连接待发送消息上限（同 coalesce_key 的进度事件合并），超过视为慢客户端并断开
+    WS_CLIENT_MAX_PENDING: int = 100
+    # 单条消息发送超时（秒），超时断开连接
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0
     
     # Celery Worker 配置
     # Celery worker 并发数（默认根据 CPU 数自动计算，建议 >= 4 以避免 k8s 同步任务占用）
@@ -214,6 +311,21 @@ class Settings(BaseSettings):
     CELERY_TASK_PRIORITY_OBSERVABILITY: int = 3  # K8s 同步任务（低优先级，后台任务）
     CELERY_TASK_PRIORITY_CLEANUP: int = 2  # 清理任务（最低优先级）
     CELERY_TASK_PRIORITY_DEFAULT: int = 5  # 默认优先级
+    # Worker 只导入其监听队列对应的任务模块（False 时导入全部任务模块）
+    CELERY_LAZY_TASK_IMPORTS: bool = True
+    # 模型（CLIP / Rerank）首次使用时才加载；False 时在服务实例化时预加载
+    MODEL_LAZY_LOADING: bool = True
+    # 启动剖析：输出模块导入耗时与内存报告，超出预算时以 warning 输出
+    STARTUP_PROFILE_ENABLED: bool = False
+    STARTUP_IMPORT_BUDGET_MS: int = 5000
+    STARTUP_RSS_BUDGET_MB: int = 1024
+    # 文档分阶段流水线：解析(document) → 文本向量化(vector) / 图片向量化(image) 并行 → 收尾(index)
+    # 各阶段并发通过部署不同 CELERY_QUEUES / CELERY_CONCURRENCY 的 worker 分别调整；False 时在解析任务内依次执行
+    DOCUMENT_PIPELINE_ENABLED: bool = True
+    # 背压：vector/image/index 任一队列积压达到该值时，解析任务延后接收新文档（0 表示不限制）
+    DOCUMENT_PIPELINE_MAX_QUEUE_DEPTH: int = 200
+    DOCUMENT_PIPELINE_BACKPRESSURE_COUNTDOWN: int = 30  # 每次延后秒数
+    DOCUMENT_PIPELINE_BACKPRESSURE_MAX_DEFERRALS: int = 20  # 最多延后次数，超过后照常处理
     
     OBSERVABILITY_RESOURCE_TYPES: List[str] = [
         "pods",
@@ -246,6 +358,13 @@ class Settings(BaseSettings):
     OBSERVABILITY_LOG_MAX_LINES: int = 300  # 最终返回的最大日志行数（优先保留 ERROR/WARNING/FATAL 日志）
     OBSERVABILITY_LOG_CONTEXT_LINES: int = 3  # 错误日志上下文行数（前后各几行）
     OBSERVABILITY_LOG_MAX_LINE_LENGTH: int = 10000  # 单行日志最大长度（超过此长度将被截断，单位：字符）
+    OBSERVABILITY_LOG_MAX_EXCERPTS: int = 30  # 提供给 LLM 的去重日志摘录条数（按严重级别与重复次数排序）
+    # 诊断数据并发收集：API Server / 指标 / 日志同时发起，各数据源独立超时，超时返回部分结果
+    OBSERVABILITY_COLLECT_API_TIMEOUT_SECONDS: float = 15.0
+    OBSERVABILITY_COLLECT_METRICS_TIMEOUT_SECONDS: float = 20.0  # 单个指标模板查询超时（超时的模板记为失败，其余照常返回）
+    OBSERVABILITY_COLLECT_LOGS_TIMEOUT_SECONDS: float = 30.0  # 单个容器日志拉取超时
+    OBSERVABILITY_COLLECT_METRICS_CONCURRENCY: int = 4  # 同时执行的指标模板数
+    OBSERVABILITY_COLLECT_LOGS_CONCURRENCY: int = 4  # 同时拉取日志的容器数
     SEARXNG_URL: Optional[str] = None
     EXTERNAL_SEARCH_ENABLED: bool = True
     EXTERNAL_SEARCH_MIN_DOC_HITS: int = 2
@@ -300,14 +419,31 @@ class Settings(BaseSettings):
     MIN_PASSWORD_LENGTH: int = 8
     MAX_PASSWORD_LENGTH: int = 50
     
+    # API 限流（GCRA，按用户/IP 计数）：默认 RATE_LIMIT_PER_MINUTE 次/分钟，
+    # RATE_LIMIT_ROUTE_POLICIES 按路由前缀覆盖，如 "/api/qa=30/60;/api/search=120/60"（次数/秒）
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_PER_MINUTE: int = 600
+    RATE_LIMIT_ROUTE_POLICIES: str = ""
+    # 热点客户端本地预取令牌数（<=1 关闭）与有效期，减少 Redis 往返
+    RATE_LIMIT_LOCAL_LEASE: int = 5
+    RATE_LIMIT_LOCAL_LEASE_TTL_MS: int = 1000
+    
     # 邮箱验证
     EMAIL_VERIFICATION_ENABLED: bool = False
     EMAIL_VERIFICATION_CODE_EXPIRE_MINUTES: int = 10
     
     # 日志
     LOG_LEVEL: str = "INFO"
-    LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    # %(trace_id)s：当前请求 / 任务的 trace_id（无上下文时为 -）
+    LOG_FORMAT: str = "%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] - %(message)s"
     LOG_FILE: str = "logs/app.log"
+    # 异步日志：调用线程只入队，脱敏/格式化/写出在后台线程完成；队列满时丢弃 WARNING 以下日志
+    LOG_ASYNC_ENABLED: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+    # 高频逐项日志（extra=sampled(...)）每 N 条输出 1 条
+    LOG_SAMPLE_EVERY_N: int = 20
+    # Prometheus 指标（/metrics）：入库/检索分阶段耗时直方图；多进程部署需设置 PROMETHEUS_MULTIPROC_DIR
+    METRICS_ENABLED: bool = True
     
     # 环境
     ENVIRONMENT: str = "development"
@@ -1,107 +1,355 @@
 ﻿"""
 Cache Module
+基于 redis.asyncio 的缓存管理器：连接池、批量读写（mget / pipeline）、可插拔序列化与大值压缩
+
+- 异步接口供请求路径使用，不阻塞事件循环；cache_manager.sync 提供同步接口（Celery 任务等同步调用方）
+- 值格式：标记字节 + 编码字节 + 负载，读取时按编码字节解码（切换序列化方式不影响已有缓存）；
+  兼容历史上直接写入的 JSON 文本
 """
 
-from typing import Any, Optional
+import asyncio
 import json
+import uuid
+import weakref
+import zlib
+from typing import Any, Dict, List, Optional
+
 import redis
+import redis.asyncio as redis_asyncio
+
 from app.config.settings import settings
+from app.core.logging import logger
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 可选依赖
+    msgpack = None
+
+_MARKER = b"\x1e"
+_CODEC_JSON = b"j"
+_CODEC_MSGPACK = b"m"
+_DELETE_BATCH = 500
+
+# 只有锁的持有者才能释放
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+else
+    return 0
+end
+"""
+
+
+class CacheSerializer:
+    """
+    缓存值序列化：json（有 orjson 时使用 orjson）或 msgpack；
+    超过 compress_min_bytes 的值使用 zlib 压缩（编码字节大写表示已压缩）
+    """
+
+    def __init__(self, codec: Optional[str] = None, compress_min_bytes: Optional[int] = None):
+        codec = (codec or settings.CACHE_SERIALIZER or "json").lower()
+        if codec == "msgpack" and msgpack is None:
+            logger.warning("CACHE_SERIALIZER=msgpack 但未安装 msgpack，改用 json")
+            codec = "json"
+        self.codec = _CODEC_MSGPACK if codec == "msgpack" else _CODEC_JSON
+        self.compress_min_bytes = (
+            settings.CACHE_COMPRESS_MIN_BYTES if compress_min_bytes is None else compress_min_bytes
+        )
+
+    @staticmethod
+    def _json_dumps(value: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+
+    def dumps(self, value: Any) -> bytes:
+        if self.codec == _CODEC_MSGPACK:
+            payload = msgpack.packb(value, use_bin_type=True, default=str)
+        else:
+            payload = self._json_dumps(value)
+        codec = self.codec
+        if self.compress_min_bytes and len(payload) >= self.compress_min_bytes:
+            payload = zlib.compress(payload, 3)
+            codec = codec.upper()
+        return _MARKER + codec + payload
+
+    def loads(self, raw: Optional[bytes]) -> Any:
+        if raw is None:
+            return None
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+        if not raw.startswith(_MARKER):
+            # 历史数据：直接写入的 JSON 文本
+            return json.loads(raw.decode("utf-8"))
+        codec, payload = raw[1:2], raw[2:]
+        if codec.isupper():
+            payload = zlib.decompress(payload)
+            codec = codec.lower()
+        if codec == _CODEC_MSGPACK:
+            if msgpack is None:
+                raise RuntimeError("缓存值为 msgpack 编码，但未安装 msgpack")
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        if orjson is not None:
+            return orjson.loads(payload)
+        return json.loads(payload.decode("utf-8"))
+
+
+class SyncCacheManager:
+    """同步缓存接口（Celery 任务、同步服务使用），与异步接口共用序列化格式"""
+
+    def __init__(self, serializer: CacheSerializer):
+        self.serializer = serializer
+        self.client = redis.Redis(
+            connection_pool=redis.ConnectionPool.from_url(
+                settings.REDIS_URL,
+                max_connections=settings.CACHE_MAX_CONNECTIONS,
+                socket_connect_timeout=5,
+                socket_timeout=5,
+            )
+        )
+        self._release_script = self.client.register_script(_RELEASE_LOCK_SCRIPT)
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            return self.serializer.loads(self.client.get(key))
+        except Exception as e:
+            logger.warning(f"缓存获取错误: {key}, err={e}")
+            return None
+
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        if not keys:
+            return []
+        try:
+            return [self._safe_loads(raw) for raw in self.client.mget(keys)]
+        except Exception as e:
+            logger.warning(f"缓存批量获取错误: {e}")
+            return [None] * len(keys)
+
+    def set(self, key: str, value: Any, expire: Optional[int] = None) -> bool:
+        try:
+            self.client.set(key, self.serializer.dumps(value), ex=expire or None)
+            return True
+        except Exception as e:
+            logger.warning(f"缓存设置错误: {key}, err={e}")
+            return False
+
+    def mset(self, mapping: Dict[str, Any], expire: Optional[int] = None) -> bool:
+        if not mapping:
+            return True
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.set(key, self.serializer.dumps(value), ex=expire or None)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"缓存批量设置错误: {e}")
+            return False
+
+    def delete(self, *keys: str) -> bool:
+        try:
+            if keys:
+                self.client.delete(*keys)
+            return True
+        except Exception as e:
+            logger.warning(f"缓存删除错误: {keys}, err={e}")
+            return False
+
+    def delete_pattern(self, pattern: str) -> int:
+        """按模式删除（SCAN + 分批 UNLINK，不使用阻塞的 KEYS）"""
+        deleted = 0
+        try:
+            batch: List[bytes] = []
+            for key in self.client.scan_iter(match=pattern, count=_DELETE_BATCH):
+                batch.append(key)
+                if len(batch) >= _DELETE_BATCH:
+                    deleted += self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += self.client.unlink(*batch)
+        except Exception as e:
+            logger.warning(f"缓存按模式删除错误: {pattern}, err={e}")
+        return deleted
+
+    def exists(self, key: str) -> bool:
+        try:
+            return bool(self.client.exists(key))
+        except Exception as e:
+            logger.warning(f"缓存检查错误: {key}, err={e}")
+            return False
+
+    def acquire_lock(self, key: str, timeout: int = 300, value: Optional[str] = None) -> bool:
+        try:
+            return bool(self.client.set(key, value or str(uuid.uuid4()), nx=True, ex=timeout))
+        except Exception as e:
+            logger.warning(f"获取锁失败: {key}, err={e}")
+            return False
+
+    def release_lock(self, key: str, value: Optional[str] = None) -> bool:
+        try:
+            if value:
+                return bool(self._release_script(keys=[key], args=[value]))
+            self.client.delete(key)
+            return True
+        except Exception as e:
+            logger.warning(f"释放锁失败: {key}, err={e}")
+            return False
+
+    def _safe_loads(self, raw: Optional[bytes]) -> Any:
+        try:
+            return self.serializer.loads(raw)
+        except Exception as e:
+            logger.warning(f"缓存值解码失败: {e}")
+            return None
+
 
 class CacheManager:
     """缓存管理器"""
-    
+
     def __init__(self):
-        self.redis_client = redis.Redis.from_url(
-            settings.REDIS_URL,
-            decode_responses=True
-        )
-    
+        self.serializer = CacheSerializer()
+        self.sync = SyncCacheManager(self.serializer)
+        # 兼容旧代码：同步客户端（值为二进制编码，读取请使用 get / mget）
+        self.redis_client = self.sync.client
+        self._async_client: Optional[redis_asyncio.Redis] = None
+        self._async_loop: Optional[weakref.ReferenceType] = None
+        self._release_script = None
+
+    @property
+    def client(self) -> redis_asyncio.Redis:
+        """当前事件循环的异步客户端（连接池绑定事件循环，事件循环变化时重建）"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is None or self._async_loop() is not loop:
+            self._async_client = redis_asyncio.Redis(
+                connection_pool=redis_asyncio.ConnectionPool.from_url(
+                    settings.REDIS_URL,
+                    max_connections=settings.CACHE_MAX_CONNECTIONS,
+                    socket_connect_timeout=5,
+                    socket_timeout=5,
+                )
+            )
+            self._async_loop = weakref.ref(loop)
+            self._release_script = self._async_client.register_script(_RELEASE_LOCK_SCRIPT)
+        return self._async_client
+
+    def pipeline(self, transaction: bool = False):
+        """原始异步 pipeline（值需自行通过 self.serializer 编解码）"""
+        return self.client.pipeline(transaction=transaction)
+
     async def get(self, key: str) -> Optional[Any]:
         """获取缓存"""
         try:
-            value = self.redis_client.get(key)
-            if value:
-                return json.loads(value)
-            return None
+            return self.serializer.loads(await self.client.get(key))
         except Exception as e:
-            print(f"缓存获取错误: {e}")
+            logger.warning(f"缓存获取错误: {key}, err={e}")
             return None
-    
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """批量获取缓存（一次往返），未命中的位置为 None"""
+        if not keys:
+            return []
+        try:
+            raws = await self.client.mget(keys)
+        except Exception as e:
+            logger.warning(f"缓存批量获取错误: {e}")
+            return [None] * len(keys)
+        return [self.sync._safe_loads(raw) for raw in raws]
+
     async def set(
-        self, 
-        key: str, 
-        value: Any, 
+        self,
+        key: str,
+        value: Any,
         expire: Optional[int] = None
     ) -> bool:
         """设置缓存"""
         try:
-            if expire:
-                self.redis_client.setex(key, expire, json.dumps(value))
-            else:
-                self.redis_client.set(key, json.dumps(value))
+            await self.client.set(key, self.serializer.dumps(value), ex=expire or None)
+            return True
+        except Exception as e:
+            logger.warning(f"缓存设置错误: {key}, err={e}")
+            return False
+
+    async def mset(self, mapping: Dict[str, Any], expire: Optional[int] = None) -> bool:
+        """批量设置缓存（pipeline 一次往返，可统一设置过期时间）"""
+        if not mapping:
+            return True
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                pipe.set(key, self.serializer.dumps(value), ex=expire or None)
+            await pipe.execute()
             return True
         except Exception as e:
-            print(f"缓存设置错误: {e}")
+            logger.warning(f"缓存批量设置错误: {e}")
             return False
-    
-    async def delete(self, key: str) -> bool:
+
+    async def delete(self, *keys: str) -> bool:
         """删除缓存"""
         try:
-            self.redis_client.delete(key)
+            if keys:
+                await self.client.delete(*keys)
             return True
         except Exception as e:
-            print(f"缓存删除错误: {e}")
+            logger.warning(f"缓存删除错误: {keys}, err={e}")
             return False
-    
+
+    async def delete_pattern(self, pattern: str) -> int:
+        """按模式删除（SCAN + 分批 UNLINK）"""
+        deleted = 0
+        try:
+            batch: List[bytes] = []
+            async for key in self.client.scan_iter(match=pattern, count=_DELETE_BATCH):
+                batch.append(key)
+                if len(batch) >= _DELETE_BATCH:
+                    deleted += await self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await self.client.unlink(*batch)
+        except Exception as e:
+            logger.warning(f"缓存按模式删除错误: {pattern}, err={e}")
+        return deleted
+
     async def exists(self, key: str) -> bool:
         """检查缓存是否存在"""
         try:
-            return bool(self.redis_client.exists(key))
+            return bool(await self.client.exists(key))
         except Exception as e:
-            print(f"缓存检查错误: {e}")
+            logger.warning(f"缓存检查错误: {key}, err={e}")
             return False
-    
+
     async def acquire_lock(self, key: str, timeout: int = 300, value: Optional[str] = None) -> bool:
         """尝试获取分布式锁（使用 SET NX EX）
-        
+
         Args:
             key: 锁的 key
             timeout: 锁的超时时间（秒）
             value: 锁的值（用于标识锁的持有者），如果不提供则自动生成 UUID
-        
+
         Returns:
             如果成功获取锁返回 True，否则返回 False
         """
         try:
-            import uuid
-            lock_value = value if value else str(uuid.uuid4())
-            # 使用 SET NX EX 实现原子操作：只有当 key 不存在时才设置，并设置过期时间
-            result = self.redis_client.set(key, lock_value, nx=True, ex=timeout)
-            return bool(result)
+            return bool(await self.client.set(key, value or str(uuid.uuid4()), nx=True, ex=timeout))
         except Exception as e:
-            print(f"获取锁失败: {e}")
+            logger.warning(f"获取锁失败: {key}, err={e}")
             return False
-    
+
     async def release_lock(self, key: str, value: Optional[str] = None) -> bool:
         """释放分布式锁（使用 Lua 脚本确保原子性）"""
         try:
+            client = self.client
             if value:
-                # 使用 Lua 脚本确保只有锁的持有者才能释放
-                lua_script = """
-                if redis.call("get", KEYS[1]) == ARGV[1] then
-                    return redis.call("del", KEYS[1])
-                else
-                    return 0
-                end
-                """
-                result = self.redis_client.eval(lua_script, 1, key, value)
-                return bool(result)
-            else:
-                # 如果没有提供 value，直接删除（不安全，但作为后备）
-                self.redis_client.delete(key)
-                return True
-        except Exception as e:
-            print(f"释放锁失败: {e}")
+                return bool(await self._release_script(keys=[key], args=[value]))
+            # 如果没有提供 value，直接删除（不安全，但作为后备）
+            await client.delete(key)
+            return True
+        except Exception as e:
+            logger.warning(f"释放锁失败: {key}, err={e}")
             return False
 
 # 全局缓存管理器实例
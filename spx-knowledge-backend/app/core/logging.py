@@ -2,12 +2,15 @@
 Logging Configuration
 """
 
+import atexit
+import itertools
 import logging
+import logging.handlers
+import queue
 import sys
-import json
 import re
 from pathlib import Path
-from typing import Optional, Any, Mapping
+from typing import Optional, Any, Dict, List, Mapping
 
 from app.config.settings import settings
 
@@ -56,13 +59,36 @@ class ConnectionResetFilter(logging.Filter):
         return True
 
 
+# 向量字段：键名 + 数组（JSON / Python repr 均可），替换为占位符
+_VECTOR_FIELD_PATTERN = re.compile(
+    r"""(["']?)(content_vector|image_vector|query_vector|embedding|vector)\1(\s*[:=]\s*)\[[^\[\]]*\]"""
+)
+# 无键名的长数值数组（>=16 个数字），如直接打印的向量
+_NUMERIC_ARRAY_PATTERN = re.compile(
+    r"\[\s*-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?:\s*,\s*-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?){15,}\s*\]"
+)
+_VECTOR_HINTS = ("vector", "embedding")
+
+
+def redact_vectors(text: str) -> str:
+    """用预编译正则屏蔽文本中的向量数组；先做子串判断，绝大多数消息无需进入正则"""
+    if "[" not in text:
+        return text
+    if any(hint in text for hint in _VECTOR_HINTS):
+        text = _VECTOR_FIELD_PATTERN.sub(r'\1\2\1\3"<vector>"', text)
+    if text.count(",") >= 15:
+        text = _NUMERIC_ARRAY_PATTERN.sub("<vector>", text)
+    return text
+
+
 class VectorFieldFilter(logging.Filter):
     """
     屏蔽日志中的向量大字段，避免输出巨型数组导致刷屏。
     会将以下键名的值替换为占位符：content_vector, image_vector, embedding, vector。
+    异步日志下在后台线程执行（见 _LoggingQueueListener），不占用请求线程
     """
 
-    SENSITIVE_KEYS = {"content_vector", "image_vector", "embedding", "vector"}
+    SENSITIVE_KEYS = {"content_vector", "image_vector", "query_vector", "embedding", "vector"}
 
     def _redact_obj(self, obj: Any):
         try:
@@ -93,23 +119,132 @@ class VectorFieldFilter(logging.Filter):
                 record.msg = self._redact_obj(record.msg)
             if isinstance(record.args, tuple) and record.args:
                 record.args = tuple(self._redact_obj(a) for a in record.args)
-            if isinstance(record.msg, str):
-                msg = record.msg
-                # 尝试 JSON 方式脱敏
-                if ("content_vector" in msg) or ("image_vector" in msg) or ("embedding" in msg) or (" vector" in msg):
-                    try:
-                        data = json.loads(msg)
-                        data = self._redact_obj(data)
-                        record.msg = json.dumps(data, ensure_ascii=False)
-                    except Exception:
-                        # 非严格JSON：使用正则替换大数组
-                        pattern = re.compile(r'"(content_vector|image_vector|embedding|vector)"\s*:\s*\[(?:[^\]]|\n)*\]')
-                        record.msg = pattern.sub(r'"\1": "<vector>"', msg)
+            elif isinstance(record.args, Mapping) and record.args:
+                record.args = self._redact_obj(record.args)
+            # 合并参数后统一做文本脱敏；结果写回 msg，格式化器不再重复合并
+            message = record.getMessage()
+            record.msg = redact_vectors(message)
+            record.args = None
         except Exception:
             pass
         return True
 
 
+class SamplingFilter(logging.Filter):
+    """
+    高频逐项日志采样：带 extra=sampled(key) 的日志，同一 key 每 N 条只输出 1 条
+    未标记的日志不受影响；计数器只做自增，运行在调用线程也足够廉价
+    """
+
+    def __init__(self, default_every: int = 1):
+        super().__init__()
+        self.default_every = max(1, default_every)
+        self._counters: Dict[str, "itertools.count"] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample_key", None)
+        if key is None:
+            return True
+        every = getattr(record, "sample_every", None) or self.default_every
+        if every <= 1:
+            return True
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count())
+        return next(counter) % every == 0
+
+
+class TraceIdFilter(logging.Filter):
+    """
+    把当前上下文的 trace_id（app.core.tracing 中的 contextvar）写入 record.trace_id，供格式串使用 %(trace_id)s
+    contextvar 只在调用线程可见，须挂在调用线程执行的处理器上（异步日志时为入队处理器）
+    """
+
+    _get_trace_id = None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        getter = TraceIdFilter._get_trace_id
+        if getter is None:
+            try:
+                # tracing 依赖本模块，延迟导入避免循环引用
+                from app.core.tracing import get_trace_id
+            except ImportError:
+                record.trace_id = "-"
+                return True
+            getter = TraceIdFilter._get_trace_id = get_trace_id
+        record.trace_id = getter() or "-"
+        return True
+
+
+def sampled(key: str, every: Optional[int] = None) -> Dict[str, Any]:
+    """
+    用法：logger.info("分块 %s 完成", chunk_id, extra=sampled("vectorize.chunk"))
+    every 为空时使用 LOG_SAMPLE_EVERY_N
+    """
+    return {"sample_key": key, "sample_every": every}
+
+
+# 不可变的日志参数类型：可以原样留到后台线程再格式化
+_PRIMITIVE_LOG_ARG_TYPES = (str, int, float, bool, bytes, type(None))
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    只把记录放入队列，不在调用线程格式化消息（标准 QueueHandler.prepare 会提前格式化）
+    进程内队列无需序列化；队列满时丢弃 WARNING 以下的日志，不阻塞请求
+    参数含可变对象时在入队前合并消息，避免后台线程格式化时读到调用方之后修改过的值
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args:
+            values = args.values() if isinstance(args, Mapping) else args
+            if not all(isinstance(value, _PRIMITIVE_LOG_ARG_TYPES) for value in values):
+                try:
+                    record.msg = record.getMessage()
+                    record.args = None
+                except Exception:
+                    pass
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=1)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _LoggingQueueListener(logging.handlers.QueueListener):
+    """后台线程：向量脱敏 + 格式化 + 写出（控制台 / 文件）"""
+
+    def __init__(self, log_queue, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self._redactor = VectorFieldFilter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        self._redactor.filter(record)
+        return record
+
+
+_queue_listener: Optional[_LoggingQueueListener] = None
+
+
+def _stop_queue_listener() -> None:
+    """停止后台写日志线程（会先写完队列中剩余的记录）"""
+    global _queue_listener
+    if _queue_listener is not None:
+        try:
+            _queue_listener.stop()
+        except Exception:
+            pass
+        _queue_listener = None
+
+
 def _tune_external_loggers():
     # 降低第三方库噪音，防止请求/响应体（含向量）被打印
     for name in (
@@ -157,17 +292,21 @@ def setup_logging(
     root_logger = logging.getLogger()
     root_logger.setLevel(numeric_level)
     
-    # 清除现有的处理器
+    # 清除现有的处理器（重复初始化时先写完并停止旧的后台线程）
+    _stop_queue_listener()
     root_logger.handlers = []
     
+    output_handlers: List[logging.Handler] = []
+    
     # 控制台处理器
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(numeric_level)
     console_formatter = logging.Formatter(fmt)
     console_handler.setFormatter(console_formatter)
-    root_logger.addHandler(console_handler)
+    output_handlers.append(console_handler)
     
     # 文件处理器
+    file_error = None
     if log_path:
         try:
             log_file_path = Path(log_path)
@@ -177,14 +316,35 @@ def setup_logging(
             file_handler.setLevel(numeric_level)
             file_formatter = logging.Formatter(fmt)
             file_handler.setFormatter(file_formatter)
-            root_logger.addHandler(file_handler)
+            output_handlers.append(file_handler)
         except Exception as e:
-            root_logger.warning(f"无法创建日志文件 {log_path}: {e}")
+            file_error = e
     
-    # 添加日志过滤器
+    # 添加日志过滤器（挂在处理器上，子 logger 传播上来的记录同样生效）
     connection_filter = ConnectionResetFilter()
-    root_logger.addFilter(connection_filter)
-    root_logger.addFilter(VectorFieldFilter())
+    sampling_filter = SamplingFilter(settings.LOG_SAMPLE_EVERY_N)
+    trace_filter = TraceIdFilter()
+    if settings.LOG_ASYNC_ENABLED:
+        # 调用线程只做过滤与入队；脱敏、格式化、写出在后台线程完成
+        global _queue_listener
+        queue_handler = _LazyQueueHandler(queue.Queue(maxsize=max(0, settings.LOG_QUEUE_SIZE)))
+        queue_handler.setLevel(numeric_level)
+        queue_handler.addFilter(connection_filter)
+        queue_handler.addFilter(sampling_filter)
+        queue_handler.addFilter(trace_filter)
+        root_logger.addHandler(queue_handler)
+        _queue_listener = _LoggingQueueListener(queue_handler.queue, *output_handlers)
+        _queue_listener.start()
+    else:
+        vector_filter = VectorFieldFilter()
+        for handler in output_handlers:
+            handler.addFilter(connection_filter)
+            handler.addFilter(sampling_filter)
+            handler.addFilter(trace_filter)
+            handler.addFilter(vector_filter)
+            root_logger.addHandler(handler)
+    if file_error is not None:
+        root_logger.warning("无法创建日志文件 %s: %s", log_path, file_error)
     
     # 特别为 asyncio 日志记录器添加过滤器（Windows 上常见连接重置错误）
     asyncio_logger = logging.getLogger('asyncio')
@@ -207,6 +367,8 @@ def setup_logging(
 
 # 初始化日志
 setup_logging()
+# 进程退出前写完队列中剩余的日志
+atexit.register(_stop_queue_listener)
 
 # 创建全局日志记录器
 logger = logging.getLogger('spx-knowledge-backend')
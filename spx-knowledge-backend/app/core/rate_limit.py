@@ -0,0 +1,168 @@
+"""
+Rate Limit
+共享限流引擎：Redis Lua 脚本实现 GCRA（通用信元速率算法），一次异步往返完成判定与扣减
+
+- 每个限流键只保存一个“理论到达时间”（TAT），无读-改-写竞争，时间取 Redis 服务器时间
+- 策略按路由前缀配置（RATE_LIMIT_ROUTE_POLICIES），按用户（无用户时按 IP）分别计数
+- 可选本地预取令牌：短时间内重复访问的热点客户端一次向 Redis 预扣多个令牌，在本进程内消耗，
+  预取令牌过期即作废（只会更严格，不会超出限额）
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.config.redis import get_async_redis
+from app.config.settings import settings
+from app.core.logging import logger, sampled
+
+# KEYS[1]=限流键；ARGV[1]=令牌间隔（微秒，period/limit），ARGV[2]=突发上限（limit），ARGV[3]=本次消耗
+# 返回 {是否放行, 剩余令牌, 需等待毫秒数}
+_GCRA_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local emission = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local tolerance = emission * limit
+local stored = redis.call('GET', KEYS[1])
+local tat = stored and tonumber(stored) or now
+if tat < now then tat = now end
+local new_tat = tat + emission * cost
+local allow_at = new_tat - tolerance
+if now < allow_at then
+  return {0, math.floor((tolerance - (tat - now)) / emission), math.ceil((allow_at - now) / 1000)}
+end
+redis.call('SET', KEYS[1], string.format('%.0f', new_tat), 'PX', math.ceil((new_tat - now) / 1000) + 1)
+return {1, math.floor((tolerance - (new_tat - now)) / emission), 0}
+"""
+
+_LOCAL_BUCKET_MAX_KEYS = 10000
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """limit 次 / period 秒"""
+
+    limit: int
+    period: int = 60
+    name: str = "default"
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float = 0.0
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(self.remaining, 0)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, int(self.retry_after + 0.999)))
+        return headers
+
+
+def parse_policies(spec: Optional[str]) -> List[Tuple[str, RateLimitPolicy]]:
+    """
+    解析路由策略，如 "/api/qa=30/60;/api/search=120/60"（前缀=次数/秒）
+    按前缀长度倒序返回，便于最长前缀匹配；格式错误的条目忽略
+    """
+    policies: List[Tuple[str, RateLimitPolicy]] = []
+    for item in (spec or "").replace(",", ";").split(";"):
+        prefix, _, rule = item.strip().partition("=")
+        if not prefix or not rule:
+            continue
+        limit, _, period = rule.partition("/")
+        try:
+            policy = RateLimitPolicy(int(limit), int(period or 60), prefix.strip())
+        except ValueError:
+            logger.warning(f"[RateLimit] 忽略格式错误的限流策略: {item}")
+            continue
+        if policy.limit > 0 and policy.period > 0:
+            policies.append((prefix.strip(), policy))
+    return sorted(policies, key=lambda p: len(p[0]), reverse=True)
+
+
+class _LocalBucket:
+    __slots__ = ("tokens", "expires_at", "last_seen", "remaining")
+
+    def __init__(self):
+        self.tokens = 0
+        self.expires_at = 0.0
+        self.last_seen = 0.0
+        self.remaining = 0
+
+
+class RateLimiter:
+    """GCRA 限流器（异步，一次 Redis 往返）；Redis 不可用时放行"""
+
+    def __init__(
+        self,
+        redis_client=None,
+        key_prefix: str = "rate_limit",
+        local_lease: Optional[int] = None,
+        lease_ttl_ms: Optional[int] = None,
+    ):
+        self.redis = redis_client or get_async_redis()
+        self.key_prefix = key_prefix
+        self.local_lease = settings.RATE_LIMIT_LOCAL_LEASE if local_lease is None else local_lease
+        self.lease_ttl = (settings.RATE_LIMIT_LOCAL_LEASE_TTL_MS if lease_ttl_ms is None else lease_ttl_ms) / 1000.0
+        self._script = self.redis.register_script(_GCRA_SCRIPT)
+        self._local: Dict[str, _LocalBucket] = {}
+
+    async def _eval(self, key: str, policy: RateLimitPolicy, cost: int) -> Tuple[bool, int, float]:
+        emission_us = max(1, int(policy.period * 1_000_000 / policy.limit))
+        allowed, remaining, retry_ms = await self._script(keys=[key], args=[emission_us, policy.limit, cost])
+        return bool(int(allowed)), int(remaining), int(retry_ms) / 1000.0
+
+    async def hit(self, identity: str, policy: RateLimitPolicy, cost: int = 1) -> RateLimitResult:
+        """为 identity 在 policy 下消耗 cost 个令牌"""
+        key = f"{self.key_prefix}:{policy.name}:{identity}"
+        now = time.monotonic()
+        use_lease = self.local_lease > 1 and cost == 1
+        bucket = self._local.get(key) if use_lease else None
+
+        if bucket is not None and bucket.tokens >= cost and bucket.expires_at > now:
+            bucket.tokens -= cost
+            bucket.last_seen = now
+            return RateLimitResult(True, policy.limit, bucket.remaining + bucket.tokens)
+
+        # 距上次访问不足一个预取周期的客户端视为热点，一次预扣多个令牌
+        hot = bucket is not None and now - bucket.last_seen < self.lease_ttl
+        request_cost = min(self.local_lease, policy.limit) if (use_lease and hot) else cost
+        try:
+            allowed, remaining, retry_after = await self._eval(key, policy, request_cost)
+            # 预取被拒但仍有足够令牌时，按实际消耗再判定一次
+            if not allowed and request_cost > cost and remaining >= cost:
+                allowed, remaining, retry_after = await self._eval(key, policy, cost)
+                request_cost = cost
+        except Exception as e:
+            logger.warning(f"[RateLimit] Redis 限流判定失败，放行请求: {e}", extra=sampled("rate_limit.redis_error"))
+            return RateLimitResult(True, policy.limit, policy.limit)
+
+        if use_lease:
+            if bucket is None:
+                if len(self._local) >= _LOCAL_BUCKET_MAX_KEYS:
+                    self._local.clear()
+                bucket = self._local[key] = _LocalBucket()
+            bucket.tokens = request_cost - cost if allowed else 0
+            bucket.expires_at = now + self.lease_ttl
+            bucket.last_seen = now
+            bucket.remaining = remaining
+        return RateLimitResult(allowed, policy.limit, remaining + (request_cost - cost if allowed else 0), retry_after)
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """进程内共享的限流器（本地预取令牌在同一实例内生效）"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
@@ -0,0 +1,219 @@
+"""
+Startup Profile
+进程启动剖析：记录模块导入耗时与内存占用，并按导入预算输出报告
+
+- Worker：设置 STARTUP_PROFILE_ENABLED=true 启动，worker 就绪时输出报告
+- 命令行：python -m app.core.startup_profile app.tasks.document_tasks [更多模块...]
+"""
+
+import importlib
+import importlib.abc
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_PROCESS_STARTED = time.perf_counter()
+
+
+def _current_rss_mb() -> float:
+    """当前进程常驻内存（MB），无法获取时返回 0"""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except Exception:
+        pass
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 单位为字节，Linux 为 KB
+        return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+    except Exception:
+        return 0.0
+
+
+class _TimedLoader:
+    """包装真实 loader，统计 exec_module 耗时；其余属性透传"""
+
+    def __init__(self, loader, profiler: "ImportProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._enter(module.__name__)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._exit(module.__name__)
+
+    def __getattr__(self, item):
+        return getattr(self._loader, item)
+
+
+class ImportProfiler(importlib.abc.MetaPathFinder):
+    """
+    导入剖析器（meta path finder）
+    - 记录每个模块的累计耗时（含子导入）与自身耗时，以及导入前后的 RSS 变化
+    - 只统计安装之后发生的导入
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # name -> [inclusive_ms, self_ms, rss_delta_mb]
+        self.records: Dict[str, List[float]] = {}
+        # 最外层导入的累计耗时之和（嵌套导入不重复计算）
+        self.total_ms = 0.0
+        self.installed_at: Optional[float] = None
+        self.rss_at_install = 0.0
+
+    # ---------------- 安装 / 卸载 ----------------
+
+    def install(self) -> "ImportProfiler":
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+            self.installed_at = time.perf_counter()
+            self.rss_at_install = _current_rss_mb()
+        return self
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    # ---------------- MetaPathFinder ----------------
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self._local, "finding", False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(spec.loader, self)
+                    return spec
+            return None
+        finally:
+            self._local.finding = False
+
+    def _stack(self) -> List[Tuple[str, float, float, List[float]]]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, name: str) -> None:
+        # (模块名, 开始时间, 开始 RSS, [子导入累计耗时])
+        self._stack().append((name, time.perf_counter(), _current_rss_mb(), [0.0]))
+
+    def _exit(self, name: str) -> None:
+        stack = self._stack()
+        if not stack:
+            return
+        _, started, rss_before, children = stack.pop()
+        inclusive = (time.perf_counter() - started) * 1000
+        rss_delta = _current_rss_mb() - rss_before
+        with self._lock:
+            if stack:
+                stack[-1][3][0] += inclusive
+            else:
+                self.total_ms += inclusive
+            self.records[name] = [inclusive, max(inclusive - children[0], 0.0), rss_delta]
+
+    # ---------------- 报告 ----------------
+
+    def report(self, top_n: int = 15) -> Dict[str, Any]:
+        """汇总导入耗时：按顶层包聚合自身耗时，并列出最慢的模块"""
+        with self._lock:
+            records = dict(self.records)
+        by_package: Dict[str, float] = {}
+        for name, (_, self_ms, _) in records.items():
+            pkg = name.split(".")[0]
+            by_package[pkg] = by_package.get(pkg, 0.0) + self_ms
+        slowest = sorted(records.items(), key=lambda item: item[1][0], reverse=True)[:top_n]
+        return {
+            "modules": len(records),
+            "import_ms": round(self.total_ms, 1),
+            "since_process_start_ms": round((time.perf_counter() - _PROCESS_STARTED) * 1000, 1),
+            "rss_mb": round(_current_rss_mb(), 1),
+            "rss_at_install_mb": round(self.rss_at_install, 1),
+            "packages": [
+                {"package": pkg, "self_ms": round(ms, 1)}
+                for pkg, ms in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top_n]
+            ],
+            "slowest_modules": [
+                {"module": name, "inclusive_ms": round(inc, 1), "self_ms": round(own, 1), "rss_delta_mb": round(rss, 1)}
+                for name, (inc, own, rss) in slowest
+            ],
+        }
+
+    def log_report(self, label: str, budget_ms: Optional[int] = None, rss_budget_mb: Optional[int] = None) -> Dict[str, Any]:
+        """按预算输出报告：超出预算时以 warning 级别输出"""
+        from app.core.logging import logger
+
+        data = self.report()
+        over_time = budget_ms is not None and data["import_ms"] > budget_ms
+        over_rss = rss_budget_mb is not None and data["rss_mb"] > rss_budget_mb
+        log = logger.warning if (over_time or over_rss) else logger.info
+        log(
+            f"[StartupProfile] {label}: 导入 {data['modules']} 个模块耗时 {data['import_ms']}ms"
+            f"（预算 {budget_ms}ms），RSS {data['rss_mb']}MB（预算 {rss_budget_mb}MB），"
+            f"进程启动至今 {data['since_process_start_ms']}ms"
+        )
+        packages = ", ".join(f"{p['package']}={p['self_ms']}ms" for p in data["packages"][:10])
+        log(f"[StartupProfile] 耗时最多的包: {packages}")
+        for item in data["slowest_modules"][:10]:
+            log(
+                f"[StartupProfile]   {item['module']}: {item['inclusive_ms']}ms"
+                f"（自身 {item['self_ms']}ms，RSS +{item['rss_delta_mb']}MB）"
+            )
+        return data
+
+
+_profiler: Optional[ImportProfiler] = None
+
+
+def start_import_profiling() -> ImportProfiler:
+    """安装进程级导入剖析器（重复调用返回同一实例）"""
+    global _profiler
+    if _profiler is None:
+        _profiler = ImportProfiler().install()
+    return _profiler
+
+
+def get_import_profiler() -> Optional[ImportProfiler]:
+    return _profiler
+
+
+def is_profiling_requested() -> bool:
+    """在导入 settings 之前也可判断，便于尽早安装剖析器"""
+    return os.getenv("STARTUP_PROFILE_ENABLED", "").lower() in ("1", "true", "yes")
+
+
+def _main(argv: List[str]) -> int:
+    modules = argv or ["app.tasks.celery_app"]
+    profiler = start_import_profiling()
+    for name in modules:
+        importlib.import_module(name)
+    from app.config.settings import settings
+
+    profiler.log_report(
+        ", ".join(modules),
+        budget_ms=settings.STARTUP_IMPORT_BUDGET_MS,
+        rss_budget_mb=settings.STARTUP_RSS_BUDGET_MB,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,190 @@
+"""
+Tracing
+分阶段耗时追踪与 Prometheus 指标导出
+
+- 入库阶段（download / parse / chunk / archive / image / embed / index）与检索阶段
+  （embed / knn / bm25 / fusion / enrich / rerank / exact / advanced / llm_ttft / llm_total）各自记录到直方图
+- trace_id 保存在 contextvar 中：API 请求生成（或沿用 X-Request-ID），通过 Celery 消息头传递到任务；
+  日志格式中的 %(trace_id)s 由 app.core.logging.TraceIdFilter 填充
+- 未安装 prometheus_client 或 METRICS_ENABLED=false 时只保留日志中的耗时，指标操作为空操作
+- 多进程部署（gunicorn / celery prefork）设置 PROMETHEUS_MULTIPROC_DIR 后 /metrics 汇总各进程数据
+"""
+
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+from app.config.settings import settings
+from app.core.logging import logger
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, generate_latest
+    from prometheus_client import multiprocess
+
+    _PROMETHEUS_AVAILABLE = True
+except ImportError:  # pragma: no cover - 可选依赖
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    _PROMETHEUS_AVAILABLE = False
+
+KIND_INGESTION = "ingestion"
+KIND_RETRIEVAL = "retrieval"
+
+TRACE_HEADER = "X-Request-ID"
+TRACE_ID_FIELD = "trace_id"
+
+# 秒级分桶：覆盖毫秒级检索阶段到分钟级文档解析
+_STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+_HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+if _PROMETHEUS_AVAILABLE:
+    _STAGE_HISTOGRAMS = {
+        KIND_INGESTION: Histogram(
+            "spx_ingestion_stage_seconds", "文档入库各阶段耗时（秒）", ["stage"], buckets=_STAGE_BUCKETS
+        ),
+        KIND_RETRIEVAL: Histogram(
+            "spx_retrieval_stage_seconds", "检索/问答各阶段耗时（秒）", ["stage"], buckets=_STAGE_BUCKETS
+        ),
+    }
+    _HTTP_HISTOGRAM = Histogram(
+        "spx_http_request_seconds", "HTTP 请求耗时（秒）", ["method", "route", "status"], buckets=_HTTP_BUCKETS
+    )
+else:
+    _STAGE_HISTOGRAMS = {}
+    _HTTP_HISTOGRAM = None
+
+
+# ---------------- trace_id ----------------
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def get_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+def set_trace_id(trace_id: Optional[str]):
+    """设置当前上下文的 trace_id，返回可用于 reset_trace_id 的 token"""
+    return _trace_id.set(trace_id)
+
+
+def reset_trace_id(token) -> None:
+    try:
+        _trace_id.reset(token)
+    except (ValueError, LookupError):
+        _trace_id.set(None)
+
+
+# ---------------- 指标 ----------------
+
+def metrics_enabled() -> bool:
+    return _PROMETHEUS_AVAILABLE and settings.METRICS_ENABLED
+
+
+def observe_stage(kind: str, stage: str, seconds: float) -> None:
+    """记录一个阶段的耗时"""
+    if not metrics_enabled():
+        return
+    histogram = _STAGE_HISTOGRAMS.get(kind)
+    if histogram is None:
+        return
+    try:
+        histogram.labels(stage=stage).observe(max(seconds, 0.0))
+    except Exception as e:
+        logger.debug(f"[Tracing] 记录阶段耗时失败 {kind}.{stage}: {e}")
+
+
+def observe_http_request(method: str, route: str, status: int, seconds: float) -> None:
+    if not metrics_enabled() or _HTTP_HISTOGRAM is None:
+        return
+    try:
+        _HTTP_HISTOGRAM.labels(method=method, route=route, status=str(status)).observe(max(seconds, 0.0))
+    except Exception as e:
+        logger.debug(f"[Tracing] 记录请求耗时失败 {method} {route}: {e}")
+
+
+def metrics_response() -> Tuple[bytes, str]:
+    """生成 Prometheus 文本格式的指标（多进程模式下汇总 PROMETHEUS_MULTIPROC_DIR 中的数据）"""
+    if not _PROMETHEUS_AVAILABLE:
+        return b"# prometheus_client not installed\n", CONTENT_TYPE_LATEST
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# ---------------- 阶段计时 ----------------
+
+class StageTimer:
+    """
+    顺序阶段计时器：start(stage) 自动结束上一个阶段，stop() 结束当前阶段
+    适合在较长的函数中按阶段打点，无需改动原有缩进
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.durations: Dict[str, float] = {}
+        self._stage: Optional[str] = None
+        self._started = 0.0
+
+    def start(self, stage: str) -> "StageTimer":
+        self.stop()
+        self._stage = stage
+        self._started = time.perf_counter()
+        return self
+
+    def stop(self) -> Optional[float]:
+        if self._stage is None:
+            return None
+        elapsed = time.perf_counter() - self._started
+        stage, self._stage = self._stage, None
+        # 同名阶段多次出现（如逐张图片）时累加
+        self.durations[stage] = self.durations.get(stage, 0.0) + elapsed
+        observe_stage(self.kind, stage, elapsed)
+        return elapsed
+
+    def summary(self) -> str:
+        """用于日志的耗时摘要，如 parse=1.234s chunk=0.056s"""
+        return " ".join(f"{stage}={seconds:.3f}s" for stage, seconds in self.durations.items())
+
+
+@contextmanager
+def span(kind: str, stage: str) -> Iterator[None]:
+    """单阶段计时：with span(KIND_RETRIEVAL, "rerank"): ..."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(kind, stage, time.perf_counter() - started)
+
+
+# ---------------- Celery 传递 ----------------
+
+def install_celery_trace_propagation() -> None:
+    """发布任务时把当前 trace_id 写入消息头；执行任务前恢复到 contextvar"""
+    from celery.signals import before_task_publish, task_postrun, task_prerun
+
+    @before_task_publish.connect(weak=False)
+    def _inject_trace_id(headers=None, **kwargs):
+        trace_id = get_trace_id()
+        if trace_id and headers is not None and TRACE_ID_FIELD not in headers:
+            headers[TRACE_ID_FIELD] = trace_id
+
+    @task_prerun.connect(weak=False)
+    def _restore_trace_id(task=None, **kwargs):
+        request = getattr(task, "request", None)
+        trace_id = getattr(request, TRACE_ID_FIELD, None)
+        if not trace_id:
+            headers = getattr(request, "headers", None) or {}
+            trace_id = headers.get(TRACE_ID_FIELD)
+        set_trace_id(trace_id or new_trace_id())
+
+    @task_postrun.connect(weak=False)
+    def _clear_trace_id(**kwargs):
+        set_trace_id(None)
@@ -2,9 +2,12 @@
 Database Dependencies
 """
 
+from typing import AsyncIterator
+
 from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.config.database import SessionLocal
+from app.config.database import SessionLocal, ReadSessionLocal, get_async_sessionmaker
 
 def get_db():
     """获取数据库会话"""
@@ -13,3 +16,21 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """获取只读数据库会话（配置了 DATABASE_READ_URL 时连接只读副本）"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """获取异步数据库会话（主库），查询不阻塞事件循环"""
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+async def get_async_read_db() -> AsyncIterator[AsyncSession]:
+    """获取异步只读数据库会话（列表、搜索等读接口）"""
+    async with get_async_sessionmaker(read=True)() as db:
+        yield db
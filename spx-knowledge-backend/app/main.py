@@ -81,8 +81,20 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"❌ OpenSearch 连接失败: {e}")
     
+    # 订阅 WebSocket 通知频道（跨进程扇出，每个 worker 进程一次）
+    from app.services.websocket_notification_service import websocket_notification_service
+    try:
+        await websocket_notification_service.start_fanout()
+    except Exception as e:
+        logger.error(f"❌ WebSocket 通知订阅失败，仅投递本进程连接: {e}")
+    
+    # 后台预热搜索建议前缀树，避免首个请求同步构建
+    from app.services.suggestion_service import suggestion_index
+    suggestion_index.refresh_in_background()
+    
     logger.info("🚀 服务器启动完成")
     yield
+    await websocket_notification_service.stop_fanout()
     logger.info("👋 服务器关闭")
 
 
@@ -114,6 +126,11 @@ app.add_middleware(
 # 请求日志中间件（记录每个请求的开始、结束、状态码与耗时）
 app.middleware("http")(logging_middleware)
 
+# 限流中间件（注册在认证之前，执行时位于认证之后，可按用户计数）
+if settings.RATE_LIMIT_ENABLED:
+    from app.middleware.rate_limit import RateLimitMiddleware
+    app.middleware("http")(RateLimitMiddleware(settings.RATE_LIMIT_PER_MINUTE))
+
 # 认证中间件（在所有/api路径上要求认证，除了认证相关的接口）
 from app.middleware.auth import auth_middleware
 app.middleware("http")(auth_middleware)
@@ -130,13 +147,17 @@ app.include_router(ws_routes.router, prefix="/ws")
 
 # 兼容性图片代理（无 /api 前缀的场景，需要认证）
 from fastapi import HTTPException, Depends, Request, status, Query
-from app.services.minio_storage_service import MinioStorageService
+from typing import Optional
+from app.services.image_proxy_service import ImageProxyService
 from app.core.logging import logger
-from fastapi.responses import Response
 from app.dependencies.auth import get_current_user
 
 @app.get("/images/file")
-async def compat_image_proxy(request: Request, object: str = Query(..., description="MinIO对象路径")):
+async def compat_image_proxy(
+    request: Request,
+    object: str = Query(..., description="MinIO对象路径"),
+    size: Optional[str] = Query(None, description="缩略图档位（如 small/medium），为空返回原图"),
+):
     """兼容性图片代理（无 /api 前缀的场景，需要认证）"""
     # 自己处理认证（因为不在 /api/ 路径下，中间件不会处理）
     from app.core.security import verify_token
@@ -168,20 +189,7 @@ async def compat_image_proxy(request: Request, object: str = Query(..., descript
         )
     
     try:
-        minio = MinioStorageService()
-        data = minio.download_file(object)
-        lower = object.lower()
-        if lower.endswith((".jpg", ".jpeg")):
-            content_type = "image/jpeg"
-        elif lower.endswith(".png"):
-            content_type = "image/png"
-        elif lower.endswith(".gif"):
-            content_type = "image/gif"
-        elif lower.endswith(".webp"):
-            content_type = "image/webp"
-        else:
-            content_type = "application/octet-stream"
-        return Response(content=data, media_type=content_type)
+        return await ImageProxyService().serve(request, object, size=size)
     except Exception as e:
         logger.error(f"兼容图片代理错误: {e}", exc_info=True)
         raise HTTPException(status_code=404, detail="图片不存在或无法访问")
@@ -194,6 +202,17 @@ async def root():
     """根路径"""
     return {"message": "SPX Knowledge Base API", "version": "1.0.0"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标（入库/检索各阶段耗时、HTTP 请求耗时）"""
+    from fastapi.responses import Response
+    from app.core.tracing import metrics_response
+
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="metrics disabled")
+    body, content_type = metrics_response()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/health")
 async def health_check():
     """健康检查 - 检查所有中间件连接状态"""
@@ -240,4 +259,11 @@ async def health_check():
         health_status["status"] = "unhealthy"
         health_status["services"]["opensearch"] = {"status": "error", "message": str(e)}
     
+    # 查询期推理微批指标（队列深度、批大小等）
+    try:
+        from app.services.inference_batcher import get_inference_stats
+        health_status["inference"] = get_inference_stats()
+    except Exception as e:
+        health_status["inference"] = {"status": "error", "message": str(e)}
+    
     return health_status
@@ -8,12 +8,30 @@ import logging
 import time
 from datetime import datetime
 
+from app.core.tracing import (
+    TRACE_HEADER,
+    new_trace_id,
+    observe_http_request,
+    reset_trace_id,
+    set_trace_id,
+)
+
 logger = logging.getLogger(__name__)
 
 async def logging_middleware(request: Request, call_next):
     """日志中间件"""
-    start_time = time.time()
-    
+    start_time = time.perf_counter()
+    # 沿用调用方传入的请求 ID，否则生成新的 trace_id；随任务消息传递到 Celery
+    trace_id = request.headers.get(TRACE_HEADER) or request.headers.get("X-Trace-Id") or new_trace_id()
+    trace_token = set_trace_id(trace_id)
+    try:
+        return await _handle(request, call_next, trace_id, start_time)
+    finally:
+        # 请求结束日志仍带 trace_id，记录完成后再恢复
+        reset_trace_id(trace_token)
+
+
+async def _handle(request: Request, call_next, trace_id: str, start_time: float) -> Response:
     # 记录请求开始（包含查询参数，特别是对于 /api/images/file 端点）
     query_params = dict(request.query_params)
     if request.url.path == "/api/images/file" or request.url.path == "/images/file":
@@ -25,7 +43,12 @@ async def logging_middleware(request: Request, call_next):
     response = await call_next(request)
     
     # 计算处理时间
-    process_time = time.time() - start_time
+    process_time = time.perf_counter() - start_time
+    # 按路由模板聚合（/api/documents/{document_id}），避免路径参数导致标签基数膨胀
+    route = request.scope.get("route")
+    observe_http_request(
+        request.method, getattr(route, "path", "unmatched"), response.status_code, process_time
+    )
     
     # 记录请求结束（对于422错误，记录更多信息）
     if response.status_code == 422:
@@ -43,5 +66,6 @@ async def logging_middleware(request: Request, call_next):
     # 添加响应头
     response.headers["X-Process-Time"] = str(process_time)
     response.headers["X-Timestamp"] = datetime.now().isoformat()
+    response.headers[TRACE_HEADER] = trace_id
     
     return response
@@ -2,62 +2,64 @@
 Rate Limit Middleware
 """
 
-from fastapi import Request, HTTPException, status
+from typing import List, Optional, Tuple
+
+from fastapi import Request, status
 from fastapi.responses import JSONResponse
-from app.config.redis import get_redis
-import time
+from app.config.settings import settings
+from app.core.rate_limit import RateLimiter, RateLimitPolicy, get_rate_limiter, parse_policies
 import logging
 
 logger = logging.getLogger(__name__)
 
+_SKIP_PATHS = {"/health", "/metrics"}
+
 class RateLimitMiddleware:
-    """限流中间件"""
-    
-    def __init__(self, requests_per_minute: int = 60):
+    """限流中间件（按路由策略、按用户/IP 计数；一次异步 Redis 往返）"""
+
+    def __init__(
+        self,
+        requests_per_minute: int = 60,
+        limiter: Optional[RateLimiter] = None,
+        route_policies: Optional[List[Tuple[str, RateLimitPolicy]]] = None,
+    ):
         self.requests_per_minute = requests_per_minute
-        self.redis = get_redis()
-    
+        self.default_policy = RateLimitPolicy(requests_per_minute, 60, "default")
+        self.route_policies = (
+            parse_policies(settings.RATE_LIMIT_ROUTE_POLICIES) if route_policies is None else route_policies
+        )
+        self.limiter = limiter or get_rate_limiter()
+
+    def _policy(self, path: str) -> RateLimitPolicy:
+        for prefix, policy in self.route_policies:
+            if path.startswith(prefix):
+                return policy
+        return self.default_policy
+
+    @staticmethod
+    def _identity(request: Request) -> str:
+        # 已认证请求按用户计数（认证中间件写入 request.state.user），否则按客户端IP
+        user = getattr(request.state, "user", None)
+        if isinstance(user, dict) and user.get("sub"):
+            return f"user:{user['sub']}"
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
     async def __call__(self, request: Request, call_next):
-        # 获取客户端IP
-        client_ip = request.client.host
-        
-        # 生成限流键
-        current_minute = int(time.time() // 60)
-        rate_limit_key = f"rate_limit:{client_ip}:{current_minute}"
-        
-        try:
-            # 检查当前分钟内的请求数
-            current_requests = self.redis.get(rate_limit_key)
-            
-            if current_requests is None:
-                # 第一次请求，设置计数器
-                self.redis.setex(rate_limit_key, 60, 1)
-            else:
-                current_requests = int(current_requests)
-                
-                if current_requests >= self.requests_per_minute:
-                    # 超过限流阈值
-                    logger.warning(f"IP {client_ip} 触发限流")
-                    return JSONResponse(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        content={"error": "请求过于频繁，请稍后再试"}
-                    )
-                else:
-                    # 增加计数器
-                    self.redis.incr(rate_limit_key)
-            
-            # 处理请求
-            response = await call_next(request)
-            
-            # 添加限流信息到响应头
-            response.headers["X-RateLimit-Limit"] = str(self.requests_per_minute)
-            response.headers["X-RateLimit-Remaining"] = str(
-                self.requests_per_minute - int(self.redis.get(rate_limit_key) or 0)
-            )
-            
-            return response
-            
-        except Exception as e:
-            logger.error(f"限流中间件错误: {e}")
-            # 如果Redis出错，允许请求通过
+        path = request.url.path
+        if path in _SKIP_PATHS or request.method == "OPTIONS":
             return await call_next(request)
+
+        identity = self._identity(request)
+        result = await self.limiter.hit(identity, self._policy(path))
+        if not result.allowed:
+            logger.warning(f"{identity} 触发限流: {path}")
+            return JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"error": "请求过于频繁，请稍后再试"},
+                headers=result.headers(),
+            )
+
+        response = await call_next(request)
+        # 添加限流信息到响应头
+        response.headers.update(result.headers())
+        return response
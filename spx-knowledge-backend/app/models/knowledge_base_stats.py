@@ -0,0 +1,26 @@
+﻿"""
+Knowledge Base Stats Model
+知识库聚合统计（文档/分块/图片数量、存储占用、最近入库时间），随文档生命周期增量维护，定时对账修正
+"""
+
+from sqlalchemy import Column, Integer, BigInteger, DateTime, ForeignKey
+from app.models.base import BaseModel
+
+
+class KnowledgeBaseStats(BaseModel):
+    """知识库聚合统计模型"""
+    __tablename__ = "knowledge_base_stats"
+
+    knowledge_base_id = Column(
+        Integer, ForeignKey("knowledge_bases.id", ondelete="CASCADE"), nullable=False, unique=True, comment="知识库ID"
+    )
+    document_count = Column(Integer, nullable=False, default=0, server_default="0", comment="文档数量（未删除）")
+    completed_document_count = Column(Integer, nullable=False, default=0, server_default="0", comment="处理完成的文档数量")
+    chunk_count = Column(Integer, nullable=False, default=0, server_default="0", comment="分块数量")
+    image_count = Column(Integer, nullable=False, default=0, server_default="0", comment="图片数量")
+    storage_bytes = Column(BigInteger, nullable=False, default=0, server_default="0", comment="存储占用（原文件+图片，字节）")
+    last_ingested_at = Column(DateTime, comment="最近一次文档处理完成时间")
+    reconciled_at = Column(DateTime, comment="最近一次对账时间")
+
+    def __repr__(self):
+        return f"<KnowledgeBaseStats(knowledge_base_id={self.knowledge_base_id}, documents={self.document_count})>"
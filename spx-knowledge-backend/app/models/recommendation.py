@@ -0,0 +1,47 @@
+﻿"""
+Document Recommendation Models
+分类/标签推荐：文档级向量（分块向量均值）与分类/标签质心（向量和 + 文档数，增量维护，按知识库隔离）
+"""
+
+from sqlalchemy import Column, Integer, String, LargeBinary, JSON, ForeignKey, UniqueConstraint
+from app.models.base import BaseModel
+
+
+class DocumentEmbedding(BaseModel):
+    """文档级向量：记录当前计入的分类与标签，分类/标签变化时按差值移动质心"""
+    __tablename__ = "document_embeddings"
+
+    document_id = Column(
+        Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, unique=True, comment="文档ID"
+    )
+    dim = Column(Integer, nullable=False, comment="向量维度")
+    vector = Column(LargeBinary, nullable=False, comment="L2 归一化后的 float32 向量")
+    counted_knowledge_base_id = Column(Integer, nullable=True, comment="已计入质心的知识库ID")
+    counted_category_id = Column(Integer, nullable=True, comment="已计入质心的分类ID")
+    counted_tags = Column(JSON, comment="已计入质心的标签列表")
+
+    def __repr__(self):
+        return f"<DocumentEmbedding(document_id={self.document_id}, dim={self.dim})>"
+
+
+class RecommendationCentroid(BaseModel):
+    """分类/标签质心：保存向量和与文档数，质心 = vector_sum / doc_count；每个知识库单独维护"""
+    __tablename__ = "recommendation_centroids"
+    __table_args__ = (
+        UniqueConstraint("knowledge_base_id", "kind", "key", name="uk_rec_centroid_kb_kind_key"),
+    )
+
+    knowledge_base_id = Column(
+        Integer, ForeignKey("knowledge_bases.id", ondelete="CASCADE"), nullable=False, comment="知识库ID"
+    )
+    kind = Column(String(20), nullable=False, comment="质心类型：category/tag")
+    key = Column(String(255), nullable=False, comment="分类ID或标签名")
+    dim = Column(Integer, nullable=False, comment="向量维度")
+    vector_sum = Column(LargeBinary, nullable=False, comment="float32 向量和")
+    doc_count = Column(Integer, nullable=False, default=0, comment="计入的文档数")
+
+    def __repr__(self):
+        return (
+            f"<RecommendationCentroid(knowledge_base_id={self.knowledge_base_id}, kind={self.kind}, "
+            f"key={self.key}, doc_count={self.doc_count})>"
+        )
@@ -14,6 +14,8 @@ class KnowledgeBaseCreate(BaseCreateSchema):
     category_id: Optional[int] = None
     # 允许前端直接输入分类名；若提供则后端自动创建或复用
     category_name: Optional[str] = None
+    # 向量索引配置档（引擎/量化/磁盘模式），创建后不可修改；不传时取 VECTOR_INDEX_DEFAULT_PROFILE
+    vector_profile: Optional[str] = None
 
 class KnowledgeBaseUpdate(BaseUpdateSchema):
     """知识库更新模式"""
@@ -29,6 +31,7 @@ class KnowledgeBaseResponse(BaseResponseSchema):
     description: Optional[str] = None
     category_id: Optional[int] = None
     is_active: bool = True
+    vector_profile: Optional[str] = None
 
 class KnowledgeBaseListResponse(BaseModel):
     """知识库分页列表响应"""
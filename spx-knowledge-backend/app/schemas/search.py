@@ -45,6 +45,7 @@ class SearchSuggestionRequest(BaseModel):
     """搜索建议请求模式"""
     query: str
     limit: int = 5
+    knowledge_base_id: Optional[List[int]] = None
 
 class SearchSuggestionResponse(BaseModel):
     """搜索建议响应模式"""
@@ -78,6 +79,7 @@ class SearchAdvancedRequest(BaseModel):
     knowledge_base_id: Optional[List[int]] = None  # 支持多个知识库ID
     limit: int = 10
     offset: int = 0
+    sort: Optional[str] = None  # relevance（默认）/ position（按页码、分块顺序）
 
 class SearchFacetsResponse(BaseModel):
     """搜索分面响应模式"""
@@ -17,7 +17,7 @@ class CacheService:
         """获取文档缓存"""
         try:
             cache_key = f"document:info:{doc_id}"
-            cached_data = cache_manager.get(cache_key)
+            cached_data = cache_manager.sync.get(cache_key)
             
             if cached_data:
                 logger.debug(f"文档缓存命中: {doc_id}")
@@ -34,7 +34,7 @@ class CacheService:
         """设置文档缓存"""
         try:
             cache_key = f"document:info:{doc_id}"
-            success = cache_manager.set(cache_key, data, ex)
+            success = cache_manager.sync.set(cache_key, data, ex)
             
             if success:
                 logger.debug(f"文档缓存设置成功: {doc_id}")
@@ -51,7 +51,7 @@ class CacheService:
         """删除文档缓存"""
         try:
             cache_key = f"document:info:{doc_id}"
-            success = cache_manager.delete(cache_key)
+            success = cache_manager.sync.delete(cache_key)
             
             if success:
                 logger.debug(f"文档缓存删除成功: {doc_id}")
@@ -68,7 +68,7 @@ class CacheService:
         """获取知识库缓存"""
         try:
             cache_key = f"kb:info:{kb_id}"
-            cached_data = cache_manager.get(cache_key)
+            cached_data = cache_manager.sync.get(cache_key)
             
             if cached_data:
                 logger.debug(f"知识库缓存命中: {kb_id}")
@@ -85,7 +85,7 @@ class CacheService:
         """设置知识库缓存"""
         try:
             cache_key = f"kb:info:{kb_id}"
-            success = cache_manager.set(cache_key, data, ex)
+            success = cache_manager.sync.set(cache_key, data, ex)
             
             if success:
                 logger.debug(f"知识库缓存设置成功: {kb_id}")
@@ -102,7 +102,7 @@ class CacheService:
         """获取搜索结果缓存"""
         try:
             cache_key = f"search:results:{hash(query)}:{kb_id or 'all'}"
-            cached_data = cache_manager.get(cache_key)
+            cached_data = cache_manager.sync.get(cache_key)
             
             if cached_data:
                 logger.debug(f"搜索结果缓存命中: {query[:50]}...")
@@ -119,7 +119,7 @@ class CacheService:
         """设置搜索结果缓存"""
         try:
             cache_key = f"search:results:{hash(query)}:{kb_id or 'all'}"
-            success = cache_manager.set(cache_key, results, ex)
+            success = cache_manager.sync.set(cache_key, results, ex)
             
             if success:
                 logger.debug(f"搜索结果缓存设置成功: {query[:50]}...")
@@ -142,7 +142,7 @@ class CacheService:
             
             # 清除搜索结果缓存（包含该文档的搜索结果）
             pattern = f"search:results:*"
-            deleted_count = cache_manager.delete_pattern(pattern)
+            deleted_count = cache_manager.sync.delete_pattern(pattern)
             
             logger.info(f"文档相关缓存清除完成: {doc_id}, 清除缓存数量: {deleted_count}")
             return True
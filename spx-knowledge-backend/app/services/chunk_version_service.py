@@ -163,8 +163,12 @@ class ChunkVersionService(BaseService[ChunkVersion]):
                 message=f"获取块版本失败: {str(e)}"
             )
     
-    def revert_chunk_to_version(self, chunk_id: int, revert_request: ChunkRevertRequest) -> ChunkRevertResponse:
-        """回退块到指定版本 - 根据设计文档实现"""
+    def revert_chunk_to_version(
+        self, chunk_id: int, revert_request: ChunkRevertRequest, reindex: bool = True
+    ) -> ChunkRevertResponse:
+        """回退块到指定版本 - 根据设计文档实现
+        reindex=False 时不在此处重新向量化/更新 OpenSearch，由调用方批量处理（如批量回退）
+        """
         try:
             logger.info(f"回退块版本: chunk_id={chunk_id}, target_version={revert_request.target_version}")
             
@@ -247,19 +251,12 @@ class ChunkVersionService(BaseService[ChunkVersion]):
             
             # ✅ 修复：重新向量化并更新所有数据库（MySQL、OpenSearch、MinIO）
             try:
-                # 1. 重新向量化
-                from app.services.vector_service import VectorService
-                from app.services.opensearch_service import OpenSearchService
+                # 1. 准备服务
                 from app.services.minio_storage_service import MinioStorageService
                 import json
                 
-                vector_service = VectorService(self.db)
-                osvc = OpenSearchService()
                 minio_service = MinioStorageService()
                 
-                # 生成新向量
-                content_vector = vector_service.generate_embedding(chunk.content or "") if (chunk.content or "").strip() else []
-                
                 # 2. 解析 metadata
                 chunk_meta_dict = {}
                 try:
@@ -286,19 +283,13 @@ class ChunkVersionService(BaseService[ChunkVersion]):
                     Document.id == chunk.document_id
                 ).first()
                 
-                # 4. 更新 OpenSearch
-                osvc.index_document_chunk_sync({
-                    "document_id": chunk.document_id,
-                    "knowledge_base_id": document.knowledge_base_id if document else None,
-                    "category_id": document.category_id if document else None,
-                    "chunk_id": chunk.id,
-                    "content": chunk.content or "",
-                    "chunk_type": chunk.chunk_type or 'text',
-                    "metadata": chunk_meta_dict,
-                    "created_at": chunk.created_at.isoformat() if chunk.created_at else None,
-                    "content_vector": content_vector,
-                })
-                logger.info(f"✅ OpenSearch 更新成功: chunk_id={chunk_id}")
+                # 4. 重新向量化并更新 OpenSearch（内容与已索引版本一致时只更新 metadata）
+                if reindex:
+                    from app.services.smart_vectorization_service import SmartVectorizationService
+                    SmartVectorizationService(self.db).revectorize_chunks(
+                        chunk.document_id, [chunk], extra_metadata={"edited": True, "reverted": True}
+                    )
+                    logger.info(f"✅ OpenSearch 更新成功: chunk_id={chunk_id}")
                 
                 # 5. 更新 MinIO
                 try:
@@ -462,7 +453,7 @@ class ChunkVersionService(BaseService[ChunkVersion]):
                 message=f"回退块版本失败: {str(e)}"
             )
     
-    def revert_chunk_to_previous_version(self, chunk_id: int) -> ChunkRevertResponse:
+    def revert_chunk_to_previous_version(self, chunk_id: int, reindex: bool = True) -> ChunkRevertResponse:
         """回退到上一个版本 - 根据设计文档实现"""
         try:
             logger.info(f"回退到上一个版本: chunk_id={chunk_id}")
@@ -493,7 +484,7 @@ class ChunkVersionService(BaseService[ChunkVersion]):
                 revert_comment="回退到上一个版本"
             )
             
-            return self.revert_chunk_to_version(chunk_id, revert_request)
+            return self.revert_chunk_to_version(chunk_id, revert_request, reindex=reindex)
             
         except CustomException:
             raise
@@ -209,11 +209,10 @@ class ConsistencyCheckService:
                 
                 # 从OpenSearch获取存储的向量
                 try:
-                    stored_doc = self.opensearch_service.client.get(
-                        index=self.opensearch_service.document_index,
-                        id=f"chunk_{chunk.id}"
-                    )
-                    stored_vector = stored_doc["_source"].get("vector", [])
+                    stored_doc = self.opensearch_service.get_chunk_source_sync(chunk.id)
+                    if stored_doc is None:
+                        raise LookupError(f"chunk_{chunk.id}")
+                    stored_vector = stored_doc.get("vector", [])
                     
                     # 比较向量维度
                     if len(new_vector) != len(stored_vector):
@@ -235,10 +234,9 @@ class ConsistencyCheckService:
             # 检查OpenSearch中是否有文档的所有块
             for chunk in chunks:
                 try:
-                    self.opensearch_service.client.get(
-                        index=self.opensearch_service.document_index,
-                        id=f"chunk_{chunk.id}"
-                    )
+                    if self.opensearch_service.get_chunk_source_sync(chunk.id, fields=["chunk_id"]) is None:
+                        logger.warning(f"块 {chunk.id} 在OpenSearch中不存在")
+                        return False
                 except Exception as e:
                     logger.warning(f"块 {chunk.id} 在OpenSearch中不存在")
                     return False
@@ -298,11 +296,10 @@ class ConsistencyCheckService:
             
             # 从OpenSearch获取存储的向量
             try:
-                stored_doc = self.opensearch_service.client.get(
-                    index=self.opensearch_service.document_index,
-                    id=f"chunk_{chunk.id}"
-                )
-                stored_vector = stored_doc["_source"].get("vector", [])
+                stored_doc = self.opensearch_service.get_chunk_source_sync(chunk.id)
+                if stored_doc is None:
+                    raise LookupError(f"chunk_{chunk.id}")
+                stored_vector = stored_doc.get("vector", [])
                 
                 # 比较向量维度
                 if len(new_vector) != len(stored_vector):
@@ -321,11 +318,7 @@ class ConsistencyCheckService:
     def _check_chunk_index_consistency(self, chunk_id: int) -> bool:
         """检查单个块的索引一致性"""
         try:
-            self.opensearch_service.client.get(
-                index=self.opensearch_service.document_index,
-                id=f"chunk_{chunk_id}"
-            )
-            return True
+            return self.opensearch_service.get_chunk_source_sync(chunk_id, fields=["chunk_id"]) is not None
         except Exception as e:
             return False
     
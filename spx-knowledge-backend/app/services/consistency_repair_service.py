@@ -134,11 +134,10 @@ class ConsistencyRepairService:
             count = 0
             for chunk in chunks:
                 try:
-                    self.opensearch_service.client.get(
-                        index=self.opensearch_service.document_index,
-                        id=f"chunk_{chunk.id}"
-                    )
-                    count += 1
+                    if self.opensearch_service.get_chunk_source_sync(chunk.id, fields=["chunk_id"]) is not None:
+                        count += 1
+                    else:
+                        logger.warning(f"块 {chunk.id} 索引更新失败: 索引中不存在")
                 except Exception as e:
                     logger.warning(f"块 {chunk.id} 索引更新失败: {e}")
             
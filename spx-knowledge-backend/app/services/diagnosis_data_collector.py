@@ -5,8 +5,10 @@ Diagnosis data collector service.
 
 from __future__ import annotations
 
+import asyncio
+import time
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional, List
+from typing import Any, Awaitable, Dict, Optional, List
 
 import httpx  # type: ignore
 
@@ -16,9 +18,32 @@ from app.models.cluster_config import ClusterConfig
 from app.services.cluster_config_service import ResourceSnapshotService
 from app.services.metrics_service import PrometheusMetricsService
 from app.services.log_query_service import LogQueryService
+from app.services.log_triage_service import LogTriage
 from app.services.resource_sync_service import KubernetesResourceSyncService
 from app.services.search_service import SearchService
 
+# 数据源整体截止时间在单项超时基础上的余量，保证单项超时先触发、返回部分结果
+_SOURCE_DEADLINE_SLACK_SECONDS = 5.0
+
+
+async def _wait_within(coros: List[Awaitable[Any]], deadline: float) -> List[Any]:
+    """
+    并发执行并在截止时间内收集结果（按传入顺序）：已完成的保留结果或异常，
+    截止时仍未完成的取消并以 TimeoutError 占位，不丢弃已完成的部分结果
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    if not tasks:
+        return []
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    return [
+        (task.exception() or task.result()) if task in done else TimeoutError(f"超过截止时间（>{deadline:g}s）")
+        for task in tasks
+    ]
+
 
 class DiagnosisDataCollector:
     """诊断数据收集器"""
@@ -165,9 +190,36 @@ class DiagnosisDataCollector:
             f"模板={', '.join(templates)}, 上下文={context}"
         )
         
-        for template in templates:
+        # 各模板并发查询（受并发数限制，单模板独立超时）
+        semaphore = asyncio.Semaphore(max(1, settings.OBSERVABILITY_COLLECT_METRICS_CONCURRENCY))
+        template_timeout = settings.OBSERVABILITY_COLLECT_METRICS_TIMEOUT_SECONDS
+        template_latency: Dict[str, float] = {}
+
+        async def run_template_limited(template: str) -> Any:
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    return await asyncio.wait_for(
+                        service.run_template(template, context, start=start, end=end, step=step),
+                        timeout=template_timeout,
+                    )
+                except asyncio.TimeoutError as exc:
+                    raise TimeoutError(f"查询超时（>{template_timeout:g}s）") from exc
+                finally:
+                    template_latency[template] = round((time.perf_counter() - started) * 1000, 1)
+
+        # 模板数超过并发数时排队时间会累加，整体截止时只取消未完成的模板，保留已完成的结果
+        outcomes = await _wait_within(
+            [run_template_limited(template) for template in templates],
+            template_timeout + _SOURCE_DEADLINE_SLACK_SECONDS,
+        )
+        metrics_payload["template_latency_ms"] = template_latency
+
+        for template, outcome in zip(templates, outcomes):
             try:
-                result = await service.run_template(template, context, start=start, end=end, step=step)
+                if isinstance(outcome, Exception):
+                    raise outcome
+                result = outcome
                 metrics_payload[template] = result
                 success_count += 1
                 
@@ -277,6 +329,7 @@ class DiagnosisDataCollector:
         if resource_type == "pods":
             # 步骤1: 尝试获取 Pod 状态，判断是否应该从 K8s API 获取日志
             pod_phase = None
+            pod_detail: Dict[str, Any] = {}
             try:
                 snapshot_service = ResourceSnapshotService(self.db)
                 sync_service = KubernetesResourceSyncService(cluster, snapshot_service, runtime)
@@ -295,8 +348,7 @@ class DiagnosisDataCollector:
                         cluster, ResourceSnapshotService(self.db), runtime
                     )
                     
-                    # 获取 Pod 详情，检查容器列表
-                    pod_detail = await sync_service.fetch_resource_detail("pods", ns, resource_name)
+                    # 检查容器列表（复用步骤1获取的 Pod 详情）
                     pod_spec = pod_detail.get("spec", {})
                     containers = pod_spec.get("containers", [])
                     container_names = [c.get("name") for c in containers if c.get("name")]
@@ -379,269 +431,72 @@ class DiagnosisDataCollector:
                             )
                             return []
                     
-                    # 如果是多容器 Pod，需要分别获取每个容器的日志
+                    # 如果是多容器 Pod，并发获取每个容器的日志（单容器超时只丢弃该容器的日志）
                     if len(container_names) > 1:
-                        logger.warning(f"[日志收集] 多容器 Pod，分别获取 {len(container_names)} 个容器的日志")
-                        for container_name in container_names:
-                            container_log_lines = await fetch_container_logs_with_fallback(
-                                container_name
-                            )
-                            # 为每行日志添加容器名称前缀
+                        logger.warning(f"[日志收集] 多容器 Pod，并发获取 {len(container_names)} 个容器的日志")
+                        semaphore = asyncio.Semaphore(max(1, settings.OBSERVABILITY_COLLECT_LOGS_CONCURRENCY))
+                        container_timeout = settings.OBSERVABILITY_COLLECT_LOGS_TIMEOUT_SECONDS
+
+                        async def fetch_container_limited(container_name: str) -> List[str]:
+                            async with semaphore:
+                                try:
+                                    return await asyncio.wait_for(
+                                        fetch_container_logs_with_fallback(container_name),
+                                        timeout=container_timeout,
+                                    )
+                                except asyncio.TimeoutError:
+                                    logger.warning(
+                                        f"[日志收集] 容器 '{container_name}' 日志拉取超时（>{container_timeout:g}s），跳过"
+                                    )
+                                    timed_out_containers.append(container_name)
+                                    return []
+
+                        timed_out_containers: List[str] = []
+                        container_logs = await _wait_within(
+                            [fetch_container_limited(name) for name in container_names],
+                            container_timeout + _SOURCE_DEADLINE_SLACK_SECONDS,
+                        )
+                        # 为每行日志添加容器名称前缀（保持容器顺序）
+                        for container_name, container_log_lines in zip(container_names, container_logs):
+                            if isinstance(container_log_lines, Exception):
+                                if container_name not in timed_out_containers:
+                                    timed_out_containers.append(container_name)
+                                continue
                             for line in container_log_lines:
                                 all_log_lines.append(f"[{container_name}] {line}")
+                        if timed_out_containers:
+                            result["timed_out_containers"] = timed_out_containers
                     else:
                         # 单容器 Pod，明确指定容器名称获取日志
                         container_name = container_names[0] if container_names else None
                         all_log_lines = await fetch_container_logs_with_fallback(container_name)
                     
-                    # 将文本日志转换为结构化格式
+                    # 单次流式分诊：识别错误/告警、截取有界上下文、归并堆栈并按模板去重
+                    triage = LogTriage(max_lines=max_log_lines).feed_many(all_log_lines).finish()
                     entries = []
-                    
-                    # 优先提取 ERROR、WARNING、FATAL 级别的日志（带上下文和大小保护）
-                    def is_error_log_line(line: str) -> bool:
-                        """
-                        更智能的错误日志识别
-                        避免误匹配（如包含 ERROR 的正常消息）
-                        
-                        Args:
-                            line: 日志行内容
-                        
-                        Returns:
-                            是否为错误/警告日志
-                        """
-                        if not line or not line.strip():
-                            return False
-                        
-                        line_upper = line.upper()
-                        
-                        # 定义日志级别关键词和常见误匹配模式
-                        # 优先级关键词（常见格式）
-                        priority_patterns = [
-                            ' ERROR ',  # 空格包围，避免匹配 "ERRORS" 等
-                            ' ERROR:',  # 冒号格式
-                            ' ERROR]',  # 方括号格式
-                            '[ERROR',   # 方括号格式（开头）
-                            ' WARNING ',  # 空格包围
-                            ' WARNING:',  # 冒号格式
-                            ' WARNING]',  # 方括号格式
-                            '[WARNING',   # 方括号格式
-                            ' WARN ',     # 空格包围
-                            ' WARN:',     # 冒号格式
-                            ' WARN]',     # 方括号格式
-                            '[WARN',      # 方括号格式
-                            ' FATAL ',    # 空格包围
-                            ' FATAL:',    # 冒号格式
-                            ' FATAL]',    # 方括号格式
-                            '[FATAL',     # 方括号格式
-                            ' CRITICAL ', # 空格包围
-                            ' CRITICAL:', # 冒号格式
-                            ' CRITICAL]', # 方括号格式
-                            '[CRITICAL',  # 方括号格式
-                            'EXCEPTION',  # 异常信息
-                            'EXCEPTION:', # 异常信息带冒号
-                            'EXCEPTION]', # 异常信息带方括号
-                            '[EXCEPTION', # 异常信息带方括号开头
-                        ]
-                        
-                        # 排除误匹配模式（包含这些关键词但不是错误日志）
-                        false_positive_patterns = [
-                            'NO ERROR',      # 无错误
-                            'NO WARNING',    # 无警告
-                            'NO EXCEPTION',  # 无异常
-                            'IGNORED ERROR', # 忽略的错误
-                        ]
-                        
-                        # 检查是否为误匹配
-                        for pattern in false_positive_patterns:
-                            if pattern in line_upper:
-                                return False
-                        
-                        # 检查是否匹配错误日志模式
-                        for pattern in priority_patterns:
-                            if pattern in line_upper:
-                                return True
-                        
-                        # 检查行首或行尾的特殊格式（如 "ERROR - " 或 " - ERROR"）
-                        if line_upper.startswith('ERROR') or line_upper.startswith('WARNING') or \
-                           line_upper.startswith('FATAL') or line_upper.startswith('CRITICAL'):
-                            return True
-                        
-                        # 检查常见的 Java/Spring 错误格式
-                        if any(pattern in line_upper for pattern in [
-                            '.ERROR',
-                            '.WARN',
-                            '.FATAL',
-                            'java.lang.',
-                            'java.net.',
-                            'java.io.',
-                            'Exception in thread',
-                            'Caused by:',
-                        ]):
-                            return True
-                        
-                        return False
-                    
-                    def truncate_log_line(line: str, max_length: int) -> str:
-                        """
-                        截断过长的日志行
-                        
-                        Args:
-                            line: 日志行内容
-                            max_length: 最大长度
-                        
-                        Returns:
-                            截断后的日志行（如果超长，会添加截断标记）
-                        """
-                        if not line:
-                            return line
-                        
-                        if len(line) <= max_length:
-                            return line
-                        
-                        # 保留前 90% 的内容，后 10% 用于截断标记
-                        truncate_at = int(max_length * 0.9)
-                        truncated = line[:truncate_at]
-                        remaining = len(line) - truncate_at
-                        return f"{truncated}... [TRUNCATED {remaining} chars]"
-                    
-                    def prioritize_logs_with_context(
-                        log_lines: List[str], 
-                        max_lines: int, 
-                        context_lines: int = 3
-                    ) -> List[str]:
-                        """
-                        优先提取包含 ERROR、WARNING、FATAL 的日志行及其上下文
-                        保持原始时间顺序，确保关键错误信息不被截断
-                        同时保护日志大小（截断过长日志）
-                        
-                        Args:
-                            log_lines: 原始日志行列表（按时间顺序）
-                            max_lines: 最大返回行数
-                            context_lines: 错误日志上下文行数（前后各几行）
-                        
-                        Returns:
-                            处理后的日志行列表（优先级：ERROR/WARNING/FATAL + 上下文 > 其他）
-                        """
-                        if not log_lines:
-                            return []
-                        
-                        # 首先截断过长的日志行
-                        max_line_length = settings.OBSERVABILITY_LOG_MAX_LINE_LENGTH
-                        truncated_log_lines = [truncate_log_line(line, max_line_length) for line in log_lines]
-                        
-                        if len(truncated_log_lines) <= max_lines:
-                            return truncated_log_lines
-                        
-                        # 标记每行是否为优先级日志
-                        log_with_flags = []
-                        priority_indices = set()
-                        
-                        for idx, line in enumerate(truncated_log_lines):
-                            is_priority = is_error_log_line(line)
-                            log_with_flags.append((idx, line, is_priority))
-                            if is_priority:
-                                priority_indices.add(idx)
-                        
-                        # 如果没有优先级日志，直接返回最近的日志
-                        if not priority_indices:
-                            return truncated_log_lines[-max_lines:]
-                        
-                        # 收集优先级日志及其上下文
-                        selected_indices = set()
-                        
-                        for priority_idx in priority_indices:
-                            # 添加优先级日志本身
-                            selected_indices.add(priority_idx)
-                            
-                            # 添加上下文（前面的日志）
-                            for i in range(max(0, priority_idx - context_lines), priority_idx):
-                                selected_indices.add(i)
-                            
-                            # 添加上下文（后面的日志）
-                            max_idx = len(truncated_log_lines) - 1
-                            for i in range(priority_idx + 1, min(max_idx + 1, priority_idx + context_lines + 1)):
-                                selected_indices.add(i)
-                        
-                        # 如果选中的日志数量已超过限制，优先保留优先级日志
-                        if len(selected_indices) > max_lines:
-                            # 先保留所有优先级日志
-                            result_indices = set(priority_indices)
-                            
-                            # 计算剩余槽位
-                            remaining_slots = max_lines - len(result_indices)
-                            
-                            # 优先保留优先级日志的直接上下文
-                            context_indices = selected_indices - priority_indices
-                            if len(context_indices) > remaining_slots:
-                                # 从优先级日志的上下文中选择（按距离优先级日志的远近）
-                                context_with_distance = []
-                                for ctx_idx in context_indices:
-                                    # 计算到最近优先级日志的距离
-                                    min_distance = min(abs(ctx_idx - pri_idx) for pri_idx in priority_indices)
-                                    context_with_distance.append((ctx_idx, min_distance))
-                                
-                                # 按距离排序，优先保留距离近的上下文
-                                context_with_distance.sort(key=lambda x: x[1])
-                                for ctx_idx, _ in context_with_distance[:remaining_slots]:
-                                    result_indices.add(ctx_idx)
-                            else:
-                                result_indices.update(context_indices)
-                            
-                            selected_indices = result_indices
-                        
-                        # 如果选中的日志数量仍然不足，补充最近的日志
-                        if len(selected_indices) < max_lines:
-                            remaining_slots = max_lines - len(selected_indices)
-                            other_indices = [idx for idx in range(len(truncated_log_lines)) if idx not in selected_indices]
-                            
-                            if other_indices:
-                                # 从后往前取最近的日志
-                                other_indices_to_add = other_indices[-remaining_slots:] if len(other_indices) > remaining_slots else other_indices
-                                selected_indices.update(other_indices_to_add)
-                        
-                        # 按原始索引顺序返回，保持时间顺序
-                        result = []
-                        for idx, line, _ in log_with_flags:
-                            if idx in selected_indices:
-                                result.append(line)
-                                if len(result) >= max_lines:
-                                    break
-                        
-                        return result
-                    
-                    # 使用改进的优先级排序处理日志（带上下文和大小保护）
-                    context_lines = settings.OBSERVABILITY_LOG_CONTEXT_LINES
-                    log_lines_to_process = prioritize_logs_with_context(
-                        all_log_lines, 
-                        max_log_lines, 
-                        context_lines=context_lines
-                    )
-                    
-                    # 统计优先级日志数量（使用改进的错误日志识别函数）
-                    priority_count = sum(1 for line in log_lines_to_process if is_error_log_line(line))
-                    truncated_count = sum(1 for line in log_lines_to_process if '[TRUNCATED' in line)
-                    
+                    for _, message, repeat in triage.timeline():
+                        entry = {
+                            "timestamp": datetime.utcnow().isoformat() + "Z",
+                            "message": message,
+                            "source": "k8s_api",
+                        }
+                        if repeat > 1:
+                            entry["repeat_count"] = repeat
+                        entries.append(entry)
+
                     logger.warning(
                         f"[日志收集] 原始日志行数: {len(all_log_lines)}, "
-                        f"处理后返回行数: {len(log_lines_to_process)} (最大限制: {max_log_lines}), "
-                        f"优先级日志(ERROR/WARNING/FATAL): {priority_count} 条, "
-                        f"截断日志: {truncated_count} 条, "
-                        f"上下文行数: {context_lines}"
+                        f"处理后返回条数: {len(entries)} (最大限制: {max_log_lines}), "
+                        f"分诊统计: {triage.stats}"
                     )
                     
-                    for line in log_lines_to_process:
-                        if line.strip():
-                            entries.append({
-                                "timestamp": datetime.utcnow().isoformat() + "Z",
-                                "message": line,
-                                "source": "k8s_api",
-                            })
-                    
                     result.update({
                         "source": "k8s_api",
                         "logs": entries,
                         "total": len(entries),
                         "log_available": True,  # 可以从 K8s API 获取
+                        "excerpts": triage.excerpts(),
+                        "triage": triage.stats,
                     })
                     logger.warning(
                         f"[日志收集] 成功从 K8s API 获取 Pod {ns}/{resource_name} 的日志: "
@@ -700,142 +555,26 @@ class DiagnosisDataCollector:
                 entries = log_result.get("results", [])
                 total = log_result.get("pagination", {}).get("total", len(entries))
                 
-                # 定义辅助函数：处理日志系统返回的日志（带上下文和大小保护）
-                def filter_log_system_entries(log_entries: List[Dict], max_lines: int) -> List[Dict]:
-                    """对日志系统返回的日志应用优先级过滤、上下文提取和大小保护"""
-                    if len(log_entries) <= max_lines:
-                        # 即使不超过限制，也要截断过长的日志行
-                        max_line_length = settings.OBSERVABILITY_LOG_MAX_LINE_LENGTH
-                        for entry in log_entries:
-                            msg = entry.get("message") or entry.get("log") or str(entry)
-                            if isinstance(msg, dict):
-                                msg = str(msg)
-                            if len(str(msg)) > max_line_length:
-                                truncate_at = int(max_line_length * 0.9)
-                                truncated = str(msg)[:truncate_at]
-                                remaining = len(str(msg)) - truncate_at
-                                entry["message"] = f"{truncated}... [TRUNCATED {remaining} chars]"
-                        return log_entries
-                    
-                    # 提取日志消息内容
-                    log_messages = []
-                    for entry in log_entries:
-                        message = entry.get("message") or entry.get("log") or str(entry)
-                        if isinstance(message, dict):
-                            message = str(message)
-                        # 截断过长的日志行
-                        max_line_length = settings.OBSERVABILITY_LOG_MAX_LINE_LENGTH
-                        if len(message) > max_line_length:
-                            truncate_at = int(max_line_length * 0.9)
-                            truncated = message[:truncate_at]
-                            remaining = len(message) - truncate_at
-                            message = f"{truncated}... [TRUNCATED {remaining} chars]"
-                        log_messages.append(message)
-                    
-                    # 使用改进的错误日志识别逻辑（与 is_error_log_line 保持一致）
-                    def is_error_entry(msg: str) -> bool:
-                        if not msg or not str(msg).strip():
-                            return False
-                        msg_upper = str(msg).upper()
-                        
-                        # 排除误匹配
-                        if any(pattern in msg_upper for pattern in ['NO ERROR', 'NO WARNING', 'NO EXCEPTION', 'IGNORED ERROR']):
-                            return False
-                        
-                        # 检查优先级模式
-                        priority_patterns = [
-                            ' ERROR ', ' ERROR:', ' ERROR]', '[ERROR',
-                            ' WARNING ', ' WARNING:', ' WARNING]', '[WARNING',
-                            ' WARN ', ' WARN:', ' WARN]', '[WARN',
-                            ' FATAL ', ' FATAL:', ' FATAL]', '[FATAL',
-                            ' CRITICAL ', ' CRITICAL:', ' CRITICAL]', '[CRITICAL',
-                            'EXCEPTION', 'EXCEPTION:', 'EXCEPTION]', '[EXCEPTION',
-                        ]
-                        if any(pattern in msg_upper for pattern in priority_patterns):
-                            return True
-                        
-                        if msg_upper.startswith(('ERROR', 'WARNING', 'FATAL', 'CRITICAL')):
-                            return True
-                        
-                        if any(pattern in msg_upper for pattern in [
-                            '.ERROR', '.WARN', '.FATAL',
-                            'java.lang.', 'java.net.', 'java.io.',
-                            'Exception in thread', 'Caused by:',
-                        ]):
-                            return True
-                        
-                        return False
-                    
-                    # 标记优先级日志
-                    priority_indices = set()
-                    for idx, msg in enumerate(log_messages):
-                        if is_error_entry(msg):
-                            priority_indices.add(idx)
-                    
-                    # 如果没有优先级日志，直接返回最近的日志
-                    if not priority_indices:
-                        return log_entries[-max_lines:]
-                    
-                    # 收集优先级日志及其上下文
-                    context_lines = settings.OBSERVABILITY_LOG_CONTEXT_LINES
-                    selected_indices = set()
-                    
-                    for priority_idx in priority_indices:
-                        selected_indices.add(priority_idx)
-                        # 添加上下文
-                        for i in range(max(0, priority_idx - context_lines), priority_idx):
-                            selected_indices.add(i)
-                        for i in range(priority_idx + 1, min(len(log_entries), priority_idx + context_lines + 1)):
-                            selected_indices.add(i)
-                    
-                    # 如果超过限制，优先保留优先级日志和近的上下文
-                    if len(selected_indices) > max_lines:
-                        result_indices = set(priority_indices)
-                        remaining_slots = max_lines - len(result_indices)
-                        context_indices = selected_indices - priority_indices
-                        
-                        if len(context_indices) > remaining_slots:
-                            # 按距离排序，优先保留距离近的上下文
-                            context_with_distance = [
-                                (ctx_idx, min(abs(ctx_idx - pri_idx) for pri_idx in priority_indices))
-                                for ctx_idx in context_indices
-                            ]
-                            context_with_distance.sort(key=lambda x: x[1])
-                            for ctx_idx, _ in context_with_distance[:remaining_slots]:
-                                result_indices.add(ctx_idx)
-                        else:
-                            result_indices.update(context_indices)
-                        
-                        selected_indices = result_indices
-                    
-                    # 如果仍然不足，补充最近的日志
-                    if len(selected_indices) < max_lines:
-                        remaining_slots = max_lines - len(selected_indices)
-                        other_indices = [idx for idx in range(len(log_entries)) if idx not in selected_indices]
-                        if other_indices:
-                            selected_indices.update(other_indices[-remaining_slots:] if len(other_indices) > remaining_slots else other_indices)
-                    
-                    # 按原始顺序返回，并更新消息内容
-                    result = []
-                    for idx in sorted(selected_indices):
-                        if idx < len(log_entries):
-                            entry = log_entries[idx].copy()
-                            entry["message"] = log_messages[idx]
-                            result.append(entry)
-                    
-                    return result[:max_lines]
-                
-                # 应用过滤和大小保护
-                entries = filter_log_system_entries(entries, max_log_lines)
+                # 单次流式分诊：识别错误/告警、截取有界上下文、归并堆栈并按模板去重
+                triage = LogTriage(max_lines=max_log_lines).feed_many(entries).finish()
+                filtered = []
+                for entry, message, repeat in triage.timeline():
+                    entry = dict(entry) if isinstance(entry, dict) else {"message": message}
+                    entry["message"] = message
+                    if repeat > 1:
+                        entry["repeat_count"] = repeat
+                    filtered.append(entry)
+                entries = filtered
                 
                 result.update({
                     "source": "log_system",
                     "logs": entries,
                     "total": total,
                     "raw": log_result,
+                    "excerpts": triage.excerpts(),
+                    "triage": triage.stats,
                 })
-                priority_count = sum(1 for e in entries if any(kw in str(e.get("message", e.get("log", ""))).upper() 
-                                                               for kw in ['ERROR', 'WARNING', 'WARN', 'FATAL', 'CRITICAL', 'EXCEPTION']))
+                priority_count = triage.stats["priority_lines"]
                 logger.info(
                     f"[日志收集] 成功从日志系统获取 Pod {ns}/{resource_name} 的日志: "
                     f"共 {len(entries)} 条（总数: {total}），优先级日志: {priority_count} 条，查询语句: {query}"
@@ -896,143 +635,26 @@ class DiagnosisDataCollector:
                 entries = log_result.get("results", [])
                 total = log_result.get("pagination", {}).get("total", len(entries))
                 
-                # 复用 Pod 日志的过滤逻辑（使用相同的 filter_log_system_entries 逻辑）
-                # 定义辅助函数：处理日志系统返回的日志（带上下文和大小保护）
-                def filter_log_system_entries_for_node_service(log_entries: List[Dict], max_lines: int) -> List[Dict]:
-                    """对日志系统返回的日志应用优先级过滤、上下文提取和大小保护（Node/Service专用）"""
-                    if len(log_entries) <= max_lines:
-                        # 即使不超过限制，也要截断过长的日志行
-                        max_line_length = settings.OBSERVABILITY_LOG_MAX_LINE_LENGTH
-                        for entry in log_entries:
-                            msg = entry.get("message") or entry.get("log") or str(entry)
-                            if isinstance(msg, dict):
-                                msg = str(msg)
-                            if len(str(msg)) > max_line_length:
-                                truncate_at = int(max_line_length * 0.9)
-                                truncated = str(msg)[:truncate_at]
-                                remaining = len(str(msg)) - truncate_at
-                                entry["message"] = f"{truncated}... [TRUNCATED {remaining} chars]"
-                        return log_entries
-                    
-                    # 提取日志消息内容
-                    log_messages = []
-                    for entry in log_entries:
-                        message = entry.get("message") or entry.get("log") or str(entry)
-                        if isinstance(message, dict):
-                            message = str(message)
-                        # 截断过长的日志行
-                        max_line_length = settings.OBSERVABILITY_LOG_MAX_LINE_LENGTH
-                        if len(message) > max_line_length:
-                            truncate_at = int(max_line_length * 0.9)
-                            truncated = message[:truncate_at]
-                            remaining = len(message) - truncate_at
-                            message = f"{truncated}... [TRUNCATED {remaining} chars]"
-                        log_messages.append(message)
-                    
-                    # 使用改进的错误日志识别逻辑
-                    def is_error_entry(msg: str) -> bool:
-                        if not msg or not str(msg).strip():
-                            return False
-                        msg_upper = str(msg).upper()
-                        
-                        # 排除误匹配
-                        if any(pattern in msg_upper for pattern in ['NO ERROR', 'NO WARNING', 'NO EXCEPTION', 'IGNORED ERROR']):
-                            return False
-                        
-                        # 检查优先级模式
-                        priority_patterns = [
-                            ' ERROR ', ' ERROR:', ' ERROR]', '[ERROR',
-                            ' WARNING ', ' WARNING:', ' WARNING]', '[WARNING',
-                            ' WARN ', ' WARN:', ' WARN]', '[WARN',
-                            ' FATAL ', ' FATAL:', ' FATAL]', '[FATAL',
-                            ' CRITICAL ', ' CRITICAL:', ' CRITICAL]', '[CRITICAL',
-                            'EXCEPTION', 'EXCEPTION:', 'EXCEPTION]', '[EXCEPTION',
-                        ]
-                        if any(pattern in msg_upper for pattern in priority_patterns):
-                            return True
-                        
-                        if msg_upper.startswith(('ERROR', 'WARNING', 'FATAL', 'CRITICAL')):
-                            return True
-                        
-                        if any(pattern in msg_upper for pattern in [
-                            '.ERROR', '.WARN', '.FATAL',
-                            'java.lang.', 'java.net.', 'java.io.',
-                            'Exception in thread', 'Caused by:',
-                        ]):
-                            return True
-                        
-                        return False
-                    
-                    # 标记优先级日志
-                    priority_indices = set()
-                    for idx, msg in enumerate(log_messages):
-                        if is_error_entry(msg):
-                            priority_indices.add(idx)
-                    
-                    # 如果没有优先级日志，直接返回最近的日志
-                    if not priority_indices:
-                        return log_entries[-max_lines:]
-                    
-                    # 收集优先级日志及其上下文
-                    context_lines = settings.OBSERVABILITY_LOG_CONTEXT_LINES
-                    selected_indices = set()
-                    
-                    for priority_idx in priority_indices:
-                        selected_indices.add(priority_idx)
-                        # 添加上下文
-                        for i in range(max(0, priority_idx - context_lines), priority_idx):
-                            selected_indices.add(i)
-                        for i in range(priority_idx + 1, min(len(log_entries), priority_idx + context_lines + 1)):
-                            selected_indices.add(i)
-                    
-                    # 如果超过限制，优先保留优先级日志和近的上下文
-                    if len(selected_indices) > max_lines:
-                        result_indices = set(priority_indices)
-                        remaining_slots = max_lines - len(result_indices)
-                        context_indices = selected_indices - priority_indices
-                        
-                        if len(context_indices) > remaining_slots:
-                            # 按距离排序，优先保留距离近的上下文
-                            context_with_distance = [
-                                (ctx_idx, min(abs(ctx_idx - pri_idx) for pri_idx in priority_indices))
-                                for ctx_idx in context_indices
-                            ]
-                            context_with_distance.sort(key=lambda x: x[1])
-                            for ctx_idx, _ in context_with_distance[:remaining_slots]:
-                                result_indices.add(ctx_idx)
-                        else:
-                            result_indices.update(context_indices)
-                        
-                        selected_indices = result_indices
-                    
-                    # 如果仍然不足，补充最近的日志
-                    if len(selected_indices) < max_lines:
-                        remaining_slots = max_lines - len(selected_indices)
-                        other_indices = [idx for idx in range(len(log_entries)) if idx not in selected_indices]
-                        if other_indices:
-                            selected_indices.update(other_indices[-remaining_slots:] if len(other_indices) > remaining_slots else other_indices)
-                    
-                    # 按原始顺序返回，并更新消息内容
-                    result = []
-                    for idx in sorted(selected_indices):
-                        if idx < len(log_entries):
-                            entry = log_entries[idx].copy()
-                            entry["message"] = log_messages[idx]
-                            result.append(entry)
-                    
-                    return result[:max_lines]
-                
-                # 应用过滤和大小保护
-                entries = filter_log_system_entries_for_node_service(entries, max_log_lines)
+                # 单次流式分诊：识别错误/告警、截取有界上下文、归并堆栈并按模板去重
+                triage = LogTriage(max_lines=max_log_lines).feed_many(entries).finish()
+                filtered = []
+                for entry, message, repeat in triage.timeline():
+                    entry = dict(entry) if isinstance(entry, dict) else {"message": message}
+                    entry["message"] = message
+                    if repeat > 1:
+                        entry["repeat_count"] = repeat
+                    filtered.append(entry)
+                entries = filtered
                 
                 result.update({
                     "source": "log_system",
                     "logs": entries,
                     "total": total,
                     "raw": log_result,
+                    "excerpts": triage.excerpts(),
+                    "triage": triage.stats,
                 })
-                priority_count = sum(1 for e in entries if any(kw in str(e.get("message", e.get("log", ""))).upper() 
-                                                               for kw in ['ERROR', 'WARNING', 'WARN', 'FATAL', 'CRITICAL', 'EXCEPTION']))
+                priority_count = triage.stats["priority_lines"]
                 logger.info(
                     f"[日志收集] 成功从日志系统获取 {resource_type} {ns}/{resource_name} 的日志: "
                     f"共 {len(entries)} 条（总数: {total}），优先级日志: {priority_count} 条，查询语句: {query}"
@@ -1073,42 +695,72 @@ class DiagnosisDataCollector:
             time_range_hours: 时间范围（小时），默认 0.5 小时
             
         Returns:
-            包含 api_data, metrics, logs 的字典
+            包含 api_data, metrics, logs 以及各数据源耗时 collection 的字典
         """
         logger.warning(
             f"[数据收集入口] 开始收集 {resource_type}/{resource_name} 的数据, "
             f"命名空间={namespace}, 时间范围={time_range_hours}小时"
         )
-        
-        # 1. 从 API Server 获取资源状态和配置
-        logger.warning(f"[数据收集入口] 步骤1: 从 API Server 获取资源状态和配置")
-        api_data = await self.collect_from_api_server(
-            resource_type, resource_name, namespace, cluster, runtime
-        )
-        logger.warning(f"[数据收集入口] API Server 数据收集完成, 结果={bool(api_data)}")
-        
-        # 2. 从监控系统获取指标（根据资源类型选择指标模板）
-        logger.warning(f"[数据收集入口] 步骤2: 从监控系统获取指标")
-        metrics = await self.collect_metrics(
-            resource_type, resource_name, cluster, runtime, namespace, time_range_hours
-        )
-        logger.warning(f"[数据收集入口] 指标收集完成, 监控配置={metrics.get('monitoring_configured', False)}, 消息={metrics.get('message', 'N/A')}")
-        
-        # 3. 从日志系统获取日志（根据资源类型选择日志源）
-        logger.warning(f"[数据收集入口] 步骤3: 从日志系统获取日志")
+
+        # API Server、指标、日志三个数据源并发收集；超时的数据源返回占位结果，不阻塞其余数据源
+        # 指标 / 日志在内部按截止时间保留已完成的部分结果，这里的截止时间只作兜底，晚于内部截止时间
         log_time_range_hours = min(time_range_hours, 0.25)  # 日志默认 15 分钟
-        logs = await self.collect_logs(
-            resource_type, resource_name, cluster, runtime, namespace, log_time_range_hours
+        slack = 2 * _SOURCE_DEADLINE_SLACK_SECONDS
+        (api_data, api_stat), (metrics, metrics_stat), (logs, logs_stat) = await asyncio.gather(
+            self._collect_source(
+                "api_server",
+                self.collect_from_api_server(resource_type, resource_name, namespace, cluster, runtime),
+                settings.OBSERVABILITY_COLLECT_API_TIMEOUT_SECONDS,
+                fallback={},
+            ),
+            self._collect_source(
+                "metrics",
+                self.collect_metrics(resource_type, resource_name, cluster, runtime, namespace, time_range_hours),
+                settings.OBSERVABILITY_COLLECT_METRICS_TIMEOUT_SECONDS + slack,
+                fallback={"message": "指标收集超时"},
+            ),
+            self._collect_source(
+                "logs",
+                self.collect_logs(resource_type, resource_name, cluster, runtime, namespace, log_time_range_hours),
+                settings.OBSERVABILITY_COLLECT_LOGS_TIMEOUT_SECONDS + slack,
+                fallback={"source": None, "logs": [], "error": "日志收集超时", "log_available": False},
+            ),
+        )
+        collection = {"api_server": api_stat, "metrics": metrics_stat, "logs": logs_stat}
+
+        logger.warning(
+            f"[数据收集入口] 数据收集完成: API Server 结果={bool(api_data)}, "
+            f"监控配置={metrics.get('monitoring_configured', False)}, 指标消息={metrics.get('message', 'N/A')}, "
+            f"日志来源={logs.get('source', 'N/A')}, 日志数量={len(logs.get('logs', []))}, 耗时={collection}"
         )
-        logger.warning(f"[数据收集入口] 日志收集完成, 来源={logs.get('source', 'N/A')}, 数量={len(logs.get('logs', []))}")
-        
-        logger.warning(f"[数据收集入口] 数据收集完成, 返回结果")
         return {
             "api_data": api_data,
             "metrics": metrics,
             "logs": logs,
+            "collection": collection,
         }
 
+    @staticmethod
+    async def _collect_source(
+        name: str,
+        coro: Awaitable[Dict[str, Any]],
+        timeout: float,
+        fallback: Dict[str, Any],
+    ) -> tuple[Dict[str, Any], Dict[str, Any]]:
+        """执行单个数据源的收集并计时；超时或异常时返回 fallback，状态记录在统计信息中"""
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            data = await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[数据收集入口] 数据源 {name} 超时（>{timeout:g}s），返回部分结果")
+            data, status = dict(fallback), "timeout"
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.warning(f"[数据收集入口] 数据源 {name} 收集失败: {exc}", exc_info=True)
+            data, status = dict(fallback), "error"
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        return data, {"status": status, "latency_ms": latency_ms}
+
     async def search_knowledge(self, problem_summary: str) -> Optional[List[Dict[str, Any]]]:
         """
         基于问题总结搜索知识库
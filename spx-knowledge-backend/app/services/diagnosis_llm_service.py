@@ -373,6 +373,27 @@ class DiagnosisLlmService:
             logger.warning("LLM 诊断失败: %s", exc)
             return None
 
+    @staticmethod
+    def _append_log_excerpts(
+        prompt_lines: List[str], excerpts: List[Dict[str, Any]], triage_stats: Dict[str, Any]
+    ) -> None:
+        """输出分诊后的日志摘录（已按模板去重，重复次数以 ×N 标注）"""
+        if triage_stats:
+            prompt_lines.append(
+                f"分诊统计: 原始 {triage_stats.get('total_lines', 0)} 行，"
+                f"错误/告警 {triage_stats.get('priority_lines', 0)} 行，"
+                f"去重后 {triage_stats.get('unique_events', len(excerpts))} 类，"
+                f"合并重复 {triage_stats.get('duplicates_suppressed', 0)} 次"
+            )
+        prompt_lines.append(f"### 关键日志摘录（共 {len(excerpts)} 类，按严重程度排序）- **这是诊断的关键依据，请仔细分析**")
+        for i, item in enumerate(excerpts, 1):
+            repeat = f" ×{item.get('count')}" if (item.get("count") or 1) > 1 else ""
+            timestamp = f" [{item.get('timestamp')}]" if item.get("timestamp") else ""
+            prompt_lines.append(f"{i}. [{item.get('severity')}{repeat}]{timestamp} {item.get('message', '')}")
+            context = (item.get("context_before") or []) + (item.get("context_after") or [])
+            if context:
+                prompt_lines.append(f"   上下文: {' | '.join(line[:300] for line in context)}")
+
     def build_structured_llm_prompt(
         self,
         context: Dict[str, Any],
@@ -544,57 +565,62 @@ class DiagnosisLlmService:
             prompt_lines.append(f"日志来源: {log_source}, 总数量: {log_count} 条")
             prompt_lines.append("")
             
-            # 提取和分类日志
-            error_keywords = ["error", "exception", "failed", "fail", "warn", "warning", 
-                            "fatal", "critical", "timeout", "refused", "denied", "closed",
-                            "unable", "unavailable", "cannot", "can't", "connection", "connect",
-                            "resolve", "resolvable", "unknownhost", "dns", "host"]
+            excerpts = logs.get("excerpts")
+            if excerpts:
+                # 日志分诊已完成去重与排序：按严重级别、重复次数展示精简摘录
+                self._append_log_excerpts(prompt_lines, excerpts, logs.get("triage") or {})
+            else:
+                # 提取和分类日志
+                error_keywords = ["error", "exception", "failed", "fail", "warn", "warning", 
+                                "fatal", "critical", "timeout", "refused", "denied", "closed",
+                                "unable", "unavailable", "cannot", "can't", "connection", "connect",
+                                "resolve", "resolvable", "unknownhost", "dns", "host"]
             
-            error_logs = []
-            warning_logs = []
-            normal_logs = []
+                error_logs = []
+                warning_logs = []
+                normal_logs = []
             
-            for log in log_list:
-                msg = str(log.get("message", "")).lower()
-                # 检查是否为错误日志
-                if any(keyword in msg for keyword in error_keywords):
-                    # 进一步判断是 ERROR 还是 WARNING
-                    if any(kw in msg for kw in ["error", "exception", "failed", "fatal", "critical"]):
-                        error_logs.append(log)
+                for log in log_list:
+                    msg = str(log.get("message", "")).lower()
+                    # 检查是否为错误日志
+                    if any(keyword in msg for keyword in error_keywords):
+                        # 进一步判断是 ERROR 还是 WARNING
+                        if any(kw in msg for kw in ["error", "exception", "failed", "fatal", "critical"]):
+                            error_logs.append(log)
+                        else:
+                            warning_logs.append(log)
                     else:
-                        warning_logs.append(log)
-                else:
-                    normal_logs.append(log)
+                        normal_logs.append(log)
             
-            # 优先展示错误日志（完整内容，不截断）
-            if error_logs:
-                prompt_lines.append(f"### 错误日志（共 {len(error_logs)} 条）- **这是诊断的关键依据，请仔细分析**")
-                for i, log in enumerate(error_logs[:20], 1):  # 最多显示 20 条错误日志
-                    msg = log.get("message", "")
-                    timestamp = log.get("timestamp", "")
-                    prompt_lines.append(f"{i}. [{timestamp}] {msg}")
-                if len(error_logs) > 20:
-                    prompt_lines.append(f"   ... 还有 {len(error_logs) - 20} 条错误日志未显示")
+                # 优先展示错误日志（完整内容，不截断）
+                if error_logs:
+                    prompt_lines.append(f"### 错误日志（共 {len(error_logs)} 条）- **这是诊断的关键依据，请仔细分析**")
+                    for i, log in enumerate(error_logs[:20], 1):  # 最多显示 20 条错误日志
+                        msg = log.get("message", "")
+                        timestamp = log.get("timestamp", "")
+                        prompt_lines.append(f"{i}. [{timestamp}] {msg}")
+                    if len(error_logs) > 20:
+                        prompt_lines.append(f"   ... 还有 {len(error_logs) - 20} 条错误日志未显示")
             
-            # 其次展示警告日志
-            if warning_logs:
-                prompt_lines.append("")
-                prompt_lines.append(f"### 警告日志（共 {len(warning_logs)} 条）")
-                for i, log in enumerate(warning_logs[:10], 1):  # 最多显示 10 条警告日志
-                    msg = log.get("message", "")
-                    timestamp = log.get("timestamp", "")
-                    prompt_lines.append(f"{i}. [{timestamp}] {msg}")
-                if len(warning_logs) > 10:
-                    prompt_lines.append(f"   ... 还有 {len(warning_logs) - 10} 条警告日志未显示")
+                # 其次展示警告日志
+                if warning_logs:
+                    prompt_lines.append("")
+                    prompt_lines.append(f"### 警告日志（共 {len(warning_logs)} 条）")
+                    for i, log in enumerate(warning_logs[:10], 1):  # 最多显示 10 条警告日志
+                        msg = log.get("message", "")
+                        timestamp = log.get("timestamp", "")
+                        prompt_lines.append(f"{i}. [{timestamp}] {msg}")
+                    if len(warning_logs) > 10:
+                        prompt_lines.append(f"   ... 还有 {len(warning_logs) - 10} 条警告日志未显示")
             
-            # 如果需要，展示少量普通日志作为上下文
-            if not error_logs and not warning_logs and normal_logs:
-                prompt_lines.append("")
-                prompt_lines.append("### 普通日志（作为上下文参考）")
-                for i, log in enumerate(normal_logs[:5], 1):
-                    msg = log.get("message", "")
-                    timestamp = log.get("timestamp", "")
-                    prompt_lines.append(f"{i}. [{timestamp}] {msg}")
+                # 如果需要，展示少量普通日志作为上下文
+                if not error_logs and not warning_logs and normal_logs:
+                    prompt_lines.append("")
+                    prompt_lines.append("### 普通日志（作为上下文参考）")
+                    for i, log in enumerate(normal_logs[:5], 1):
+                        msg = log.get("message", "")
+                        timestamp = log.get("timestamp", "")
+                        prompt_lines.append(f"{i}. [{timestamp}] {msg}")
             
             prompt_lines.append("")
             prompt_lines.append("**关键要求**：")
@@ -333,19 +333,30 @@ class DiagnosisService:
         api_data = data.get("api_data", {})
         metrics_data = data.get("metrics", {})
         logs_data = data.get("logs", {})
+        collection = data.get("collection", {})
         
+        latency_text = ", ".join(
+            f"{name}={stat.get('latency_ms')}ms" + ("" if stat.get("status") == "ok" else f"({stat.get('status')})")
+            for name, stat in collection.items()
+        )
+        timed_out = [name for name, stat in collection.items() if stat.get("status") != "ok"]
         await self.record_service.append_event(
             record.id,
-            self._make_event("collect_data", f"[迭代 {iteration_no}] 数据收集完成", "success"),
+            self._make_event(
+                "collect_data",
+                f"[迭代 {iteration_no}] 数据收集完成（{latency_text}）",
+                "warning" if timed_out else "success",
+            ),
         )
         action_results.append(
             {
                 "name": "collect_data",
-                "status": "success",
+                "status": "partial" if timed_out else "success",
                 "details": {
                     "api_data": bool(api_data),
                     "metrics": list(metrics_data.keys()),
                     "logs": len(logs_data.get("logs", [])) if isinstance(logs_data, dict) else 0,
+                    "collection": collection,
                 },
             }
         )
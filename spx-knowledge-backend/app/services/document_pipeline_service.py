@@ -0,0 +1,795 @@
+"""
+Document Pipeline Service
+文档处理分阶段流水线：解析/分块（document 队列）→ 文本向量化+索引（vector 队列）与
+图片向量化+索引（image 队列）并行 → 收尾（index 队列：自动标签、目录提取、状态完成）
+
+- 每个阶段是独立的 Celery 任务，可按队列单独设置并发，文档之间按阶段流水并行
+- 阶段进度记录在 Document.meta["pipeline"]，失败后重新投递文档时从最后完成的阶段继续
+- 下游队列积压超过阈值时，解析阶段推迟接收新文档（背压）
+"""
+
+import datetime
+import gzip
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.core.constants import DOC_STATUS_COMPLETED, DOC_STATUS_FAILED, DOC_STATUS_INDEXING
+from app.core.logging import logger, sampled
+from app.core.tracing import KIND_INGESTION, observe_stage
+from app.models.chunk import DocumentChunk
+from app.models.document import Document
+from app.models.image import DocumentImage
+from app.services.document_recommendation_service import DocumentRecommendationService
+from app.services.kb_stats_service import KnowledgeBaseStatsService
+from app.services.notification_bus import notify_document_progress
+
+STAGE_PARSE = "parse"
+STAGE_EMBED = "embed"
+STAGE_IMAGES = "images"
+STAGE_FINALIZE = "finalize"
+
+# Celery redis 传输对优先级队列使用的键分隔符（queue + sep + priority）
+_PRIORITY_SEP = "\x06\x16"
+
+
+def get_queue_depth(queue: str) -> int:
+    """broker（Redis）中某个队列的待处理消息数（含各优先级子队列）"""
+    try:
+        from app.config.redis import redis_client
+
+        keys = [queue] + [f"{queue}{_PRIORITY_SEP}{p}" for p in range(1, 10)]
+        pipe = redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.llen(key)
+        return int(sum(pipe.execute()))
+    except Exception as e:
+        logger.debug(f"[Pipeline] 获取队列长度失败 queue={queue}: {e}")
+        return 0
+
+
+def downstream_backlog() -> Dict[str, int]:
+    """返回超过背压阈值的下游队列及其积压数量（为空表示可以继续接收新文档）"""
+    limit = settings.DOCUMENT_PIPELINE_MAX_QUEUE_DEPTH
+    if limit <= 0:
+        return {}
+    saturated = {}
+    for queue in ("vector", "image", "index"):
+        depth = get_queue_depth(queue)
+        if depth >= limit:
+            saturated[queue] = depth
+    return saturated
+
+
+def document_kind(document: Document) -> Dict[str, bool]:
+    """根据文件名与类型判断文档类别（与解析阶段的判断保持一致）"""
+    file_suffix = (document.original_filename or '').split('.')[-1].lower()
+    file_type = (document.file_type or '').lower()
+    return {
+        "is_docx": file_suffix == 'docx' or file_type == 'docx',
+        "is_pdf": file_suffix == 'pdf' or file_type == 'pdf',
+        "is_md": file_suffix in ('md', 'markdown', 'mkd') or file_type in ('md', 'markdown'),
+        "is_pptx": file_suffix == 'pptx' or file_type == 'pptx',
+        "is_html": file_suffix in ('html', 'htm') or file_type in ('html', 'htm'),
+    }
+
+
+class DocumentPipelineService:
+    """文档分阶段处理服务（阶段状态、阶段实现与调度）"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ---------------- 阶段状态 ----------------
+
+    @staticmethod
+    def _meta_dict(document: Document) -> Dict[str, Any]:
+        meta = document.meta or {}
+        if isinstance(meta, str):
+            try:
+                meta = json.loads(meta)
+            except Exception:
+                meta = {}
+        return meta.copy() if isinstance(meta, dict) else {}
+
+    def get_state(self, document: Document) -> Dict[str, Any]:
+        state = self._meta_dict(document).get("pipeline") or {}
+        return state if isinstance(state, dict) else {}
+
+    def update_state(self, document: Document, completed_stage: Optional[str] = None, **changes: Any) -> Dict[str, Any]:
+        """
+        合并更新阶段状态并提交（JSON 列需整体赋值才能被 SQLAlchemy 感知）
+        文本与图片阶段并行结束时会同时更新，先行锁定文档行并重新加载，避免互相覆盖；
+        completed_stage 在锁内并入重新加载后的 completed 列表
+        """
+        self.db.query(Document).filter(Document.id == document.id).with_for_update().populate_existing().first()
+        meta = self._meta_dict(document)
+        state = dict(meta.get("pipeline") or {})
+        state.update(changes)
+        if completed_stage:
+            completed = list(state.get("completed") or [])
+            if completed_stage not in completed:
+                completed.append(completed_stage)
+            state["completed"] = completed
+        state["updated_at"] = datetime.datetime.utcnow().isoformat()
+        # 经 JSON 往返，保证写入 JSON 列的内容可序列化（解析器的图片元数据可能含非基础类型）
+        meta["pipeline"] = json.loads(json.dumps(state, ensure_ascii=False, default=str))
+        document.meta = meta
+        self.db.commit()
+        return meta["pipeline"]
+
+    def reset_state(self, document: Document) -> Dict[str, Any]:
+        meta = self._meta_dict(document)
+        meta["pipeline"] = {
+            "file_hash": document.file_hash,
+            "completed": [],
+            "started_at": datetime.datetime.utcnow().isoformat(),
+        }
+        document.meta = meta
+        self.db.commit()
+        return meta["pipeline"]
+
+    def mark_stage_done(self, document: Document, stage: str, **extra: Any) -> Dict[str, Any]:
+        return self.update_state(document, completed_stage=stage, failed_stage=None, **extra)
+
+    def is_stage_done(self, document: Document, stage: str) -> bool:
+        return stage in (self.get_state(document).get("completed") or [])
+
+    def resumable_state(self, document: Document, resume: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        失败后重新投递时可续跑的阶段状态：仅当上次失败、文件未变化且解析阶段已完成时返回，
+        其余情况（首次处理、重新处理、文件已替换）返回 None，从头开始
+        resume=True 表示投递方已确认上次失败（reprocess_document 投递前会把状态改为 reprocessing）
+        """
+        if not resume and document.status != DOC_STATUS_FAILED:
+            return None
+        state = self.get_state(document)
+        if not state or state.get("file_hash") != document.file_hash:
+            return None
+        if STAGE_PARSE not in (state.get("completed") or []):
+            return None
+        return state
+
+    def mark_failed(self, document: Document, stage: str, error: str) -> None:
+        try:
+            self.db.rollback()
+            document.status = DOC_STATUS_FAILED
+            document.error_message = error
+            self.db.commit()
+            self.update_state(document, failed_stage=stage)
+            notify_document_progress(document, "处理失败")
+        except Exception as e:
+            logger.error(f"[Pipeline] 更新文档失败状态出错 document_id={document.id}: {e}", exc_info=True)
+
+    def run_stage(self, document_id: int, stage: str, task_id: str) -> Dict[str, Any]:
+        """
+        执行单个下游阶段（供阶段任务调用）：已完成的阶段直接跳过（重复投递幂等），
+        失败时将文档标记为失败并记录失败阶段，返回结果供 chord 回调判断
+        """
+        document = self.db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            return {"status": "failed", "stage": stage, "document_id": document_id, "error": "文档不存在"}
+        if self.is_stage_done(document, stage):
+            logger.info(f"[任务ID: {task_id}] 文档 {document_id} 阶段 {stage} 已完成，跳过")
+            return {"status": "skipped", "stage": stage, "document_id": document_id}
+
+        started = time.time()
+        try:
+            if stage == STAGE_EMBED:
+                result = self.embed_and_index_chunks(document, task_id)
+            elif stage == STAGE_IMAGES:
+                result = self.vectorize_and_index_images(document, self.get_state(document).get("images") or [], task_id)
+            elif stage == STAGE_FINALIZE:
+                self.finalize_document(document, task_id)
+                result = {}
+            else:
+                raise ValueError(f"未知阶段: {stage}")
+            self.mark_stage_done(document, stage)
+        except Exception as e:
+            error_msg = str(e) or type(e).__name__
+            logger.error(f"[任务ID: {task_id}] 文档 {document_id} 阶段 {stage} 失败: {error_msg}", exc_info=True)
+            self.mark_failed(document, stage, error_msg)
+            return {"status": "failed", "stage": stage, "document_id": document_id, "error": error_msg}
+
+        elapsed = time.time() - started
+        if stage != STAGE_EMBED:
+            # 文本向量化阶段在 embed_and_index_chunks 内拆分为 embed / index 分别记录
+            observe_stage(KIND_INGESTION, stage, elapsed)
+        logger.info(f"[任务ID: {task_id}] 文档 {document_id} 阶段 {stage} 完成，耗时={elapsed:.2f}秒")
+        return {"status": "success", "stage": stage, "document_id": document_id, "elapsed": elapsed, **result}
+
+    # ---------------- 调度 ----------------
+
+    def dispatch_downstream(self, document_id: int) -> None:
+        """
+        派发解析之后尚未完成的阶段：文本向量化与图片向量化并行（chord），全部结束后执行收尾
+        DOCUMENT_PIPELINE_ENABLED=false 时在当前任务内依次执行
+        """
+        document = self.db.query(Document).filter(Document.id == document_id).first()
+        if not document:
+            return
+        state = self.get_state(document)
+        completed = set(state.get("completed") or [])
+
+        if not settings.DOCUMENT_PIPELINE_ENABLED:
+            for stage in (STAGE_EMBED, STAGE_IMAGES, STAGE_FINALIZE):
+                if self.run_stage(document_id, stage, task_id="inline")["status"] == "failed":
+                    break
+            return
+
+        from celery import chord
+        from app.tasks.image_tasks import vectorize_document_images_task
+        from app.tasks.index_tasks import finalize_document_task
+        from app.tasks.vector_tasks import embed_document_chunks_task
+
+        header = []
+        if STAGE_EMBED not in completed:
+            header.append(
+                embed_document_chunks_task.si(document_id).set(
+                    queue="vector", priority=settings.CELERY_TASK_PRIORITY_VECTOR
+                )
+            )
+        if STAGE_IMAGES not in completed:
+            header.append(
+                vectorize_document_images_task.si(document_id).set(
+                    queue="image", priority=settings.CELERY_TASK_PRIORITY_IMAGE
+                )
+            )
+        callback = finalize_document_task.s(document_id).set(
+            queue="index", priority=settings.CELERY_TASK_PRIORITY_INDEX
+        )
+        if header:
+            chord(header)(callback)
+        else:
+            callback.delay([])
+        pending = [stage for stage in (STAGE_EMBED, STAGE_IMAGES) if stage not in completed]
+        logger.info(f"[Pipeline] 文档 {document_id} 已派发后续阶段: {pending} -> {STAGE_FINALIZE}")
+
+    # ---------------- 阶段实现 ----------------
+
+    def _load_chunk_texts(self, document: Document, db_chunks: List[DocumentChunk], task_id: str) -> Dict[int, str]:
+        """chunk_index -> 正文：正文存库时直接读取，否则读取 MinIO 中的分块归档"""
+        if getattr(settings, 'STORE_CHUNK_TEXT_IN_DB', False):
+            return {chunk.chunk_index: chunk.content or "" for chunk in db_chunks}
+
+        from app.services.minio_storage_service import MinioStorageService
+
+        texts: Dict[int, str] = {}
+        try:
+            minio = MinioStorageService()
+            target = self.get_state(document).get("chunks_path")
+            if not target:
+                needle = f"/{document.id}/parsed/chunks/chunks.jsonl.gz"
+                for fobj in minio.list_files("documents/"):
+                    if fobj.get("object_name", "").endswith(needle):
+                        target = fobj["object_name"]
+                        break
+            if not target:
+                logger.warning(f"[任务ID: {task_id}] 未找到 MinIO 分块归档，文档ID={document.id}")
+                return texts
+            response = minio.client.get_object(minio.bucket_name, target)
+            try:
+                with gzip.GzipFile(fileobj=response, mode='rb') as gz:
+                    for position, line in enumerate(gz):
+                        try:
+                            item = json.loads(line)
+                        except Exception:
+                            continue
+                        texts[int(item.get("index", position))] = item.get("content", "") or ""
+            finally:
+                try:
+                    response.close(); response.release_conn()
+                except Exception:
+                    pass
+        except Exception as e:
+            logger.warning(f"[任务ID: {task_id}] 从 MinIO 读取分块失败: {e}")
+        return texts
+
+    def embed_and_index_chunks(
+        self,
+        document: Document,
+        task_id: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> Dict[str, Any]:
+        """文本分块向量化并批量写入 OpenSearch"""
+        from app.services.opensearch_service import OpenSearchService
+        from app.services.vector_service import VectorService
+
+        db = self.db
+        document_id = document.id
+        db_chunks = db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).order_by(DocumentChunk.chunk_index).all()
+        logger.info(f"[任务ID: {task_id}] 开始向量化: 共 {len(db_chunks)} 个分块需要处理")
+        if not db_chunks:
+            logger.warning(f"[任务ID: {task_id}] 无分块可向量化，跳过向量化与索引阶段")
+            return {"indexed": 0, "chunks": 0}
+
+        vectorize_start = time.time()
+        vector_service = VectorService(db)
+        opensearch_service = OpenSearchService()
+        chunk_texts = self._load_chunk_texts(document, db_chunks, task_id)
+        success_count = 0
+        error_count = 0
+
+        docs_to_index = []
+        for i, chunk in enumerate(db_chunks):
+            chunk_start = time.time()
+            
+            try:
+                # ✅ 跳过图片分块：图片分块不进行文本向量化，图片向量化已在图片处理阶段完成
+                if chunk.chunk_type == 'image':
+                    logger.debug("[任务ID: %s] 分块 %s 是图片类型，跳过文本向量化（图片向量化已在图片处理阶段完成）", task_id, chunk.id)
+                    continue
+                
+                # 按 chunk_index 获取对应文本（图片分块在归档中也占位，不能按顺序消费）
+                chunk_text = chunk_texts.get(chunk.chunk_index, "")
+                
+                # ✅ 优化：对于表格块，从 meta 中提取完整的表格数据并生成完整文本
+                chunk_meta_dict = {}  # 确保在所有情况下都有定义
+                if chunk.chunk_type == 'table' and chunk.meta:
+                    try:
+                        chunk_meta_dict = json.loads(chunk.meta) if isinstance(chunk.meta, str) else chunk.meta
+                        table_data = chunk_meta_dict.get('table_data', {})
+                        
+                        # 优先使用结构化单元格数据生成完整文本
+                        if table_data.get('cells'):
+                            cells = table_data['cells']
+                            text_lines = []
+                            for row in cells:
+                                if isinstance(row, (list, tuple)):
+                                    # 使用制表符分隔，保持列对齐
+                                    row_text = '\t'.join(str(cell) if cell is not None else '' for cell in row)
+                                    text_lines.append(row_text)
+                                else:
+                                    text_lines.append(str(row))
+                            chunk_text = '\n'.join(text_lines)
+                            logger.debug(f"[任务ID: {task_id}] 表格块 {chunk.id}: 从结构化数据生成完整文本 ({len(text_lines)} 行)")
+                        # 如果没有 cells，尝试使用 HTML（至少包含结构化信息）
+                        elif table_data.get('html'):
+                            # ✅ 修复：正确解析 HTML 表格结构，保持行列关系
+                            try:
+                                import re
+                                html_text = table_data['html']
+                                
+                                # 方法1：使用 BeautifulSoup（如果可用）
+                                try:
+                                    from bs4 import BeautifulSoup
+                                    soup = BeautifulSoup(html_text, 'html.parser')
+                                    table = soup.find('table')
+                                    if table:
+                                        text_lines = []
+                                        for tr in table.find_all('tr'):
+                                            row_cells = []
+                                            for td in tr.find_all(['td', 'th']):
+                                                cell_text = td.get_text(strip=True)
+                                                row_cells.append(cell_text)
+                                            if row_cells:
+                                                # 使用制表符分隔同一行的单元格
+                                                text_lines.append('\t'.join(row_cells))
+                                        
+                                        if text_lines:
+                                            # 使用换行符分隔不同行
+                                            chunk_text = '\n'.join(text_lines)
+                                            logger.debug(f"[任务ID: {task_id}] 表格块 {chunk.id}: 从 HTML (BeautifulSoup) 提取文本 ({len(text_lines)} 行)")
+                                except ImportError:
+                                    # 方法2：使用正则表达式解析（兜底方案）
+                                    tr_pattern = r'<tr[^>]*>(.*?)</tr>'
+                                    td_pattern = r'<t[dh][^>]*>(.*?)</t[dh]>'
+                                    
+                                    trs = re.findall(tr_pattern, html_text, re.DOTALL | re.IGNORECASE)
+                                    if trs:
+                                        text_lines = []
+                                        for tr_content in trs:
+                                            tds = re.findall(td_pattern, tr_content, re.DOTALL | re.IGNORECASE)
+                                            if tds:
+                                                row_cells = []
+                                                for td in tds:
+                                                    # 移除内嵌的 HTML 标签
+                                                    cell_text = re.sub(r'<[^>]+>', '', td)
+                                                    # 处理 HTML 实体
+                                                    cell_text = cell_text.replace('&nbsp;', ' ').replace('&amp;', '&')
+                                                    cell_text = ' '.join(cell_text.split()).strip()
+                                                    row_cells.append(cell_text)
+                                                
+                                                if row_cells:
+                                                    text_lines.append('\t'.join(row_cells))
+                                        
+                                        if text_lines:
+                                            chunk_text = '\n'.join(text_lines)
+                                            logger.debug(f"[任务ID: {task_id}] 表格块 {chunk.id}: 从 HTML (正则) 提取文本 ({len(text_lines)} 行)")
+                            except Exception as e:
+                                logger.warning(f"[任务ID: {task_id}] 表格块 {chunk.id}: 从 HTML 提取文本失败: {e}")
+                                chunk_text = None  # 继续使用原始的 table_text
+                        # 如果都没有，使用原始的 table_text（已在上面获取）
+                        if chunk_text:
+                            logger.debug(f"[任务ID: {task_id}] 表格块 {chunk.id} 最终文本长度: {len(chunk_text)}")
+                    except Exception as e:
+                        logger.warning(f"[任务ID: {task_id}] 表格块 {chunk.id} 提取完整内容失败: {e}，使用原始文本")
+                        # 解析失败时确保 chunk_meta_dict 至少是空字典
+                        chunk_meta_dict = {}
+                
+                # 跳过空内容分块
+                if not (chunk_text or "").strip():
+                    logger.warning(
+                        "[任务ID: %s] 分块 %s 内容为空，跳过向量化与索引", task_id, chunk.id,
+                        extra=sampled("vectorize.empty_chunk"),
+                    )
+                    continue
+                
+                # ✅ 优化：记录表格块的处理信息
+                if chunk.chunk_type == 'table':
+                    logger.info(
+                        "[任务ID: %s] 表格块 %s 向量化: 文本长度=%s, 包含单元格数据=%s",
+                        task_id, chunk.id, len(chunk_text), bool(chunk_meta_dict.get('table_data', {}).get('cells')),
+                        extra=sampled("vectorize.table_chunk"),
+                    )
+                
+                # 生成向量（Ollama不可用时将返回空列表，允许继续索引文本）
+                vector = vector_service.generate_embedding(chunk_text)
+                vectorize_time = time.time() - chunk_start
+                
+                # 构建索引文档（✅ 新增：包含完整的 metadata 信息）
+                # 从 chunk.meta 中提取完整的 metadata（包含 element_index、page_number、coordinates）
+                # ✅ 注意：对于表格块，chunk_meta_dict 已经在上面提取过，需要确保已定义
+                if chunk.chunk_type != 'table':
+                    # 非表格块，需要重新解析 meta
+                    chunk_meta_dict = {}
+                    if chunk.meta:
+                        try:
+                            chunk_meta_dict = json.loads(chunk.meta) if isinstance(chunk.meta, str) else chunk.meta
+                        except:
+                            pass
+                # 表格块的 chunk_meta_dict 已在上面提取，直接使用
+                
+                # 构建 metadata（包含所有关键信息）
+                chunk_metadata = {
+                    "chunk_index": i
+                }
+                # ✅ 添加 element_index 信息
+                if chunk_meta_dict.get('element_index_start') is not None:
+                    chunk_metadata['element_index_start'] = chunk_meta_dict.get('element_index_start')
+                if chunk_meta_dict.get('element_index_end') is not None:
+                    chunk_metadata['element_index_end'] = chunk_meta_dict.get('element_index_end')
+                # ✅ 添加 page_number
+                if chunk_meta_dict.get('page_number') is not None:
+                    chunk_metadata['page_number'] = chunk_meta_dict.get('page_number')
+                # ✅ 添加 coordinates
+                if chunk_meta_dict.get('coordinates'):
+                    chunk_metadata['coordinates'] = chunk_meta_dict.get('coordinates')
+                # 表格组 / 章节路径（写入索引 meta.* 结构化字段）
+                for key in ('table_group_uid', 'table_id', 'heading_path', 'section_hint'):
+                    if chunk_meta_dict.get(key):
+                        chunk_metadata[key] = chunk_meta_dict.get(key)
+                
+                chunk_doc = {
+                    "document_id": document_id,
+                    "chunk_id": chunk.id,
+                    "knowledge_base_id": document.knowledge_base_id,
+                    "category_id": document.category_id if hasattr(document, 'category_id') else None,
+                    "content": chunk_text,
+                    "chunk_type": chunk.chunk_type if hasattr(chunk, 'chunk_type') else "text",
+                    "metadata": chunk_metadata,  # ✅ 使用完整的 metadata
+                    "created_at": chunk.created_at.isoformat() if chunk.created_at else None
+                }
+                # 仅当有有效向量时写入
+                if isinstance(vector, list) and len(vector) > 0:
+                    chunk_doc["content_vector"] = vector
+                docs_to_index.append(chunk_doc)
+                
+                index_time = 0.0
+                
+                success_count += 1
+                
+                if (i + 1) % 10 == 0 or i == len(db_chunks) - 1:  # 每10个或最后一个记录日志
+                    logger.info(f"[任务ID: {task_id}] 向量化进度: {i+1}/{len(db_chunks)} "
+                               f"(分块ID={chunk.id}, 向量维度={len(vector)}, "
+                               f"向量化耗时={vectorize_time:.2f}秒, 索引耗时={index_time:.2f}秒)")
+                else:
+                    logger.debug(
+                        "[任务ID: %s] 分块 %s 处理完成: 向量维度=%s, 向量化=%.2f秒, 索引=%.2f秒",
+                        task_id, chunk.id, len(vector), vectorize_time, index_time,
+                    )
+                
+            except Exception as e:
+                error_count += 1
+                logger.error(f"[任务ID: {task_id}] 分块 {chunk.id} (索引 {i+1}/{len(db_chunks)}) 处理失败: {e}", exc_info=True)
+                continue
+            
+            # 更新任务进度
+            if progress_callback and ((i + 1) % 20 == 0 or i == len(db_chunks) - 1):
+                progress_callback(i + 1, len(db_chunks))
+
+            # 更新文档处理进度（向量化阶段占 70%~90%）
+            if (i + 1) % 20 == 0 or i == len(db_chunks) - 1:
+                try:
+                    document.processing_progress = 70.0 + 20.0 * (i + 1) / len(db_chunks)
+                    db.commit()
+                    notify_document_progress(document, f"向量化 {i + 1}/{len(db_chunks)}")
+                except Exception:
+                    db.rollback()
+
+        # 批量索引到 OpenSearch（默认不刷新，提升吞吐）
+        bulk_index_start = time.time()
+        observe_stage(KIND_INGESTION, "embed", bulk_index_start - vectorize_start)
+        try:
+            opensearch_service.bulk_index_document_chunks_sync(docs_to_index)
+            bulk_index_time = time.time() - bulk_index_start
+            observe_stage(KIND_INGESTION, "index", bulk_index_time)
+            logger.info(f"[任务ID: {task_id}] 批量索引完成，耗时={bulk_index_time:.2f}秒，总文档={len(docs_to_index)}")
+        except Exception as e:
+            # 分块未写入索引时阶段失败（run_stage 记录失败阶段），重新投递后从本阶段续跑
+            raise RuntimeError(f"批量索引失败（{len(docs_to_index)} 个分块）: {e}") from e
+
+        # 分块向量均值作为文档向量，计入分类 / 标签推荐质心（失败不影响向量化阶段）
+        try:
+            DocumentRecommendationService(db).record_document_vectors(
+                document, (doc["content_vector"] for doc in docs_to_index if doc.get("content_vector"))
+            )
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"[任务ID: {task_id}] 文档向量写入推荐质心失败: {e}")
+        
+        vectorize_total_time = time.time() - vectorize_start
+        avg_time = (vectorize_total_time / len(db_chunks)) if len(db_chunks) else 0.0
+        logger.info(f"[任务ID: {task_id}] 向量化完成: 成功={success_count}, 失败={error_count}, 总耗时={vectorize_total_time:.2f}秒, 平均耗时={avg_time:.2f}秒/分块")
+
+        return {"indexed": len(docs_to_index), "chunks": len(db_chunks), "errors": error_count}
+
+    def vectorize_and_index_images(self, document: Document, image_entries: List[Dict[str, Any]], task_id: str) -> Dict[str, Any]:
+        """
+        图片向量化（CLIP）并写入图片索引
+        image_entries 由解析阶段记录：image_id 及该图片在本文档中的位置信息（element_index/page_number 等）
+        """
+        if not image_entries:
+            return {"indexed": 0, "images": 0}
+
+        from app.services.minio_storage_service import MinioStorageService
+        from app.services.opensearch_service import OpenSearchService
+        from app.services.vector_service import VectorService
+
+        db = self.db
+        vector_service = VectorService(db)
+        os_service = OpenSearchService()
+        minio = None
+
+        # 一次 IN 查询读取图片行
+        image_ids = [entry.get("image_id") for entry in image_entries if entry.get("image_id") is not None]
+        rows = {
+            row.id: row
+            for row in db.query(DocumentImage).filter(DocumentImage.id.in_(image_ids)).all()
+        } if image_ids else {}
+
+        # 相同内容（SHA256）的图片可能已被其他文档向量化，一次 mget 读取可复用的已有向量
+        try:
+            existing_vectors = os_service.get_image_vectors_sync(
+                list(rows), index=os_service.image_index_for(document.knowledge_base_id)
+            )
+        except Exception as e:
+            logger.warning(f"[任务ID: {task_id}] 批量读取已有图片向量失败，将全部重新生成: {e}")
+            existing_vectors = {}
+        dim = settings.IMAGE_EMBEDDING_DIMENSION
+        vectors: Dict[int, List[float]] = {
+            image_id: vector for image_id, vector in existing_vectors.items() if len(vector) == dim
+        }
+        if vectors:
+            logger.info(f"[任务ID: {task_id}] 复用已有图片向量 {len(vectors)}/{len(rows)}")
+
+        now = datetime.datetime.utcnow()
+        to_index: List[Dict[str, Any]] = []
+        for entry in image_entries:
+            image_row = rows.get(entry.get("image_id"))
+            if not image_row:
+                logger.warning(f"[任务ID: {task_id}] 图片 {entry.get('image_id')} 不存在，跳过向量化")
+                continue
+
+            image_vector = vectors.get(image_row.id)
+            if image_vector is None:
+                try:
+                    minio = minio or MinioStorageService()
+                    data = minio.download_file(image_row.image_path)
+                    image_vector = vector_service.generate_image_embedding_prefer_memory(data)
+                    logger.info(f"[任务ID: {task_id}] 图片 {image_row.id} 向量生成完成，维度: {len(image_vector)}")
+                except Exception as vec_exc:
+                    logger.warning(f"[任务ID: {task_id}] 图片 {image_row.id} 向量生成失败: {vec_exc}")
+                    image_vector = []
+                # 同一批内重复的图片只生成一次
+                vectors[image_row.id] = image_vector
+
+            # 记录向量化结果到 MySQL（统一提交），供前端状态展示
+            if image_vector:
+                image_row.vector_model = settings.CLIP_MODEL_NAME
+                image_row.vector_dim = len(image_vector)
+            image_row.last_processed_at = now
+            if image_row.status not in ("completed", "failed"):
+                image_row.status = "completed"
+
+            element_index = entry.get("element_index")
+            image_metadata = dict(entry.get("metadata") or {})
+            if element_index is not None:
+                image_metadata['element_index'] = element_index
+            if entry.get("doc_order") is not None:
+                image_metadata['doc_order'] = entry.get("doc_order")
+            image_metadata['image_path'] = image_row.image_path
+            image_metadata['image_id'] = image_row.id
+            to_index.append({
+                "image_id": image_row.id,
+                "document_id": document.id,
+                "knowledge_base_id": document.knowledge_base_id,
+                "category_id": getattr(document, 'category_id', None),
+                "image_path": image_row.image_path,
+                "page_number": entry.get("page_number"),
+                "coordinates": entry.get("coordinates"),
+                "width": image_row.width,
+                "height": image_row.height,
+                "image_type": image_row.image_type,
+                "ocr_text": image_row.ocr_text or "",
+                "description": entry.get("description", ''),
+                "feature_tags": entry.get("feature_tags", []),
+                "image_vector": image_vector,
+                "created_at": image_row.created_at.isoformat() if getattr(image_row, 'created_at', None) else None,
+                "updated_at": image_row.updated_at.isoformat() if getattr(image_row, 'updated_at', None) else None,
+                "metadata": image_metadata,
+                "processing_status": getattr(image_row, 'status', 'completed'),
+                "model_version": "1.0",
+            })
+
+        try:
+            db.commit()
+        except Exception as db_exc:
+            logger.warning(f"[任务ID: {task_id}] 回写图片向量信息失败: {db_exc}")
+            db.rollback()
+
+        # 同一图片在文档中出现多次时索引文档 ID 相同，保留最后一次出现的位置信息（与逐条写入一致）
+        to_index = list({item["image_id"]: item for item in to_index}.values())
+        try:
+            indexed = len(os_service.bulk_index_images_sync(to_index))
+        except Exception as idx_exc:
+            logger.warning(f"[任务ID: {task_id}] 图片批量索引失败: {idx_exc}")
+            indexed = 0
+
+        logger.info(f"[任务ID: {task_id}] 图片向量化与索引完成: {indexed}/{len(image_entries)}")
+        return {"indexed": indexed, "images": len(image_entries)}
+
+    def finalize_document(self, document: Document, task_id: str) -> None:
+        """收尾阶段：自动标签/摘要、目录提取、标记完成并创建初始版本"""
+        db = self.db
+        document_id = document.id
+        kind = document_kind(document)
+        is_pdf, is_docx, is_md = kind["is_pdf"], kind["is_docx"], kind["is_md"]
+        is_html, is_pptx = kind["is_html"], kind["is_pptx"]
+        has_chunks = db.query(DocumentChunk.id).filter(DocumentChunk.document_id == document_id).first() is not None
+
+        if has_chunks:
+            # 自动标签/摘要生成（向量化后、索引前，失败不阻塞）
+            # 检查全局开关和知识库级别配置
+            global_enabled = getattr(settings, 'ENABLE_AUTO_TAGGING', False)
+            kb_enabled = getattr(document.knowledge_base, 'enable_auto_tagging', True) if document.knowledge_base else True
+        
+            if global_enabled and kb_enabled:
+                try:
+                    logger.info(f"[任务ID: {task_id}] 开始生成自动标签/摘要（知识库ID={document.knowledge_base_id}, 知识库配置={kb_enabled}）")
+                    from app.services.auto_tagging_service import AutoTaggingService
+                    import asyncio
+                    tagging_service = AutoTaggingService(db)
+                    result = asyncio.run(tagging_service.generate_tags_and_summary(document_id))
+                    if result:
+                        logger.info(f"[任务ID: {task_id}] 自动标签/摘要生成成功: keywords={result.get('keywords', [])}, summary={result.get('summary', '')[:50]}...")
+                    else:
+                        logger.warning(f"[任务ID: {task_id}] 自动标签/摘要生成失败（不影响主流程）")
+                except Exception as e:
+                    logger.warning(f"[任务ID: {task_id}] 自动标签/摘要生成异常（不影响主流程）: {e}", exc_info=True)
+            else:
+                logger.debug(f"[任务ID: {task_id}] 自动标签/摘要未启用（全局={global_enabled}, 知识库={kb_enabled}）")
+
+        document.status = DOC_STATUS_INDEXING
+        document.processing_progress = 90.0
+        db.commit()
+        notify_document_progress(document, "索引中")
+
+        # 提取文档目录（同步执行，不影响主流程）
+        # 注意：TXT 文件不提取目录（纯文本文件通常没有结构化目录）
+        try:
+            from app.services.document_toc_service import DocumentTOCService
+            import asyncio
+            toc_service = DocumentTOCService(db)
+            if is_pdf and document.file_path:
+                toc_items = asyncio.run(toc_service.extract_toc_from_pdf(document_id, document.file_path))
+                if toc_items:
+                    logger.info(f"[任务ID: {task_id}] PDF目录提取成功，共 {len(toc_items)} 个目录项")
+            elif is_docx and document.file_path:
+                toc_items = asyncio.run(toc_service.extract_toc_from_docx(document_id, document.file_path))
+                if toc_items:
+                    logger.info(f"[任务ID: {task_id}] Word目录提取成功，共 {len(toc_items)} 个目录项")
+            elif is_md:
+                # MD 文件从 metadata 中的 heading_structure 提取目录
+                doc_meta = document.meta or {}
+                if isinstance(doc_meta, str):
+                    import json as _json
+                    try:
+                        doc_meta = _json.loads(doc_meta)
+                    except Exception:
+                        doc_meta = {}
+                heading_structure = doc_meta.get('heading_structure', [])
+                if heading_structure:
+                    toc_items = asyncio.run(toc_service.extract_toc_from_markdown(document_id, heading_structure))
+                    if toc_items:
+                        logger.info(f"[任务ID: {task_id}] Markdown目录提取成功，共 {len(toc_items)} 个目录项")
+                else:
+                    logger.debug(f"[任务ID: {task_id}] Markdown文件无标题结构，跳过目录提取")
+            elif is_html:
+                doc_meta = document.meta or {}
+                if isinstance(doc_meta, str):
+                    import json as _json
+                    try:
+                        doc_meta = _json.loads(doc_meta)
+                    except Exception:
+                        doc_meta = {}
+                heading_structure = doc_meta.get('heading_structure', [])
+                if heading_structure:
+                    toc_items = asyncio.run(toc_service.extract_toc_from_html(document_id, heading_structure))
+                    if toc_items:
+                        logger.info(f"[任务ID: {task_id}] HTML目录提取成功，共 {len(toc_items)} 个目录项")
+                else:
+                    logger.debug(f"[任务ID: {task_id}] HTML文件无标题结构，跳过目录提取")
+            elif is_pptx:
+                # PPTX 文件从 metadata 中的 slides 列表提取目录
+                doc_meta = document.meta or {}
+                if isinstance(doc_meta, str):
+                    import json as _json
+                    try:
+                        doc_meta = _json.loads(doc_meta)
+                    except Exception:
+                        doc_meta = {}
+                slides = doc_meta.get('slides', [])
+                if slides:
+                    toc_items = asyncio.run(toc_service.extract_toc_from_pptx(document_id, slides))
+                    if toc_items:
+                        logger.info(f"[任务ID: {task_id}] PPTX目录提取成功，共 {len(toc_items)} 个目录项")
+                else:
+                    logger.debug(f"[任务ID: {task_id}] PPTX文件无幻灯片信息，跳过目录提取")
+            # TXT 文件跳过目录提取（纯文本文件通常没有结构化目录）
+        except Exception as e:
+            logger.warning(f"[任务ID: {task_id}] 提取文档目录失败（不影响主流程）: {e}")
+
+        document.status = DOC_STATUS_COMPLETED
+        document.processing_progress = 100.0
+        document.error_message = None
+        db.commit()
+        notify_document_progress(document, "处理完成")
+
+        try:
+            KnowledgeBaseStatsService(db).sync_document(document, ingested=True)
+        except Exception as stats_err:
+            db.rollback()
+            logger.warning(f"[任务ID: {task_id}] 知识库统计更新失败: {stats_err}")
+        # 自动标签可能已修改标签：同步推荐质心
+        try:
+            DocumentRecommendationService(db).sync_document(document)
+        except Exception as rec_err:
+            db.rollback()
+            logger.warning(f"[任务ID: {task_id}] 推荐质心同步失败: {rec_err}")
+
+        # 若不存在任何文档版本，则创建初始版本 v1（以原始文件为基准）
+        try:
+            from app.models.version import DocumentVersion
+            existing_count = db.query(DocumentVersion).filter(
+                DocumentVersion.document_id == document_id,
+                DocumentVersion.is_deleted == False
+            ).count()
+            if existing_count == 0:
+                initial_version = DocumentVersion(
+                    document_id=document_id,
+                    version_number=1,
+                    version_type="auto",
+                    description="初始版本",
+                    file_path=document.file_path or "",
+                    file_size=document.file_size,
+                    file_hash=document.file_hash,
+                )
+                db.add(initial_version)
+                db.commit()
+                logger.info(f"[任务ID: {task_id}] 已创建文档初始版本 v1 (document_id={document_id})")
+        except Exception as ver_err:
+            logger.warning(f"[任务ID: {task_id}] 创建初始版本失败（不影响主流程）: {ver_err}")
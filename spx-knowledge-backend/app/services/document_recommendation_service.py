@@ -0,0 +1,449 @@
+"""
+Document Recommendation Service
+分类 / 标签推荐：基于文档向量质心与标签 TF-IDF，不额外调用 LLM
+
+- 文档向量：向量化阶段已生成的分块向量求均值并 L2 归一化，写入 document_embeddings
+- 质心：每个知识库内的每个分类 / 标签保存向量和与文档数（recommendation_centroids），文档的知识库、分类或标签
+  变化时按 document_embeddings 中记录的已计入知识库 / 分类 / 标签求差，增量加减向量
+- 分类推荐：文档向量与所在知识库各分类质心的余弦相似度（文档自身已计入时先从质心中扣除）
+- 标签推荐：所在知识库标签质心相似度与标签在正文中的 TF-IDF 得分加权（IDF 来自该知识库现有文档标签）
+- 质心与词表只取文档所在知识库，不会把其他知识库的标签或内容特征暴露给只能查看本知识库的用户
+"""
+
+import math
+import re
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.core.logging import logger
+from app.models.document import Document
+from app.models.knowledge_base_category import KnowledgeBaseCategory
+from app.models.recommendation import DocumentEmbedding, RecommendationCentroid
+
+KIND_CATEGORY = "category"
+KIND_TAG = "tag"
+_VOCAB_CACHE_KEY = "rec:tag_vocab"
+
+# (知识库ID, 分类ID, 标签列表)：文档计入质心的标签集合
+Labels = Tuple[Optional[int], Optional[int], List[str]]
+_NO_LABELS: Labels = (None, None, [])
+
+
+# ---------------- 向量与打分（纯函数，评估脚本复用） ----------------
+
+def encode_vector(vector: np.ndarray) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def decode_vector(raw: bytes, dim: int) -> np.ndarray:
+    return np.frombuffer(raw, dtype=np.float32, count=dim).copy()
+
+
+def mean_embedding(vectors: Iterable[Sequence[float]]) -> Optional[np.ndarray]:
+    """分块向量均值并 L2 归一化；维度不一致时取多数维度"""
+    groups: Dict[int, List[Sequence[float]]] = {}
+    for vector in vectors:
+        if vector is not None and len(vector) > 0:
+            groups.setdefault(len(vector), []).append(vector)
+    if not groups:
+        return None
+    matrix = np.asarray(max(groups.values(), key=len), dtype=np.float32)
+    mean = matrix.mean(axis=0)
+    norm = float(np.linalg.norm(mean))
+    return mean / norm if norm > 0 else None
+
+
+def normalize_tags(tags: Any) -> List[str]:
+    if not isinstance(tags, list):
+        return []
+    return sorted({str(tag).strip() for tag in tags if str(tag).strip()})
+
+
+def rank_centroids(
+    vector: np.ndarray,
+    centroids: Dict[str, Tuple[np.ndarray, int]],
+    exclude: Iterable[str] = (),
+) -> List[Tuple[str, float, int]]:
+    """按余弦相似度排序质心，返回 [(key, score, doc_count)]；exclude 中的质心先扣除该文档向量（留一法）"""
+    excluded = set(exclude)
+    ranked: List[Tuple[str, float, int]] = []
+    for key, (vector_sum, count) in centroids.items():
+        if vector_sum.shape != vector.shape:
+            continue
+        if key in excluded:
+            vector_sum = vector_sum - vector
+            count -= 1
+        norm = float(np.linalg.norm(vector_sum))
+        if count <= 0 or norm <= 0:
+            continue
+        ranked.append((key, float(vector @ vector_sum) / norm, count))
+    ranked.sort(key=lambda item: item[1], reverse=True)
+    return ranked
+
+
+def tag_idf(df: Dict[str, int], n_docs: int) -> Dict[str, float]:
+    """平滑 IDF：log((1 + N) / (1 + df)) + 1"""
+    return {tag: math.log((1 + n_docs) / (1 + count)) + 1.0 for tag, count in df.items()}
+
+
+def lexical_tag_scores(text: str, idf: Dict[str, float]) -> Dict[str, float]:
+    """标签在正文中的 TF-IDF 得分（次线性 TF），按最大值归一化到 [0, 1]"""
+    if not text:
+        return {}
+    lowered = text.lower()
+    scores: Dict[str, float] = {}
+    for tag, weight in idf.items():
+        needle = tag.lower()
+        if needle.isascii():
+            tf = len(re.findall(rf"(?<![a-z0-9]){re.escape(needle)}(?![a-z0-9])", lowered))
+        else:
+            tf = lowered.count(needle)
+        if tf:
+            scores[tag] = (1.0 + math.log(tf)) * weight
+    top = max(scores.values(), default=0.0)
+    return {tag: score / top for tag, score in scores.items()} if top > 0 else {}
+
+
+def combine_tag_scores(
+    semantic: Dict[str, float],
+    lexical: Dict[str, float],
+    semantic_weight: float,
+) -> List[Tuple[str, float, float, float]]:
+    """加权合并，返回 [(tag, score, semantic, lexical)]，按得分降序"""
+    combined = []
+    for tag in set(semantic) | set(lexical):
+        sem = max(0.0, semantic.get(tag, 0.0))
+        lex = lexical.get(tag, 0.0)
+        combined.append((tag, semantic_weight * sem + (1 - semantic_weight) * lex, sem, lex))
+    combined.sort(key=lambda item: item[1], reverse=True)
+    return combined
+
+
+def evaluate_holdout(
+    train: List[Tuple[np.ndarray, Optional[str], List[str]]],
+    test: List[Tuple[np.ndarray, Optional[str], List[str]]],
+    top_k: int = 3,
+    max_tags: int = 5,
+) -> Dict[str, Any]:
+    """在留出集上评估：分类 top-1 / top-k 准确率，标签（仅质心）precision@max_tags 与 recall@max_tags"""
+    categories: Dict[str, Tuple[np.ndarray, int]] = {}
+    tags: Dict[str, Tuple[np.ndarray, int]] = {}
+    for vector, category, doc_tags in train:
+        targets = ([(categories, category)] if category else []) + [(tags, tag) for tag in doc_tags]
+        for table, key in targets:
+            vector_sum, count = table.get(key, (np.zeros_like(vector), 0))
+            table[key] = (vector_sum + vector, count + 1)
+
+    top1 = topk = category_total = 0
+    tag_hits = tag_suggested = tag_expected = 0
+    for vector, category, doc_tags in test:
+        if category:
+            category_total += 1
+            ranked = [key for key, _, _ in rank_centroids(vector, categories)[:top_k]]
+            top1 += int(bool(ranked) and ranked[0] == category)
+            topk += int(category in ranked)
+        if doc_tags:
+            suggested = [key for key, _, _ in rank_centroids(vector, tags)[:max_tags]]
+            tag_hits += len(set(suggested) & set(doc_tags))
+            tag_suggested += len(suggested)
+            tag_expected += len(doc_tags)
+    return {
+        "train": len(train),
+        "test": len(test),
+        "category_top1": top1 / category_total if category_total else None,
+        f"category_top{top_k}": topk / category_total if category_total else None,
+        f"tag_precision@{max_tags}": tag_hits / tag_suggested if tag_suggested else None,
+        f"tag_recall@{max_tags}": tag_hits / tag_expected if tag_expected else None,
+    }
+
+
+# ---------------- 服务 ----------------
+
+class DocumentRecommendationService:
+    """分类 / 标签推荐服务"""
+
+    def __init__(self, db: Session, cache=None):
+        self.db = db
+        self._cache = cache
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            from app.core.cache import cache_manager
+
+            self._cache = cache_manager.sync
+        return self._cache
+
+    # ---------------- 质心维护 ----------------
+
+    def _centroid_query(self, kb_id: int, kind: str, key: str):
+        return self.db.query(RecommendationCentroid).filter(
+            RecommendationCentroid.knowledge_base_id == kb_id,
+            RecommendationCentroid.kind == kind,
+            RecommendationCentroid.key == key,
+        )
+
+    def _adjust(self, kb_id: int, kind: str, key: str, vector: np.ndarray, sign: int) -> None:
+        """对单个质心加 / 减一个文档向量（锁定质心行，文档数归零时删除）"""
+        row = self._centroid_query(kb_id, kind, key).with_for_update().first()
+        if row is None:
+            if sign < 0:
+                return
+            try:
+                with self.db.begin_nested():
+                    self.db.add(RecommendationCentroid(
+                        knowledge_base_id=kb_id, kind=kind, key=key,
+                        dim=len(vector), vector_sum=encode_vector(vector), doc_count=1,
+                    ))
+                return
+            except IntegrityError:
+                # 并发写入方已创建质心，改为累加
+                row = self._centroid_query(kb_id, kind, key).with_for_update().one()
+        if row.dim != len(vector):
+            # 向量模型更换后维度变化：旧质心需重建（scripts/backfill_document_embeddings.py --reset）
+            logger.warning(
+                f"[推荐] 质心维度不一致，跳过 kb={kb_id} kind={kind} key={key}: {row.dim} != {len(vector)}"
+            )
+            return
+        row.doc_count = (row.doc_count or 0) + sign
+        if row.doc_count <= 0:
+            self.db.delete(row)
+            return
+        row.vector_sum = encode_vector(decode_vector(row.vector_sum, row.dim) + sign * vector)
+
+    def _move(
+        self,
+        vector: Optional[np.ndarray],
+        old: Labels,
+        new_vector: Optional[np.ndarray],
+        new: Labels,
+    ) -> None:
+        """old / new 为 (知识库ID, 分类ID, 标签列表)；向量与知识库都不变时只移动有变化的分类 / 标签"""
+        old_kb, old_category, old_tags = old
+        new_kb, new_category, new_tags = new
+        same = (
+            vector is not None and new_vector is not None and old_kb == new_kb and np.array_equal(vector, new_vector)
+        )
+        if vector is not None and old_kb is not None:
+            if old_category is not None and not (same and old_category == new_category):
+                self._adjust(old_kb, KIND_CATEGORY, str(old_category), vector, -1)
+            for tag in old_tags:
+                if not (same and tag in new_tags):
+                    self._adjust(old_kb, KIND_TAG, tag, vector, -1)
+        if new_vector is not None and new_kb is not None:
+            if new_category is not None and not (same and old_category == new_category):
+                self._adjust(new_kb, KIND_CATEGORY, str(new_category), new_vector, 1)
+            for tag in new_tags:
+                if not (same and tag in old_tags):
+                    self._adjust(new_kb, KIND_TAG, tag, new_vector, 1)
+
+    @staticmethod
+    def _current_labels(document: Document) -> Labels:
+        if document.is_deleted:
+            return None, None, []
+        return document.knowledge_base_id, document.category_id, normalize_tags(document.tags)
+
+    @staticmethod
+    def _counted_labels(row: DocumentEmbedding) -> Labels:
+        return row.counted_knowledge_base_id, row.counted_category_id, normalize_tags(row.counted_tags)
+
+    @staticmethod
+    def _set_counted(row: DocumentEmbedding, labels: Labels) -> None:
+        row.counted_knowledge_base_id, row.counted_category_id, row.counted_tags = labels
+
+    def record_document_vectors(self, document: Document, vectors: Iterable[Sequence[float]]) -> bool:
+        """向量化阶段调用：以分块向量均值更新文档向量，并把文档计入当前分类 / 标签质心"""
+        vector = mean_embedding(vectors)
+        if vector is None:
+            return False
+        labels = self._current_labels(document)
+        row = (
+            self.db.query(DocumentEmbedding)
+            .filter(DocumentEmbedding.document_id == document.id)
+            .with_for_update()
+            .first()
+        )
+        if row is None:
+            row = DocumentEmbedding(document_id=document.id)
+            self.db.add(row)
+            self._move(None, _NO_LABELS, vector, labels)
+        else:
+            old_vector = decode_vector(row.vector, row.dim) if row.vector else None
+            self._move(old_vector, self._counted_labels(row), vector, labels)
+        row.dim = len(vector)
+        row.vector = encode_vector(vector)
+        self._set_counted(row, labels)
+        self.db.commit()
+        return True
+
+    def sync_document(self, document: Document) -> None:
+        """知识库、分类或标签变化后调用：按已计入与当前标签集合的差值移动质心（无文档向量时跳过）"""
+        row = (
+            self.db.query(DocumentEmbedding)
+            .filter(DocumentEmbedding.document_id == document.id)
+            .with_for_update()
+            .first()
+        )
+        if row is None:
+            return
+        labels = self._current_labels(document)
+        counted = self._counted_labels(row)
+        if labels == counted:
+            self.db.commit()
+            return
+        vector = decode_vector(row.vector, row.dim)
+        self._move(vector, counted, vector, labels)
+        self._set_counted(row, labels)
+        self.db.commit()
+
+    def remove_document(self, document_id: int) -> None:
+        """文档删除前调用：从质心中扣除并删除文档向量（不提交，与删除操作同一事务）"""
+        row = self.db.query(DocumentEmbedding).filter(DocumentEmbedding.document_id == document_id).first()
+        if row is None:
+            return
+        vector = decode_vector(row.vector, row.dim)
+        self._move(vector, self._counted_labels(row), None, _NO_LABELS)
+        self.db.delete(row)
+
+    # ---------------- 推荐 ----------------
+
+    def _load_centroids(
+        self, kb_id: int, kind: str, keys: Optional[List[str]] = None
+    ) -> Dict[str, Tuple[np.ndarray, int]]:
+        query = self.db.query(
+            RecommendationCentroid.key,
+            RecommendationCentroid.dim,
+            RecommendationCentroid.vector_sum,
+            RecommendationCentroid.doc_count,
+        ).filter(
+            RecommendationCentroid.knowledge_base_id == kb_id,
+            RecommendationCentroid.kind == kind,
+            RecommendationCentroid.doc_count > 0,
+        )
+        if keys is not None:
+            if not keys:
+                return {}
+            query = query.filter(RecommendationCentroid.key.in_(keys))
+        return {key: (decode_vector(raw, dim), count) for key, dim, raw, count in query.all()}
+
+    def _document_embedding(self, document_id: int) -> Optional[DocumentEmbedding]:
+        return self.db.query(DocumentEmbedding).filter(DocumentEmbedding.document_id == document_id).first()
+
+    @staticmethod
+    def _own_keys(row: DocumentEmbedding, kb_id: int, keys: List[str]) -> List[str]:
+        """文档已计入本知识库质心的键（留一法扣除）；已计入的是其他知识库时不扣除"""
+        return keys if row.counted_knowledge_base_id == kb_id else []
+
+    def suggest_categories(self, document_id: int, top_k: int = 3) -> Dict[str, Any]:
+        started = time.perf_counter()
+        document = self.db.query(Document).filter(Document.id == document_id).first()
+        if document is None:
+            return {"document_id": document_id, "status": "not_found", "suggested_categories": []}
+        row = self._document_embedding(document_id)
+        if row is None:
+            return {"document_id": document_id, "status": "not_ready", "suggested_categories": []}
+        kb_id = document.knowledge_base_id
+        vector = decode_vector(row.vector, row.dim)
+        exclude = self._own_keys(
+            row, kb_id, [str(row.counted_category_id)] if row.counted_category_id is not None else []
+        )
+        ranked = rank_centroids(vector, self._load_centroids(kb_id, KIND_CATEGORY), exclude)[:top_k]
+
+        category_ids = [int(key) for key, _, _ in ranked]
+        names = dict(
+            self.db.query(KnowledgeBaseCategory.id, KnowledgeBaseCategory.name)
+            .filter(KnowledgeBaseCategory.id.in_(category_ids))
+            .all()
+        ) if category_ids else {}
+        suggestions = [
+            {
+                "category_id": int(key),
+                "category_name": names.get(int(key)),
+                "confidence": round(max(0.0, score), 4),
+                "reason": f"与该分类 {count} 篇文档的向量质心相似度 {score:.2f}",
+            }
+            for key, score, count in ranked
+            if int(key) in names
+        ]
+        return {
+            "document_id": document_id,
+            "status": "success",
+            "suggested_categories": suggestions,
+            "processing_time": f"{(time.perf_counter() - started) * 1000:.1f}ms",
+        }
+
+    def _tag_vocabulary(self, kb_id: int) -> Tuple[Dict[str, float], int]:
+        """知识库的标签词表（IDF），按使用次数取前 RECOMMEND_TAG_VOCAB_SIZE 个，缓存 RECOMMEND_VOCAB_CACHE_TTL 秒"""
+        cache_key = f"{_VOCAB_CACHE_KEY}:{kb_id}"
+        try:
+            cached = self.cache.get(cache_key)
+        except Exception:
+            cached = None
+        if isinstance(cached, dict) and "idf" in cached:
+            return cached["idf"], int(cached.get("documents") or 0)
+
+        from app.services.knowledge_base_tag_service import KnowledgeBaseTagService
+
+        df, n_docs = KnowledgeBaseTagService(self.db).tag_document_frequencies(kb_id)
+        top = dict(sorted(df.items(), key=lambda item: item[1], reverse=True)[:settings.RECOMMEND_TAG_VOCAB_SIZE])
+        idf = tag_idf(top, n_docs)
+        try:
+            self.cache.set(cache_key, {"idf": idf, "documents": n_docs}, expire=settings.RECOMMEND_VOCAB_CACHE_TTL)
+        except Exception as e:
+            logger.debug(f"[推荐] 标签词表缓存写入失败: {e}")
+        return idf, n_docs
+
+    def _document_text(self, document_id: int) -> str:
+        try:
+            from app.services.opensearch_service import OpenSearchService
+
+            sources = OpenSearchService().get_document_chunk_sources_sync(
+                document_id, ["content"], size=settings.RECOMMEND_TAG_TEXT_CHUNKS
+            )
+            return "\n".join(src.get("content") or "" for src in sources)
+        except Exception as e:
+            logger.warning(f"[推荐] 读取文档 {document_id} 正文失败，仅使用向量质心: {e}")
+            return ""
+
+    def suggest_tags(self, document_id: int, max_tags: int = 10) -> Dict[str, Any]:
+        started = time.perf_counter()
+        document = self.db.query(Document).filter(Document.id == document_id).first()
+        if document is None:
+            return {"document_id": document_id, "status": "not_found", "suggested_tags": []}
+        kb_id = document.knowledge_base_id
+        idf, _ = self._tag_vocabulary(kb_id)
+        existing = set(normalize_tags(document.tags))
+
+        semantic: Dict[str, float] = {}
+        row = self._document_embedding(document_id)
+        if row is not None:
+            vector = decode_vector(row.vector, row.dim)
+            centroids = self._load_centroids(kb_id, KIND_TAG, list(idf))
+            exclude = self._own_keys(row, kb_id, normalize_tags(row.counted_tags))
+            for key, score, _ in rank_centroids(vector, centroids, exclude):
+                semantic[key] = score
+        lexical = lexical_tag_scores(self._document_text(document_id), idf)
+
+        suggestions = []
+        for tag, score, sem, lex in combine_tag_scores(semantic, lexical, settings.RECOMMEND_TAG_SEMANTIC_WEIGHT):
+            if tag in existing or score <= 0:
+                continue
+            reasons = []
+            if sem > 0:
+                reasons.append(f"向量质心相似度 {sem:.2f}")
+            if lex > 0:
+                reasons.append(f"正文 TF-IDF {lex:.2f}")
+            suggestions.append({"tag_name": tag, "confidence": round(score, 4), "reason": "，".join(reasons)})
+            if len(suggestions) >= max_tags:
+                break
+        return {
+            "document_id": document_id,
+            "status": "success" if row is not None or lexical else "not_ready",
+            "suggested_tags": suggestions,
+            "processing_time": f"{(time.perf_counter() - started) * 1000:.1f}ms",
+        }
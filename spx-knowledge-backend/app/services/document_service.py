@@ -14,6 +14,8 @@ from app.tasks.document_tasks import process_document_task
 from app.services.file_validation_service import FileValidationService
 from app.services.minio_storage_service import MinioStorageService
 from app.services.duplicate_detection_service import DuplicateDetectionService
+from app.services.document_recommendation_service import DocumentRecommendationService
+from app.services.kb_stats_service import KnowledgeBaseStatsService
 from app.core.exceptions import CustomException, ErrorCode
 from app.config.settings import settings
 import os
@@ -209,6 +211,13 @@ class DocumentService(BaseService[Document]):
             
             document = await self.create(doc_data)
             logger.info(f"文档元数据保存完成，文档ID: {document.id}")
+
+            # 知识库聚合统计计入新文档（失败不影响上传，由定时对账修正）
+            try:
+                KnowledgeBaseStatsService(self.db).sync_document(document)
+            except Exception as stats_err:
+                self.db.rollback()
+                logger.warning(f"知识库统计更新失败（文档ID: {document.id}）: {stats_err}")
             
             # 5. 触发异步处理任务
             logger.info("步骤5: 触发异步处理任务")
@@ -492,7 +501,7 @@ class DocumentService(BaseService[Document]):
                 message=f"从URL导入文档失败: {str(e)}"
             )
     
-    def update_document(
+    async def update_document(
         self, 
         doc_id: int, 
         doc_data: DocumentUpdate
@@ -501,9 +510,15 @@ class DocumentService(BaseService[Document]):
         try:
             logger.info(f"更新文档: {doc_id}")
             
-            document = self.update(doc_id, doc_data.dict(exclude_unset=True))
+            document = await self.update(doc_id, doc_data.dict(exclude_unset=True))
             if document:
                 logger.info(f"文档更新完成: {document.original_filename}")
+                # 分类 / 标签变化时移动推荐质心
+                try:
+                    DocumentRecommendationService(self.db).sync_document(document)
+                except Exception as rec_err:
+                    self.db.rollback()
+                    logger.warning(f"推荐质心同步失败（文档ID: {doc_id}）: {rec_err}")
             else:
                 logger.warning(f"文档不存在: {doc_id}")
             
@@ -715,6 +730,9 @@ class DocumentService(BaseService[Document]):
             from sqlalchemy import text as _sql_text
 
             try:
+                # 先扣除文档对知识库聚合统计的贡献，与删除在同一事务中提交
+                KnowledgeBaseStatsService(self.db).remove_document(doc)
+                DocumentRecommendationService(self.db).remove_document(doc_id)
                 # 无论 hard 与否，均执行物理删除，确保“不同步保留，全部清除”
                 # 物理删除顺序：文档版本 -> 分块版本 -> 分块 -> 关系/表格 -> 图片 -> 文档
                 chunk_ids = [rid for (rid,) in self.db.query(DocumentChunk.id).filter(DocumentChunk.document_id == doc_id).all()]
@@ -764,11 +782,17 @@ class DocumentService(BaseService[Document]):
         try:
             logger.info(f"重新处理文档: {doc_id}")
             
-            doc = self.get(doc_id)
+            # 同步方法：直接查询（BaseService.get 为协程）
+            doc = self.db.query(Document).filter(Document.id == doc_id, Document.is_deleted == False).first()
             if not doc:
                 logger.warning(f"文档不存在: {doc_id}")
                 return False
             
+            # 上次在解析之后的阶段失败且文件未变化时续跑（须在改写状态前判断）
+            from app.services.document_pipeline_service import DocumentPipelineService
+
+            resume = DocumentPipelineService(self.db).resumable_state(doc) is not None
+
             # 更新状态为重新处理
             doc.status = "reprocessing"
             doc.processing_progress = 0.0
@@ -779,9 +803,10 @@ class DocumentService(BaseService[Document]):
             # 触发异步任务重新处理文档（设置高优先级）
             task = process_document_task.apply_async(
                 args=(doc_id,),
+                kwargs={"resume": resume},
                 priority=settings.CELERY_TASK_PRIORITY_DOCUMENT
             )
-            logger.info(f"文档重新处理任务已启动，任务ID: {task.id}")
+            logger.info(f"文档重新处理任务已启动，任务ID: {task.id}，续跑: {resume}")
             
             return True
             
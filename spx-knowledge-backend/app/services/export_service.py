@@ -389,7 +389,7 @@ class ExportService:
             }
             
             response = self.opensearch.client.search(
-                index=self.opensearch.document_index,
+                index=self.opensearch.document_search_index,
                 body=search_body
             )
             
@@ -14,6 +14,7 @@ import httpx
 from app.config.settings import settings
 from app.core.cache import cache_manager
 from app.core.logging import logger
+from app.core.rate_limit import RateLimitPolicy, get_rate_limiter
 
 
 class ExternalSearchRateLimitError(Exception):
@@ -24,11 +25,9 @@ class ExternalSearchService:
     """封装 SearxNG 调用、缓存与限流控制"""
 
     CACHE_PREFIX = "external_search:cache:"
-    RATE_PREFIX = "external_search:rate:"
 
     def __init__(self) -> None:
         self.enabled = bool(settings.SEARXNG_URL) and settings.EXTERNAL_SEARCH_ENABLED
-        self._redis = cache_manager.redis_client
 
     async def search(
         self,
@@ -87,18 +86,17 @@ class ExternalSearchService:
         return result_payload
 
     async def _ensure_rate_limit(self, user_id: Optional[int]) -> None:
-        """简单的基于 Redis 的计数限流"""
+        """按用户限流（共享 GCRA 限流引擎）"""
         if not user_id:
             return
-        key = self.RATE_PREFIX + str(user_id)
-        pipe = self._redis.pipeline()
-        pipe.incr(key)
-        pipe.expire(key, settings.EXTERNAL_SEARCH_RATE_LIMIT_WINDOW)
-        count, _ = pipe.execute()
-        if count == 1:
-            self._redis.expire(key, settings.EXTERNAL_SEARCH_RATE_LIMIT_WINDOW)
-        if count > settings.EXTERNAL_SEARCH_RATE_LIMIT_PER_USER:
-            logger.warning("[外部搜索] 用户 %s 触发限流，count=%s", user_id, count)
+        policy = RateLimitPolicy(
+            settings.EXTERNAL_SEARCH_RATE_LIMIT_PER_USER,
+            settings.EXTERNAL_SEARCH_RATE_LIMIT_WINDOW,
+            "external_search",
+        )
+        result = await get_rate_limiter().hit(f"user:{user_id}", policy)
+        if not result.allowed:
+            logger.warning("[外部搜索] 用户 %s 触发限流，retry_after=%.1fs", user_id, result.retry_after)
             raise ExternalSearchRateLimitError("联网搜索过于频繁，请稍后再试")
 
     def _build_query(
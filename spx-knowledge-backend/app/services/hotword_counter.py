@@ -0,0 +1,278 @@
+"""
+Hotword Counter
+搜索热词缓冲计数：请求路径只在 Redis 中累加（一次 pipeline），定时任务把累计增量合并写入 search_hotwords（批量 upsert）
+
+- {prefix}pending：待落盘增量（ZSET）；落盘时原子改名后并入 {prefix}flushing，写库成功才删除，失败保留到下次合并重试
+- {prefix}counts：总次数（库内次数 + 未落盘增量），{prefix}last_seen：最后搜索时间戳；热词 Top-N 直接读取这两个 ZSET
+- counts 缺失（首次启用 / Redis 清空）时由落盘任务从数据库重建，重建完成前读取回退数据库
+- {prefix}hidden：数据库中已软删除的热词（重建 / 落盘时同步），落盘不再累加、Top-N 不返回
+- 请求路径（record / top）使用异步 Redis 客户端，落盘（flush）在 Celery 任务中同步执行
+"""
+
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config.settings import settings
+from app.core.logging import logger
+from app.models.search_history import SearchHotword
+
+KEYWORD_MAX_LENGTH = 200
+PERIOD_DAYS = {"day": 1, "week": 7, "month": 30}
+# last_seen 保留时长（覆盖最长统计周期）
+_LAST_SEEN_RETENTION_DAYS = 31
+_SEED_BATCH = 5000
+
+
+def normalize_keyword(keyword: Optional[str]) -> str:
+    return (keyword or "").strip()[:KEYWORD_MAX_LENGTH]
+
+
+def _upsert_statement(dialect: str, rows: List[Dict]):
+    """search_hotwords 批量 upsert：次数累加、最后搜索时间取较大值（MySQL / SQLite）"""
+    table = SearchHotword.__table__
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+
+        stmt = insert(table).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.keyword],
+            set_={
+                "search_count": table.c.search_count + stmt.excluded.search_count,
+                "last_searched_at": func.max(table.c.last_searched_at, stmt.excluded.last_searched_at),
+                "updated_at": func.now(),
+            },
+        )
+    from sqlalchemy.dialects.mysql import insert
+
+    stmt = insert(table).values(rows)
+    return stmt.on_duplicate_key_update(
+        search_count=table.c.search_count + stmt.inserted.search_count,
+        last_searched_at=func.greatest(
+            func.coalesce(table.c.last_searched_at, stmt.inserted.last_searched_at), stmt.inserted.last_searched_at
+        ),
+        updated_at=func.now(),
+    )
+
+
+class HotwordCounter:
+    """Redis 热词计数器"""
+
+    def __init__(self, client=None, async_client=None):
+        self._redis = client
+        self._async_redis = async_client
+        prefix = settings.HOTWORD_REDIS_PREFIX
+        self.pending_key = f"{prefix}pending"
+        self.flushing_key = f"{prefix}flushing"
+        self.counts_key = f"{prefix}counts"
+        self.last_seen_key = f"{prefix}last_seen"
+        self.seeded_key = f"{prefix}seeded"
+        self.hidden_key = f"{prefix}hidden"
+        self.lock_key = f"{prefix}flush_lock"
+
+    @property
+    def redis(self):
+        """同步客户端（落盘任务使用）"""
+        if self._redis is None:
+            from app.config.redis import redis_client
+
+            self._redis = redis_client
+        return self._redis
+
+    @property
+    def async_redis(self):
+        """异步客户端（请求路径使用）"""
+        if self._async_redis is None:
+            from app.config.redis import get_async_redis
+
+            self._async_redis = get_async_redis()
+        return self._async_redis
+
+    # ---------------- 计数 ----------------
+
+    async def record(self, keyword: str) -> None:
+        """记录一次搜索（一次往返，不访问数据库）"""
+        keyword = normalize_keyword(keyword)
+        if not keyword:
+            return
+        pipe = self.async_redis.pipeline(transaction=False)
+        pipe.zincrby(self.pending_key, 1, keyword)
+        pipe.zincrby(self.counts_key, 1, keyword)
+        pipe.zadd(self.last_seen_key, {keyword: time.time()})
+        await pipe.execute()
+
+    # ---------------- 读取 ----------------
+
+    def is_seeded(self) -> bool:
+        return bool(self.redis.exists(self.seeded_key)) and bool(self.redis.exists(self.counts_key))
+
+    async def top(self, limit: int, period: Optional[str] = None) -> Optional[List[Tuple[str, int, Optional[datetime]]]]:
+        """
+        按总次数取热词 Top-N（period 为 day/week/month 时只保留该周期内搜索过的词，已软删除的词不返回）
+        返回 [(关键词, 次数, 最后搜索时间)]；计数尚未从数据库重建时返回 None，由调用方回退数据库
+        """
+        if await self.async_redis.exists(self.seeded_key, self.counts_key) < 2:
+            return None
+        days = PERIOD_DAYS.get(period or "")
+        cutoff = time.time() - days * 86400 if days else None
+        page = max(limit * 4, 50)
+        results: List[Tuple[str, int, Optional[datetime]]] = []
+        start = 0
+        while len(results) < limit and start < settings.HOTWORD_TOP_SCAN_LIMIT:
+            rows = await self.async_redis.zrevrange(self.counts_key, start, start + page - 1, withscores=True)
+            if not rows:
+                break
+            pipe = self.async_redis.pipeline(transaction=False)
+            for keyword, _ in rows:
+                pipe.zscore(self.last_seen_key, keyword)
+                pipe.sismember(self.hidden_key, keyword)
+            flags = await pipe.execute()
+            for (keyword, count), ts, hidden in zip(rows, flags[0::2], flags[1::2]):
+                if hidden or (cutoff is not None and (ts is None or ts < cutoff)):
+                    continue
+                keyword = keyword.decode() if isinstance(keyword, bytes) else keyword
+                results.append((keyword, int(count), datetime.utcfromtimestamp(ts) if ts else None))
+                if len(results) >= limit:
+                    break
+            start += page
+        return results
+
+    # ---------------- 落盘 ----------------
+
+    def _acquire(self, token: str) -> bool:
+        ttl = max(60, settings.HOTWORD_FLUSH_INTERVAL_SECONDS * 2)
+        return bool(self.redis.set(self.lock_key, token, nx=True, ex=ttl))
+
+    def _release(self, token: str) -> None:
+        current = self.redis.get(self.lock_key)
+        current = current.decode() if isinstance(current, bytes) else current
+        if current == token:
+            self.redis.delete(self.lock_key)
+
+    def _seed(self, db: Session) -> int:
+        """从数据库重建总次数：库内次数 + 尚未落盘的增量（单条 ZUNIONSTORE 原子替换）"""
+        seed_key = f"{self.counts_key}:seed"
+        self.redis.delete(seed_key, self.hidden_key)
+        deleted = [
+            keyword
+            for (keyword,) in db.query(SearchHotword.keyword).filter(SearchHotword.is_deleted == True).all()  # noqa: E712
+        ]
+        for start in range(0, len(deleted), _SEED_BATCH):
+            self.redis.sadd(self.hidden_key, *deleted[start:start + _SEED_BATCH])
+        seeded = 0
+        last_id = 0
+        while True:
+            rows = (
+                db.query(SearchHotword.id, SearchHotword.keyword, SearchHotword.search_count, SearchHotword.last_searched_at)
+                .filter(SearchHotword.id > last_id, SearchHotword.is_deleted == False)  # noqa: E712
+                .order_by(SearchHotword.id)
+                .limit(_SEED_BATCH)
+                .all()
+            )
+            if not rows:
+                break
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zadd(seed_key, {row.keyword: int(row.search_count or 0) for row in rows})
+            last_seen = {
+                row.keyword: _utc_timestamp(row.last_searched_at) for row in rows if row.last_searched_at is not None
+            }
+            if last_seen:
+                # 搜索路径已写入的时间戳更新，保留
+                pipe.zadd(self.last_seen_key, last_seen, nx=True)
+            pipe.execute()
+            seeded += len(rows)
+            last_id = rows[-1].id
+        self.redis.zunionstore(self.counts_key, [seed_key, self.pending_key, self.flushing_key])
+        self.redis.delete(seed_key)
+        self.redis.set(self.seeded_key, "1")
+        logger.info(f"[热词] 已从数据库重建 Redis 热词计数: {seeded} 个")
+        return seeded
+
+    def _hide_deleted(self, db: Session, keywords: List[str]) -> set:
+        """批次中数据库已软删除的热词：不再累加，并从总次数中移除、记入 hidden"""
+        deleted = {
+            keyword
+            for (keyword,) in db.query(SearchHotword.keyword)
+            .filter(SearchHotword.keyword.in_(keywords), SearchHotword.is_deleted == True)  # noqa: E712
+            .all()
+        }
+        if deleted:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.sadd(self.hidden_key, *deleted)
+            pipe.zrem(self.counts_key, *deleted)
+            pipe.zrem(self.last_seen_key, *deleted)
+            pipe.execute()
+        return deleted
+
+    def _take_pending(self) -> None:
+        """把待落盘增量原子改名后并入 flushing（上次失败未删除的 flushing 一并落盘）"""
+        staging = f"{self.pending_key}:{uuid.uuid4().hex}"
+        try:
+            self.redis.rename(self.pending_key, staging)
+        except Exception as e:
+            if "no such key" in str(e).lower():
+                return
+            raise
+        self.redis.zunionstore(self.flushing_key, [self.flushing_key, staging])
+        self.redis.delete(staging)
+
+    def flush(self, db: Session) -> Dict[str, int]:
+        """把缓冲的增量合并写入 search_hotwords（同一时刻只有一个落盘任务执行）"""
+        token = uuid.uuid4().hex
+        if not self._acquire(token):
+            return {"flushed": 0, "skipped": 1}
+        try:
+            if not self.is_seeded():
+                self._seed(db)
+            self._take_pending()
+            entries = self.redis.zrange(self.flushing_key, 0, -1, withscores=True)
+            flushed = 0
+            if entries:
+                dialect = db.get_bind().dialect.name
+                batch_size = max(1, settings.HOTWORD_FLUSH_BATCH_SIZE)
+                for start in range(0, len(entries), batch_size):
+                    batch = entries[start:start + batch_size]
+                    pipe = self.redis.pipeline(transaction=False)
+                    for keyword, _ in batch:
+                        pipe.zscore(self.last_seen_key, keyword)
+                    seen = pipe.execute()
+                    hidden = self._hide_deleted(db, [keyword for keyword, _ in batch])
+                    now = datetime.utcnow()
+                    rows = [
+                        {
+                            "keyword": keyword.decode() if isinstance(keyword, bytes) else keyword,
+                            "search_count": int(count),
+                            "last_searched_at": datetime.utcfromtimestamp(ts) if ts else now,
+                            "is_deleted": False,
+                        }
+                        for (keyword, count), ts in zip(batch, seen)
+                        if int(count) > 0 and keyword not in hidden
+                    ]
+                    if rows:
+                        db.execute(_upsert_statement(dialect, rows))
+                        flushed += len(rows)
+                db.commit()
+            # 写库成功后才删除，失败时留待下次合并重试
+            self.redis.delete(self.flushing_key)
+            cutoff = time.time() - _LAST_SEEN_RETENTION_DAYS * 86400
+            self.redis.zremrangebyscore(self.last_seen_key, "-inf", cutoff)
+            if flushed:
+                logger.info(f"[热词] 已落盘 {flushed} 个热词增量")
+            return {"flushed": flushed, "skipped": 0}
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            self._release(token)
+
+
+def _utc_timestamp(value: datetime) -> float:
+    """数据库中的 UTC 时间（无时区）转时间戳"""
+    if value.tzinfo is None:
+        return (value - datetime(1970, 1, 1)).total_seconds()
+    return value.timestamp()
+
@@ -0,0 +1,300 @@
+﻿"""
+Image Proxy Service
+图片/对象代理：流式转发 MinIO 对象，支持 ETag/Last-Modified 条件请求、Range 分段请求与缩略图档位
+"""
+
+import hashlib
+import os
+import threading
+from email.utils import format_datetime, parsedate_to_datetime
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.config.settings import settings
+from app.core.logging import logger
+from app.services.minio_storage_service import MinioStorageService
+
+_CONTENT_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".bmp": "image/bmp",
+}
+
+
+def guess_content_type(object_name: str, fallback: Optional[str] = None) -> str:
+    """根据扩展名推断 Content-Type，未知类型使用对象自身的 Content-Type"""
+    ext = os.path.splitext(object_name.lower())[1]
+    if ext in _CONTENT_TYPES:
+        return _CONTENT_TYPES[ext]
+    if fallback and fallback != "binary/octet-stream":
+        return fallback
+    return "application/octet-stream"
+
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段 Range 头，返回闭区间 (start, end)。
+    - 头不存在、格式不支持或为多段请求时返回 None（按完整内容响应）
+    - 区间不可满足时抛出 ValueError（响应 416）
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec or "," in spec:
+        return None
+    start_str, sep, end_str = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_str == "":
+            # 后缀区间：bytes=-500 表示最后 500 字节
+            suffix = int(end_str)
+            if suffix <= 0:
+                raise ValueError("empty suffix range")
+            start = max(size - suffix, 0)
+            end = size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+            end = min(end, size - 1)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid range: {range_header}")
+    if start < 0 or start >= size or end < start:
+        raise ValueError(f"unsatisfiable range: {range_header}")
+    return start, end
+
+
+class ThumbnailDiskCache:
+    """
+    缩略图磁盘 LRU 缓存
+    - 以 mtime 记录最近访问时间，命中时刷新
+    - 写入后总大小超过上限时，按 mtime 从旧到新淘汰
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}{ext}")
+
+    def get(self, key: str, ext: str) -> Optional[bytes]:
+        path = self._path(key, ext)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+            os.utime(path, None)
+            return data
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.debug(f"[Thumbnail] 读取缓存失败: {path} - {e}")
+            return None
+
+    def put(self, key: str, ext: str, data: bytes) -> None:
+        path = self._path(key, ext)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"[Thumbnail] 写入缓存失败: {path} - {e}")
+            return
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _iter_entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _scan_total(self) -> int:
+        return sum(size for _, size, _ in self._iter_entries())
+
+    def _evict(self) -> None:
+        entries = sorted(self._iter_entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        # 淘汰到上限的 90%，避免每次写入都触发全量扫描
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                continue
+        self._total_bytes = total
+        if removed:
+            logger.info(f"[Thumbnail] LRU 淘汰 {removed} 个缓存文件，当前占用 {total} bytes")
+
+
+_thumbnail_cache: Optional[ThumbnailDiskCache] = None
+_thumbnail_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailDiskCache:
+    """进程内共享的缩略图缓存实例"""
+    global _thumbnail_cache
+    if _thumbnail_cache is None:
+        with _thumbnail_cache_lock:
+            if _thumbnail_cache is None:
+                _thumbnail_cache = ThumbnailDiskCache(
+                    settings.IMAGE_THUMBNAIL_CACHE_DIR,
+                    settings.IMAGE_THUMBNAIL_CACHE_MAX_BYTES,
+                )
+    return _thumbnail_cache
+
+
+class ImageProxyService:
+    """图片代理服务 - 流式、可缓存的 MinIO 对象转发"""
+
+    def __init__(self, minio: Optional[MinioStorageService] = None):
+        self.minio = minio or MinioStorageService()
+        self.thumbnail_cache = get_thumbnail_cache()
+
+    def _cache_headers(self, etag: str, last_modified) -> Dict[str, str]:
+        headers = {
+            "ETag": etag,
+            # 图片需要认证访问，只允许浏览器私有缓存
+            "Cache-Control": f"private, max-age={settings.IMAGE_PROXY_CACHE_MAX_AGE}",
+            "Accept-Ranges": "bytes",
+        }
+        if last_modified is not None:
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+        return headers
+
+    @staticmethod
+    def _not_modified(request: Request, etag: str, last_modified) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidates = {tag.strip() for tag in if_none_match.split(",")}
+            weak_etag = f"W/{etag}"
+            return "*" in candidates or etag in candidates or weak_etag in candidates
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+                return last_modified.replace(microsecond=0) <= since
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def serve(self, request: Request, object_name: str, size: Optional[str] = None) -> Response:
+        """
+        代理对象读取
+        - size 为缩略图档位（见 IMAGE_THUMBNAIL_TIERS），命中时返回磁盘缓存的缩略图
+        - 其余情况流式转发原对象，支持 If-None-Match / If-Modified-Since / Range / If-Range
+        """
+        stat = await run_in_threadpool(self.minio.stat_file, object_name)
+        etag = f'"{(stat.etag or "").strip(chr(34))}"'
+        last_modified = stat.last_modified
+        content_type = guess_content_type(object_name, getattr(stat, "content_type", None))
+
+        max_side = settings.IMAGE_THUMBNAIL_TIERS.get(size) if size else None
+        if (
+            max_side
+            and content_type.startswith("image/")
+            and content_type != "image/gif"
+            and (stat.size or 0) <= settings.IMAGE_THUMBNAIL_SOURCE_MAX_BYTES
+        ):
+            thumb_etag = f'"{etag.strip(chr(34))}-{size}"'
+            if self._not_modified(request, thumb_etag, last_modified):
+                return Response(status_code=304, headers=self._cache_headers(thumb_etag, last_modified))
+            thumbnail = await run_in_threadpool(self._get_thumbnail, object_name, etag, size, max_side)
+            if thumbnail is not None:
+                data, thumb_type = thumbnail
+                headers = self._cache_headers(thumb_etag, last_modified)
+                headers.pop("Accept-Ranges", None)
+                return Response(content=data, media_type=thumb_type, headers=headers)
+
+        headers = self._cache_headers(etag, last_modified)
+        if self._not_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=headers)
+
+        total = stat.size or 0
+        byte_range = None
+        if_range = request.headers.get("if-range")
+        if not if_range or if_range.strip() == etag:
+            try:
+                byte_range = parse_range_header(request.headers.get("range"), total)
+            except ValueError:
+                headers["Content-Range"] = f"bytes */{total}"
+                return Response(status_code=416, headers=headers)
+
+        chunk_size = settings.IMAGE_PROXY_CHUNK_SIZE
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(
+                self.minio.iter_file(object_name, offset=start, length=length, chunk_size=chunk_size),
+                status_code=206,
+                media_type=content_type,
+                headers=headers,
+            )
+
+        headers["Content-Length"] = str(total)
+        return StreamingResponse(
+            self.minio.iter_file(object_name, chunk_size=chunk_size),
+            media_type=content_type,
+            headers=headers,
+        )
+
+    def _get_thumbnail(self, object_name: str, etag: str, size: str, max_side: int) -> Optional[Tuple[bytes, str]]:
+        """读取或生成缩略图，返回 (bytes, content_type)；生成失败返回 None 以回退原图"""
+        key = hashlib.sha1(f"{object_name}|{etag}|{size}".encode("utf-8")).hexdigest()
+        for ext, media_type in ((".jpg", "image/jpeg"), (".png", "image/png")):
+            cached = self.thumbnail_cache.get(key, ext)
+            if cached is not None:
+                return cached, media_type
+
+        try:
+            from PIL import Image
+
+            raw = self.minio.download_file(object_name)
+            with Image.open(BytesIO(raw)) as im:
+                im.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+                buf = BytesIO()
+                # 带透明通道的图片保留 PNG，其余统一转 JPEG 以压缩体积
+                if im.mode in ("RGBA", "LA") or (im.mode == "P" and "transparency" in im.info):
+                    im.save(buf, format="PNG", optimize=True)
+                    ext, media_type = ".png", "image/png"
+                else:
+                    if im.mode != "RGB":
+                        im = im.convert("RGB")
+                    im.save(buf, format="JPEG", quality=85, optimize=True)
+                    ext, media_type = ".jpg", "image/jpeg"
+            data = buf.getvalue()
+        except Exception as e:
+            logger.warning(f"[Thumbnail] 生成缩略图失败，回退原图: {object_name} - {e}")
+            return None
+
+        self.thumbnail_cache.put(key, ext, data)
+        return data, media_type
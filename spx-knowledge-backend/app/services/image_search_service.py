@@ -146,12 +146,14 @@ class ImageSearchService:
             
             # 2. 使用CLIP文本编码器生成512维向量（替代Ollama）
             logger.info("[以文搜图] 步骤2: CLIP文本向量化（512维）")
-            from app.services.image_vectorization_service import ImageVectorizationService
-            
             text_vector = None
             try:
-                image_vectorizer = ImageVectorizationService()
-                text_vector = image_vectorizer.generate_clip_text_embedding(processed_text)
+                if settings.INFERENCE_BATCHING_ENABLED:
+                    # 与并发的以文搜图请求合批编码（进程内共享一个CLIP模型）
+                    from app.services.inference_batcher import get_clip_text_batcher
+                    text_vector = await get_clip_text_batcher().infer_async(processed_text)
+                else:
+                    text_vector = self.image_vectorizer.generate_clip_text_embedding(processed_text)
                 
                 if not text_vector or len(text_vector) != 512:
                     logger.error(f"[以文搜图] CLIP文本向量生成失败或维度不正确: 维度={len(text_vector) if text_vector else 0}, 期望=512")
@@ -293,7 +295,7 @@ class ImageSearchService:
                 f"RERANK_TOP_K={settings.RERANK_TOP_K}"
             )
             
-            reranked_results = self.rerank_service.rerank(
+            reranked_results = await self.rerank_service.rerank_async(
                 query=processed_text,
                 candidates=rerank_candidates,
                 top_k=rerank_top_k  # 召回更多候选，后续会按阈值过滤
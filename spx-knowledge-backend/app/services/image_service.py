@@ -2,7 +2,7 @@
 Image Service
 """
 
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from app.models.image import DocumentImage
@@ -263,6 +263,57 @@ class ImageService(BaseService[DocumentImage]):
                 existing.image_type = inferred_type
                 self.db.commit()
             return existing
+        image = self._build_image_from_bytes(document_id, data, sha, norm_ext, inferred_type)
+        self.db.add(image)
+        self.db.commit()
+        self.db.refresh(image)
+        return image
+
+    def create_images_from_bytes(
+        self, document_id: int, items: List[Tuple[bytes, str, Optional[str]]]
+    ) -> List[DocumentImage]:
+        """批量从二进制创建图片（items 为 (data, ext, image_type)），结果与输入一一对应。
+        一次 IN 查询按 SHA256 去重（含本批内重复），新图片上传 MinIO 后只 flush 取得 ID，由调用方统一提交。
+        """
+        prepared = []
+        for data, image_ext, image_type in items:
+            norm_ext = self._normalize_ext(image_ext or ".png")
+            prepared.append((
+                hashlib.sha256(data).hexdigest(),
+                data,
+                norm_ext,
+                self._infer_image_type(norm_ext, explicit_type=image_type),
+            ))
+        if not prepared:
+            return []
+
+        by_sha: Dict[str, DocumentImage] = {}
+        shas = list({sha for sha, _, _, _ in prepared})
+        for row in self.db.query(DocumentImage).filter(
+            DocumentImage.sha256_hash.in_(shas), DocumentImage.is_deleted == False
+        ).order_by(DocumentImage.id):
+            by_sha.setdefault(row.sha256_hash, row)
+
+        results: List[DocumentImage] = []
+        created = 0
+        for sha, data, norm_ext, inferred_type in prepared:
+            image = by_sha.get(sha)
+            if image is None:
+                image = self._build_image_from_bytes(document_id, data, sha, norm_ext, inferred_type)
+                self.db.add(image)
+                by_sha[sha] = image
+                created += 1
+            elif not image.image_type and inferred_type != "unknown":
+                image.image_type = inferred_type
+            results.append(image)
+        self.db.flush()
+        logger.info(f"批量保存图片: 输入 {len(prepared)}，新建 {created}，复用 {len(prepared) - created}")
+        return results
+
+    def _build_image_from_bytes(
+        self, document_id: int, data: bytes, sha: str, norm_ext: str, inferred_type: str
+    ) -> DocumentImage:
+        """上传原图与缩略图、执行 OCR，返回未入库的图片实体"""
         # 上传原图至 MinIO
         minio = MinioStorageService()
         object_name = f"documents/{document_id}/images/{sha}{norm_ext}"
@@ -311,10 +362,8 @@ class ImageService(BaseService[DocumentImage]):
             retry_count=0,
             last_processed_at=datetime.utcnow()
         )
-        self.db.add(image)
-        self.db.commit()
-        self.db.refresh(image)
         return image
+
     def create_or_get_image(self, document_id: int, image_path: str, image_type: Optional[str] = None) -> DocumentImage:
         sha = self.compute_sha256(image_path)
         _, ext = os.path.splitext(image_path)
@@ -4,12 +4,10 @@ Image Vectorization Service
 """
 
 import os
+import threading
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 from PIL import Image
-import torch
-import open_clip
-import cv2
 from app.core.logging import logger
 from app.core.exceptions import CustomException, ErrorCode
 from app.utils.download_progress import (
@@ -19,24 +17,72 @@ from app.utils.download_progress import (
     setup_hf_download_progress
 )
 
+if TYPE_CHECKING:
+    import torch
+
 # 彻底移除对 torchvision 的导入，避免因环境不兼容导致应用启动失败
 # 如果后续需要 ResNet/ViT，可在具备兼容环境时再按需引入
+# torch / open_clip / cv2 均在首次使用时导入，不处理图片的进程不再承担其导入耗时与内存
 
 class ImageVectorizationService:
-    """图片向量化服务 - 严格按照设计文档实现"""
+    """图片向量化服务 - 严格按照设计文档实现
+    
+    模型在进程内共享，首次访问 models / transforms / device 时才加载，
+    重复实例化不会重复加载 CLIP 权重。
+    """
+    
+    _shared_models: Dict[str, Any] = {}
+    _shared_transforms: Dict[str, Any] = {}
+    _shared_device = None
+    _init_lock = threading.Lock()
     
     def __init__(self):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.models = {}
-        self.transforms = {}
-        self._initialize_models()
+        from app.config.settings import settings as _settings
+        if not _settings.MODEL_LAZY_LOADING:
+            self._ensure_models()
+    
+    @property
+    def models(self) -> Dict[str, Any]:
+        self._ensure_models()
+        return ImageVectorizationService._shared_models
+    
+    @property
+    def transforms(self) -> Dict[str, Any]:
+        self._ensure_models()
+        return ImageVectorizationService._shared_transforms
+    
+    @property
+    def device(self):
+        self._ensure_models()
+        return ImageVectorizationService._shared_device
+    
+    @classmethod
+    def is_loaded(cls) -> bool:
+        return "clip" in cls._shared_models
+    
+    def _ensure_models(self) -> None:
+        """按需加载模型（每个进程仅执行一次）"""
+        cls = ImageVectorizationService
+        if cls.is_loaded():
+            return
+        with cls._init_lock:
+            if cls.is_loaded():
+                return
+            self._initialize_models()
     
     def _initialize_models(self):
         """初始化视觉模型 - 根据设计文档实现"""
         try:
             logger.info("开始初始化视觉模型")
+            import torch
+            import open_clip
             from app.config.settings import settings as _settings
 
+            cls = ImageVectorizationService
+            if (_settings.CLIP_BACKEND or "torch").lower() == "onnx" and self._initialize_onnx_clip():
+                return
+            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
             if _settings.HF_HOME:
                 hf_home = _settings.HF_HOME
                 logger.info(f"📁 使用配置的 HF_HOME: {hf_home}")
@@ -123,7 +169,7 @@ class ImageVectorizationService:
                     model_name,
                     pretrained=pretrained_arg,
                     cache_dir=None if using_cache else _settings.CLIP_CACHE_DIR,
-                    device=self.device,
+                    device=device,
                 )
                 logger.info("✅ CLIP模型初始化完成")
             except Exception as err:
@@ -136,9 +182,10 @@ class ImageVectorizationService:
                 ) from err
 
             clip_model.eval()
-            clip_model.to(self.device)
-            self.models["clip"] = clip_model
-            self.transforms["clip"] = clip_preprocess
+            clip_model.to(device)
+            cls._shared_device = device
+            cls._shared_transforms["clip"] = clip_preprocess
+            cls._shared_models["clip"] = clip_model
             logger.info("✅ CLIP模型已加载到设备并可使用")
         except CustomException:
             raise
@@ -149,9 +196,33 @@ class ImageVectorizationService:
                 message=f"初始化视觉模型失败: {str(e)}"
             )
     
+    def _initialize_onnx_clip(self) -> bool:
+        """加载 ONNX Runtime 版 CLIP（CLIP_BACKEND=onnx），产物缺失时返回 False 回退 PyTorch"""
+        try:
+            import torch
+            import open_clip
+            from app.services.onnx_backend import OnnxClipEncoder
+
+            encoder = OnnxClipEncoder()
+            cls = ImageVectorizationService
+            cls._shared_device = torch.device("cpu")
+            cls._shared_transforms["clip"] = open_clip.image_transform(
+                encoder.image_size, is_train=False, mean=encoder.mean, std=encoder.std
+            )
+            cls._shared_models["clip"] = encoder
+            logger.info("✅ CLIP模型已加载（ONNX Runtime）")
+            return True
+        except (ImportError, FileNotFoundError, OSError) as e:
+            logger.warning(
+                f"⚠️ ONNX CLIP 模型不可用，回退到 PyTorch: {e}。"
+                "可运行 python scripts/export_onnx_models.py --clip 导出"
+            )
+            return False
+
     def generate_clip_embedding(self, image_path: str) -> List[float]:
         """使用CLIP生成图片嵌入向量 - 根据设计文档实现"""
         try:
+            import torch
             logger.info(f"开始CLIP向量化: {image_path}")
             
             # 图片预处理
@@ -189,6 +260,8 @@ class ImageVectorizationService:
             512维向量列表
         """
         try:
+            import torch
+            import open_clip
             logger.info(f"开始CLIP文本向量化: {text[:50]}...")
             
             # 检查CLIP模型是否已加载
@@ -230,9 +303,43 @@ class ImageVectorizationService:
                 message=f"CLIP文本向量化失败: {str(e)}"
             )
     
+    def generate_clip_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """批量CLIP文本向量化：一次前向计算编码多条文本（供微批调度器使用）
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与输入等长的512维向量列表
+        """
+        if not texts:
+            return []
+        if 'clip' not in self.models:
+            raise CustomException(
+                code=ErrorCode.VECTOR_GENERATION_FAILED,
+                message="CLIP模型未初始化"
+            )
+        try:
+            import torch
+            import open_clip
+            text_tokens = open_clip.tokenize(list(texts)).to(self.device)
+            with torch.no_grad():
+                text_features = self.models['clip'].encode_text(text_tokens)
+                text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+                embeddings = text_features.cpu().numpy().tolist()
+            logger.debug(f"CLIP批量文本向量化完成: 数量={len(embeddings)}")
+            return embeddings
+        except Exception as e:
+            logger.error(f"CLIP批量文本向量化错误: {e}", exc_info=True)
+            raise CustomException(
+                code=ErrorCode.VECTOR_GENERATION_FAILED,
+                message=f"CLIP批量文本向量化失败: {str(e)}"
+            )
+
     def generate_resnet_embedding(self, image_path: str) -> List[float]:
         """使用ResNet生成图片嵌入向量 - 根据设计文档实现"""
         try:
+            import torch
             logger.info(f"开始ResNet向量化: {image_path}")
             
             # 图片预处理
@@ -262,6 +369,7 @@ class ImageVectorizationService:
     def generate_vit_embedding(self, image_path: str) -> List[float]:
         """使用ViT生成图片嵌入向量 - 根据设计文档实现"""
         try:
+            import torch
             logger.info(f"开始ViT向量化: {image_path}")
             
             # 图片预处理
@@ -364,7 +472,7 @@ class ImageVectorizationService:
                 message=f"混合向量化失败: {str(e)}"
             )
     
-    def _preprocess_image(self, image_path: str, model_type: str) -> Optional[torch.Tensor]:
+    def _preprocess_image(self, image_path: str, model_type: str) -> Optional["torch.Tensor"]:
         """图片预处理 - 根据设计文档实现"""
         try:
             logger.debug(f"开始图片预处理: {image_path}, 模型: {model_type}")
@@ -403,6 +511,7 @@ class ImageVectorizationService:
             logger.info(f"开始提取图片特征: {image_path}")
             
             # 使用OpenCV提取传统特征
+            import cv2
             image = cv2.imread(image_path)
             if image is None:
                 raise CustomException(
@@ -513,8 +622,8 @@ class ImageVectorizationService:
             logger.info("获取视觉模型信息")
             
             model_info = {
-                'available_models': list(self.models.keys()),
-                'device': str(self.device),
+                'available_models': list(ImageVectorizationService._shared_models.keys()),
+                'device': str(ImageVectorizationService._shared_device or "not_loaded"),
                 'clip_info': {
                     'model_name': 'ViT-B/32',
                     'embedding_dim': 512,
@@ -549,14 +658,16 @@ class ImageVectorizationService:
         try:
             logger.info("开始清理模型资源")
             
+            cls = ImageVectorizationService
+            with cls._init_lock:
+                cls._shared_models.clear()
+                cls._shared_transforms.clear()
+            
             # 清理GPU内存
+            import torch
             if torch.cuda.is_available():
                 torch.cuda.empty_cache()
             
-            # 清理模型
-            self.models.clear()
-            self.transforms.clear()
-            
             logger.info("模型资源清理完成")
             
         except Exception as e:
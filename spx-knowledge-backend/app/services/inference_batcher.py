@@ -0,0 +1,230 @@
+﻿"""
+Inference Batcher
+查询期模型调用的动态微批调度：在很短的时间窗口内收集并发请求，合并为一次前向计算后再分发结果
+用于 CLIP 文本编码与 cross-encoder rerank（CPU 推理节点上合批可显著提升吞吐）
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config.settings import settings
+from app.core.logging import logger
+
+
+class _Request:
+    __slots__ = ("payload", "weight", "future", "enqueued_at")
+
+    def __init__(self, payload: Any, weight: int):
+        self.payload = payload
+        self.weight = weight
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    动态微批调度器（进程内、后台线程）
+
+    - batch_fn 接收 payload 列表，返回等长的结果列表，在后台线程中执行
+    - 第一个请求到达后最多等待 max_wait_ms 收集后续请求，或累计权重达到 max_batch_size 立即执行
+    - weight_fn 用于按“真实计算量”计数（如 rerank 按 query-passage 对数），默认每个请求记 1
+    - 同步调用方使用 infer()，协程调用方使用 infer_async()，两者共享同一个批次队列
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int,
+        max_wait_ms: int,
+        max_queue_size: int = 1024,
+        weight_fn: Optional[Callable[[Any], int]] = None,
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self.weight_fn = weight_fn
+        self._queue: "queue.Queue[_Request]" = queue.Queue(maxsize=max_queue_size)
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._carry: Optional[_Request] = None
+        # 统计指标
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._weight_total = 0
+        self._max_batch_seen = 0
+        self._last_batch_size = 0
+        self._errors = 0
+        self._wait_ms_total = 0.0
+        self._compute_ms_total = 0.0
+        self._batch_size_buckets: Dict[str, int] = {}
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._run, name=f"micro-batcher-{self.name}", daemon=True
+            )
+            self._worker.start()
+            logger.info(
+                f"[MicroBatcher:{self.name}] 调度线程已启动: "
+                f"max_batch_size={self.max_batch_size}, max_wait_ms={int(self.max_wait * 1000)}"
+            )
+
+    def submit(self, payload: Any) -> Future:
+        """提交一个推理请求，返回 concurrent.futures.Future"""
+        self._ensure_worker()
+        weight = self.weight_fn(payload) if self.weight_fn else 1
+        req = _Request(payload, max(1, weight))
+        # 队列满时阻塞调用方，形成背压，避免无限堆积
+        self._queue.put(req)
+        return req.future
+
+    def infer(self, payload: Any, timeout: Optional[float] = None) -> Any:
+        """同步调用：提交并等待结果"""
+        return self.submit(payload).result(timeout=timeout)
+
+    async def infer_async(self, payload: Any) -> Any:
+        """协程调用：提交并等待结果，不阻塞事件循环"""
+        self._ensure_worker()
+        weight = self.weight_fn(payload) if self.weight_fn else 1
+        req = _Request(payload, max(1, weight))
+        try:
+            self._queue.put_nowait(req)
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self._queue.put, req)
+        return await asyncio.wrap_future(req.future)
+
+    def _collect(self) -> List[_Request]:
+        first = self._carry or self._queue.get()
+        self._carry = None
+        batch = [first]
+        total_weight = first.weight
+        deadline = time.perf_counter() + self.max_wait
+        while total_weight < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                req = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if total_weight + req.weight > self.max_batch_size:
+                # 超出本批容量的请求留给下一批，保证单批计算量可控
+                self._carry = req
+                break
+            batch.append(req)
+            total_weight += req.weight
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                results = self.batch_fn([req.payload for req in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"batch_fn 返回结果数量不匹配: 期望 {len(batch)}，实际 {len(results)}"
+                    )
+                for req, result in zip(batch, results):
+                    if not req.future.done():
+                        req.future.set_result(result)
+                failed = False
+            except Exception as e:
+                logger.error(f"[MicroBatcher:{self.name}] 批次执行失败: {e}", exc_info=True)
+                for req in batch:
+                    if not req.future.done():
+                        req.future.set_exception(e)
+                failed = True
+            self._record(batch, started, failed)
+
+    def _record(self, batch: List[_Request], started: float, failed: bool) -> None:
+        finished = time.perf_counter()
+        size = len(batch)
+        weight = sum(req.weight for req in batch)
+        bucket = self._bucket_label(weight)
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._weight_total += weight
+            self._last_batch_size = weight
+            self._max_batch_seen = max(self._max_batch_seen, weight)
+            self._errors += 1 if failed else 0
+            self._wait_ms_total += sum((started - req.enqueued_at) * 1000 for req in batch)
+            self._compute_ms_total += (finished - started) * 1000
+            self._batch_size_buckets[bucket] = self._batch_size_buckets.get(bucket, 0) + 1
+
+    @staticmethod
+    def _bucket_label(weight: int) -> str:
+        for upper in (1, 2, 4, 8, 16, 32, 64, 128):
+            if weight <= upper:
+                return f"<={upper}"
+        return ">128"
+
+    def stats(self) -> Dict[str, Any]:
+        """队列深度与批大小等运行指标"""
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                "name": self.name,
+                "queue_depth": self._queue.qsize() + (1 if self._carry else 0),
+                "batches": batches,
+                "requests": self._items,
+                "errors": self._errors,
+                "avg_batch_size": round(self._weight_total / batches, 2) if batches else 0.0,
+                "avg_requests_per_batch": round(self._items / batches, 2) if batches else 0.0,
+                "last_batch_size": self._last_batch_size,
+                "max_batch_size_seen": self._max_batch_seen,
+                "avg_queue_wait_ms": round(self._wait_ms_total / self._items, 2) if self._items else 0.0,
+                "avg_compute_ms": round(self._compute_ms_total / batches, 2) if batches else 0.0,
+                "batch_size_histogram": dict(self._batch_size_buckets),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": int(self.max_wait * 1000),
+            }
+
+
+_batchers: Dict[str, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(name: str, factory: Callable[[], MicroBatcher]) -> MicroBatcher:
+    """按名称获取进程内共享的批处理器（首次调用时创建）"""
+    batcher = _batchers.get(name)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(name)
+            if batcher is None:
+                batcher = factory()
+                _batchers[name] = batcher
+    return batcher
+
+
+def get_clip_text_batcher() -> MicroBatcher:
+    """CLIP 文本编码微批处理器：payload 为文本，结果为 512 维向量"""
+
+    def _factory() -> MicroBatcher:
+        from app.services.image_vectorization_service import ImageVectorizationService
+
+        vectorizer = ImageVectorizationService()
+        return MicroBatcher(
+            name="clip_text",
+            batch_fn=vectorizer.generate_clip_text_embeddings,
+            max_batch_size=settings.CLIP_TEXT_BATCH_MAX_SIZE,
+            max_wait_ms=settings.INFERENCE_BATCH_MAX_WAIT_MS,
+            max_queue_size=settings.INFERENCE_BATCH_MAX_QUEUE,
+        )
+
+    return get_batcher("clip_text", _factory)
+
+
+def get_inference_stats() -> Dict[str, Any]:
+    """所有已创建批处理器的指标快照"""
+    return {name: batcher.stats() for name, batcher in list(_batchers.items())}
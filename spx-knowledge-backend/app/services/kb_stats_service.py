@@ -0,0 +1,263 @@
+"""
+Knowledge Base Stats Service
+知识库聚合统计（knowledge_base_stats）：文档数、完成数、分块数、图片数、存储占用、最近入库时间
+
+- 增量：文档生命周期钩子计算文档当前贡献，与 Document.meta["kb_stats"] 中记录的上次贡献求差，
+  以原子 UPDATE（col = col + delta）累加到知识库统计行；重复调用幂等，重新处理文档不会重复计数
+- 对账：按知识库分组重算并覆盖漂移的统计行（定时任务 reconcile_knowledge_base_stats_task）
+- 读取：列表接口 LEFT JOIN knowledge_base_stats（knowledge_base_id 唯一索引），不再按文档分组统计
+"""
+
+import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.constants import DOC_STATUS_COMPLETED
+from app.core.logging import logger
+from app.models.chunk import DocumentChunk
+from app.models.document import Document
+from app.models.image import DocumentImage
+from app.models.knowledge_base import KnowledgeBase
+from app.models.knowledge_base_stats import KnowledgeBaseStats
+
+STATS_FIELDS = ("document_count", "completed_document_count", "chunk_count", "image_count", "storage_bytes")
+_META_KEY = "kb_stats"
+_RECONCILE_BATCH = 500
+
+
+def empty_stats() -> Dict[str, Any]:
+    return {**dict.fromkeys(STATS_FIELDS, 0), "last_ingested_at": None}
+
+
+def stats_to_dict(row: Optional[KnowledgeBaseStats]) -> Dict[str, Any]:
+    """统计行 -> 字典（无统计行时全部为 0）"""
+    if row is None:
+        return empty_stats()
+    data = {field: int(getattr(row, field) or 0) for field in STATS_FIELDS}
+    data["last_ingested_at"] = row.last_ingested_at
+    return data
+
+
+class KnowledgeBaseStatsService:
+    """知识库聚合统计服务"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    # ---------------- 增量维护 ----------------
+
+    def _ensure_row(self, kb_id: int) -> None:
+        exists = self.db.query(KnowledgeBaseStats.id).filter(KnowledgeBaseStats.knowledge_base_id == kb_id).first()
+        if exists:
+            return
+        try:
+            with self.db.begin_nested():
+                self.db.add(KnowledgeBaseStats(knowledge_base_id=kb_id))
+        except IntegrityError:
+            # 并发写入方已创建统计行
+            pass
+
+    def apply_delta(
+        self,
+        kb_id: int,
+        delta: Dict[str, int],
+        ingested_at: Optional[datetime.datetime] = None,
+        commit: bool = True,
+    ) -> None:
+        """原子累加统计差值（col = col + delta），统计行不存在时先创建"""
+        values: Dict[Any, Any] = {
+            getattr(KnowledgeBaseStats, field): getattr(KnowledgeBaseStats, field) + int(value)
+            for field, value in delta.items()
+            if field in STATS_FIELDS and value
+        }
+        if ingested_at is not None:
+            values[KnowledgeBaseStats.last_ingested_at] = ingested_at
+        if not values:
+            return
+        self._ensure_row(kb_id)
+        self.db.query(KnowledgeBaseStats).filter(KnowledgeBaseStats.knowledge_base_id == kb_id).update(
+            values, synchronize_session=False
+        )
+        if commit:
+            self.db.commit()
+
+    def document_contribution(self, document: Document) -> Dict[str, int]:
+        """文档当前对知识库统计的贡献（已删除文档贡献为 0）"""
+        if document.is_deleted:
+            return dict.fromkeys(STATS_FIELDS, 0)
+        chunk_count = (
+            self.db.query(func.count(DocumentChunk.id))
+            .filter(DocumentChunk.document_id == document.id, DocumentChunk.is_deleted == False)  # noqa: E712
+            .scalar()
+        )
+        image_count, image_bytes = (
+            self.db.query(func.count(DocumentImage.id), func.coalesce(func.sum(DocumentImage.file_size), 0))
+            .filter(DocumentImage.document_id == document.id, DocumentImage.is_deleted == False)  # noqa: E712
+            .one()
+        )
+        return {
+            "document_count": 1,
+            "completed_document_count": 1 if document.status == DOC_STATUS_COMPLETED else 0,
+            "chunk_count": int(chunk_count or 0),
+            "image_count": int(image_count or 0),
+            "storage_bytes": int(document.file_size or 0) + int(image_bytes or 0),
+        }
+
+    def sync_document(self, document: Document, ingested: bool = False) -> Dict[str, int]:
+        """
+        按文档当前贡献与上次记录的差值更新知识库统计，并把本次贡献（含所属知识库）写回 Document.meta["kb_stats"]
+        会锁定并重新加载文档行，调用前需先提交对文档的修改；ingested=True 时刷新最近入库时间
+        """
+        self.db.query(Document).filter(Document.id == document.id).with_for_update().populate_existing().first()
+        meta = document.meta or {}
+        meta = dict(meta) if isinstance(meta, dict) else {}
+        recorded = meta.get(_META_KEY) if isinstance(meta.get(_META_KEY), dict) else {}
+        current = self.document_contribution(document)
+        recorded_kb = recorded.get("knowledge_base_id") or document.knowledge_base_id
+        if recorded_kb != document.knowledge_base_id:
+            # 文档已移动到其他知识库：从原知识库扣除上次贡献，新知识库计入全部贡献
+            self.apply_delta(
+                recorded_kb, {field: -int(recorded.get(field) or 0) for field in STATS_FIELDS}, commit=False
+            )
+            recorded = {}
+        delta = {field: current[field] - int(recorded.get(field) or 0) for field in STATS_FIELDS}
+        meta[_META_KEY] = {**current, "knowledge_base_id": document.knowledge_base_id}
+        document.meta = meta
+        self.apply_delta(
+            document.knowledge_base_id,
+            delta,
+            ingested_at=datetime.datetime.utcnow() if ingested else None,
+            commit=False,
+        )
+        self.db.commit()
+        return delta
+
+    def remove_document(self, document: Document) -> None:
+        """
+        文档删除前调用：从记录的知识库扣除 Document.meta["kb_stats"] 中记录的贡献并清除记录
+        （不提交，与删除操作同一事务）；之后再同步已删除文档时贡献为 0，不会重复扣除
+        """
+        self.db.query(Document).filter(Document.id == document.id).with_for_update().populate_existing().first()
+        meta = document.meta or {}
+        meta = dict(meta) if isinstance(meta, dict) else {}
+        recorded = meta.pop(_META_KEY, None)
+        if not isinstance(recorded, dict):
+            return
+        self.apply_delta(
+            recorded.get("knowledge_base_id") or document.knowledge_base_id,
+            {field: -int(recorded.get(field) or 0) for field in STATS_FIELDS},
+            commit=False,
+        )
+        document.meta = meta
+
+    # ---------------- 读取 ----------------
+
+    def get_stats(self, kb_id: int) -> Dict[str, Any]:
+        row = self.db.query(KnowledgeBaseStats).filter(KnowledgeBaseStats.knowledge_base_id == kb_id).first()
+        return stats_to_dict(row)
+
+    # ---------------- 对账 ----------------
+
+    def _expected_stats(self, kb_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """按知识库分组重算统计（三次分组查询）"""
+        expected = {kb_id: empty_stats() for kb_id in kb_ids}
+        completed = Document.status == DOC_STATUS_COMPLETED
+        doc_rows = (
+            self.db.query(
+                Document.knowledge_base_id,
+                func.count(Document.id),
+                func.coalesce(func.sum(case((completed, 1), else_=0)), 0),
+                func.coalesce(func.sum(Document.file_size), 0),
+                func.max(case((completed, Document.updated_at), else_=None)),
+            )
+            .filter(Document.knowledge_base_id.in_(kb_ids), Document.is_deleted == False)  # noqa: E712
+            .group_by(Document.knowledge_base_id)
+            .all()
+        )
+        for kb_id, doc_count, completed_count, file_bytes, last_completed in doc_rows:
+            stats = expected[kb_id]
+            stats["document_count"] = int(doc_count or 0)
+            stats["completed_document_count"] = int(completed_count or 0)
+            stats["storage_bytes"] += int(file_bytes or 0)
+            stats["last_ingested_at"] = last_completed
+
+        chunk_rows = (
+            self.db.query(Document.knowledge_base_id, func.count(DocumentChunk.id))
+            .join(Document, DocumentChunk.document_id == Document.id)
+            .filter(
+                Document.knowledge_base_id.in_(kb_ids),
+                Document.is_deleted == False,  # noqa: E712
+                DocumentChunk.is_deleted == False,  # noqa: E712
+            )
+            .group_by(Document.knowledge_base_id)
+            .all()
+        )
+        for kb_id, chunk_count in chunk_rows:
+            expected[kb_id]["chunk_count"] = int(chunk_count or 0)
+
+        image_rows = (
+            self.db.query(
+                Document.knowledge_base_id,
+                func.count(DocumentImage.id),
+                func.coalesce(func.sum(DocumentImage.file_size), 0),
+            )
+            .join(Document, DocumentImage.document_id == Document.id)
+            .filter(
+                Document.knowledge_base_id.in_(kb_ids),
+                Document.is_deleted == False,  # noqa: E712
+                DocumentImage.is_deleted == False,  # noqa: E712
+            )
+            .group_by(Document.knowledge_base_id)
+            .all()
+        )
+        for kb_id, image_count, image_bytes in image_rows:
+            expected[kb_id]["image_count"] = int(image_count or 0)
+            expected[kb_id]["storage_bytes"] += int(image_bytes or 0)
+        return expected
+
+    def reconcile(self, kb_ids: Optional[Iterable[int]] = None) -> Dict[str, int]:
+        """重算知识库统计并修正漂移，返回 {"checked": 知识库数, "corrected": 修正数}"""
+        query = self.db.query(KnowledgeBase.id).filter(KnowledgeBase.is_deleted == False)  # noqa: E712
+        if kb_ids is not None:
+            query = query.filter(KnowledgeBase.id.in_(list(kb_ids)))
+        all_ids = sorted(kb_id for (kb_id,) in query.all())
+
+        checked = corrected = 0
+        now = datetime.datetime.utcnow()
+        for start in range(0, len(all_ids), _RECONCILE_BATCH):
+            batch = all_ids[start:start + _RECONCILE_BATCH]
+            expected = self._expected_stats(batch)
+            rows = {
+                row.knowledge_base_id: row
+                for row in self.db.query(KnowledgeBaseStats)
+                .filter(KnowledgeBaseStats.knowledge_base_id.in_(batch))
+                .with_for_update()
+                .all()
+            }
+            for kb_id in batch:
+                stats = expected[kb_id]
+                row = rows.get(kb_id)
+                if row is None:
+                    row = KnowledgeBaseStats(knowledge_base_id=kb_id)
+                    self.db.add(row)
+                drift = {
+                    field: (getattr(row, field) or 0, stats[field])
+                    for field in STATS_FIELDS
+                    if int(getattr(row, field) or 0) != stats[field]
+                }
+                if drift and kb_id in rows:
+                    logger.info(f"[知识库统计] 对账修正 kb={kb_id}: {drift}")
+                if drift or kb_id not in rows:
+                    corrected += 1
+                for field in STATS_FIELDS:
+                    setattr(row, field, stats[field])
+                # 最近入库时间以增量记录为准，缺失或已无完成文档时取重算值
+                if row.last_ingested_at is None or not stats["completed_document_count"]:
+                    row.last_ingested_at = stats["last_ingested_at"]
+                row.reconciled_at = now
+            self.db.commit()
+            checked += len(batch)
+        return {"checked": checked, "corrected": corrected}
@@ -2,17 +2,20 @@
 Knowledge Base Service
 """
 
+import asyncio
 from typing import List, Optional, Tuple, Dict, Any
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_, and_
 from app.models.knowledge_base import KnowledgeBase
 from app.models.knowledge_base_category import KnowledgeBaseCategory
 from app.models.knowledge_base_member import KnowledgeBaseMember
+from app.models.knowledge_base_stats import KnowledgeBaseStats
 from app.schemas.knowledge_base import KnowledgeBaseCreate, KnowledgeBaseUpdate
-from app.models.document import Document
 from app.core.exceptions import CustomException, ErrorCode
 from app.services.base import BaseService
+from app.services.kb_stats_service import stats_to_dict
 from app.services.permission_service import ROLE_ACTION_MATRIX
+from app.services.vector_index_profiles import DEFAULT_PROFILE, resolve_profile_name
 
 class KnowledgeBaseService(BaseService[KnowledgeBase]):
     """知识库服务"""
@@ -28,6 +31,38 @@ class KnowledgeBaseService(BaseService[KnowledgeBase]):
         """获取知识库列表"""
         return await self.get_multi(skip=skip, limit=limit)
 
+    @staticmethod
+    def _list_item(
+        kb: KnowledgeBase,
+        category_name: Optional[str],
+        role: Optional[str],
+        stats: Optional[KnowledgeBaseStats],
+    ) -> Dict[str, Any]:
+        """列表项（含聚合统计）"""
+        agg = stats_to_dict(stats)
+        return {
+            "id": kb.id,
+            "name": kb.name,
+            "description": kb.description,
+            "category_id": kb.category_id,
+            "category_name": category_name,
+            "is_active": kb.is_active,
+            "visibility": getattr(kb, "visibility", "private"),
+            "vector_profile": kb.vector_profile,
+            "role": role,
+            "created_at": kb.created_at,
+            "updated_at": kb.updated_at,
+            # 保持对前端兼容：document_count 沿用总数
+            "document_count": agg["document_count"],
+            # 额外提供两个口径，前端可按需展示
+            "doc_count_total": agg["document_count"],
+            "doc_count_completed": agg["completed_document_count"],
+            "chunk_count": agg["chunk_count"],
+            "image_count": agg["image_count"],
+            "storage_size": agg["storage_bytes"],
+            "last_ingested_at": agg["last_ingested_at"],
+        }
+
     async def get_knowledge_bases_paginated(
         self,
         page: int = 1,
@@ -102,36 +137,10 @@ class KnowledgeBaseService(BaseService[KnowledgeBase]):
             )
         total = total_query.scalar()
 
-        # 文档数统计子查询（未删除总数 与 已完成数）
-        total_sub = (
-            self.db.query(
-                Document.knowledge_base_id.label("kb_id"),
-                func.count(Document.id).label("doc_count_total")
-            )
-            .filter(Document.is_deleted == False)
-            .group_by(Document.knowledge_base_id)
-            .subquery()
-        )
-        completed_sub = (
-            self.db.query(
-                Document.knowledge_base_id.label("kb_id"),
-                func.count(Document.id).label("doc_count_completed")
-            )
-            .filter(Document.is_deleted == False, Document.status == 'completed')
-            .group_by(Document.knowledge_base_id)
-            .subquery()
-        )
-
-        # 附加计数字段后再查询
+        # 统计字段来自物化的 knowledge_base_stats（knowledge_base_id 唯一索引），不再按文档分组计数
         rows_query = (
-            base_query.add_columns(
-                func.coalesce(total_sub.c.doc_count_total, 0).label("doc_count_total"),
-                func.coalesce(
-                    completed_sub.c.doc_count_completed, 0
-                ).label("doc_count_completed"),
-            )
-            .outerjoin(total_sub, total_sub.c.kb_id == KnowledgeBase.id)
-            .outerjoin(completed_sub, completed_sub.c.kb_id == KnowledgeBase.id)
+            base_query.add_columns(KnowledgeBaseStats)
+            .outerjoin(KnowledgeBaseStats, KnowledgeBaseStats.knowledge_base_id == KnowledgeBase.id)
             .order_by(KnowledgeBase.created_at.desc())
         )
         
@@ -139,7 +148,7 @@ class KnowledgeBaseService(BaseService[KnowledgeBase]):
         if require_permission:
             all_rows = rows_query.all()
             filtered_items: List[Dict[str, Any]] = []
-            for kb, category_name, member_role, doc_count_total, doc_count_completed in all_rows:
+            for kb, category_name, member_role, stats in all_rows:
                 # 角色优先级：owner > admin > editor > viewer
                 effective_role = member_role
                 if user_id is not None and kb.user_id == user_id:
@@ -151,21 +160,7 @@ class KnowledgeBaseService(BaseService[KnowledgeBase]):
                     # 跳过没有该权限的知识库
                     continue
                 
-                filtered_items.append({
-                    "id": kb.id,
-                    "name": kb.name,
-                    "description": kb.description,
-                    "category_id": kb.category_id,
-                    "category_name": category_name,
-                    "is_active": kb.is_active,
-                    "visibility": getattr(kb, "visibility", "private"),
-                    "role": effective_role,
-                    "created_at": kb.created_at,
-                    "updated_at": kb.updated_at,
-                    "document_count": int(doc_count_total or 0),
-                    "doc_count_total": int(doc_count_total or 0),
-                    "doc_count_completed": int(doc_count_completed or 0),
-                })
+                filtered_items.append(self._list_item(kb, category_name, effective_role, stats))
             
             # 重新计算过滤后的总数
             total = len(filtered_items)
@@ -176,29 +171,13 @@ class KnowledgeBaseService(BaseService[KnowledgeBase]):
             # 不需要权限过滤，正常分页查询
             rows = rows_query.offset(skip).limit(size).all()
             items: List[Dict[str, Any]] = []
-            for kb, category_name, member_role, doc_count_total, doc_count_completed in rows:
+            for kb, category_name, member_role, stats in rows:
                 # 角色优先级：owner > admin > editor > viewer
                 effective_role = member_role
                 if user_id is not None and kb.user_id == user_id:
                     effective_role = "owner"
 
-                items.append({
-                    "id": kb.id,
-                    "name": kb.name,
-                    "description": kb.description,
-                    "category_id": kb.category_id,
-                    "category_name": category_name,
-                    "is_active": kb.is_active,
-                    "visibility": getattr(kb, "visibility", "private"),
-                    "role": effective_role,
-                    "created_at": kb.created_at,
-                    "updated_at": kb.updated_at,
-                    # 保持对前端兼容：document_count 沿用总数
-                    "document_count": int(doc_count_total or 0),
-                    # 额外提供两个口径，前端可按需展示
-                    "doc_count_total": int(doc_count_total or 0),
-                    "doc_count_completed": int(doc_count_completed or 0),
-                })
+                items.append(self._list_item(kb, category_name, effective_role, stats))
             return items, total
     
     async def get_knowledge_base(self, kb_id: int) -> Optional[KnowledgeBase]:
@@ -222,8 +201,24 @@ class KnowledgeBaseService(BaseService[KnowledgeBase]):
         existing = query.first()
         if existing:
             raise CustomException(code=ErrorCode.VALIDATION_ERROR, message="知识库名称已存在")
+        data = kb_data.dict(exclude_none=True, exclude_unset=True)
+        try:
+            data["vector_profile"] = resolve_profile_name(kb_data.vector_profile)
+        except ValueError as e:
+            raise CustomException(code=ErrorCode.VALIDATION_ERROR, message=str(e))
+        if data["vector_profile"] != DEFAULT_PROFILE:
+            # 预先创建配置档索引：集群版本不支持该引擎 / 量化时拒绝创建，避免知识库建成后每次写入失败
+            from app.services.opensearch_service import OpenSearchService
+
+            try:
+                await asyncio.to_thread(OpenSearchService().ensure_profile_indices, data["vector_profile"])
+            except Exception as e:
+                raise CustomException(
+                    code=ErrorCode.VALIDATION_ERROR,
+                    message=f"当前 OpenSearch 集群不支持向量索引配置档 {data['vector_profile']}: {e}",
+                )
         # 排除 None/未提供的可选字段（如 category_name）
-        return await self.create(kb_data.dict(exclude_none=True, exclude_unset=True))
+        return await self.create(data)
     
     async def update_knowledge_base(
         self, 
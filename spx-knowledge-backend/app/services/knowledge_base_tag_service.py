@@ -3,7 +3,7 @@ Knowledge Base Tag Service
 根据文档处理流程设计实现知识库标签管理服务
 """
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, func
 from app.models.document import Document
@@ -106,6 +106,27 @@ class KnowledgeBaseTagService:
         }
         return colors.get(tag, "#909399")
     
+    def tag_document_frequencies(self, knowledge_base_id: Optional[int] = None) -> Tuple[Dict[str, int], int]:
+        """标签文档频率（每个标签出现在多少篇文档中）与带标签的文档总数，用于计算 IDF；可限定知识库"""
+        df: Dict[str, int] = {}
+        total = 0
+        query = self.db.query(Document.tags).filter(
+            and_(
+                Document.is_deleted == False,
+                Document.tags.isnot(None)
+            )
+        )
+        if knowledge_base_id is not None:
+            query = query.filter(Document.knowledge_base_id == knowledge_base_id)
+        rows = query.yield_per(1000)
+        for (tags,) in rows:
+            if not isinstance(tags, list) or not tags:
+                continue
+            total += 1
+            for tag in {str(t).strip() for t in tags if str(t).strip()}:
+                df[tag] = df.get(tag, 0) + 1
+        return df, total
+    
     def get_popular_tags(self, limit: int = 20) -> List[Dict[str, Any]]:
         """获取热门标签 - 根据设计文档实现"""
         try:
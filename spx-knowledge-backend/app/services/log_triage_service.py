@@ -0,0 +1,312 @@
+"""
+Log Triage Service
+诊断日志分诊：一次流式扫描完成级别识别、上下文截取、堆栈归并与重复事件去重
+- 严重级别与误报模式预编译为一个带命名分组的正则，每行只扫描一次；级别词只在级别位（行首 / 括号 / 键值 / 全大写）识别
+- 上下文窗口有界，内存占用与日志总行数无关（只保留事件与最近 max_lines 行）
+- 堆栈行（at ... / Caused by: / Traceback）归入前一条事件；按归一化模板指纹去重并计数
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from app.config.settings import settings
+
+LEVEL_INFO = 0
+LEVEL_WARNING = 1
+LEVEL_ERROR = 2
+LEVEL_FATAL = 3
+
+LEVEL_NAMES = {
+    LEVEL_INFO: "INFO",
+    LEVEL_WARNING: "WARNING",
+    LEVEL_ERROR: "ERROR",
+    LEVEL_FATAL: "FATAL",
+}
+
+_LEVEL_WORDS = r"fatal|critical|panic|emerg(?:ency)?|error|severe|warn(?:ing)?"
+
+# 单个正则完成分类：noise 命中表示误报（如 "no error"、"Error count: 0"）；
+# 级别词只在级别位识别（行首、括号内、level= / "level": 键值、全大写独立词），正文中的普通单词（如 "terror"）不算；
+# 另识别异常类名（NullPointerException / ValueError）、堆栈起始行与 OOM
+_SEVERITY_PATTERN = re.compile(
+    r"(?P<noise>\b(?:no|ignored|0)\s+(?:errors?|warnings?|exceptions?)\b"
+    r"|\b(?:errors?|failed|failures?)(?:\s+count)?\s*[=:]\s*0\b)"
+    rf"|^(?:\[[^\]]*\]\s*|[\d:.,TZ/+-]+\s+)*(?P<start>{_LEVEL_WORDS})\b"
+    rf"|[\[<(]\s*(?P<bracket>{_LEVEL_WORDS})\s*[\]>)]"
+    rf"|\b(?:level|lvl|severity|loglevel)\"?\s*[=:]\s*\"?(?P<keyed>{_LEVEL_WORDS})\b"
+    r"|(?-i:\b(?P<upper>FATAL|CRITICAL|PANIC|EMERG|ERROR|SEVERE|WARN|WARNING)\b)"
+    r"|(?P<error>(?-i:\b[A-Z][\w$]*(?:Exception|Error)\b)|\bexception in thread\b|^\s*caused by:|^traceback \(most recent call last\))"
+    r"|(?P<fatal>\boomkilled\b|\bout of memory\b)",
+    re.IGNORECASE,
+)
+
+_SLOT_GROUPS = ("start", "bracket", "keyed", "upper")
+_WORD_LEVELS = {
+    "fatal": LEVEL_FATAL,
+    "critical": LEVEL_FATAL,
+    "panic": LEVEL_FATAL,
+    "emerg": LEVEL_FATAL,
+    "emergency": LEVEL_FATAL,
+    "error": LEVEL_ERROR,
+    "severe": LEVEL_ERROR,
+    "warn": LEVEL_WARNING,
+    "warning": LEVEL_WARNING,
+}
+
+# 堆栈续行：Java "at ..."/"... N more"/"Caused by:"，Python Traceback 及其 File 行；允许多容器日志的 "[容器名] " 前缀
+_CONTINUATION_PATTERN = re.compile(
+    r"^(?:\[[^\]]+\]\s)?(?:\s+at\s|\s+\.\.\.\s\d+\s+more|\s+File\s\"|Caused by:|\s{4,}\S)"
+)
+
+# 指纹归一化：去掉时间戳、地址、UUID、IP、数字等每次都会变化的部分
+_FINGERPRINT_SUBS = [
+    (re.compile(r"^(?:\[[^\]]+\]\s)?\S*\d{4}-\d{2}-\d{2}[T\s]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?\s*"), ""),
+    (re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE), "<uuid>"),
+    (re.compile(r"\b0x[0-9a-f]+\b", re.IGNORECASE), "<hex>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<ip>"),
+    (re.compile(r"\b[0-9a-f]{16,}\b", re.IGNORECASE), "<id>"),
+    (re.compile(r"\d+"), "<n>"),
+    (re.compile(r"\s+"), " "),
+]
+
+_FINGERPRINT_FRAMES = 3
+
+
+def classify_line(line: str) -> int:
+    """返回日志行的严重级别（LEVEL_*）；命中误报模式的行视为普通日志"""
+    if not line:
+        return LEVEL_INFO
+    level = LEVEL_INFO
+    for match in _SEVERITY_PATTERN.finditer(line):
+        if match.group("noise"):
+            return LEVEL_INFO
+        if match.group("error"):
+            level = max(level, LEVEL_ERROR)
+        elif match.group("fatal"):
+            level = max(level, LEVEL_FATAL)
+        else:
+            word = next(match.group(name) for name in _SLOT_GROUPS if match.group(name))
+            level = max(level, _WORD_LEVELS[word.lower()])
+    return level
+
+
+def is_continuation(line: str) -> bool:
+    """是否为堆栈续行（归入上一条事件）"""
+    return bool(line) and _CONTINUATION_PATTERN.match(line) is not None
+
+
+def fingerprint(message: str, frames: Optional[List[str]] = None) -> str:
+    """按归一化模板计算事件指纹：同一错误反复出现（仅时间、ID、数字不同）时指纹相同"""
+    parts = [message[:300]] + list(frames or [])[:_FINGERPRINT_FRAMES]
+    normalized = []
+    for part in parts:
+        text = part.strip()
+        for pattern, replacement in _FINGERPRINT_SUBS:
+            text = pattern.sub(replacement, text)
+        normalized.append(text.strip().lower())
+    return hashlib.sha1("\n".join(normalized).encode("utf-8", "ignore")).hexdigest()[:16]
+
+
+def truncate_log_line(line: str, max_length: int) -> str:
+    """截断过长的日志行（保留前 90%，并注明截断的字符数）"""
+    if not line or len(line) <= max_length:
+        return line
+    truncate_at = int(max_length * 0.9)
+    return f"{line[:truncate_at]}... [TRUNCATED {len(line) - truncate_at} chars]"
+
+
+def entry_message(entry: Any) -> str:
+    """从日志系统返回的条目中取出消息文本"""
+    if isinstance(entry, dict):
+        message = entry.get("message") or entry.get("log") or str(entry)
+        return str(message)
+    return str(entry)
+
+
+class _Event:
+    __slots__ = ("index", "level", "message", "frames", "payload", "before", "after", "count", "last_index", "fingerprint")
+
+    def __init__(self, index: int, level: int, message: str, payload: Any, before: List[Tuple[int, str, Any]]):
+        self.index = index
+        self.level = level
+        self.message = message
+        self.frames: List[str] = []
+        self.payload = payload
+        self.before = before
+        self.after: List[Tuple[int, str, Any]] = []
+        self.count = 1
+        self.last_index = index
+        self.fingerprint = ""
+
+
+class LogTriage:
+    """
+    流式日志分诊器
+
+    用法：逐行 feed()（或 feed_many()），最后调用 finish() 取得结果；
+    payload 为原始条目（K8s 文本行或日志系统返回的字典），输出时原样带回
+    """
+
+    def __init__(
+        self,
+        max_lines: Optional[int] = None,
+        context_lines: Optional[int] = None,
+        max_line_length: Optional[int] = None,
+        max_frames: int = 8,
+        max_events: Optional[int] = None,
+    ):
+        self.max_lines = max_lines or settings.OBSERVABILITY_LOG_MAX_LINES
+        self.context_lines = settings.OBSERVABILITY_LOG_CONTEXT_LINES if context_lines is None else context_lines
+        self.max_line_length = max_line_length or settings.OBSERVABILITY_LOG_MAX_LINE_LENGTH
+        self.max_frames = max_frames
+        self.max_events = max_events or self.max_lines * 2
+
+        self._before: Deque[Tuple[int, str, Any]] = deque(maxlen=max(0, self.context_lines))
+        self._tail: Deque[Tuple[int, str, Any]] = deque(maxlen=self.max_lines)
+        self._events: Dict[str, _Event] = {}
+        self._open: Optional[_Event] = None
+        self._after_target: Optional[_Event] = None
+        self._after_remaining = 0
+        self._index = 0
+        self.stats = {
+            "total_lines": 0,
+            "priority_lines": 0,
+            "continuation_lines": 0,
+            "duplicates_suppressed": 0,
+            "events_dropped": 0,
+        }
+
+    # ---------------- 输入 ----------------
+
+    def feed(self, line: str, payload: Any = None) -> None:
+        if line is None or not str(line).strip():
+            return
+        idx = self._index
+        self._index += 1
+        self.stats["total_lines"] += 1
+        line = truncate_log_line(str(line).rstrip("\n"), self.max_line_length)
+        item = (idx, line, line if payload is None else payload)
+
+        if self._open is not None and is_continuation(line):
+            self.stats["continuation_lines"] += 1
+            if len(self._open.frames) < self.max_frames:
+                self._open.frames.append(line.strip())
+            return
+
+        self._close_open()
+        self._tail.append(item)
+
+        level = classify_line(line)
+        if level > LEVEL_INFO:
+            self.stats["priority_lines"] += 1
+            self._open = _Event(idx, level, line, item[2], list(self._before))
+            self._before.clear()
+            self._after_target = None
+            return
+
+        if self._after_target is not None and self._after_remaining > 0:
+            self._after_target.after.append(item)
+            self._after_remaining -= 1
+        self._before.append(item)
+
+    def feed_many(self, lines: Iterable[Any]) -> "LogTriage":
+        """批量输入：元素可以是文本行，也可以是日志系统条目（字典）"""
+        for item in lines:
+            if isinstance(item, dict):
+                self.feed(entry_message(item), item)
+            else:
+                self.feed(item)
+        return self
+
+    def _close_open(self) -> None:
+        event = self._open
+        if event is None:
+            return
+        self._open = None
+        event.fingerprint = fingerprint(event.message, event.frames)
+        existing = self._events.get(event.fingerprint)
+        if existing is not None:
+            existing.count += 1
+            existing.last_index = event.index
+            self.stats["duplicates_suppressed"] += 1
+            return
+        if len(self._events) >= self.max_events:
+            self.stats["events_dropped"] += 1
+            return
+        self._events[event.fingerprint] = event
+        self._after_target = event
+        self._after_remaining = self.context_lines
+
+    # ---------------- 输出 ----------------
+
+    def finish(self) -> "TriageResult":
+        self._close_open()
+        return TriageResult(self, list(self._events.values()), list(self._tail))
+
+
+class TriageResult:
+    """分诊结果：按时间顺序的精简日志（timeline）与按优先级排序的摘录（excerpts）"""
+
+    def __init__(self, triage: LogTriage, events: List[_Event], tail: List[Tuple[int, str, Any]]):
+        self.max_lines = triage.max_lines
+        # 严重级别优先，其次重复次数，再次最近出现
+        self.events = sorted(events, key=lambda e: (-e.level, -e.count, -e.last_index))
+        self.tail = tail
+        self.stats = dict(triage.stats, unique_events=len(events))
+
+    @staticmethod
+    def _event_text(event: _Event) -> str:
+        if not event.frames:
+            return event.message
+        return "\n".join([event.message] + [f"    {frame}" for frame in event.frames])
+
+    def timeline(self, max_lines: Optional[int] = None) -> List[Tuple[Any, str, int]]:
+        """
+        精简后的日志（按原始顺序），返回 (payload, message, repeat_count) 列表
+        先保留各事件本身，再按距离由近及远补充上下文；没有告警/错误时返回最近的日志
+        """
+        budget = max_lines or self.max_lines
+        if not self.events:
+            return [(payload, message, 1) for _, message, payload in self.tail[-budget:]]
+
+        selected: Dict[int, Tuple[Any, str, int]] = {}
+        kept: List[Tuple[int, _Event]] = []
+        for rank, event in enumerate(self.events):
+            if len(selected) >= budget:
+                break
+            selected[event.index] = (event.payload, self._event_text(event), event.count)
+            kept.append((rank, event))
+
+        # 上下文按与事件的距离由近及远、事件优先级由高到低补充
+        candidates = sorted(
+            (abs(idx - event.index), rank, idx, message, payload)
+            for rank, event in kept
+            for idx, message, payload in event.before + event.after
+        )
+        for _, _, idx, message, payload in candidates:
+            if len(selected) >= budget:
+                break
+            if idx not in selected:
+                selected[idx] = (payload, message, 1)
+        return [selected[idx] for idx in sorted(selected)]
+
+    def excerpts(self, limit: Optional[int] = None, context_lines: int = 2) -> List[Dict[str, Any]]:
+        """按优先级排序的精简摘录，供 LLM Prompt 使用"""
+        limit = limit or settings.OBSERVABILITY_LOG_MAX_EXCERPTS
+        items = []
+        for event in self.events[:limit]:
+            payload = event.payload if isinstance(event.payload, dict) else {}
+            items.append({
+                "severity": LEVEL_NAMES[event.level],
+                "count": event.count,
+                "message": self._event_text(event),
+                "timestamp": payload.get("timestamp") or payload.get("@timestamp"),
+                "context_before": [message for _, message, _ in event.before[-context_lines:]] if context_lines else [],
+                "context_after": [message for _, message, _ in event.after[:context_lines]] if context_lines else [],
+                "fingerprint": event.fingerprint,
+            })
+        return items
@@ -189,21 +189,18 @@ class PrometheusMetricsService:
         if isinstance(query_preview, str) and len(query_preview) > 100:
             query_preview = query_preview[:100] + "..."
         
-        logger.warning(
-            f"[Prometheus请求详情] base_url={self.base_url}, path={path}, "
-            f"完整URL={url}, 超时={timeout}秒, 认证类型={self.auth_type}, "
-            f"查询参数={query_preview}, "
-            f"时间范围参数: start={params.get('start', 'N/A')}, end={params.get('end', 'N/A')}, step={params.get('step', 'N/A')}"
+        logger.debug(
+            "[Prometheus请求详情] base_url=%s, path=%s, 完整URL=%s, 超时=%s秒, 认证类型=%s, 查询参数=%s, "
+            "时间范围参数: start=%s, end=%s, step=%s",
+            self.base_url, path, url, timeout, self.auth_type, query_preview,
+            params.get('start', 'N/A'), params.get('end', 'N/A'), params.get('step', 'N/A'),
         )
         
         # 增加超时时间，特别是对于 query_range 请求
         actual_timeout = timeout
         if path == "/api/v1/query_range":
             actual_timeout = max(timeout, 30)  # query_range 至少 30 秒超时
-            logger.warning(
-                f"[Prometheus请求] query_range 请求，增加超时时间至 {actual_timeout} 秒。"
-                f"如果仍然超时，可能需要检查 Prometheus 服务性能或减小查询时间范围"
-            )
+            logger.debug("[Prometheus请求] query_range 请求，超时时间调整为 %s 秒", actual_timeout)
 
         # Prometheus 通常在内网环境，禁用代理以避免反向代理问题（与健康检查逻辑一致）
         import os
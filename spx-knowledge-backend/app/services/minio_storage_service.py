@@ -4,8 +4,9 @@ MinIO Storage Service
 """
 
 import os
+import threading
 from datetime import datetime
-from typing import Dict, Any, Optional, BinaryIO
+from typing import Dict, Any, Optional, BinaryIO, Iterator
 from minio import Minio
 from minio.error import S3Error
 from fastapi import UploadFile
@@ -16,6 +17,10 @@ from app.core.exceptions import CustomException, ErrorCode
 class MinioStorageService:
     """MinIO存储服务 - 严格按照设计文档实现存储结构"""
     
+    # 已确认存在的存储桶（进程级），避免每次实例化都发起 bucket_exists 网络请求
+    _checked_buckets = set()
+    _bucket_lock = threading.Lock()
+    
     def __init__(self):
         self.client = Minio(
             endpoint=settings.MINIO_ENDPOINT,
@@ -27,7 +32,16 @@ class MinioStorageService:
         self._ensure_bucket_exists()
     
     def _ensure_bucket_exists(self):
-        """确保存储桶存在"""
+        """确保存储桶存在（每个进程每个存储桶只检查一次）"""
+        if self.bucket_name in MinioStorageService._checked_buckets:
+            return
+        with MinioStorageService._bucket_lock:
+            if self.bucket_name in MinioStorageService._checked_buckets:
+                return
+            self._check_bucket()
+            MinioStorageService._checked_buckets.add(self.bucket_name)
+    
+    def _check_bucket(self):
         try:
             if not self.client.bucket_exists(self.bucket_name):
                 self.client.make_bucket(self.bucket_name)
@@ -474,6 +488,39 @@ class MinioStorageService:
                 message=f"文件下载失败: {str(e)}"
             )
     
+    def stat_file(self, object_name: str):
+        """获取对象元信息（大小、ETag、最后修改时间、Content-Type），不下载内容"""
+        try:
+            return self.client.stat_object(self.bucket_name, object_name)
+        except S3Error as e:
+            logger.warning(f"MinIO对象元信息获取失败: {object_name} - {e}")
+            raise CustomException(
+                code=ErrorCode.MINIO_DOWNLOAD_FAILED,
+                message=f"文件不存在或无法访问: {str(e)}"
+            )
+
+    def iter_file(
+        self,
+        object_name: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        chunk_size: int = 64 * 1024,
+    ) -> Iterator[bytes]:
+        """
+        分块流式读取对象（可指定字节区间），用于代理大文件，避免整体读入内存。
+        生成器结束或被提前关闭时都会释放 MinIO 连接。
+        """
+        kwargs: Dict[str, Any] = {"offset": offset}
+        if length:
+            kwargs["length"] = length
+        response = self.client.get_object(self.bucket_name, object_name, **kwargs)
+        try:
+            for data in response.stream(chunk_size):
+                yield data
+        finally:
+            response.close()
+            response.release_conn()
+
     def delete_file(self, object_name: str) -> bool:
         """删除文件 - 根据设计文档实现"""
         try:
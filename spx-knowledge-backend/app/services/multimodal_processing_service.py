@@ -11,8 +11,6 @@ from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 import numpy as np
 from PIL import Image
-import cv2
-import torch
 from fastapi import UploadFile
 from sqlalchemy.orm import Session
 
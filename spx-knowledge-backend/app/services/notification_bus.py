@@ -0,0 +1,149 @@
+"""
+Notification Bus
+跨进程 WebSocket 通知：任意进程（API worker / Celery worker）按用户发布到 Redis 频道，
+每个 API 进程只订阅一次（模式订阅），收到后交给本进程的 WebSocketNotificationService 投递到本地连接
+
+- 频道：{WS_CHANNEL_PREFIX}user:{user_id}；广播：{WS_CHANNEL_PREFIX}broadcast
+- 消息可带 coalesce_key：同一连接尚未发出的同 key 消息只保留最新一条（高频进度事件）
+"""
+
+import asyncio
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from app.config.settings import settings
+from app.core.logging import logger
+
+_USER = "user:"
+_BROADCAST = "broadcast"
+
+
+def user_channel(user_id: Any) -> str:
+    return f"{settings.WS_CHANNEL_PREFIX}{_USER}{user_id}"
+
+
+def broadcast_channel() -> str:
+    return f"{settings.WS_CHANNEL_PREFIX}{_BROADCAST}"
+
+
+def _encode(message: Dict[str, Any]) -> str:
+    return json.dumps(message, ensure_ascii=False, default=str)
+
+
+def _channel_for(user_id: Optional[Any]) -> str:
+    return user_channel(user_id) if user_id is not None else broadcast_channel()
+
+
+def publish_sync(user_id: Optional[Any], message: Dict[str, Any], client=None) -> int:
+    """同步发布（Celery 任务等同步调用方），user_id 为 None 时广播；返回收到消息的订阅进程数"""
+    if client is None:
+        from app.core.cache import cache_manager
+
+        client = cache_manager.sync.client
+    return client.publish(_channel_for(user_id), _encode(message))
+
+
+async def publish(user_id: Optional[Any], message: Dict[str, Any], client=None) -> int:
+    """异步发布（请求路径），user_id 为 None 时广播"""
+    if client is None:
+        from app.core.cache import cache_manager
+
+        client = cache_manager.client
+    return await client.publish(_channel_for(user_id), _encode(message))
+
+
+def notify_document_progress(document, message: str = "", client=None) -> None:
+    """文档处理状态 / 进度变化后调用：发布给上传用户，同一文档未发出的进度事件只保留最新（失败只记录日志）"""
+    if not settings.WS_FANOUT_ENABLED or getattr(document, "user_id", None) is None:
+        return
+    try:
+        publish_sync(
+            document.user_id,
+            {
+                "type": "document_status",
+                "document_id": document.id,
+                "knowledge_base_id": document.knowledge_base_id,
+                "status": document.status,
+                "progress": float(document.processing_progress or 0),
+                "error_message": document.error_message,
+                "message": message,
+                "timestamp": datetime.now().isoformat(),
+                "coalesce_key": f"document_status:{document.id}",
+            },
+            client=client,
+        )
+    except Exception as e:
+        logger.debug(f"[通知] 发布文档进度失败 document_id={document.id}: {e}")
+
+
+class NotificationSubscriber:
+    """
+    进程级订阅：模式订阅 {WS_CHANNEL_PREFIX}*，把消息交给 deliver(user_id, message)（广播时 user_id 为 None）
+    连接异常时等待后继续读取（redis-py 重连时自动恢复订阅）
+    """
+
+    def __init__(self, deliver: Callable[[Optional[str], Dict[str, Any]], None], client=None):
+        self._deliver = deliver
+        self._client = client
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        if self._client is None:
+            import redis.asyncio as redis_asyncio
+
+            # 订阅连接长期阻塞读取，不与缓存连接池共用（缓存连接有 socket_timeout）
+            self._client = redis_asyncio.Redis.from_url(settings.REDIS_URL)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.psubscribe(f"{settings.WS_CHANNEL_PREFIX}*")
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"[通知] 已订阅 {settings.WS_CHANNEL_PREFIX}* 频道")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.punsubscribe()
+                await self._pubsub.aclose()
+            except Exception as e:
+                logger.debug(f"[通知] 关闭订阅失败: {e}")
+            self._pubsub = None
+
+    def _dispatch(self, raw: Dict[str, Any]) -> None:
+        channel = raw.get("channel")
+        channel = channel.decode() if isinstance(channel, bytes) else str(channel)
+        name = channel[len(settings.WS_CHANNEL_PREFIX):]
+        if name == _BROADCAST:
+            user_id = None
+        elif name.startswith(_USER):
+            user_id = name[len(_USER):]
+        else:
+            return
+        message = json.loads(raw.get("data"))
+        if isinstance(message, dict):
+            self._deliver(user_id, message)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                raw = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if raw is not None:
+                    self._dispatch(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[通知] 读取订阅消息失败，1 秒后重试: {e}")
+                await asyncio.sleep(1)
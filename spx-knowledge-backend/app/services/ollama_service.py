@@ -9,6 +9,7 @@ import json
 import time
 from app.config.settings import settings
 from app.core.logging import logger
+from app.core.tracing import KIND_RETRIEVAL, observe_stage
 import base64
 
 class OllamaService:
@@ -80,6 +81,7 @@ class OllamaService:
     ) -> str:
         """聊天完成"""
         try:
+            started = time.perf_counter()
             response = requests.post(
                 f"{self.base_url}/api/chat",
                 json={
@@ -90,6 +92,7 @@ class OllamaService:
             )
             response.raise_for_status()
             result = response.json()
+            observe_stage(KIND_RETRIEVAL, "llm_total", time.perf_counter() - started)
             return result.get("message", {}).get("content", "")
         except Exception as e:
             print(f"Ollama聊天完成错误: {e}")
@@ -178,6 +181,8 @@ class OllamaService:
         try:
             # 在线程池中执行同步请求，避免阻塞事件循环
             loop = asyncio.get_event_loop()
+            started = time.perf_counter()
+            first_token_at: List[float] = []
             
             def _make_stream_request():
                 """在线程池中执行的同步请求"""
@@ -207,6 +212,8 @@ class OllamaService:
                             data = json.loads(line.decode('utf-8'))
                             content = data.get("message", {}).get("content", "")
                             done = data.get("done", False)
+                            if content and not first_token_at:
+                                first_token_at.append(time.perf_counter())
                             chunks.append((content, done))
                             if done:
                                 break
@@ -216,6 +223,9 @@ class OllamaService:
             
             # 在线程池中读取流
             chunks = await loop.run_in_executor(None, _read_stream)
+            if first_token_at:
+                observe_stage(KIND_RETRIEVAL, "llm_ttft", first_token_at[0] - started)
+            observe_stage(KIND_RETRIEVAL, "llm_total", time.perf_counter() - started)
             
             # 异步yield结果
             for content, done in chunks:
@@ -0,0 +1,303 @@
+"""
+ONNX Backend
+Rerank / CLIP 模型的 ONNX Runtime 推理后端（CPU）：导出、int8 动态量化、会话线程调优与一致性校验
+
+- 导出与量化为离线步骤（scripts/export_onnx_models.py），服务进程只加载 ONNX_MODELS_DIR 下的产物
+- 通过 RERANK_BACKEND / CLIP_BACKEND=onnx 按模型启用；产物缺失或 onnxruntime 未安装时回退 PyTorch
+- OnnxReranker 与 FlagReranker 接口一致（tokenizer / compute_score），OnnxClipEncoder 与 open_clip 模型
+  的 encode_image / encode_text 一致，调用方无需区分后端
+"""
+
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config.settings import settings
+from app.core.logging import logger
+
+RERANK_SUBDIR = "rerank"
+CLIP_SUBDIR = "clip"
+FP32_SUFFIX = ".onnx"
+INT8_SUFFIX = ".int8.onnx"
+CLIP_CONFIG_FILE = "clip_config.json"
+
+
+def model_dir(subdir: str) -> str:
+    return os.path.join(settings.ONNX_MODELS_DIR, subdir)
+
+
+def resolve_model_file(directory: str, stem: str, quantized: Optional[bool] = None) -> str:
+    """选择模型文件：启用量化且存在 int8 产物时优先使用，否则使用 fp32 产物"""
+    quantized = settings.ONNX_QUANTIZE if quantized is None else quantized
+    candidates = [stem + INT8_SUFFIX, stem + FP32_SUFFIX] if quantized else [stem + FP32_SUFFIX]
+    for name in candidates:
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"未找到 ONNX 模型: {os.path.join(directory, candidates[0])}")
+
+
+def create_session(model_path: str):
+    """创建 CPU 推理会话（线程数与自旋策略来自配置）"""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if settings.ONNX_INTRA_OP_THREADS > 0:
+        options.intra_op_num_threads = settings.ONNX_INTRA_OP_THREADS
+    if settings.ONNX_INTER_OP_THREADS > 0:
+        options.inter_op_num_threads = settings.ONNX_INTER_OP_THREADS
+    # 关闭线程自旋：请求间隙不空转占用 CPU（多进程共用节点时尤为重要）
+    if not settings.ONNX_ALLOW_SPINNING:
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        options.add_session_config_entry("session.inter_op.allow_spinning", "0")
+    return ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def quantize_int8(fp32_path: str) -> str:
+    """int8 动态量化（权重量化，激活在运行时量化），返回量化模型路径"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = fp32_path[: -len(FP32_SUFFIX)] + INT8_SUFFIX
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    logger.info(f"[ONNX] int8 动态量化完成: {int8_path}")
+    return int8_path
+
+
+# ---------------- Rerank ----------------
+
+class OnnxReranker:
+    """ONNX Runtime 版 cross-encoder，接口与 FlagReranker 一致"""
+
+    def __init__(self, directory: Optional[str] = None, quantized: Optional[bool] = None):
+        from transformers import AutoTokenizer
+
+        directory = directory or model_dir(RERANK_SUBDIR)
+        self.model_path = resolve_model_file(directory, "model", quantized)
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        self.session = create_session(self.model_path)
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"[ONNX] Rerank 模型已加载: {self.model_path}")
+
+    def compute_score(
+        self,
+        sentence_pairs: Sequence[Sequence[str]],
+        batch_size: int = 32,
+        max_length: int = 512,
+        normalize: bool = False,
+    ) -> List[float]:
+        if sentence_pairs and isinstance(sentence_pairs[0], str):
+            sentence_pairs = [sentence_pairs]
+        scores: List[float] = []
+        for start in range(0, len(sentence_pairs), max(1, batch_size)):
+            batch = sentence_pairs[start:start + batch_size]
+            encoded = self.tokenizer(
+                [p[0] for p in batch],
+                [p[1] for p in batch],
+                padding=True,
+                truncation=True,
+                max_length=max_length,
+                return_tensors="np",
+            )
+            feed = {k: v.astype(np.int64) for k, v in encoded.items() if k in self._input_names}
+            logits = self.session.run(None, feed)[0].reshape(len(batch), -1)[:, 0]
+            scores.extend(float(x) for x in logits)
+        if normalize:
+            scores = [1.0 / (1.0 + math.exp(-s)) for s in scores]
+        return scores
+
+
+def export_reranker(source: str, directory: Optional[str] = None, quantize: bool = True, opset: int = 17) -> str:
+    """将 HuggingFace cross-encoder（如 bge-reranker）导出为 ONNX，返回 fp32 模型路径"""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    directory = directory or model_dir(RERANK_SUBDIR)
+    os.makedirs(directory, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    model = AutoModelForSequenceClassification.from_pretrained(source).eval()
+    sample = tokenizer(["query"], ["passage"], padding=True, return_tensors="pt")
+    input_names = list(sample.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    fp32_path = os.path.join(directory, "model" + FP32_SUFFIX)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    tokenizer.save_pretrained(directory)
+    logger.info(f"[ONNX] Rerank 模型导出完成: {fp32_path}")
+    if quantize:
+        quantize_int8(fp32_path)
+    return fp32_path
+
+
+# ---------------- CLIP ----------------
+
+def _to_numpy(value: Any, dtype) -> np.ndarray:
+    if hasattr(value, "detach"):
+        value = value.detach().cpu().numpy()
+    return np.ascontiguousarray(value, dtype=dtype)
+
+
+def _like(reference: Any, array: np.ndarray):
+    """输入为 torch.Tensor 时输出也转换为 Tensor，与 open_clip 模型的返回类型一致"""
+    if hasattr(reference, "detach"):
+        import torch
+
+        return torch.from_numpy(array)
+    return array
+
+
+class OnnxClipEncoder:
+    """ONNX Runtime 版 CLIP 编码器（图像 / 文本两个会话），接口与 open_clip 模型一致"""
+
+    def __init__(self, directory: Optional[str] = None, quantized: Optional[bool] = None):
+        directory = directory or model_dir(CLIP_SUBDIR)
+        with open(os.path.join(directory, CLIP_CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config: Dict[str, Any] = json.load(f)
+        self.image_path = resolve_model_file(directory, "image_encoder", quantized)
+        self.text_path = resolve_model_file(directory, "text_encoder", quantized)
+        self.image_session = create_session(self.image_path)
+        self.text_session = create_session(self.text_path)
+        self._image_input = self.image_session.get_inputs()[0].name
+        self._text_input = self.text_session.get_inputs()[0].name
+        logger.info(f"[ONNX] CLIP 模型已加载: {self.image_path}, {self.text_path}")
+
+    @property
+    def image_size(self) -> int:
+        return int(self.config.get("image_size", 224))
+
+    @property
+    def mean(self) -> Optional[List[float]]:
+        return self.config.get("mean")
+
+    @property
+    def std(self) -> Optional[List[float]]:
+        return self.config.get("std")
+
+    def encode_image(self, images):
+        output = self.image_session.run(None, {self._image_input: _to_numpy(images, np.float32)})[0]
+        return _like(images, output)
+
+    def encode_text(self, tokens):
+        output = self.text_session.run(None, {self._text_input: _to_numpy(tokens, np.int64)})[0]
+        return _like(tokens, output)
+
+    # 与 torch 模型保持一致的空操作
+    def eval(self) -> "OnnxClipEncoder":
+        return self
+
+    def to(self, *args, **kwargs) -> "OnnxClipEncoder":
+        return self
+
+
+def export_clip(model, model_name: str, directory: Optional[str] = None, quantize: bool = True, opset: int = 17) -> List[str]:
+    """将已加载的 open_clip 模型拆分导出为图像 / 文本编码器 ONNX，返回 fp32 模型路径"""
+    import open_clip
+    import torch
+
+    directory = directory or model_dir(CLIP_SUBDIR)
+    os.makedirs(directory, exist_ok=True)
+    model = model.eval().to("cpu")
+
+    class _ImageEncoder(torch.nn.Module):
+        def __init__(self, clip):
+            super().__init__()
+            self.clip = clip
+
+        def forward(self, images):
+            return self.clip.encode_image(images)
+
+    class _TextEncoder(torch.nn.Module):
+        def __init__(self, clip):
+            super().__init__()
+            self.clip = clip
+
+        def forward(self, tokens):
+            return self.clip.encode_text(tokens)
+
+    try:
+        preprocess_cfg = open_clip.get_model_preprocess_cfg(model)
+    except Exception:
+        preprocess_cfg = {}
+    image_size = preprocess_cfg.get("size") or getattr(model.visual, "image_size", 224)
+    if isinstance(image_size, (list, tuple)):
+        image_size = image_size[0]
+    config = {
+        "model_name": model_name,
+        "image_size": int(image_size),
+        "mean": list(preprocess_cfg.get("mean") or open_clip.OPENAI_DATASET_MEAN),
+        "std": list(preprocess_cfg.get("std") or open_clip.OPENAI_DATASET_STD),
+    }
+
+    paths = []
+    dummy_image = torch.randn(1, 3, config["image_size"], config["image_size"])
+    dummy_tokens = open_clip.tokenize(["a photo"])
+    for name, module, dummy, input_name in (
+        ("image_encoder", _ImageEncoder(model), dummy_image, "images"),
+        ("text_encoder", _TextEncoder(model), dummy_tokens, "tokens"),
+    ):
+        path = os.path.join(directory, name + FP32_SUFFIX)
+        with torch.no_grad():
+            torch.onnx.export(
+                module,
+                (dummy,),
+                path,
+                input_names=[input_name],
+                output_names=["features"],
+                dynamic_axes={input_name: {0: "batch"}, "features": {0: "batch"}},
+                opset_version=opset,
+                do_constant_folding=True,
+            )
+        logger.info(f"[ONNX] CLIP {name} 导出完成: {path}")
+        if quantize:
+            quantize_int8(path)
+        paths.append(path)
+
+    with open(os.path.join(directory, CLIP_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    return paths
+
+
+# ---------------- 一致性校验 ----------------
+
+def _rank(values: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[np.argsort(values)] = np.arange(len(values))
+    return ranks
+
+
+def score_parity(reference: Sequence[float], candidate: Sequence[float]) -> Dict[str, float]:
+    """对比两组 rerank 分数：最大绝对误差与排序一致性（Spearman 相关系数）"""
+    ref = np.asarray(reference, dtype=np.float64)
+    cand = np.asarray(candidate, dtype=np.float64)
+    spearman = 1.0
+    if len(ref) > 1:
+        ref_rank, cand_rank = _rank(ref), _rank(cand)
+        spearman = float(np.corrcoef(ref_rank, cand_rank)[0, 1])
+    return {
+        "max_abs_diff": float(np.max(np.abs(ref - cand))) if len(ref) else 0.0,
+        "spearman": spearman,
+    }
+
+
+def embedding_parity(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """对比两组向量：逐行余弦相似度的最小值与均值"""
+    ref = np.asarray(reference, dtype=np.float64)
+    cand = np.asarray(candidate, dtype=np.float64)
+    ref = ref / np.linalg.norm(ref, axis=-1, keepdims=True)
+    cand = cand / np.linalg.norm(cand, axis=-1, keepdims=True)
+    cosine = np.sum(ref * cand, axis=-1)
+    return {"min_cosine": float(np.min(cosine)), "mean_cosine": float(np.mean(cosine))}
@@ -13,6 +13,69 @@ from opensearchpy.exceptions import OpenSearchException
 from app.config.settings import settings
 from app.core.logging import logger
 from app.core.exceptions import CustomException, ErrorCode
+from app.utils.hash_utils import generate_hash
+from app.services.pattern_query_planner import NGRAM_SIZE, plan_pattern_query
+from app.services.vector_index_profiles import (
+    DEFAULT_PROFILE,
+    available_profiles,
+    get_profile,
+    knn_index_settings,
+    knn_vector_mapping,
+    profile_index_name,
+    search_target,
+)
+
+
+def chunk_content_hash(content: Optional[str]) -> str:
+    """分块内容哈希（写入索引的 content_hash 字段，用于判断是否需要重新向量化）"""
+    return generate_hash(content or "", "sha256")
+
+
+# 结构化元数据（meta 对象）：从分块 metadata 中提取的强类型字段，过滤 / 排序 / 分页直接在 OpenSearch 内完成
+CHUNK_META_PROPERTIES: Dict[str, Dict[str, str]] = {
+    "page_number": {"type": "integer"},
+    "chunk_index": {"type": "integer"},
+    "element_index_start": {"type": "integer"},
+    "table_group_uid": {"type": "keyword"},
+    "table_id": {"type": "keyword"},
+    "section_path": {"type": "keyword"},
+}
+
+_INT_META_FIELDS = ("page_number", "chunk_index", "element_index_start")
+_SECTION_PATH_SEP = " / "
+
+
+def structured_chunk_meta(metadata: Any) -> Dict[str, Any]:
+    """从分块 metadata（dict 或 JSON 字符串）中提取 meta.* 字段，缺失或无法转换的字段不输出"""
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except (json.JSONDecodeError, TypeError):
+            return {}
+    if not isinstance(metadata, dict):
+        return {}
+    meta: Dict[str, Any] = {}
+    for field in _INT_META_FIELDS:
+        try:
+            if metadata.get(field) is not None:
+                meta[field] = int(metadata[field])
+        except (TypeError, ValueError):
+            pass
+    table_group_uid = metadata.get("table_group_uid")
+    table_id = metadata.get("table_id") or metadata.get("table_uid")
+    if table_group_uid:
+        meta["table_group_uid"] = str(table_group_uid)
+    if table_id:
+        meta["table_id"] = str(table_id)
+    heading_path = metadata.get("heading_path")
+    if isinstance(heading_path, (list, tuple)) and heading_path:
+        meta["section_path"] = _SECTION_PATH_SEP.join(str(h).strip() for h in heading_path if str(h).strip())
+    elif metadata.get("section_hint"):
+        meta["section_path"] = str(metadata["section_hint"]).strip()
+    if not meta.get("section_path"):
+        meta.pop("section_path", None)
+    return meta
+
 
 class OpenSearchService:
     """OpenSearch服务 - 严格按照设计文档实现（单例模式）"""
@@ -41,6 +104,11 @@ class OpenSearchService:
             self.client = self._create_client()
             self.document_index = settings.DOCUMENT_INDEX_NAME
             self.image_index = settings.IMAGE_INDEX_NAME
+            # 检索目标覆盖 default 索引与各向量配置档索引
+            self.document_search_index = search_target(self.document_index)
+            self.image_search_index = search_target(self.image_index)
+            self._kb_profiles: Dict[int, str] = {}
+            self._ensured_indices = {self.document_index, self.image_index}
             self.qa_index = settings.QA_INDEX_NAME
             self.qa_answer_index = getattr(settings, "QA_ANSWER_INDEX_NAME", "qa_answers")
             self.resource_events_index = getattr(settings, "RESOURCE_EVENTS_INDEX_NAME", "resource_events")
@@ -110,6 +178,20 @@ class OpenSearchService:
                 except Exception:
                     # 若映射读取失败，尽量继续
                     pass
+                # 存量索引补充 meta 映射（新增字段无需重建索引；存量数据由回填脚本补齐）
+                try:
+                    self.ensure_chunk_meta_mapping()
+                except Exception as _e:
+                    logger.warning(f"文档索引 meta 映射补充失败: {_e}")
+                try:
+                    subfield = (settings.CONTENT_PATTERN_SUBFIELD or "off").lower()
+                    if subfield != "off" and not self.has_content_pattern_subfield(subfield):
+                        logger.warning(
+                            f"CONTENT_PATTERN_SUBFIELD={subfield} 但索引缺少 content.{subfield} 子字段，"
+                            f"请运行 scripts/enable_pattern_subfield.py --populate"
+                        )
+                except Exception as _e:
+                    logger.warning(f"文档索引子字段检查失败: {_e}")
             
             # 创建图片专用索引
             if not self.client.indices.exists(index=self.image_index):
@@ -222,10 +304,12 @@ class OpenSearchService:
             logger.error(f"[OpenSearch] delete_by_query error index={index}: {e}")
             raise
     
-    def _create_document_index(self):
-        """创建文档内容索引 - 根据设计文档实现"""
+    def _create_document_index(self, index: Optional[str] = None, profile: Optional[Dict[str, Any]] = None):
+        """创建文档内容索引 - 根据设计文档实现（index/profile 为空时创建 default 配置档的基础索引）"""
+        index = index or self.document_index
+        profile = profile or get_profile(DEFAULT_PROFILE)
         try:
-            logger.info(f"创建文档索引: {self.document_index}")
+            logger.info(f"创建文档索引: {index}")
             
             # 根据设计文档的索引配置
             index_mapping = {
@@ -234,13 +318,8 @@ class OpenSearchService:
                     "number_of_replicas": settings.OPENSEARCH_NUMBER_OF_REPLICAS,
                     # 关键：开启 KNN（用于 content_vector）
                     "index.knn": True,
-                    "analysis": {
-                        "analyzer": {
-                            "ik_max_word": {
-                                "type": settings.TEXT_ANALYZER
-                            }
-                        }
-                    }
+                    **knn_index_settings(profile),
+                    "analysis": self._content_analysis()
                 },
                 "mappings": {
                     "properties": {
@@ -250,33 +329,21 @@ class OpenSearchService:
                         "category_id": {"type": "integer"},
                         "chunk_id": {"type": "integer"},
                         
-                        # 内容字段
-                        "content": {
-                            "type": "text",
-                            "analyzer": settings.TEXT_ANALYZER,
-                            "search_analyzer": settings.TEXT_ANALYZER
-                        },
+                        # 内容字段（可选 wildcard / ngram 子字段，供通配符、正则查询使用）
+                        "content": self._content_mapping(),
                         "chunk_type": {"type": "keyword"},
                         "tags": {"type": "keyword"},
                         "metadata": {"type": "text"},
+                        # 结构化元数据（页码 / 表格 / 章节路径，可直接过滤、排序）
+                        "meta": {"type": "object", "properties": CHUNK_META_PROPERTIES},
+                        # 已写入向量对应的内容哈希（变更感知的重新向量化）
+                        "content_hash": {"type": "keyword"},
                         
                         # 时间字段
                         "created_at": {"type": "date"},
                         
-                        # 向量字段 - 文本向量（维度来自配置），HNSW算法
-                        "content_vector": {
-                            "type": "knn_vector",
-                            "dimension": settings.TEXT_EMBEDDING_DIMENSION,
-                            "method": {
-                                "name": "hnsw",
-                                "space_type": "cosinesimil",
-                                "engine": "nmslib",
-                                "parameters": {
-                                    "ef_construction": settings.HNSW_EF_CONSTRUCTION,
-                                    "m": settings.HNSW_M
-                                }
-                            }
-                        },
+                        # 向量字段 - 文本向量（维度来自配置），HNSW算法，引擎/量化取决于配置档
+                        "content_vector": knn_vector_mapping(profile, settings.TEXT_EMBEDDING_DIMENSION),
                         
                         # 图片字段
                         "image_info": {
@@ -295,11 +362,11 @@ class OpenSearchService:
                 }
             }
             
-            self.client.indices.create(index=self.document_index, body=index_mapping)
-            logger.info(f"文档索引创建成功: {self.document_index}，已设置 index.knn=true，向量字段=content_vector，维度={settings.TEXT_EMBEDDING_DIMENSION}")
+            self.client.indices.create(index=index, body=index_mapping)
+            logger.info(f"文档索引创建成功: {index}，已设置 index.knn=true，向量字段=content_vector，维度={settings.TEXT_EMBEDDING_DIMENSION}")
             try:
-                settings_res = self.client.indices.get_settings(index=self.document_index)
-                knn_flag = settings_res.get(self.document_index, {}).get('settings', {}).get('index', {}).get('knn')
+                settings_res = self.client.indices.get_settings(index=index)
+                knn_flag = settings_res.get(index, {}).get('settings', {}).get('index', {}).get('knn')
                 logger.info(f"文档索引当前 knn 设置: {knn_flag}")
             except Exception as _e:
                 logger.warning(f"读取文档索引 settings 失败: {_e}")
@@ -310,11 +377,96 @@ class OpenSearchService:
                 code=ErrorCode.OPENSEARCH_INDEX_FAILED,
                 message=f"文档索引创建失败: {str(e)}"
             )
+
+    @staticmethod
+    def _content_analysis() -> Dict[str, Any]:
+        """文档索引分析器：中文分词 + content.ngram 子字段使用的 n-gram 分析器（始终定义，切换子字段无需关闭索引）"""
+        return {
+            "analyzer": {
+                "ik_max_word": {
+                    "type": settings.TEXT_ANALYZER
+                },
+                "content_ngram": {"type": "custom", "tokenizer": "content_ngram", "filter": ["lowercase"]},
+            },
+            "tokenizer": {
+                "content_ngram": {"type": "ngram", "min_gram": NGRAM_SIZE, "max_gram": NGRAM_SIZE},
+            },
+        }
+
+    @staticmethod
+    def _pattern_subfield_mapping(subfield: str) -> Optional[Dict[str, Any]]:
+        if subfield == "wildcard":
+            return {"type": "wildcard"}
+        if subfield == "ngram":
+            return {"type": "text", "analyzer": "content_ngram", "norms": False}
+        return None
+
+    def _content_mapping(self) -> Dict[str, Any]:
+        mapping: Dict[str, Any] = {
+            "type": "text",
+            "analyzer": settings.TEXT_ANALYZER,
+            "search_analyzer": settings.TEXT_ANALYZER,
+        }
+        subfield = (settings.CONTENT_PATTERN_SUBFIELD or "off").lower()
+        sub_mapping = self._pattern_subfield_mapping(subfield)
+        if sub_mapping:
+            mapping["fields"] = {subfield: sub_mapping}
+        return mapping
+
+    def has_content_pattern_subfield(self, subfield: Optional[str] = None) -> bool:
+        subfield = (subfield or settings.CONTENT_PATTERN_SUBFIELD or "off").lower()
+        mapping = self.client.indices.get_mapping(index=self.document_index)
+        content = mapping[self.document_index]["mappings"].get("properties", {}).get("content", {})
+        return subfield in (content.get("fields") or {})
+
+    def ensure_content_pattern_subfield(self, subfield: Optional[str] = None) -> bool:
+        """为存量文档索引补充 content 的 wildcard / ngram 子字段映射（幂等），返回是否新增了映射。
+        新增后存量文档需重新索引（update_by_query）才会写入子字段
+        """
+        subfield = (subfield or settings.CONTENT_PATTERN_SUBFIELD or "off").lower()
+        sub_mapping = self._pattern_subfield_mapping(subfield)
+        if not sub_mapping or self.has_content_pattern_subfield(subfield):
+            return False
+        if subfield == "ngram":
+            index_settings = self.client.indices.get_settings(index=self.document_index)
+            analysis = index_settings[self.document_index]["settings"]["index"].get("analysis", {})
+            if "content_ngram" not in (analysis.get("analyzer") or {}):
+                # 旧索引没有 n-gram 分析器：分析器只能在索引关闭时添加
+                ngram_analysis = self._content_analysis()
+                ngram_analysis["analyzer"].pop("ik_max_word")
+                self.client.indices.close(index=self.document_index)
+                try:
+                    self.client.indices.put_settings(index=self.document_index, body={"analysis": ngram_analysis})
+                finally:
+                    self.client.indices.open(index=self.document_index)
+        mapping = self.client.indices.get_mapping(index=self.document_index)
+        content = dict(mapping[self.document_index]["mappings"]["properties"]["content"])
+        content["fields"] = {**(content.get("fields") or {}), subfield: sub_mapping}
+        self.client.indices.put_mapping(index=self.document_index, body={"properties": {"content": content}})
+        logger.info(f"文档索引已补充 content.{subfield} 子字段")
+        return True
+
+    def ensure_chunk_meta_mapping(self) -> bool:
+        """为存量文档索引补充 meta.* 映射（幂等），返回是否新增了映射"""
+        mapping = self.client.indices.get_mapping(index=self.document_index)
+        props = mapping[self.document_index]["mappings"].get("properties", {})
+        current = (props.get("meta") or {}).get("properties", {})
+        missing = {k: v for k, v in CHUNK_META_PROPERTIES.items() if k not in current}
+        if not missing:
+            return False
+        self.client.indices.put_mapping(
+            index=self.document_index,
+            body={"properties": {"meta": {"type": "object", "properties": missing}}},
+        )
+        logger.info(f"文档索引已补充 meta 映射: {sorted(missing)}")
+        return True
     
-    def _create_image_index(self):
-        """创建图片专用索引 - 根据设计文档实现"""
+    def _create_image_index(self, index: Optional[str] = None, profile: Optional[Dict[str, Any]] = None):
+        """创建图片专用索引 - 根据设计文档实现（index/profile 为空时创建 default 配置档的基础索引）"""
+        index = index or self.image_index
+        profile = profile or get_profile(DEFAULT_PROFILE)
         try:
-            logger.info(f"创建图片索引: {self.image_index}")
+            logger.info(f"创建图片索引: {index}")
             
             # 根据设计文档的图片索引配置
             index_mapping = {
@@ -322,7 +474,8 @@ class OpenSearchService:
                     "number_of_shards": settings.OPENSEARCH_NUMBER_OF_SHARDS,
                     "number_of_replicas": settings.OPENSEARCH_NUMBER_OF_REPLICAS,
                     # 关键：开启 KNN（用于 content_vector）
-                    "index.knn": True
+                    "index.knn": True,
+                    **knn_index_settings(profile),
                 },
                 "mappings": {
                     "properties": {
@@ -350,20 +503,8 @@ class OpenSearchService:
                         "description": {"type": "text"},
                         "feature_tags": {"type": "keyword"},
                         
-                        # 向量字段 - 512维图片向量，HNSW算法
-                        "image_vector": {
-                            "type": "knn_vector",
-                            "dimension": settings.IMAGE_EMBEDDING_DIMENSION,
-                            "method": {
-                                "name": "hnsw",
-                                "space_type": "cosinesimil",
-                                "engine": "nmslib",
-                                "parameters": {
-                                    "ef_construction": settings.HNSW_EF_CONSTRUCTION,
-                                    "m": settings.HNSW_M
-                                }
-                            }
-                        },
+                        # 向量字段 - 512维图片向量，HNSW算法，引擎/量化取决于配置档
+                        "image_vector": knn_vector_mapping(profile, settings.IMAGE_EMBEDDING_DIMENSION),
                         
                         # 时间字段
                         "created_at": {"type": "date"},
@@ -377,11 +518,11 @@ class OpenSearchService:
                 }
             }
             
-            self.client.indices.create(index=self.image_index, body=index_mapping)
-            logger.info(f"图片索引创建成功: {self.image_index}，已设置 index.knn=true，向量字段=image_vector，维度=512")
+            self.client.indices.create(index=index, body=index_mapping)
+            logger.info(f"图片索引创建成功: {index}，已设置 index.knn=true，向量字段=image_vector，维度={settings.IMAGE_EMBEDDING_DIMENSION}")
             try:
-                settings_res = self.client.indices.get_settings(index=self.image_index)
-                knn_flag = settings_res.get(self.image_index, {}).get('settings', {}).get('index', {}).get('knn')
+                settings_res = self.client.indices.get_settings(index=index)
+                knn_flag = settings_res.get(index, {}).get('settings', {}).get('index', {}).get('knn')
                 logger.info(f"图片索引当前 knn 设置: {knn_flag}")
             except Exception as _e:
                 logger.warning(f"读取图片索引 settings 失败: {_e}")
@@ -393,6 +534,64 @@ class OpenSearchService:
                 message=f"图片索引创建失败: {str(e)}"
             )
     
+    # ---------------- 向量索引配置档路由 ----------------
+
+    def _kb_profile(self, kb_id: Optional[int]) -> str:
+        """知识库的向量索引配置档（创建后不可修改，进程内缓存）；查询失败时按 default 处理且不缓存"""
+        if not kb_id:
+            return DEFAULT_PROFILE
+        cached = self._kb_profiles.get(kb_id)
+        if cached is not None:
+            return cached
+        from app.config.database import SessionLocal
+        from app.models.knowledge_base import KnowledgeBase
+
+        db = SessionLocal()
+        try:
+            name = db.query(KnowledgeBase.vector_profile).filter(KnowledgeBase.id == kb_id).scalar()
+        except Exception as e:
+            logger.warning(f"[OpenSearch] 读取知识库向量配置档失败 kb_id={kb_id}: {e}")
+            return DEFAULT_PROFILE
+        finally:
+            db.close()
+        profile = name if name in available_profiles() else DEFAULT_PROFILE
+        self._kb_profiles[kb_id] = profile
+        return profile
+
+    def _ensure_profile_index(self, index: str, profile: str, create) -> None:
+        """配置档索引首次写入前按需创建（其他进程并发创建时以已存在为准）"""
+        if index in self._ensured_indices:
+            return
+        with self._lock:
+            if index in self._ensured_indices:
+                return
+            if not self.client.indices.exists(index=index):
+                try:
+                    create(index, get_profile(profile))
+                except CustomException:
+                    if not self.client.indices.exists(index=index):
+                        raise
+            self._ensured_indices.add(index)
+
+    def ensure_profile_indices(self, profile: str) -> None:
+        """创建知识库时预先建好配置档的文档 / 图片索引；集群不支持该配置档时抛出异常"""
+        self._ensure_profile_index(profile_index_name(self.document_index, profile), profile, self._create_document_index)
+        self._ensure_profile_index(profile_index_name(self.image_index, profile), profile, self._create_image_index)
+
+    def document_index_for(self, kb_id: Optional[int]) -> str:
+        """知识库分块写入的物理索引（default 配置档即基础索引）"""
+        profile = self._kb_profile(kb_id)
+        index = profile_index_name(self.document_index, profile)
+        self._ensure_profile_index(index, profile, self._create_document_index)
+        return index
+
+    def image_index_for(self, kb_id: Optional[int]) -> str:
+        """知识库图片写入的物理索引（default 配置档即基础索引）"""
+        profile = self._kb_profile(kb_id)
+        index = profile_index_name(self.image_index, profile)
+        self._ensure_profile_index(index, profile, self._create_image_index)
+        return index
+
     def _create_qa_index(self):
         """创建问答历史索引 - 根据设计文档实现"""
         try:
@@ -733,11 +932,13 @@ class OpenSearchService:
                 "chunk_type": chunk_data.get("chunk_type", "text"),
                 "tags": chunk_data.get("tags", []),
                 "metadata": json.dumps(chunk_data.get("metadata", {})),
+                "meta": structured_chunk_meta(chunk_data.get("metadata")),
                 "created_at": chunk_data.get("created_at"),
             }
-            # 可选写入向量
+            # 可选写入向量（同时记录向量对应的内容哈希）
             if isinstance(chunk_data.get("content_vector"), list) and chunk_data["content_vector"]:
                 doc["content_vector"] = chunk_data["content_vector"]
+                doc["content_hash"] = chunk_content_hash(chunk_data["content"])
             
             # 如果有图片信息，添加图片字段
             if chunk_data.get("image_info"):
@@ -745,7 +946,7 @@ class OpenSearchService:
             
             # 索引到OpenSearch
             response = self.client.index(
-                index=self.document_index,
+                index=self.document_index_for(chunk_data["knowledge_base_id"]),
                 id=f"chunk_{chunk_data['chunk_id']}",
                 body=doc,
                 refresh="wait_for"
@@ -772,14 +973,16 @@ class OpenSearchService:
             "chunk_type": chunk_data.get("chunk_type", "text"),
             "tags": chunk_data.get("tags", []),
             "metadata": json.dumps(chunk_data.get("metadata", {})),
+            "meta": structured_chunk_meta(chunk_data.get("metadata")),
             "created_at": chunk_data.get("created_at"),
         }
         if isinstance(chunk_data.get("content_vector"), list) and chunk_data["content_vector"]:
             body["content_vector"] = chunk_data["content_vector"]
+            body["content_hash"] = chunk_content_hash(chunk_data["content"])
         if chunk_data.get("image_info"):
             body["image_info"] = chunk_data["image_info"]
         self.client.index(
-            index=self.document_index,
+            index=self.document_index_for(chunk_data["knowledge_base_id"]),
             id=f"chunk_{chunk_data['chunk_id']}",
             body=body,
             refresh="wait_for",
@@ -799,20 +1002,94 @@ class OpenSearchService:
                 "chunk_type": d.get("chunk_type", "text"),
                 "tags": d.get("tags", []),
                 "metadata": json.dumps(d.get("metadata", {})),
+                "meta": structured_chunk_meta(d.get("metadata")),
                 "created_at": d.get("created_at"),
             }
             if isinstance(d.get("content_vector"), list) and d["content_vector"]:
                 src["content_vector"] = d["content_vector"]
+                src["content_hash"] = chunk_content_hash(d["content"])
             if d.get("image_info"):
                 src["image_info"] = d["image_info"]
             actions.append({
-                "_index": self.document_index,
+                "_index": self.document_index_for(d["knowledge_base_id"]),
                 "_id": f"chunk_{d['chunk_id']}",
                 "_source": src,
             })
         success, _ = os_bulk(self.client, actions, refresh=False)
         logger.info(f"批量索引分块完成: {success} 条")
         return success
+
+    def get_chunk_content_hashes_sync(
+        self, chunk_ids: List[int], index: Optional[str] = None
+    ) -> Dict[int, Optional[str]]:
+        """批量读取已索引分块的 content_hash（一次 mget，index 为分块所在知识库的物理索引，默认基础索引）。
+        索引中不存在的分块不出现在结果中；存在但没有哈希（旧数据或无向量）的值为 None。
+        """
+        if not chunk_ids:
+            return {}
+        response = self.client.mget(
+            index=index or self.document_index,
+            body={"docs": [{"_id": f"chunk_{cid}", "_source": ["content_hash"]} for cid in chunk_ids]},
+        )
+        hashes: Dict[int, Optional[str]] = {}
+        for cid, doc in zip(chunk_ids, response.get("docs", [])):
+            if doc.get("found"):
+                hashes[cid] = (doc.get("_source") or {}).get("content_hash")
+        return hashes
+
+    def bulk_update_document_chunks_sync(
+        self, docs: List[Dict[str, Any]], refresh: Any = "wait_for", index: Optional[str] = None
+    ) -> List[int]:
+        """批量局部更新分块（_op_type=update），只覆盖传入的字段；
+        带 document_id 的条目按 doc_as_upsert 处理，索引中缺失时直接创建。返回更新成功的 chunk_id 列表。
+        index 为分块所在知识库的物理索引（document_index_for），默认基础索引。
+        """
+        if not docs:
+            return []
+        actions = []
+        for d in docs:
+            partial = {k: v for k, v in d.items() if k not in ("chunk_id", "metadata")}
+            partial["chunk_id"] = d["chunk_id"]
+            if "metadata" in d:
+                partial["metadata"] = json.dumps(d["metadata"] or {}, ensure_ascii=False)
+                # 局部更新会合并对象字段，未出现的 meta 字段显式置空
+                partial["meta"] = {**dict.fromkeys(CHUNK_META_PROPERTIES), **structured_chunk_meta(d["metadata"])}
+            if isinstance(d.get("content_vector"), list) and d["content_vector"]:
+                partial["content_hash"] = chunk_content_hash(d.get("content"))
+            else:
+                partial.pop("content_vector", None)
+            actions.append({
+                "_op_type": "update",
+                "_index": index or self.document_index,
+                "_id": f"chunk_{d['chunk_id']}",
+                "doc": partial,
+                "doc_as_upsert": "document_id" in d,
+            })
+        _, errors = os_bulk(
+            self.client, actions, refresh=refresh, raise_on_error=False, raise_on_exception=False
+        )
+        failed_ids = set()
+        for err in errors or []:
+            info = next(iter(err.values()), {}) if isinstance(err, dict) else {}
+            failed_ids.add(str(info.get("_id")))
+            logger.warning(f"[OpenSearch] bulk 更新分块失败 id={info.get('_id')}: {info.get('error')}")
+        return [d["chunk_id"] for d in docs if f"chunk_{d['chunk_id']}" not in failed_ids]
+
+    def bulk_index_documents_sync(self, index: str, docs: Dict[str, Dict[str, Any]]) -> List[str]:
+        """通用批量写入（doc_id -> 文档），单条失败不影响其余文档，返回写入成功的 doc_id 列表。"""
+        if not docs:
+            return []
+        actions = [
+            {"_index": index, "_id": doc_id, "_source": doc}
+            for doc_id, doc in docs.items()
+        ]
+        _, errors = os_bulk(self.client, actions, refresh=False, raise_on_error=False, raise_on_exception=False)
+        failed_ids = set()
+        for err in errors or []:
+            info = next(iter(err.values()), {}) if isinstance(err, dict) else {}
+            failed_ids.add(str(info.get("_id")))
+            logger.warning(f"[OpenSearch] bulk 写入失败 index={index} id={info.get('_id')}: {info.get('error')}")
+        return [doc_id for doc_id in docs if str(doc_id) not in failed_ids]
     
     async def index_image(self, image_data: Dict[str, Any]) -> bool:
         """索引图片 - 根据设计文档实现"""
@@ -845,7 +1122,7 @@ class OpenSearchService:
             
             # 索引到OpenSearch
             response = self.client.index(
-                index=self.image_index,
+                index=self.image_index_for(image_data["knowledge_base_id"]),
                 id=f"image_{image_data['image_id']}",
                 body=doc,
                 refresh="wait_for"
@@ -862,35 +1139,71 @@ class OpenSearchService:
             )
 
     # 同步封装
+    @staticmethod
+    def _image_source(image_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "image_id": image_data["image_id"],
+            "document_id": image_data["document_id"],
+            "knowledge_base_id": image_data["knowledge_base_id"],
+            "category_id": image_data.get("category_id"),
+            "image_path": image_data["image_path"],
+            "page_number": image_data.get("page_number"),
+            "coordinates": image_data.get("coordinates"),
+            "width": image_data.get("width"),
+            "height": image_data.get("height"),
+            "image_type": image_data.get("image_type", "unknown"),
+            "ocr_text": image_data.get("ocr_text", ""),
+            "description": image_data.get("description", ""),
+            "feature_tags": image_data.get("feature_tags", []),
+            "image_vector": image_data["image_vector"],
+            "created_at": image_data.get("created_at"),
+            "updated_at": image_data.get("updated_at"),
+            # 传递 dict 类型，符合 OpenSearch 映射中的 object
+            "metadata": image_data.get("metadata", {}),
+            "processing_status": image_data.get("processing_status", "completed"),
+            "model_version": image_data.get("model_version", "1.0"),
+        }
+
     def index_image_sync(self, image_data: Dict[str, Any]) -> bool:
         self.client.index(
-            index=self.image_index,
+            index=self.image_index_for(image_data["knowledge_base_id"]),
             id=f"image_{image_data['image_id']}",
-            body={
-                "image_id": image_data["image_id"],
-                "document_id": image_data["document_id"],
-                "knowledge_base_id": image_data["knowledge_base_id"],
-                "category_id": image_data.get("category_id"),
-                "image_path": image_data["image_path"],
-                "page_number": image_data.get("page_number"),
-                "coordinates": image_data.get("coordinates"),
-                "width": image_data.get("width"),
-                "height": image_data.get("height"),
-                "image_type": image_data.get("image_type", "unknown"),
-                "ocr_text": image_data.get("ocr_text", ""),
-                "description": image_data.get("description", ""),
-                "feature_tags": image_data.get("feature_tags", []),
-                "image_vector": image_data["image_vector"],
-                "created_at": image_data.get("created_at"),
-                "updated_at": image_data.get("updated_at"),
-                # 传递 dict 类型，符合 OpenSearch 映射中的 object
-                "metadata": image_data.get("metadata", {}),
-                "processing_status": image_data.get("processing_status", "completed"),
-                "model_version": image_data.get("model_version", "1.0"),
-            },
+            body=self._image_source(image_data),
             refresh="wait_for",
         )
         return True
+
+    def get_image_vectors_sync(self, image_ids: List[int], index: Optional[str] = None) -> Dict[int, List[float]]:
+        """批量读取已索引图片的向量（一次 mget，index 默认基础索引），索引中不存在或无向量的图片不出现在结果中"""
+        if not image_ids:
+            return {}
+        response = self.client.mget(
+            index=index or self.image_index,
+            body={"docs": [{"_id": f"image_{image_id}", "_source": ["image_vector"]} for image_id in image_ids]},
+        )
+        vectors: Dict[int, List[float]] = {}
+        for image_id, doc in zip(image_ids, response.get("docs", [])):
+            vector = (doc.get("_source") or {}).get("image_vector") if doc.get("found") else None
+            if vector:
+                vectors[image_id] = vector
+        return vectors
+
+    def bulk_index_images_sync(self, images: List[Dict[str, Any]]) -> List[int]:
+        """批量写入图片索引（_bulk 不逐条刷新，结束后刷新一次），单条失败不影响其余图片，返回写入成功的 image_id 列表"""
+        if not images:
+            return []
+        by_index: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for image in images:
+            index = self.image_index_for(image["knowledge_base_id"])
+            by_index.setdefault(index, {})[f"image_{image['image_id']}"] = self._image_source(image)
+        written = set()
+        for index, docs in by_index.items():
+            written.update(self.bulk_index_documents_sync(index, docs))
+        try:
+            self.client.indices.refresh(index=",".join(by_index))
+        except Exception as e:
+            logger.warning(f"[OpenSearch] 刷新图片索引失败: {e}")
+        return [image["image_id"] for image in images if f"image_{image['image_id']}" in written]
     
     def search_document_vectors_sync(
         self,
@@ -951,7 +1264,7 @@ class OpenSearchService:
             try:
                 from app.core.logging import logger as _lg
                 _lg.info(
-                    f"[KNN] index={self.document_index}, dim={len(query_vector)}, "
+                    f"[KNN] index={self.document_search_index}, dim={len(query_vector)}, "
                     f"first5={query_vector[:5]}, kb_id={knowledge_base_id}, category_id={category_id}"
                 )
             except Exception:
@@ -991,13 +1304,13 @@ class OpenSearchService:
             try:
                 import json as _json
                 body_json = _json.dumps(body, ensure_ascii=False, separators=(",", ":"))
-                logger.info(f"[KNN][body_first200]={body_json[:200]}")
+                logger.debug("[KNN][body_first200]=%s", body_json[:200])
                 body = _json.loads(body_json)
             except Exception:
                 pass
 
             try:
-                response = self.client.search(index=self.document_index, body=body)
+                response = self.client.search(index=self.document_search_index, body=body)
             except Exception as e_primary:
                 # 兼容分支：部分集群要求 query_vector 使用 {"values": [...]} 包装
                 try:
@@ -1006,8 +1319,8 @@ class OpenSearchService:
                     qv = alt_body["query"]["knn"].pop("query_vector", None)
                     alt_body["query"]["knn"]["query_vector"] = {"values": qv if isinstance(qv, list) else []}
                     alt_json = _json.dumps(alt_body, ensure_ascii=False, separators=(",", ":"))
-                    logger.info(f"[KNN][compat_values][body_first200]={alt_json[:200]}")
-                    response = self.client.search(index=self.document_index, body=alt_body)
+                    logger.debug("[KNN][compat_values][body_first200]=%s", alt_json[:200])
+                    response = self.client.search(index=self.document_search_index, body=alt_body)
                 except Exception:
                     raise e_primary
             
@@ -1142,14 +1455,14 @@ class OpenSearchService:
             # 强制标准 JSON 序列化-反序列化，确保 query_vector 是数组而不是字符串
             try:
                 body_json = json.dumps(body, ensure_ascii=False, separators=(",", ":"))
-                logger.debug(f"[Image KNN][body_first200]={body_json[:200]}")
+                logger.debug("[Image KNN][body_first200]=%s", body_json[:200])
                 body = json.loads(body_json)
             except Exception as e:
                 logger.warning(f"[Image KNN] JSON 序列化失败: {e}")
             
             # 执行搜索
             response = self.client.search(
-                index=self.image_index,
+                index=self.image_search_index,
                 body=body
             )
             
@@ -1260,7 +1573,7 @@ class OpenSearchService:
             
             # 执行搜索
             response = self.client.search(
-                index=self.image_index,
+                index=self.image_search_index,
                 body={"query": query},
                 size=limit
             )
@@ -1388,7 +1701,7 @@ class OpenSearchService:
             # 如果没有指定sort_by，OpenSearch默认按_score排序，不需要显式指定
             
             response = self.client.search(
-                index=self.document_index,
+                index=self.document_search_index,
                 body=search_body
             )
             
@@ -1481,6 +1794,85 @@ class OpenSearchService:
         
         return None
     
+    @staticmethod
+    def _position_sort() -> List[Any]:
+        """按文档内位置排序（结构化模式按页码、分块序号；否则按 chunk_id 近似）"""
+        if settings.OPENSEARCH_STRUCTURED_METADATA:
+            return [
+                {"meta.page_number": {"order": "asc", "missing": "_last"}},
+                {"meta.chunk_index": {"order": "asc", "missing": "_last"}},
+                {"chunk_id": {"order": "asc"}},
+            ]
+        return [{"chunk_id": {"order": "asc"}}]
+
+    def search_in_document_sync(
+        self,
+        document_id: int,
+        query: str,
+        page: Optional[int] = None,
+        chunk_type: Optional[str] = None,
+        table_group_uid: Optional[str] = None,
+        section_path: Optional[str] = None,
+        sort: Optional[str] = None,
+        offset: int = 0,
+        size: int = 100,
+    ) -> Dict[str, Any]:
+        """文档内搜索：结构化模式下页码 / 类型 / 表格 / 章节过滤、排序、分页均在 OpenSearch 内完成；
+        未开启时按旧数据格式在返回结果中按页码过滤。返回 {"hits": [...], "total": n}，hit 含解析后的 metadata
+        """
+        structured = settings.OPENSEARCH_STRUCTURED_METADATA
+        filter_list: List[Dict[str, Any]] = [{"term": {"document_id": document_id}}]
+        if chunk_type:
+            filter_list.append({"term": {"chunk_type": chunk_type}})
+        if structured:
+            if page is not None:
+                filter_list.append({"term": {"meta.page_number": page}})
+            if table_group_uid:
+                filter_list.append({"term": {"meta.table_group_uid": table_group_uid}})
+            if section_path:
+                filter_list.append({"prefix": {"meta.section_path": section_path}})
+        body: Dict[str, Any] = {
+            "query": {"bool": {"must": [{"match": {"content": {"query": query}}}], "filter": filter_list}},
+            "from": max(0, offset) if structured else 0,
+            "size": size if structured else 100,
+            "_source": ["chunk_id", "content", "chunk_type", "metadata", "meta"],
+            "track_total_hits": True,
+            **self._build_highlight_config(query, fields=["content"]),
+        }
+        if sort == "position":
+            body["sort"] = self._position_sort()
+        response = self.client.search(index=self.document_search_index, body=body)
+
+        hits = []
+        for hit in response["hits"]["hits"]:
+            src = hit.get("_source") or {}
+            metadata = src.get("meta") if structured else None
+            if not metadata:
+                metadata = src.get("metadata") or {}
+                if isinstance(metadata, str):
+                    try:
+                        metadata = json.loads(metadata)
+                    except (json.JSONDecodeError, TypeError):
+                        metadata = {}
+            if not structured:
+                page_num = metadata.get("page_number")
+                if page_num and page and page_num != page:
+                    continue
+                meta = structured_chunk_meta(metadata)
+                if table_group_uid and meta.get("table_group_uid") != table_group_uid:
+                    continue
+                if section_path and not (meta.get("section_path") or "").startswith(section_path):
+                    continue
+            hits.append({**hit, "metadata": metadata})
+
+        if structured:
+            total = response["hits"].get("total", {})
+            total = total.get("value", len(hits)) if isinstance(total, dict) else total
+        else:
+            total = len(hits)
+            hits = hits[max(0, offset):max(0, offset) + size]
+        return {"hits": hits, "total": total}
+
     def _build_filters(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
         """构建OpenSearch过滤条件
         
@@ -1489,6 +1881,7 @@ class OpenSearchService:
                 - {"field": value} - term查询
                 - {"field": {"gte": value}} - range查询
                 - {"field": {"in": [value1, value2]}} - terms查询
+                - {"field": {"prefix": value}} - prefix查询
         
         Returns:
             OpenSearch过滤条件列表
@@ -1496,6 +1889,9 @@ class OpenSearchService:
         filter_list = []
         
         for field, condition in filters.items():
+            # 结构化元数据字段（page_number、table_group_uid、section_path 等）映射到 meta.*
+            if field in CHUNK_META_PROPERTIES and settings.OPENSEARCH_STRUCTURED_METADATA:
+                field = f"meta.{field}"
             if isinstance(condition, dict):
                 # 处理range查询
                 if any(key in condition for key in ["gte", "gt", "lte", "lt"]):
@@ -1503,6 +1899,9 @@ class OpenSearchService:
                 # 处理terms查询（in操作）
                 elif "in" in condition:
                     filter_list.append({"terms": {field: condition["in"]}})
+                # 处理前缀查询（如章节路径）
+                elif "prefix" in condition:
+                    filter_list.append({"prefix": {field: condition["prefix"]}})
                 # 处理其他复杂条件
                 else:
                     filter_list.append({"term": {field: condition}})
@@ -1510,7 +1909,7 @@ class OpenSearchService:
                 # 简单term查询
                 filter_list.append({"term": {field: condition}})
         
-            return filter_list
+        return filter_list
     
     async def search_document_advanced(
         self,
@@ -1522,9 +1921,20 @@ class OpenSearchService:
         limit: int = 10,
         knowledge_base_id: Optional[List[int]] = None,
         filters: Optional[Dict[str, Any]] = None,
-        similarity_threshold: float = 0.0
+        similarity_threshold: float = 0.0,
+        offset: int = 0,
+        sort: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """高级搜索 - 支持布尔查询、通配符、正则表达式等复杂查询语法"""
+        """高级搜索 - 支持布尔查询、通配符、正则表达式等复杂查询语法
+        
+        通配符 / 正则模式先经 plan_pattern_query 规划（路由到子字段或拒绝无界模式，拒绝时抛出 CustomException）
+        """
+        pattern_plans = []
+        if wildcard and wildcard.strip():
+            pattern_plans.append(plan_pattern_query("wildcard", wildcard))
+        if regex and regex.strip():
+            pattern_plans.append(plan_pattern_query("regex", regex))
+        verifiers = [plan.verifier for plan in pattern_plans if plan.verifier is not None]
         try:
             logger.info(f"开始高级搜索: {query[:50]}...")
             
@@ -1567,33 +1977,9 @@ class OpenSearchService:
                     }
                 })
             
-            # 4. 处理通配符查询（wildcard）
-            if wildcard and wildcard.strip():
-                must_clauses.append({
-                    "wildcard": {
-                        "content": {
-                            "value": wildcard,
-                            "boost": 1.0
-                        }
-                    }
-                })
-            
-            # 5. 处理正则表达式查询（regex）
-            if regex and regex.strip():
-                # 移除regex字符串两端的斜杠（如果存在）
-                regex_pattern = regex.strip()
-                if regex_pattern.startswith('/') and regex_pattern.endswith('/'):
-                    regex_pattern = regex_pattern[1:-1]
-                
-                must_clauses.append({
-                    "regexp": {
-                        "content": {
-                            "value": regex_pattern,
-                            "flags": "ALL",
-                            "boost": 1.0
-                        }
-                    }
-                })
+            # 4/5. 通配符、正则查询（已规划的子句）
+            for plan in pattern_plans:
+                must_clauses.append(plan.clause)
             
             # 构建最终查询
             bool_query_dict = {}
@@ -1629,26 +2015,42 @@ class OpenSearchService:
             query_body = {"bool": bool_query_dict}
             
             # 执行搜索
+            offset = max(0, offset or 0)
             search_body = {
                 "query": query_body,
+                "from": offset,
                 "size": limit,
-                "_source": ["document_id", "chunk_id", "content", "chunk_type", "metadata", "knowledge_base_id"]
+                "_source": ["document_id", "chunk_id", "content", "chunk_type", "metadata", "meta", "knowledge_base_id"]
             }
             
+            if sort == "position":
+                search_body["sort"] = self._position_sort()
+            if verifiers:
+                # ngram 预筛只保证字面片段出现，多取候选在结果中按模式校验后再分页
+                search_body["from"] = 0
+                search_body["size"] = min(1000, (offset + limit) * max(1, settings.PATTERN_NGRAM_CANDIDATE_FACTOR))
+            
             # 添加高亮配置（如果有查询文本）
+            query_text = query or exact_phrase
             if query_text:
                 highlight_config = self._build_highlight_config(query_text, fields=["content"])
                 search_body.update(highlight_config)
             
             response = self.client.search(
-                index=self.document_index,
+                index=self.document_search_index,
                 body=search_body
             )
             
             # 处理结果
             results = []
-            for hit in response["hits"]["hits"]:
-                score = hit["_score"]
+            hits = response["hits"]["hits"]
+            if verifiers:
+                hits = [
+                    hit for hit in hits
+                    if all(v.search(hit["_source"].get("content") or "") for v in verifiers)
+                ][offset:offset + limit]
+            for hit in hits:
+                score = hit["_score"] or 0.0
                 if score >= similarity_threshold:
                     # 解析metadata字段
                     metadata_str = hit["_source"].get("metadata", "{}")
@@ -1656,6 +2058,8 @@ class OpenSearchService:
                         metadata = json.loads(metadata_str) if isinstance(metadata_str, str) else metadata_str
                     except (json.JSONDecodeError, TypeError):
                         metadata = {}
+                    if isinstance(metadata, dict):
+                        metadata.update({k: v for k, v in (hit["_source"].get("meta") or {}).items() if v is not None})
                     
                     # 提取高亮内容
                     highlighted_content = self._extract_highlight(hit, "content") if query_text else None
@@ -1757,15 +2161,23 @@ class OpenSearchService:
         
         return result
     
+    def _get_by_id_sync(self, index: str, doc_id: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """按 _id 在检索目标（含各配置档索引）中读取 _source，不存在时返回 None"""
+        body: Dict[str, Any] = {"query": {"ids": {"values": [doc_id]}}, "size": 1}
+        if fields is not None:
+            body["_source"] = fields
+        hits = self.client.search(index=index, body=body)["hits"]["hits"]
+        return (hits[0].get("_source") or {}) if hits else None
+
+    def get_chunk_source_sync(self, chunk_id: int, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """读取已索引分块的 _source（不论所在配置档索引），不存在时返回 None"""
+        return self._get_by_id_sync(self.document_search_index, f"chunk_{chunk_id}", fields)
+
     async def get_image_vector(self, image_id: int) -> Optional[List[float]]:
         """获取图片向量"""
         try:
-            response = self.client.get(
-                index=self.image_index,
-                id=f"image_{image_id}"
-            )
-            
-            return response["_source"].get("image_vector")
+            source = self._get_by_id_sync(self.image_search_index, f"image_{image_id}", ["image_vector"])
+            return (source or {}).get("image_vector")
             
         except Exception as e:
             logger.error(f"获取图片向量失败: {e}")
@@ -1774,12 +2186,9 @@ class OpenSearchService:
     async def get_image_vector_info(self, image_id: int) -> Dict[str, Any]:
         """获取图片向量信息"""
         try:
-            response = self.client.get(
-                index=self.image_index,
-                id=f"image_{image_id}"
-            )
-            
-            source = response["_source"]
+            source = self._get_by_id_sync(self.image_search_index, f"image_{image_id}")
+            if source is None:
+                return {}
             return {
                 "dimension": len(source.get("image_vector", [])),
                 "model": source.get("model_version", "1.0"),
@@ -1795,9 +2204,9 @@ class OpenSearchService:
     async def delete_document_chunk(self, chunk_id: int) -> bool:
         """删除文档分块索引"""
         try:
-            self.client.delete(
-                index=self.document_index,
-                id=f"chunk_{chunk_id}"
+            self.client.delete_by_query(
+                index=self.document_search_index,
+                body={"query": {"ids": {"values": [f"chunk_{chunk_id}"]}}},
             )
             return True
         except Exception as e:
@@ -1807,21 +2216,69 @@ class OpenSearchService:
     async def delete_image(self, image_id: int) -> bool:
         """删除图片索引"""
         try:
-            self.client.delete(
-                index=self.image_index,
-                id=f"image_{image_id}"
+            self.client.delete_by_query(
+                index=self.image_search_index,
+                body={"query": {"ids": {"values": [f"image_{image_id}"]}}},
             )
             return True
         except Exception as e:
             logger.error(f"删除图片索引失败: {e}")
             return False
 
+    def get_document_chunk_sources_sync(
+        self, document_id: int, fields: List[str], size: int = 200
+    ) -> List[Dict[str, Any]]:
+        """按文档读取分块 _source 的指定字段（不打分，按 chunk_id 排序），如正文或 content_vector"""
+        response = self.client.search(
+            index=self.document_search_index,
+            body={
+                "query": {"bool": {"filter": [{"term": {"document_id": document_id}}]}},
+                "sort": [{"chunk_id": {"order": "asc"}}],
+                "size": size,
+                "_source": fields,
+            },
+        )
+        return [hit.get("_source") or {} for hit in response["hits"]["hits"]]
+
+    def move_document_sync(
+        self, document_id: int, source_kb_id: int, target_kb_id: int, category_id: Optional[int]
+    ) -> None:
+        """
+        文档移动（知识库或分类变化）后同步索引：已索引分块与图片的 knowledge_base_id / category_id 改为新值
+        （检索权限按 knowledge_base_id 过滤）；两个知识库的向量配置档不同时，reindex 到目标物理索引并从源索引删除
+        """
+        query = {"term": {"document_id": document_id}}
+        script = {
+            "lang": "painless",
+            "source": "ctx._source.knowledge_base_id = params.knowledge_base_id; "
+                      "ctx._source.category_id = params.category_id",
+            "params": {"knowledge_base_id": target_kb_id, "category_id": category_id},
+        }
+        for index_for in (self.document_index_for, self.image_index_for):
+            source_index, target_index = index_for(source_kb_id), index_for(target_kb_id)
+            if source_index == target_index:
+                self.client.update_by_query(
+                    index=source_index, body={"query": query, "script": script}, refresh=True, conflicts="proceed"
+                )
+                continue
+            response = self.client.reindex(
+                body={"source": {"index": source_index, "query": query}, "dest": {"index": target_index}, "script": script},
+                refresh=True,
+            )
+            if response.get("failures"):
+                raise RuntimeError(f"迁移索引失败 {source_index} -> {target_index}: {response['failures'][:3]}")
+            self.client.delete_by_query(index=source_index, body={"query": query}, refresh=True, conflicts="proceed")
+            logger.info(
+                f"文档索引已迁移: document_id={document_id}, {source_index} -> {target_index}, "
+                f"数量 {response.get('created', 0) + response.get('updated', 0)}"
+            )
+
     def delete_by_document(self, document_id: int) -> None:
         """删除与文档相关的所有索引（文档分块与图片）。"""
         try:
             # 分块索引
             self.client.delete_by_query(
-                index=self.document_index,
+                index=self.document_search_index,
                 body={"query": {"term": {"document_id": document_id}}},
                 refresh=True,
             )
@@ -1830,7 +2287,7 @@ class OpenSearchService:
         try:
             # 图片索引
             self.client.delete_by_query(
-                index=self.image_index,
+                index=self.image_search_index,
                 body={"query": {"term": {"document_id": document_id}}},
                 refresh=True,
             )
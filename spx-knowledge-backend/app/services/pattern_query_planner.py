@@ -0,0 +1,236 @@
+"""
+Pattern Query Planner
+通配符 / 正则查询规划：校验模式是否有界，并按 CONTENT_PATTERN_SUBFIELD 选择查询字段
+
+- wildcard：content.wildcard 子字段（OpenSearch 2.15+ wildcard 字段类型，内部 trigram 预筛 + 校验），模式按子串匹配
+- ngram：content.ngram 子字段（3-gram），用模式中的字面片段 match_phrase 预筛候选，再在结果中按模式校验
+- off：查询分词后的 content（按词项匹配）
+字面片段不足以使用子字段时，有前缀字面量的模式退回 content（词典范围有界）；否则拒绝
+含 Lucene 独有正则语法（<1-9> @ # & ~ "..."）时无法在本地校验，不走 ngram，改用 regexp 查询（由 OpenSearch 解释）
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from app.config.settings import settings
+from app.core.exceptions import CustomException, ErrorCode
+
+NGRAM_SIZE = 3
+_QUANTIFIERS = "*+?{"
+# Lucene 正则独有的运算符：数值区间 <1-9>、任意串 @、空语言 #、交集 &、补集 ~、字面串 "..."
+_LUCENE_ONLY = "<>@#&~\""
+
+
+@dataclass
+class PatternPlan:
+    """kind: wildcard / regex；field: 实际查询的字段；verifier: 需要在结果中二次校验时的正则"""
+
+    kind: str
+    pattern: str
+    field: str
+    clause: Dict[str, Any]
+    verifier: Optional[Pattern] = None
+
+
+def _reject(message: str) -> CustomException:
+    return CustomException(code=ErrorCode.VALIDATION_ERROR, message=message)
+
+
+def wildcard_literals(pattern: str) -> Tuple[List[str], str]:
+    """拆出通配符模式中的字面片段，返回 (片段列表, 前缀字面量)"""
+    runs: List[str] = []
+    current = ""
+    prefix: Optional[str] = None
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\" and i + 1 < len(pattern):
+            current += pattern[i + 1]
+            i += 2
+            continue
+        if c in "*?":
+            if prefix is None:
+                prefix = current
+            if current:
+                runs.append(current)
+            current = ""
+        else:
+            current += c
+        i += 1
+    if current:
+        runs.append(current)
+    return runs, current if prefix is None else prefix
+
+
+def _class_end(pattern: str, i: int) -> int:
+    """pattern[i] 为 [ 时返回字符类结束后的位置"""
+    j = i + 1
+    if j < len(pattern) and pattern[j] == "^":
+        j += 1
+    if j < len(pattern) and pattern[j] == "]":
+        j += 1
+    while j < len(pattern) and pattern[j] != "]":
+        j += 2 if pattern[j] == "\\" else 1
+    return j + 1
+
+
+def has_lucene_only_syntax(pattern: str) -> bool:
+    """正则中是否含 Lucene 独有的运算符（转义与字符类内的字符不算）；Python re 会把它们当作普通字符"""
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            i += 2
+        elif c == "[":
+            i = _class_end(pattern, i)
+        elif c in _LUCENE_ONLY:
+            return True
+        else:
+            i += 1
+    return False
+
+
+def _skip_quantifier(pattern: str, i: int) -> Tuple[int, bool, bool]:
+    """跳过 pattern[i] 处的量词，返回 (新位置, 是否有量词, 前一个原子是否可缺省)"""
+    if i >= len(pattern) or pattern[i] not in _QUANTIFIERS:
+        return i, False, False
+    c = pattern[i]
+    if c == "{":
+        end = pattern.find("}", i)
+        if end < 0:
+            return i, False, False
+        low = pattern[i + 1:end].split(",")[0].strip()
+        return end + 1, True, not low.isdigit() or int(low) == 0
+    return i + 1, True, c in "*?"
+
+
+def regex_literals(pattern: str) -> Tuple[List[str], str]:
+    """保守地拆出正则中一定会出现的字面片段（分组、字符类、可选原子都视为断点），返回 (片段列表, 前缀字面量)。
+    含选择（|）或 Lucene 补集 / 交集运算（~ &）时不做推断
+    """
+    if re.search(r"(?<!\\)[|~&]", pattern):
+        return [], ""
+    runs: List[str] = []
+    current = ""
+    prefix: Optional[str] = None
+    depth = 0
+    i = 0
+
+    def flush():
+        nonlocal current, prefix
+        if prefix is None:
+            prefix = current
+        if current:
+            runs.append(current)
+        current = ""
+
+    while i < len(pattern):
+        c = pattern[i]
+        literal: Optional[str] = None
+        if c == "\\" and i + 1 < len(pattern):
+            literal = None if pattern[i + 1].isalnum() else pattern[i + 1]
+            i += 2
+        elif c == "[":
+            i = _class_end(pattern, i)
+        elif c in "<\"":
+            # 数值区间 / 字面串整体视为一个原子，内部字符不计入字面片段
+            end = pattern.find(">" if c == "<" else c, i + 1)
+            i = len(pattern) if end < 0 else end + 1
+        elif c in "()":
+            depth += 1 if c == "(" else -1
+            i += 1
+            if c == ")":
+                i, _, _ = _skip_quantifier(pattern, i)
+            flush()
+            continue
+        elif c in ".^$>@#" or c in _QUANTIFIERS:
+            i += 1
+        else:
+            literal = c
+            i += 1
+        i, quantified, optional = _skip_quantifier(pattern, i)
+        if literal is None or optional or depth > 0:
+            flush()
+            continue
+        current += literal
+        if quantified:
+            # 重复的原子之后不再保证连续
+            flush()
+    if current:
+        runs.append(current)
+    return runs, current if prefix is None else prefix
+
+
+def _wildcard_verifier(pattern: str) -> Pattern:
+    parts = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        parts.append(".*" if c == "*" else "." if c == "?" else re.escape(c))
+        i += 1
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+def plan_pattern_query(kind: str, pattern: str, mode: Optional[str] = None) -> PatternPlan:
+    """为 wildcard / regex 模式生成查询子句；无界模式抛出 CustomException(VALIDATION_ERROR)"""
+    mode = (mode or settings.CONTENT_PATTERN_SUBFIELD or "off").lower()
+    pattern = (pattern or "").strip()
+    if kind == "regex" and len(pattern) >= 2 and pattern.startswith("/") and pattern.endswith("/"):
+        pattern = pattern[1:-1]
+    if kind == "wildcard":
+        pattern = re.sub(r"\*{2,}", "*", pattern)
+    if not pattern:
+        raise _reject("模式不能为空")
+    if len(pattern) > settings.PATTERN_MAX_LENGTH:
+        raise _reject(f"模式过长（最多 {settings.PATTERN_MAX_LENGTH} 个字符）")
+
+    runs, prefix = wildcard_literals(pattern) if kind == "wildcard" else regex_literals(pattern)
+    longest = max((len(r) for r in runs), default=0)
+    min_literal = max(settings.PATTERN_MIN_LITERAL, NGRAM_SIZE if mode == "ngram" else 1)
+
+    lucene_only = kind == "regex" and has_lucene_only_syntax(pattern)
+    verifier = None
+    if kind == "regex" and not lucene_only:
+        try:
+            verifier = re.compile(pattern, re.IGNORECASE | re.DOTALL)
+        except re.error as e:
+            raise _reject(f"正则表达式无效: {e}")
+
+    ngram_fallback = lucene_only and mode == "ngram"
+    if ngram_fallback:
+        # 无法在本地按模式校验 ngram 预筛结果：改走 content 上的 regexp（有前缀字面量时）
+        mode = "off"
+    if mode in ("wildcard", "ngram") and longest >= min_literal:
+        field = f"content.{mode}"
+        if mode == "ngram":
+            phrases = [{"match_phrase": {field: run}} for run in runs if len(run) >= NGRAM_SIZE]
+            if kind == "wildcard":
+                verifier = _wildcard_verifier(pattern)
+            return PatternPlan(kind, pattern, field, {"bool": {"must": phrases}}, verifier)
+        # wildcard 字段按整段内容匹配：两端补全，使模式按子串匹配
+        if kind == "wildcard":
+            value = pattern if pattern.startswith("*") else f"*{pattern}"
+            value = value if value.endswith("*") and not value.endswith("\\*") else f"{value}*"
+            clause = {"wildcard": {field: {"value": value, "case_insensitive": True}}}
+        else:
+            clause = {"regexp": {field: {"value": f".*{pattern}.*", "flags": "ALL", "case_insensitive": True}}}
+        return PatternPlan(kind, pattern, field, clause)
+
+    if prefix:
+        # 有前缀字面量：在分词后的 content 词典上按前缀范围匹配
+        if kind == "wildcard":
+            clause = {"wildcard": {"content": {"value": pattern, "boost": 1.0}}}
+        else:
+            clause = {"regexp": {"content": {"value": pattern, "flags": "ALL", "boost": 1.0}}}
+        return PatternPlan(kind, pattern, "content", clause)
+
+    if ngram_fallback:
+        raise _reject("含 Lucene 专用语法（<1-9> @ # & ~ \"...\"）的正则需以普通字符开头")
+    if mode in ("wildcard", "ngram"):
+        raise _reject(f"模式中需要至少 {min_literal} 个连续的普通字符，或以普通字符开头")
+    raise _reject("模式不能以通配符或正则元字符开头（未开启 CONTENT_PATTERN_SUBFIELD）")
@@ -36,8 +36,8 @@ class PerformanceMonitoringService:
         try:
             logger.debug("收集系统指标")
             
-            # CPU使用率
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # CPU使用率（非阻塞：返回距上次调用的平均值，不再在请求内 sleep 1 秒）
+            cpu_percent = psutil.cpu_percent(interval=None)
             
             # 内存使用情况
             memory = psutil.virtual_memory()
@@ -2,16 +2,21 @@
 Permission and role utilities for knowledge bases.
 
 根据知识库共享设计文档，实现基础的知识库成员/角色查询与权限校验。
+用户的权限映射（kb_id -> role）整体解析一次并缓存在 Redis（PERMISSION_CACHE_TTL），
+成员或所有者变化时调用 invalidate_users 失效；列表/搜索接口使用 allowed_kb_ids 一次性下推过滤条件。
 """
 
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterable
 
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
+from app.config.settings import settings
 from app.models.knowledge_base import KnowledgeBase
 from app.models.knowledge_base_member import KnowledgeBaseMember
 
+_ROLES_CACHE_KEY = "perm:kb_roles:{user_id}"
+
 
 # 角色 -> 允许的动作集合
 ROLE_ACTION_MATRIX: Dict[str, List[str]] = {
@@ -51,8 +56,54 @@ ROLE_ACTION_MATRIX: Dict[str, List[str]] = {
 class KnowledgeBasePermissionService:
     """知识库级权限服务"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, cache=None):
         self.db = db
+        self._cache = cache
+        # 同一请求内重复校验不再访问 Redis
+        self._roles: Dict[int, Dict[int, str]] = {}
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            from app.core.cache import cache_manager
+
+            self._cache = cache_manager.sync
+        return self._cache
+
+    def _load_kb_roles(self, user_id: int) -> Dict[int, str]:
+        """从数据库解析用户的全部知识库角色（两次查询，与知识库数量无关）"""
+        # 兼容：没有成员记录，但当前用户是 owner
+        roles: Dict[int, str] = {
+            kb_id: "owner"
+            for (kb_id,) in self.db.query(KnowledgeBase.id).filter(
+                KnowledgeBase.user_id == user_id,
+                KnowledgeBase.is_deleted == False,  # noqa: E712
+            )
+        }
+        # 成员表优先
+        for kb_id, role in self.db.query(
+            KnowledgeBaseMember.knowledge_base_id, KnowledgeBaseMember.role
+        ).filter(KnowledgeBaseMember.user_id == user_id):
+            roles[kb_id] = role or "viewer"
+        return roles
+
+    def get_user_kb_roles(self, user_id: Optional[int]) -> Dict[int, str]:
+        """返回用户的知识库角色映射 {kb_id: role}（请求内缓存 -> Redis -> 数据库）"""
+        if user_id is None:
+            return {}
+        if user_id in self._roles:
+            return self._roles[user_id]
+        ttl = settings.PERMISSION_CACHE_TTL
+        key = _ROLES_CACHE_KEY.format(user_id=user_id)
+        cached = self.cache.get(key) if ttl > 0 else None
+        if isinstance(cached, dict):
+            roles = {int(kb_id): role for kb_id, role in cached.items()}
+        else:
+            roles = self._load_kb_roles(user_id)
+            if ttl > 0:
+                self.cache.set(key, {str(kb_id): role for kb_id, role in roles.items()}, expire=ttl)
+        self._roles[user_id] = roles
+        return roles
 
     def get_user_role_for_kb(self, kb_id: int, user_id: int) -> Optional[str]:
         """
@@ -61,31 +112,59 @@ class KnowledgeBasePermissionService:
         优先从 knowledge_base_members 查找；
         若不存在成员记录且用户是 knowledge_bases.user_id，则视为 owner（兼容旧数据）。
         """
-        # 1) 优先成员表
-        member = (
-            self.db.query(KnowledgeBaseMember)
-            .filter(
-                KnowledgeBaseMember.knowledge_base_id == kb_id,
-                KnowledgeBaseMember.user_id == user_id,
-            )
-            .first()
+        return self.get_user_kb_roles(user_id).get(kb_id)
+
+    def allowed_kb_ids(self, user_id: Optional[int], action: str = "doc:view") -> List[int]:
+        """用户可执行 action 的全部知识库 ID（用于列表 / 搜索的过滤条件下推）"""
+        return sorted(
+            kb_id
+            for kb_id, role in self.get_user_kb_roles(user_id).items()
+            if action in ROLE_ACTION_MATRIX.get(role, [])
         )
-        if member:
-            return member.role or "viewer"
-
-        # 2) 兼容：没有成员记录，但当前用户是 owner
-        kb = (
-            self.db.query(KnowledgeBase)
-            .filter(
-                KnowledgeBase.id == kb_id,
-                KnowledgeBase.is_deleted == False,  # noqa: E712
+
+    def resolve_kb_filter(
+        self,
+        user_id: Optional[int],
+        requested: Optional[Iterable[int]] = None,
+        action: str = "doc:view",
+    ) -> List[int]:
+        """
+        计算搜索使用的知识库过滤集合：未指定时为全部有权限的知识库；
+        指定时必须全部有权限，否则抛出 403。
+        """
+        allowed = self.allowed_kb_ids(user_id, action)
+        if requested is None:
+            return allowed
+        requested_ids = [requested] if isinstance(requested, int) else list(requested)
+        if not requested_ids:
+            return allowed
+        denied = set(requested_ids) - set(allowed)
+        if denied:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"无权访问知识库: {', '.join(map(str, sorted(denied)))}",
             )
-            .first()
-        )
-        if kb and kb.user_id == user_id:
-            return "owner"
+        return sorted(set(requested_ids))
 
-        return None
+    def get_kb_user_ids(self, kb_id: int) -> List[int]:
+        """与知识库有关的用户（所有者 + 成员），知识库删除 / 转移前用于确定需要失效的缓存"""
+        user_ids = {
+            uid for (uid,) in self.db.query(KnowledgeBaseMember.user_id).filter(
+                KnowledgeBaseMember.knowledge_base_id == kb_id
+            )
+        }
+        owner = self.db.query(KnowledgeBase.user_id).filter(KnowledgeBase.id == kb_id).scalar()
+        if owner is not None:
+            user_ids.add(owner)
+        return sorted(user_ids)
+
+    def invalidate_users(self, *user_ids: Optional[int]) -> None:
+        """成员或所有者变化后失效相关用户的权限映射"""
+        user_ids = [uid for uid in user_ids if uid is not None]
+        for uid in user_ids:
+            self._roles.pop(uid, None)
+        if user_ids:
+            self.cache.delete(*[_ROLES_CACHE_KEY.format(user_id=uid) for uid in user_ids])
 
     def ensure_permission(self, kb_id: int, user_id: int, action: str) -> str:
         """
@@ -159,11 +159,15 @@ class QAHistoryService:
         source_info: List[Dict[str, Any]],
         processing_info: Dict[str, Any],
         quality_assessment: Dict[str, Any],
-        user_feedback: Optional[Dict[str, Any]] = None
+        user_feedback: Optional[Dict[str, Any]] = None,
+        question_vector: Optional[List[float]] = None
     ) -> bool:
         """
         存储问答历史 - 根据设计文档实现
         
+        启用 QA_HISTORY_WRITE_BEHIND_ENABLED 时仅写入持久化队列并立即返回，
+        向量生成与索引由后台任务批量完成（见 QAHistoryWriter）；否则在请求内同步写入。
+        
         Args:
             question_id: 问题ID
             session_id: 会话ID
@@ -175,74 +179,51 @@ class QAHistoryService:
             processing_info: 处理信息
             quality_assessment: 质量评估
             user_feedback: 用户反馈
+            question_vector: 检索阶段已生成的问题向量（可选，提供时不再重复生成）
             
         Returns:
-            存储是否成功
+            存储（或入队）是否成功
         """
         try:
             logger.info(f"开始存储问答历史，问题ID: {question_id}")
             
-            # 1. 生成向量数据
-            question_vector = await self._generate_question_vector(question_content)
-            answer_vector = await self._generate_answer_vector(answer_content)
-            
-            # 2. 提取关键词
-            keywords = await self._extract_keywords(question_content, answer_content)
-            
-            # 3. 清理 source_info，确保 document_id 为整数或 None（避免 OpenSearch 类型冲突）
-            cleaned_source_info = []
-            for src in source_info:
-                cleaned_src = src.copy()
-                doc_id = cleaned_src.get("document_id")
-                # ✅ 如果 document_id 不是整数类型，设置为 None
-                if doc_id is not None and not isinstance(doc_id, int):
-                    # 尝试转换为整数，如果失败则设为 None
-                    try:
-                        cleaned_src["document_id"] = int(doc_id)
-                    except (ValueError, TypeError):
-                        cleaned_src["document_id"] = None
-                cleaned_source_info.append(cleaned_src)
-            
-            # 4. 构建历史记录文档
-            history_doc = {
+            payload = {
                 "question_id": question_id,
                 "session_id": session_id,
                 "user_id": user_id,
                 "knowledge_base_id": knowledge_base_id,
                 "question_content": question_content,
                 "answer_content": answer_content,
-                "source_info": cleaned_source_info,
+                "source_info": source_info,
                 "processing_info": processing_info,
                 "quality_assessment": quality_assessment,
                 "user_feedback": user_feedback or {},
                 "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat(),
-                "question_vector": question_vector,
-                "answer_vector": answer_vector,
-                "question_type": processing_info.get("input_type", "text"),
-                "answer_quality": quality_assessment.get("overall_score", 0.0),
-                "keywords": keywords
             }
+            if question_vector:
+                payload["question_vector"] = question_vector
+            
+            if settings.QA_HISTORY_WRITE_BEHIND_ENABLED:
+                try:
+                    from app.services.qa_history_writer import QAHistoryWriter
+                    await QAHistoryWriter().enqueue_async(payload)
+                    logger.info(f"问答历史已进入写入队列，问题ID: {question_id}")
+                    return True
+                except Exception as e:
+                    logger.warning(f"问答历史入队失败，改为同步写入: {e}")
+            
+            # 1. 生成向量数据（失败时不再写入零向量，仅保留文本字段）
+            if not question_vector:
+                question_vector = await self._generate_question_vector(question_content)
+            answer_vector = await self._generate_answer_vector(answer_content)
+            
+            # 2. 构建历史记录文档与答案索引文档
+            history_doc, answer_doc = self.build_history_documents(payload, question_vector, answer_vector)
             
-            # 5. 存储到OpenSearch
+            # 3. 存储到OpenSearch
             success = await self._store_to_opensearch(question_id, history_doc)
 
-            # 6. 构建并存储答案索引文档（用于全文/语义检索）
-            answer_doc = {
-                "question_id": question_id,
-                "session_id": session_id,
-                "knowledge_base_id": knowledge_base_id,
-                "question_content": question_content,
-                "answer_content": answer_content,
-                "answer_strategy": processing_info.get("answer_strategy"),
-                "confidence": quality_assessment.get("confidence", 0.0),
-                "source_ids": [src.get("document_id") for src in cleaned_source_info if src.get("document_id") is not None and isinstance(src.get("document_id"), int)],
-                "keywords": keywords,
-                "question_vector": question_vector,
-                "answer_vector": answer_vector,
-                "created_at": history_doc["created_at"],
-                "updated_at": history_doc["updated_at"]
-            }
+            # 4. 存储答案索引文档（用于全文/语义检索）
             answer_index_success = await self._store_to_answer_index(question_id, answer_doc)
             if not answer_index_success:
                 logger.warning(f"问答答案索引存储失败 question_id={question_id}")
@@ -261,6 +242,67 @@ class QAHistoryService:
                 message=f"存储问答历史失败: {str(e)}"
             )
     
+    def build_history_documents(
+        self,
+        payload: Dict[str, Any],
+        question_vector: Optional[List[float]],
+        answer_vector: Optional[List[float]]
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """根据问答记录构建 qa_history / qa_answers 两个索引的文档（向量为空时不写向量字段）"""
+        processing_info = payload.get("processing_info") or {}
+        quality_assessment = payload.get("quality_assessment") or {}
+        created_at = payload.get("created_at") or datetime.now().isoformat()
+        keywords = self._extract_keywords_sync(payload.get("question_content", ""), payload.get("answer_content", ""))
+        
+        # 清理 source_info，确保 document_id 为整数或 None（避免 OpenSearch 类型冲突）
+        cleaned_source_info = []
+        for src in payload.get("source_info") or []:
+            cleaned_src = src.copy()
+            doc_id = cleaned_src.get("document_id")
+            if doc_id is not None and not isinstance(doc_id, int):
+                try:
+                    cleaned_src["document_id"] = int(doc_id)
+                except (ValueError, TypeError):
+                    cleaned_src["document_id"] = None
+            cleaned_source_info.append(cleaned_src)
+        
+        history_doc = {
+            "question_id": payload["question_id"],
+            "session_id": payload.get("session_id"),
+            "user_id": payload.get("user_id"),
+            "knowledge_base_id": payload.get("knowledge_base_id"),
+            "question_content": payload.get("question_content"),
+            "answer_content": payload.get("answer_content"),
+            "source_info": cleaned_source_info,
+            "processing_info": processing_info,
+            "quality_assessment": quality_assessment,
+            "user_feedback": payload.get("user_feedback") or {},
+            "created_at": created_at,
+            "updated_at": datetime.now().isoformat(),
+            "question_type": processing_info.get("input_type", "text"),
+            "answer_quality": quality_assessment.get("overall_score", 0.0),
+            "keywords": keywords
+        }
+        answer_doc = {
+            "question_id": payload["question_id"],
+            "session_id": payload.get("session_id"),
+            "knowledge_base_id": payload.get("knowledge_base_id"),
+            "question_content": payload.get("question_content"),
+            "answer_content": payload.get("answer_content"),
+            "answer_strategy": processing_info.get("answer_strategy"),
+            "confidence": quality_assessment.get("confidence", 0.0),
+            "source_ids": [src.get("document_id") for src in cleaned_source_info if isinstance(src.get("document_id"), int)],
+            "keywords": keywords,
+            "created_at": created_at,
+            "updated_at": history_doc["updated_at"]
+        }
+        for doc in (history_doc, answer_doc):
+            if question_vector:
+                doc["question_vector"] = question_vector
+            if answer_vector:
+                doc["answer_vector"] = answer_vector
+        return history_doc, answer_doc
+    
     async def get_qa_history(
         self,
         user_id: Optional[str] = None,
@@ -599,25 +641,29 @@ class QAHistoryService:
     # 辅助方法实现
     
     async def _generate_question_vector(self, question_content: str) -> List[float]:
-        """生成问题向量"""
+        """生成问题向量（失败返回空列表，不写入零向量以免污染语义检索）"""
         try:
             vector = await self.ollama_service.generate_embedding(question_content)
             return vector
         except Exception as e:
             logger.error(f"生成问题向量失败: {e}")
-            return [0.0] * settings.TEXT_EMBEDDING_DIMENSION
+            return []
     
     async def _generate_answer_vector(self, answer_content: str) -> List[float]:
-        """生成答案向量"""
+        """生成答案向量（失败返回空列表，不写入零向量以免污染语义检索）"""
         try:
             vector = await self.ollama_service.generate_embedding(answer_content)
             return vector
         except Exception as e:
             logger.error(f"生成答案向量失败: {e}")
-            return [0.0] * settings.TEXT_EMBEDDING_DIMENSION
+            return []
     
     async def _extract_keywords(self, question_content: str, answer_content: str) -> List[str]:
         """提取关键词"""
+        return self._extract_keywords_sync(question_content, answer_content)
+    
+    def _extract_keywords_sync(self, question_content: str, answer_content: str) -> List[str]:
+        """提取关键词（同步版本，供批量写入复用）"""
         try:
             # 简单的关键词提取
             combined_text = f"{question_content} {answer_content}"
@@ -0,0 +1,234 @@
+"""
+QA History Writer
+问答历史写后队列：请求路径只把记录追加到 Redis Stream，后台任务批量生成向量并 bulk 写入 OpenSearch
+- 队列持久化在 Redis 中，进程重启不丢失；未确认（ACK）的消息在空闲超时后重新投递
+- 向量生成失败的消息保留在队列中重试，超过最大投递次数后不带向量写入，不再写零向量
+- 请求路径使用 enqueue_async：异步 Redis 客户端一次 pipeline 往返，落盘任务投递交给线程池，不阻塞事件循环
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config.redis import get_async_redis, redis_client
+from app.config.settings import settings
+from app.core.logging import logger
+
+_KICK_KEY_SUFFIX = ":flush_scheduled"
+
+
+class QAHistoryWriter:
+    """问答历史批量写入器"""
+
+    # 本进程上次尝试调度落盘的时间（单调时钟），窗口内不再访问 Redis 调度标记
+    _last_kick = 0.0
+
+    def __init__(self, client=None, async_client=None):
+        self.redis = client or redis_client
+        self.async_redis = async_client
+        self.stream_key = settings.QA_HISTORY_STREAM_KEY
+        self.group = settings.QA_HISTORY_STREAM_GROUP
+        self.kick_key = f"{self.stream_key}{_KICK_KEY_SUFFIX}"
+
+    # ---------------- 生产端 ----------------
+
+    def _payload_fields(self, payload: Dict[str, Any]) -> Dict[str, str]:
+        return {"payload": json.dumps(payload, ensure_ascii=False, default=str)}
+
+    @classmethod
+    def _should_kick(cls) -> bool:
+        """同一进程在一个延迟窗口内只尝试一次调度（跨进程由 Redis SET NX 去重）"""
+        now = time.monotonic()
+        if now - cls._last_kick < max(1, settings.QA_HISTORY_FLUSH_DELAY_SECONDS):
+            return False
+        cls._last_kick = now
+        return True
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        """追加一条问答记录到写入队列，并按需调度一次延迟落盘（同步调用方使用）"""
+        message_id = self.redis.xadd(
+            self.stream_key,
+            self._payload_fields(payload),
+            maxlen=settings.QA_HISTORY_STREAM_MAXLEN,
+            approximate=True,
+        )
+        self._schedule_flush()
+        return message_id
+
+    async def enqueue_async(self, payload: Dict[str, Any]) -> str:
+        """
+        异步入队（请求路径使用）：XADD 与调度标记 SET NX 合并为一次 pipeline 往返；
+        取得调度标记时在线程池中投递落盘任务，不等待 broker
+        """
+        kick = self._should_kick()
+        pipe = (self.async_redis or get_async_redis()).pipeline(transaction=False)
+        pipe.xadd(
+            self.stream_key,
+            self._payload_fields(payload),
+            maxlen=settings.QA_HISTORY_STREAM_MAXLEN,
+            approximate=True,
+        )
+        if kick:
+            pipe.set(self.kick_key, "1", nx=True, ex=max(1, settings.QA_HISTORY_FLUSH_DELAY_SECONDS))
+        results = await pipe.execute()
+        if kick and results[1]:
+            asyncio.get_running_loop().run_in_executor(None, self._dispatch_flush)
+        return results[0]
+
+    def _schedule_flush(self) -> None:
+        """同一时间窗口内只调度一次落盘任务，使并发写入合并成一批"""
+        if not self._should_kick():
+            return
+        try:
+            if not self.redis.set(self.kick_key, "1", nx=True, ex=max(1, settings.QA_HISTORY_FLUSH_DELAY_SECONDS)):
+                return
+        except Exception as e:
+            logger.warning(f"[QAHistoryWriter] 调度落盘任务失败: {e}")
+            return
+        self._dispatch_flush()
+
+    @staticmethod
+    def _dispatch_flush() -> None:
+        try:
+            from app.tasks.index_tasks import flush_qa_history_task
+
+            flush_qa_history_task.apply_async(countdown=settings.QA_HISTORY_FLUSH_DELAY_SECONDS)
+        except Exception as e:
+            # 调度失败不影响入队，Beat 兜底任务会继续落盘
+            logger.warning(f"[QAHistoryWriter] 调度落盘任务失败: {e}")
+
+    # ---------------- 消费端 ----------------
+
+    def _ensure_group(self) -> None:
+        try:
+            self.redis.xgroup_create(self.stream_key, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _read_batch(self, consumer: str, batch_size: int) -> List[Tuple[str, Dict[str, str]]]:
+        """优先认领超时未确认的消息（重试），再读取新消息"""
+        messages: List[Tuple[str, Dict[str, str]]] = []
+        try:
+            claimed = self.redis.xautoclaim(
+                self.stream_key,
+                self.group,
+                consumer,
+                min_idle_time=settings.QA_HISTORY_RETRY_IDLE_SECONDS * 1000,
+                start_id="0-0",
+                count=batch_size,
+            )
+            messages.extend(m for m in (claimed[1] if claimed else []) if m and m[1])
+        except Exception as e:
+            logger.warning(f"[QAHistoryWriter] 认领待重试消息失败: {e}")
+
+        remaining = batch_size - len(messages)
+        if remaining > 0:
+            resp = self.redis.xreadgroup(self.group, consumer, {self.stream_key: ">"}, count=remaining)
+            for _, entries in resp or []:
+                messages.extend(entries)
+        return messages
+
+    def _delivery_counts(self, message_ids: List[str]) -> Dict[str, int]:
+        if not message_ids:
+            return {}
+        try:
+            ordered = sorted(message_ids, key=lambda mid: tuple(int(p) for p in mid.split("-")))
+            pending = self.redis.xpending_range(
+                self.stream_key, self.group, min=ordered[0], max=ordered[-1], count=len(message_ids) * 2
+            )
+            return {p["message_id"]: int(p.get("times_delivered", 1)) for p in pending}
+        except Exception:
+            return {}
+
+    def drain(self, batch_size: Optional[int] = None, consumer: str = "worker", max_batches: int = 20) -> Dict[str, int]:
+        """循环读取并写入队列中的记录，直到队列为空或达到 max_batches"""
+        from app.services.qa_history_service import QAHistoryService
+        from app.services.vector_service import VectorService
+
+        batch_size = batch_size or settings.QA_HISTORY_FLUSH_BATCH_SIZE
+        self._ensure_group()
+        history_service = QAHistoryService(None)
+        vector_service = VectorService(None)
+        stats = {"written": 0, "retry": 0, "dropped": 0, "batches": 0}
+
+        for _ in range(max_batches):
+            messages = self._read_batch(consumer, batch_size)
+            if not messages:
+                break
+            stats["batches"] += 1
+            result = self._write_batch(messages, history_service, vector_service)
+            for key in ("written", "retry", "dropped"):
+                stats[key] += result[key]
+            if len(messages) < batch_size:
+                break
+
+        if stats["batches"]:
+            logger.info(f"[QAHistoryWriter] 落盘完成: {stats}")
+        return stats
+
+    def _write_batch(self, messages, history_service, vector_service) -> Dict[str, int]:
+        parsed: List[Tuple[str, Dict[str, Any]]] = []
+        ack_ids: List[str] = []
+        for message_id, fields in messages:
+            try:
+                parsed.append((message_id, json.loads(fields["payload"])))
+            except Exception as e:
+                logger.error(f"[QAHistoryWriter] 丢弃无法解析的消息 {message_id}: {e}")
+                ack_ids.append(message_id)
+        dropped = len(ack_ids)
+
+        # 一次请求批量生成缺失的问题/答案向量（问题向量通常已在检索阶段生成并随记录入队）
+        texts: List[str] = []
+        slots: List[Tuple[int, str]] = []
+        for i, (_, payload) in enumerate(parsed):
+            if not payload.get("question_vector"):
+                slots.append((i, "question_vector"))
+                texts.append(payload.get("question_content") or "")
+            slots.append((i, "answer_vector"))
+            texts.append(payload.get("answer_content") or "")
+        vectors = vector_service.generate_embeddings(texts) if texts else []
+        for (i, field), vector in zip(slots, vectors):
+            if vector:
+                parsed[i][1][field] = vector
+
+        delivery_counts = self._delivery_counts([mid for mid, _ in parsed])
+        history_docs: Dict[str, Dict[str, Any]] = {}
+        answer_docs: Dict[str, Dict[str, Any]] = {}
+        id_map: Dict[str, str] = {}
+        retry = 0
+        for message_id, payload in parsed:
+            missing = not payload.get("question_vector") or not payload.get("answer_vector")
+            if missing and delivery_counts.get(message_id, 1) < settings.QA_HISTORY_MAX_RETRIES:
+                # 保持未确认，空闲超时后由 XAUTOCLAIM 重新投递
+                retry += 1
+                continue
+            history_doc, answer_doc = history_service.build_history_documents(
+                payload, payload.get("question_vector"), payload.get("answer_vector")
+            )
+            question_id = str(payload["question_id"])
+            history_docs[question_id] = history_doc
+            answer_docs[question_id] = answer_doc
+            id_map[question_id] = message_id
+
+        os_service = history_service.opensearch_service
+        written_ids = set(os_service.bulk_index_documents_sync(history_service.INDEX_NAME, history_docs))
+        answer_ok = set(os_service.bulk_index_documents_sync(history_service.ANSWER_INDEX_NAME, answer_docs))
+        for question_id in written_ids - answer_ok:
+            logger.warning(f"问答答案索引存储失败 question_id={question_id}")
+        ack_ids.extend(id_map[qid] for qid in written_ids)
+
+        if ack_ids:
+            self.redis.xack(self.stream_key, self.group, *ack_ids)
+            self.redis.xdel(self.stream_key, *ack_ids)
+        return {"written": len(written_ids), "retry": retry + len(history_docs) - len(written_ids), "dropped": dropped}
+
+    def stats(self) -> Dict[str, Any]:
+        """队列长度与待确认数量"""
+        try:
+            length = self.redis.xlen(self.stream_key)
+            pending = self.redis.xpending(self.stream_key, self.group) if length else {"pending": 0}
+            return {"length": length, "pending": int(pending.get("pending", 0))}
+        except Exception as e:
+            return {"error": str(e)}
@@ -7,6 +7,8 @@ import asyncio
 import uuid
 from typing import Dict, List, Optional, Any, AsyncGenerator
 from datetime import datetime
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.logging import logger
@@ -53,7 +55,11 @@ class QAService:
             
             # 从MySQL数据库获取知识库列表
             from app.models.knowledge_base import KnowledgeBase
-            query = self.db.query(KnowledgeBase)
+            from app.models.knowledge_base_stats import KnowledgeBaseStats
+            # 统计字段来自物化的 knowledge_base_stats，单次 LEFT JOIN 取得
+            query = self.db.query(KnowledgeBase, KnowledgeBaseStats).outerjoin(
+                KnowledgeBaseStats, KnowledgeBaseStats.knowledge_base_id == KnowledgeBase.id
+            )
             
             if category_id:
                 query = query.filter(KnowledgeBase.category_id == category_id)
@@ -62,7 +68,7 @@ class QAService:
                 is_active_flag = True if status == "active" else False
                 query = query.filter(KnowledgeBase.is_active == is_active_flag)
             
-            db_kbs = query.offset((page - 1) * size).limit(size).all()
+            db_rows = query.offset((page - 1) * size).limit(size).all()
             
             knowledge_bases = [
                 {
@@ -71,14 +77,14 @@ class QAService:
                     "description": kb.description,
                     "category_id": kb.category_id,
                     "category_name": getattr(kb, 'category_name', ''),
-                    "document_count": 0,  # TODO: 统计文档数量
-                    "storage_size": 0,  # TODO: 统计存储大小
+                    "document_count": int(stats.document_count or 0) if stats else 0,
+                    "storage_size": int(stats.storage_bytes or 0) if stats else 0,
                     "tags": [],  # TODO: 获取标签
                     "status": "active" if getattr(kb, 'is_active', False) else "inactive",
                     "is_active": bool(getattr(kb, 'is_active', False)),
                     "created_at": kb.created_at
                 }
-                for kb in db_kbs
+                for kb, stats in db_rows
             ]
             
             # 临时模拟数据（用于测试）
@@ -244,36 +250,33 @@ class QAService:
         try:
             logger.info(f"获取会话列表，页码: {page}, 大小: {size}, 用户ID: {user_id}")
             
-            # 查询会话
-            query = self.db.query(QASession)
-            
-            # 必须按用户ID过滤，确保数据隔离
-            if user_id is not None:
-                query = query.filter(QASession.user_id == user_id)
-            
-            if knowledge_base_id:
-                query = query.filter(QASession.knowledge_base_id == knowledge_base_id)
-            
-            query = query.filter(QASession.status == "active")
-            
-            # 总数
-            total = query.count()
+            stmt = self._sessions_stmt(knowledge_base_id, user_id)
+            total = self.db.execute(self._count_stmt(stmt)).scalar() or 0
+            sessions = self.db.execute(stmt.offset((page - 1) * size).limit(size)).scalars().all()
+            return self._sessions_response(sessions, page, size, total)
             
-            # 分页
-            sessions = query.offset((page - 1) * size).limit(size).all()
-            
-            session_list = [self._session_to_dict(s) for s in sessions]
-            
-            return QASessionListResponse(
-                sessions=session_list,
-                pagination={
-                    "page": page,
-                    "size": size,
-                    "total": total,
-                    "total_pages": (total + size - 1) // size
-                }
+        except Exception as e:
+            logger.error(f"获取会话列表失败: {e}", exc_info=True)
+            raise CustomException(
+                code=ErrorCode.SESSION_QUERY_FAILED,
+                message=f"获取会话列表失败: {str(e)}"
             )
-            
+
+    @classmethod
+    async def get_qa_sessions_async(
+        cls,
+        db: AsyncSession,
+        page: int = 1,
+        size: int = 20,
+        knowledge_base_id: Optional[int] = None,
+        user_id: Optional[int] = None
+    ) -> QASessionListResponse:
+        """获取会话列表（异步会话版本，无需构造完整的 QAService），只返回当前用户的会话"""
+        try:
+            stmt = cls._sessions_stmt(knowledge_base_id, user_id)
+            total = (await db.execute(cls._count_stmt(stmt))).scalar() or 0
+            sessions = (await db.execute(stmt.offset((page - 1) * size).limit(size))).scalars().all()
+            return cls._sessions_response(sessions, page, size, total)
         except Exception as e:
             logger.error(f"获取会话列表失败: {e}", exc_info=True)
             raise CustomException(
@@ -711,6 +714,9 @@ class QAService:
             
             # 存储历史记录到OpenSearch（暂时没有用户概念，user_id设为空字符串）
             try:
+                # 复用检索阶段已生成的问题向量
+                last_embedding = getattr(self.search_service, "last_query_embedding", None)
+                question_vector = last_embedding[1] if last_embedding and last_embedding[0] == question_content else None
                 await self.history_service.store_qa_history(
                     question_id=question_id,
                     session_id=session_id,
@@ -720,7 +726,8 @@ class QAService:
                     answer_content=answer_content,
                     source_info=source_info,
                     processing_info=processing_info,
-                    quality_assessment=quality_assessment
+                    quality_assessment=quality_assessment,
+                    question_vector=question_vector
                 )
             except Exception as history_err:
                 logger.error(
@@ -1803,7 +1810,35 @@ class QAService:
             # 这样可以确保即使OpenSearch有问题，用户仍能使用知识库查询功能
             return False
     
-    def _session_to_dict(self, session: QASession) -> dict:
+    @staticmethod
+    def _sessions_stmt(knowledge_base_id: Optional[int], user_id: Optional[int]) -> Select:
+        """会话列表查询（同步与异步接口共用）"""
+        stmt = select(QASession).where(QASession.status == "active")
+        # 必须按用户ID过滤，确保数据隔离
+        if user_id is not None:
+            stmt = stmt.where(QASession.user_id == user_id)
+        if knowledge_base_id:
+            stmt = stmt.where(QASession.knowledge_base_id == knowledge_base_id)
+        return stmt
+
+    @staticmethod
+    def _count_stmt(stmt: Select) -> Select:
+        return select(func.count()).select_from(stmt.subquery())
+
+    @classmethod
+    def _sessions_response(cls, sessions: List[QASession], page: int, size: int, total: int) -> QASessionListResponse:
+        return QASessionListResponse(
+            sessions=[cls._session_to_dict(s) for s in sessions],
+            pagination={
+                "page": page,
+                "size": size,
+                "total": total,
+                "total_pages": (total + size - 1) // size
+            }
+        )
+
+    @staticmethod
+    def _session_to_dict(session: QASession) -> dict:
         """将QASession对象转换为字典"""
         return {
             "session_id": session.session_id,
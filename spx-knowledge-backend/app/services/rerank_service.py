@@ -1,9 +1,15 @@
 ﻿"""
 Rerank Service
 使用bge-reranker模型对搜索结果进行重新排序
+
+输入处理：超出模型最大长度的段落按查询词命中密度截取窗口；query-passage 对按 token 长度分桶，
+各桶使用各自的批大小计算，减少补齐到最长段落的计算浪费；段落分词结果按分块缓存（进程内 LRU）
 """
 
+from array import array
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import os
 import threading
 from app.core.logging import logger
@@ -11,11 +17,70 @@ from app.core.exceptions import CustomException, ErrorCode
 from app.config.settings import settings
 
 
+# 每个 query-passage 对的特殊 token 数（<s> query </s></s> passage </s>）
+_PAIR_SPECIAL_TOKENS = 4
+
+
+def parse_length_buckets(spec: Optional[str], max_length: int) -> List[Tuple[int, int]]:
+    """解析长度分桶配置，如 "128:64,256:32,512:16"（token 上限:批大小），按上限升序返回"""
+    buckets = []
+    for item in (spec or "").split(","):
+        bound, _, batch_size = item.strip().partition(":")
+        try:
+            buckets.append((min(int(bound), max_length), max(1, int(batch_size or 16))))
+        except ValueError:
+            continue
+    buckets.sort()
+    if not buckets or buckets[-1][0] < max_length:
+        buckets.append((max_length, buckets[-1][1] if buckets else 16))
+    return buckets
+
+
+class _TokenizedPassage:
+    """段落分词结果：token id 与每个 token 在原文中的字符区间（用于按窗口截取原文）"""
+
+    __slots__ = ("ids", "starts", "ends")
+
+    def __init__(self, ids: List[int], offsets: List[Tuple[int, int]]):
+        self.ids = array("l", ids)
+        self.starts = array("l", (o[0] for o in offsets))
+        self.ends = array("l", (o[1] for o in offsets))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class _PassageTokenCache:
+    """按分块缓存段落分词结果（key 为 chunk_id 与内容哈希），线程安全的 LRU"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[Tuple[Any, int], _TokenizedPassage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[_TokenizedPassage]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+            return item
+
+    def put(self, key, item: _TokenizedPassage) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
 class RerankService:
     """Rerank服务 - 使用bge-reranker模型对搜索结果重新排序（单例模式）"""
     
     _instance = None
     _lock = threading.Lock()
+    _model_lock = threading.Lock()
     
     def __new__(cls):
         """单例模式实现"""
@@ -40,10 +105,28 @@ class RerankService:
             self.enabled = settings.RERANK_ENABLED
             self.model_name = settings.RERANK_MODEL_NAME
             self.model_path = settings.RERANK_MODEL_PATH
+            self.device = None
+            self.max_length = settings.RERANK_MAX_LENGTH
+            self.length_buckets = parse_length_buckets(settings.RERANK_LENGTH_BUCKETS, self.max_length)
+            self._token_cache = _PassageTokenCache(settings.RERANK_TOKEN_CACHE_SIZE)
+            self._model_loaded = False
+            self._initialized = True
+        
+        # 默认首次 rerank 时才加载模型（不需要 rerank 的进程不再为其付出启动时间与内存）
+        if not settings.MODEL_LAZY_LOADING:
+            self._ensure_model()
+    
+    def _ensure_model(self) -> None:
+        """按需加载模型（每个进程仅执行一次）"""
+        if self._model_loaded:
+            return
+        with self._model_lock:
+            if self._model_loaded:
+                return
             # 自动检测GPU可用性，如果配置为cuda但GPU不可用，降级到cpu
             self.device = self._get_device(settings.RERANK_DEVICE)
             self._initialize_model()
-            self._initialized = True
+            self._model_loaded = True
     
     def _get_device(self, configured_device: str) -> str:
         """获取实际使用的设备，自动检测GPU可用性和兼容性
@@ -131,12 +214,30 @@ class RerankService:
         logger.warning(f"未知的设备配置: {configured_device}，使用CPU")
         return "cpu"
     
+    def _initialize_onnx_model(self) -> bool:
+        """加载 ONNX Runtime 后端（RERANK_BACKEND=onnx），产物缺失时返回 False 回退 PyTorch"""
+        try:
+            from app.services.onnx_backend import OnnxReranker
+            self.model = OnnxReranker()
+            self.device = "cpu"
+            logger.info(f"✅ Rerank模型初始化成功（ONNX Runtime）: {self.model.model_path}")
+            return True
+        except (ImportError, FileNotFoundError, OSError) as e:
+            logger.warning(
+                f"⚠️ ONNX Rerank 模型不可用，回退到 PyTorch: {e}。"
+                "可运行 python scripts/export_onnx_models.py --rerank 导出"
+            )
+            return False
+
     def _initialize_model(self):
         """初始化rerank模型 - 优先使用本地缓存，没有才联网下载"""
         if not self.enabled:
             logger.info("Rerank模型未启用，跳过初始化")
             return
         
+        if (settings.RERANK_BACKEND or "torch").lower() == "onnx" and self._initialize_onnx_model():
+            return
+        
         try:
             logger.info(f"开始初始化Rerank模型: {self.model_name}")
             
@@ -279,6 +380,265 @@ class RerankService:
             self.enabled = False
             self.model = None
     
+    def _fallback_sort(self, candidates: List[Dict[str, Any]], top_k: Optional[int]) -> List[Dict[str, Any]]:
+        """降级：按原始分数排序"""
+        sorted_candidates = sorted(
+            candidates,
+            key=lambda x: x.get("score", 0.0),
+            reverse=True
+        )
+        top_k = top_k or settings.RERANK_TOP_K
+        return sorted_candidates[:top_k]
+    
+    @staticmethod
+    def _to_score_list(scores: Any, count: int) -> List[float]:
+        """FlagReranker.compute_score() 返回numpy数组、列表或单个数值，统一转换为列表"""
+        import numpy as np
+        if isinstance(scores, np.ndarray):
+            return [float(s) for s in scores.reshape(-1).tolist()]
+        if isinstance(scores, (list, tuple)):
+            return [float(s) for s in scores]
+        if isinstance(scores, (int, float)):
+            return [float(scores)] * count
+        logger.warning(f"Rerank返回的分数格式不支持: {type(scores)}")
+        return [0.0] * count
+    
+    def _model_compute(self, pairs: List[List[str]], batch_size: Optional[int] = None, max_length: Optional[int] = None):
+        if batch_size is None:
+            return self.model.compute_score(pairs, normalize=True)
+        try:
+            return self.model.compute_score(pairs, batch_size=batch_size, max_length=max_length, normalize=True)
+        except TypeError:
+            # 旧版本 FlagReranker 不支持 batch_size / max_length 参数
+            return self.model.compute_score(pairs, normalize=True)
+
+    def _compute_bucketed(self, pairs: List[List[str]], lengths: List[int]) -> List[float]:
+        """按 token 长度排序后分桶计算，各桶使用配置的批大小与长度上限，结果按原顺序返回"""
+        order = sorted(range(len(pairs)), key=lambda i: lengths[i])
+        scores = [0.0] * len(pairs)
+        pos = 0
+        for bound, batch_size in self.length_buckets:
+            end = pos
+            while end < len(order) and lengths[order[end]] <= bound:
+                end += 1
+            if bound == self.length_buckets[-1][0]:
+                end = len(order)
+            if end > pos:
+                idx = order[pos:end]
+                bucket_pairs = [pairs[i] for i in idx]
+                bucket_max = min(max(lengths[i] for i in idx), self.max_length)
+                bucket_scores = self._to_score_list(
+                    self._model_compute(bucket_pairs, batch_size=batch_size, max_length=bucket_max), len(idx)
+                )
+                for i, score in zip(idx, bucket_scores):
+                    scores[i] = score
+            pos = end
+        return scores
+
+    def _compute_scores(self, pairs: List[List[str]], lengths: Optional[List[int]] = None) -> List[float]:
+        """对 query-passage 对批量打分（含CUDA降级与逐个计算兜底）；提供 token 长度时按长度分桶计算"""
+        if not pairs:
+            return []
+        try:
+            # 方式1：批量计算（推荐）
+            if lengths is not None and len(lengths) == len(pairs):
+                return self._compute_bucketed(pairs, lengths)
+            return self._to_score_list(self._model_compute(pairs), len(pairs))
+        except Exception as e:
+            # 检查是否是CUDA兼容性错误
+            error_msg = str(e).lower()
+            is_cuda_error = "cuda" in error_msg or "no kernel image" in error_msg
+            
+            if is_cuda_error and self.device == "cuda":
+                logger.error(f"⚠️ 检测到CUDA兼容性错误: {e}")
+                logger.warning("🔄 自动降级到CPU模式，重新初始化模型...")
+                # 强制切换到CPU并重新初始化
+                self.device = "cpu"
+                try:
+                    from FlagEmbedding import FlagReranker
+                    self.model = FlagReranker(self.model_name, use_fp16=False)
+                    logger.info("✅ 模型已重新加载到CPU模式")
+                    return self._to_score_list(self.model.compute_score(pairs, normalize=True), len(pairs))
+                except Exception as e3:
+                    logger.error(f"CPU模式重新初始化失败: {e3}")
+                    return [0.0] * len(pairs)
+            
+            logger.warning(f"Rerank批量计算失败，尝试逐个计算: {e}")
+            # 降级：逐个计算
+            scores = []
+            for pair in pairs:
+                try:
+                    score = self._to_score_list(self.model.compute_score([pair], normalize=True), 1)
+                    scores.append(score[0] if score else 0.0)
+                except Exception as e2:
+                    # 检查单个pair计算时的CUDA错误
+                    error_msg2 = str(e2).lower()
+                    if ("cuda" in error_msg2 or "no kernel image" in error_msg2) and self.device == "cuda":
+                        logger.error(f"⚠️ 单个pair计算时检测到CUDA错误: {e2}")
+                        logger.warning("🔄 跳过此pair，使用默认分数")
+                    else:
+                        logger.warning(f"单个pair计算失败: {e2}")
+                    scores.append(0.0)
+            return scores
+    
+    def _score_batch(self, requests: List[Tuple[str, List[str], Optional[List[int]]]]) -> List[List[float]]:
+        """微批入口：合并多个请求的 query-passage 对为一次计算（跨请求按长度分桶），再按请求拆分结果"""
+        pairs = [[query, passage] for query, passages, _ in requests for passage in passages]
+        lengths: Optional[List[int]] = []
+        for _, passages, request_lengths in requests:
+            if request_lengths is None or lengths is None:
+                lengths = None
+            else:
+                lengths.extend(request_lengths)
+        flat_scores = self._compute_scores(pairs, lengths)
+        results = []
+        offset = 0
+        for _, passages, _ in requests:
+            results.append(flat_scores[offset:offset + len(passages)])
+            offset += len(passages)
+        return results
+
+    # ---------------- 输入预处理：截断与分词缓存 ----------------
+
+    def _get_tokenizer(self):
+        tokenizer = getattr(self.model, "tokenizer", None)
+        return tokenizer if getattr(tokenizer, "is_fast", False) else None
+
+    def _tokenize_passages(self, tokenizer, keys: List[Tuple[Any, int]], texts: List[str]) -> List[_TokenizedPassage]:
+        """批量分词（命中缓存的跳过），返回与 texts 对应的分词结果"""
+        tokenized: List[Optional[_TokenizedPassage]] = [self._token_cache.get(k) for k in keys]
+        missing = [i for i, item in enumerate(tokenized) if item is None]
+        if missing:
+            encoded = tokenizer(
+                [texts[i] for i in missing],
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                truncation=False,
+                verbose=False,
+            )
+            for i, ids, offsets in zip(missing, encoded["input_ids"], encoded["offset_mapping"]):
+                item = _TokenizedPassage(ids, offsets)
+                self._token_cache.put(keys[i], item)
+                tokenized[i] = item
+        return tokenized
+
+    def _query_term_ids(self, tokenizer, query_ids: List[int]) -> set:
+        """查询中有意义的 token（排除特殊符号、纯标点与空白片段）"""
+        special = set(getattr(tokenizer, "all_special_ids", []) or [])
+        terms = set()
+        for tid, token in zip(query_ids, tokenizer.convert_ids_to_tokens(query_ids)):
+            stripped = (token or "").replace("\u2581", "").replace("\u0120", "").lstrip("#")
+            if tid not in special and any(ch.isalnum() for ch in stripped):
+                terms.add(tid)
+        return terms
+
+    @staticmethod
+    def _best_window(ids: array, terms: set, budget: int) -> int:
+        """滑动窗口：返回查询词命中最多的窗口起点，并让命中区间居中以保留两侧上下文（无命中时取开头）"""
+        hits = [1 if tid in terms else 0 for tid in ids]
+        current = sum(hits[:budget])
+        best, best_start = current, 0
+        for start in range(1, len(hits) - budget + 1):
+            current += hits[start + budget - 1] - hits[start - 1]
+            if current > best:
+                best, best_start = current, start
+        if best == 0:
+            return 0
+        in_window = [i for i in range(best_start, best_start + budget) if hits[i]]
+        center = (in_window[0] + in_window[-1]) // 2
+        return max(0, min(len(hits) - budget, center - budget // 2))
+
+    def _prepare_inputs(self, query: str, candidates: List[Dict[str, Any]]) -> Tuple[List[str], Optional[List[int]]]:
+        """
+        生成 rerank 输入段落与对应的 query-passage token 长度
+        超出模型长度的段落截取为查询词命中最密集的窗口（按原文字符区间截取，不经过解码）
+        """
+        texts = [c.get("content", "") for c in candidates if c.get("content", "")]
+        tokenizer = self._get_tokenizer()
+        if not texts or tokenizer is None:
+            return texts, None
+        try:
+            query_ids = tokenizer(query, add_special_tokens=False, truncation=False, verbose=False)["input_ids"]
+            # 查询过长时同样截断，至少为段落保留一半长度
+            query_ids = query_ids[: self.max_length // 2]
+            budget = max(1, self.max_length - len(query_ids) - _PAIR_SPECIAL_TOKENS)
+            keys = [
+                (c.get("chunk_id") or c.get("id"), hash(c.get("content", "")))
+                for c in candidates if c.get("content", "")
+            ]
+            tokenized = self._tokenize_passages(tokenizer, keys, texts)
+            terms = None
+            passages, lengths = [], []
+            truncated = 0
+            for text, tok in zip(texts, tokenized):
+                if len(tok) > budget:
+                    if terms is None:
+                        terms = self._query_term_ids(tokenizer, query_ids)
+                    start = self._best_window(tok.ids, terms, budget) if terms else 0
+                    text = text[tok.starts[start]:tok.ends[start + budget - 1]]
+                    truncated += 1
+                passages.append(text)
+                lengths.append(len(query_ids) + min(len(tok), budget) + _PAIR_SPECIAL_TOKENS)
+            if truncated:
+                logger.debug(f"Rerank段落截断: {truncated}/{len(texts)} 个超过 {budget} tokens")
+            return passages, lengths
+        except Exception as e:
+            logger.warning(f"Rerank输入预处理失败，使用原始段落: {e}")
+            return texts, None
+    
+    def _get_batcher(self):
+        """查询期 rerank 微批处理器（未启用合批时返回 None）"""
+        if not settings.INFERENCE_BATCHING_ENABLED:
+            return None
+        from app.services.inference_batcher import MicroBatcher, get_batcher
+        return get_batcher(
+            "rerank",
+            lambda: MicroBatcher(
+                name="rerank",
+                batch_fn=self._score_batch,
+                max_batch_size=settings.RERANK_BATCH_MAX_PAIRS,
+                max_wait_ms=settings.INFERENCE_BATCH_MAX_WAIT_MS,
+                max_queue_size=settings.INFERENCE_BATCH_MAX_QUEUE,
+                weight_fn=lambda payload: len(payload[1]),
+            ),
+        )
+    
+    def _apply_scores(
+        self,
+        candidates: List[Dict[str, Any]],
+        scores: List[float],
+        top_k: Optional[int]
+    ) -> List[Dict[str, Any]]:
+        """将rerank分数写回候选结果并排序截断"""
+        valid_candidates = []
+        score_idx = 0
+        for candidate in candidates:
+            content = candidate.get("content", "")
+            if not content:
+                continue
+            
+            rerank_score = float(scores[score_idx]) if score_idx < len(scores) else 0.0
+            # 保存原始分数（融合分数）
+            candidate["original_score"] = candidate.get("score", 0.0)
+            candidate["rerank_score"] = rerank_score
+            # 使用rerank分数作为最终分数
+            candidate["score"] = rerank_score
+            
+            valid_candidates.append(candidate)
+            score_idx += 1
+        
+        # 按rerank分数排序
+        sorted_candidates = sorted(
+            valid_candidates,
+            key=lambda x: x.get("rerank_score", 0.0),
+            reverse=True
+        )
+        
+        top_k = top_k or settings.RERANK_TOP_K
+        result = sorted_candidates[:top_k]
+        logger.info(f"Rerank排序完成，返回 {len(result)} 个结果")
+        return result
+    
     def rerank(
         self,
         query: str,
@@ -295,16 +655,10 @@ class RerankService:
         Returns:
             重新排序后的结果列表
         """
+        self._ensure_model()
         if not self.enabled or self.model is None:
             logger.debug("Rerank未启用或模型未加载，使用原始排序")
-            # 降级：按原始分数排序
-            sorted_candidates = sorted(
-                candidates,
-                key=lambda x: x.get("score", 0.0),
-                reverse=True
-            )
-            top_k = top_k or settings.RERANK_TOP_K
-            return sorted_candidates[:top_k]
+            return self._fallback_sort(candidates, top_k)
         
         if not candidates:
             return []
@@ -312,137 +666,52 @@ class RerankService:
         try:
             logger.info(f"开始Rerank排序，查询: {query[:50]}..., 候选数量: {len(candidates)}")
             
-            # 准备rerank输入：query + 每个候选的content
-            pairs = []
-            for candidate in candidates:
-                content = candidate.get("content", "")
-                if not content:
-                    continue
-                pairs.append([query, content])
-            
-            if not pairs:
+            # 准备rerank输入：query + 每个候选的content（超长段落截取查询词窗口）
+            passages, lengths = self._prepare_inputs(query, candidates)
+            if not passages:
                 logger.warning("没有有效的候选内容，返回空结果")
                 return []
             
-            # 使用rerank模型计算分数
-            # FlagReranker.compute_score() 接受列表，返回numpy数组或列表
-            import numpy as np
-            try:
-                # 方式1：批量计算（推荐）
-                scores = self.model.compute_score(pairs, normalize=True)
-                
-                # 转换为列表
-                if isinstance(scores, np.ndarray):
-                    scores = scores.tolist()
-                elif isinstance(scores, (list, tuple)):
-                    scores = [float(s) for s in scores]
-                elif isinstance(scores, (int, float)):
-                    # 如果只有一个分数，转换为列表
-                    scores = [float(scores)] * len(pairs)
-                else:
-                    logger.warning(f"Rerank返回的分数格式不支持: {type(scores)}")
-                    scores = [0.0] * len(pairs)
-                    
-            except Exception as e:
-                # 检查是否是CUDA兼容性错误
-                error_msg = str(e).lower()
-                is_cuda_error = "cuda" in error_msg or "no kernel image" in error_msg
-                
-                if is_cuda_error and self.device == "cuda":
-                    logger.error(f"⚠️ 检测到CUDA兼容性错误: {e}")
-                    logger.warning("🔄 自动降级到CPU模式，重新初始化模型...")
-                    # 强制切换到CPU并重新初始化
-                    self.device = "cpu"
-                    try:
-                        # 重新初始化模型到CPU
-                        from FlagEmbedding import FlagReranker
-                        self.model = FlagReranker(self.model_name, use_fp16=False)
-                        logger.info("✅ 模型已重新加载到CPU模式")
-                        # 重新尝试批量计算
-                        scores = self.model.compute_score(pairs, normalize=True)
-                        if isinstance(scores, np.ndarray):
-                            scores = scores.tolist()
-                        elif isinstance(scores, (list, tuple)):
-                            scores = [float(s) for s in scores]
-                        elif isinstance(scores, (int, float)):
-                            scores = [float(scores)] * len(pairs)
-                        else:
-                            scores = [0.0] * len(pairs)
-                    except Exception as e3:
-                        logger.error(f"CPU模式重新初始化失败: {e3}")
-                        scores = [0.0] * len(pairs)
-                else:
-                    logger.warning(f"Rerank批量计算失败，尝试逐个计算: {e}")
-                    # 降级：逐个计算
-                    scores = []
-                    for pair in pairs:
-                        query_text, passage_text = pair
-                        try:
-                            score = self.model.compute_score([pair], normalize=True)
-                            if isinstance(score, np.ndarray):
-                                score = float(score[0])
-                            elif isinstance(score, (list, tuple)):
-                                score = float(score[0])
-                            else:
-                                score = float(score)
-                            scores.append(score)
-                        except Exception as e2:
-                            # 检查单个pair计算时的CUDA错误
-                            error_msg2 = str(e2).lower()
-                            if ("cuda" in error_msg2 or "no kernel image" in error_msg2) and self.device == "cuda":
-                                logger.error(f"⚠️ 单个pair计算时检测到CUDA错误: {e2}")
-                                logger.warning("🔄 跳过此pair，使用默认分数")
-                            else:
-                                logger.warning(f"单个pair计算失败: {e2}")
-                            scores.append(0.0)
-            
-            # 更新候选结果的分数
-            valid_candidates = []
-            score_idx = 0
-            for candidate in candidates:
-                content = candidate.get("content", "")
-                if not content:
-                    continue
-                
-                # 更新rerank分数
-                rerank_score = float(scores[score_idx]) if score_idx < len(scores) else 0.0
-                # 保存原始分数（融合分数）
-                original_score = candidate.get("score", 0.0)
-                candidate["original_score"] = original_score
-                # 更新rerank分数
-                candidate["rerank_score"] = rerank_score
-                # 使用rerank分数作为最终分数
-                candidate["score"] = rerank_score
-                
-                valid_candidates.append(candidate)
-                score_idx += 1
-            
-            # 按rerank分数排序
-            sorted_candidates = sorted(
-                valid_candidates,
-                key=lambda x: x.get("rerank_score", 0.0),
-                reverse=True
-            )
-            
-            # 返回top_k个结果
-            top_k = top_k or settings.RERANK_TOP_K
-            result = sorted_candidates[:top_k]
-            
-            logger.info(f"Rerank排序完成，返回 {len(result)} 个结果")
-            return result
+            batcher = self._get_batcher()
+            if batcher is not None:
+                # 与其他并发请求合批计算
+                scores = batcher.infer((query, passages, lengths))
+            else:
+                scores = self._compute_scores([[query, p] for p in passages], lengths)
+            return self._apply_scores(candidates, scores, top_k)
             
         except Exception as e:
             logger.error(f"Rerank排序失败: {e}", exc_info=True)
             logger.warning("Rerank失败，降级到简单排序")
-            # 降级：按原始分数排序
-            sorted_candidates = sorted(
-                candidates,
-                key=lambda x: x.get("score", 0.0),
-                reverse=True
-            )
-            top_k = top_k or settings.RERANK_TOP_K
-            return sorted_candidates[:top_k]
+            return self._fallback_sort(candidates, top_k)
+    
+    async def rerank_async(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        top_k: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """rerank 的协程版本：在事件循环中等待微批结果，不阻塞其他请求（参数同 rerank）"""
+        if not self._model_loaded and self.enabled:
+            await asyncio.get_running_loop().run_in_executor(None, self._ensure_model)
+        batcher = self._get_batcher()
+        if not self.enabled or self.model is None or batcher is None or not candidates:
+            return self.rerank(query, candidates, top_k)
+        
+        try:
+            logger.info(f"开始Rerank排序，查询: {query[:50]}..., 候选数量: {len(candidates)}")
+            passages, lengths = self._prepare_inputs(query, candidates)
+            if not passages:
+                logger.warning("没有有效的候选内容，返回空结果")
+                return []
+            scores = await batcher.infer_async((query, passages, lengths))
+            return self._apply_scores(candidates, scores, top_k)
+        except Exception as e:
+            logger.error(f"Rerank排序失败: {e}", exc_info=True)
+            logger.warning("Rerank失败，降级到简单排序")
+            return self._fallback_sort(candidates, top_k)
     
     def is_available(self) -> bool:
         """检查rerank模型是否可用"""
-        return self.enabled and self.model is not None
+        self._ensure_model()
+        return self.enabled and self.model is not None
\ No newline at end of file
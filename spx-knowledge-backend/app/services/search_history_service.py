@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from datetime import datetime
 from app.models.search_history import SearchHistory, SearchHotword
+from app.services.hotword_counter import HotwordCounter
 from app.config.settings import settings
 from app.core.logging import logger
 
@@ -63,7 +64,13 @@ class SearchHistoryService:
             raise
     
     async def _update_hotword(self, keyword: str):
-        """更新搜索热词统计"""
+        """更新搜索热词统计（默认只在 Redis 中累加，由定时任务批量落盘）"""
+        if settings.HOTWORD_BUFFER_ENABLED:
+            try:
+                await HotwordCounter().record(keyword)
+                return
+            except Exception as e:
+                logger.warning(f"热词 Redis 计数失败，改为直接写库: {e}")
         try:
             # 提取关键词（简单处理，可以后续优化）
             keyword = keyword.strip()[:200]
@@ -162,6 +169,16 @@ class SearchHistoryService:
     
     async def get_hotwords(self, limit: int = 20, period: str = "week") -> List[SearchHotword]:
         """获取搜索热词"""
+        if settings.HOTWORD_BUFFER_ENABLED:
+            try:
+                top = await HotwordCounter().top(limit, period)
+                if top is not None:
+                    return [
+                        SearchHotword(keyword=keyword, search_count=count, last_searched_at=last_searched_at)
+                        for keyword, count, last_searched_at in top
+                    ]
+            except Exception as e:
+                logger.warning(f"从 Redis 读取搜索热词失败，改为查询数据库: {e}")
         try:
             query = self.db.query(SearchHotword).filter(
                 SearchHotword.is_deleted == False
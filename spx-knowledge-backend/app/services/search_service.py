@@ -11,6 +11,8 @@ from app.services.document_service import DocumentService
 from app.schemas.search import SearchRequest, SearchResponse
 from sqlalchemy.orm import Session
 from app.core.logging import logger
+from app.core.exceptions import CustomException
+from app.core.tracing import KIND_RETRIEVAL, StageTimer
 from app.config.settings import settings
 
 
@@ -22,6 +24,8 @@ class SearchService:
         self.os = OpenSearchService()
         self.vs = VectorService(db)
         self.rerank_service = RerankService()
+        # 最近一次查询的 (文本, 向量)，供问答历史复用，避免重复生成问题向量
+        self.last_query_embedding = None
 
     def _json_load(self, v):
         try:
@@ -135,12 +139,17 @@ class SearchService:
         
         # 为了rerank，需要召回更多候选（通常取top_k的2-3倍）
         recall_limit = top_k * 3  # 召回更多候选，供rerank精排
+        # 分阶段计时：embed / knn / bm25 / fusion / enrich / rerank
+        timer = StageTimer(KIND_RETRIEVAL)
         
         try:
             if use_vector:
                 logger.info(f"开始向量搜索: {query_text[:50]}...")
+                timer.start("embed")
                 qv = self.vs.generate_embedding(query_text)
+                self.last_query_embedding = (query_text, qv) if qv else None
                 if qv:
+                    timer.start("knn")
                     # 使用同步方法（OpenSearch客户端是同步的）
                     vector_hits = self.os.search_document_vectors_sync(
                         query_vector=qv,
@@ -152,6 +161,7 @@ class SearchService:
                     logger.info(f"向量搜索完成，找到 {len(vector_hits)} 个结果")
         except Exception as e:
             logger.warning(f"向量检索失败: {e}")
+        timer.stop()
         
         try:
             if use_keywords:
@@ -174,8 +184,9 @@ class SearchService:
                 # 添加高亮配置
                 highlight_config = self.os._build_highlight_config(query_text, fields=["content"])
                 
+                timer.start("bm25")
                 resp = self.os.client.search(
-                    index=self.os.document_index,
+                    index=self.os.document_search_index,
                     body={
                         "query": {"bool": {"must": must}},
                         "size": recall_limit,
@@ -201,6 +212,7 @@ class SearchService:
             logger.warning(f"关键词检索失败: {e}")
         
         # 融合向量搜索结果和关键词搜索结果
+        timer.start("fusion")
         by_id: Dict[int, Dict[str, Any]] = {}
         
         # 添加向量搜索结果
@@ -272,13 +284,16 @@ class SearchService:
         logger.info(f"开始Rerank精排，候选数量: {len(results)}, 返回数量: {top_k}")
         
         # 优化：为每个文本块添加关联图片的OCR文本，提升rerank效果
+        timer.start("enrich")
         enriched_results = await self._enrich_chunks_with_image_ocr(results)
         
-        reranked_results = self.rerank_service.rerank(
+        timer.start("rerank")
+        reranked_results = await self.rerank_service.rerank_async(
             query=query_text,
             candidates=enriched_results,
             top_k=top_k
         )
+        timer.stop()
         all_reranked_results = reranked_results[:]
         # 应用最小精排分（优先使用传入参数，否则使用全局配置）
         try:
@@ -293,7 +308,7 @@ class SearchService:
         except Exception:
             pass
         
-        logger.info(f"混合搜索完成，Rerank后返回 {len(reranked_results)} 个结果（注：前端可能按min_rerank_score再次过滤）")
+        logger.info(f"混合搜索完成，Rerank后返回 {len(reranked_results)} 个结果（注：前端可能按min_rerank_score再次过滤），阶段耗时: {timer.summary()}")
         return reranked_results
     
     async def search(self, search_request: SearchRequest) -> List[SearchResponse]:
@@ -389,14 +404,18 @@ class SearchService:
         """向量搜索 - 基于向量相似度的语义搜索 + Rerank精排"""
         try:
             logger.info(f"开始向量搜索: {search_request.query}")
+            timer = StageTimer(KIND_RETRIEVAL)
             
             # 生成查询向量
+            timer.start("embed")
             query_vector = self.vs.generate_embedding(search_request.query)
+            self.last_query_embedding = (search_request.query, query_vector) if query_vector else None
             if not query_vector:
                 logger.warning("向量生成失败")
                 return []
             
             # OpenSearch向量搜索（使用同步方法）
+            timer.start("knn")
             results = self.os.search_document_vectors_sync(
                 query_vector=query_vector,
                 similarity_threshold=getattr(search_request, "similarity_threshold", settings.SEARCH_VECTOR_THRESHOLD),
@@ -413,11 +432,13 @@ class SearchService:
             
             # Rerank精排
             top_k = (search_request.limit or settings.SEARCH_VECTOR_TOPK or settings.RERANK_TOP_K)
-            reranked_results = self.rerank_service.rerank(
+            timer.start("rerank")
+            reranked_results = await self.rerank_service.rerank_async(
                 query=search_request.query,
                 candidates=results,
                 top_k=top_k
             )
+            timer.stop()
             # 后端最小精排分过滤（保护：限制到[0.0,0.99]）
             req_min = getattr(search_request, 'min_rerank_score', None)
             min_score = req_min if req_min is not None else settings.RERANK_MIN_SCORE
@@ -435,6 +456,7 @@ class SearchService:
             except Exception:
                 pass
             
+            logger.info(f"向量搜索完成，返回 {len(reranked_results)} 个结果，阶段耗时: {timer.summary()}")
             return reranked_results
             
         except Exception as e:
@@ -445,6 +467,7 @@ class SearchService:
         """关键词搜索 - 基于BM25的文本搜索 + Rerank精排"""
         try:
             logger.info(f"开始关键词搜索: {search_request.query}")
+            timer = StageTimer(KIND_RETRIEVAL)
             
             # 构建关键词查询
             must: List[Dict[str, Any]] = [
@@ -463,8 +486,9 @@ class SearchService:
                 must.append({"term": {"category_id": search_request.category_id}})
             
             # 执行搜索
+            timer.start("bm25")
             resp = self.os.client.search(
-                index=self.os.document_index,
+                index=self.os.document_search_index,
                 body={
                     "query": {"bool": {"must": must}},
                     "size": search_request.limit * 3,  # 召回更多候选
@@ -488,11 +512,13 @@ class SearchService:
             
             # Rerank精排
             top_k = (search_request.limit or settings.SEARCH_VECTOR_TOPK or settings.RERANK_TOP_K)
-            reranked_results = self.rerank_service.rerank(
+            timer.start("rerank")
+            reranked_results = await self.rerank_service.rerank_async(
                 query=search_request.query,
                 candidates=results,
                 top_k=top_k
             )
+            timer.stop()
             # 后端最小精排分过滤（保护同上）
             req_min = getattr(search_request, 'min_rerank_score', None)
             min_score = req_min if req_min is not None else settings.RERANK_MIN_SCORE
@@ -510,6 +536,7 @@ class SearchService:
             except Exception:
                 pass
             
+            logger.info(f"关键词搜索完成，返回 {len(reranked_results)} 个结果，阶段耗时: {timer.summary()}")
             return reranked_results
             
         except Exception as e:
@@ -539,6 +566,7 @@ class SearchService:
                 merged_filters["category_id"] = category_id
 
             # OpenSearch已经按分数排序返回结果，不需要再次排序
+            timer = StageTimer(KIND_RETRIEVAL).start("exact")
             results = await self.os.search_document_exact_match(
                 query_text=search_request.query,
                 limit=search_request.limit,
@@ -553,7 +581,8 @@ class SearchService:
             # 精确匹配不使用Rerank（因为已经是最精确的匹配）
             # OpenSearch已经按分数或指定字段排序，不需要再次排序
             
-            logger.info(f"精确匹配搜索完成，返回 {len(results)} 个结果")
+            timer.stop()
+            logger.info(f"精确匹配搜索完成，返回 {len(results)} 个结果，阶段耗时: {timer.summary()}")
             return results
             
         except Exception as e:
@@ -586,10 +615,12 @@ class SearchService:
             logger.error(f"混合搜索失败: {e}", exc_info=True)
             return []
     
-    async def get_suggestions(self, request) -> List[str]:
-        """获取搜索建议"""
-        # TODO: 实现搜索建议逻辑
-        return []
+    async def get_suggestions(self, request, kb_ids: Optional[List[int]] = None) -> List[str]:
+        """获取搜索建议：热词与 kb_ids 中知识库的文档标题 / 目录标题前缀匹配（kb_ids 为 None 时不按知识库过滤）"""
+        from app.services.suggestion_service import suggestion_index
+
+        limit = min(max(1, request.limit), settings.SUGGEST_MAX_LIMIT)
+        return suggestion_index.suggest(request.query or "", kb_ids, limit)
     
     async def get_search_history(self, user_id: Optional[int] = None, limit: int = 20):
         """获取搜索历史"""
@@ -631,6 +662,7 @@ class SearchService:
                 pass
             
             # 调用OpenSearch高级搜索
+            timer = StageTimer(KIND_RETRIEVAL).start("advanced")
             results = await self.os.search_document_advanced(
                 query=advanced_request.query or "",
                 bool_query=advanced_request.bool_query,
@@ -640,8 +672,11 @@ class SearchService:
                 limit=advanced_request.limit,
                 knowledge_base_id=advanced_request.knowledge_base_id,
                 filters=filters,
-                similarity_threshold=0.0  # 高级搜索通常不设置阈值，或者可以通过filters传递
+                similarity_threshold=0.0,  # 高级搜索通常不设置阈值，或者可以通过filters传递
+                offset=advanced_request.offset,
+                sort=advanced_request.sort
             )
+            timer.stop()
             
             # 转换为SearchResponse格式（高级搜索也补齐表格结构）
             search_responses = []
@@ -695,9 +730,11 @@ class SearchService:
                 )
                 search_responses.append(search_response)
             
-            logger.info(f"高级搜索完成，返回 {len(search_responses)} 个结果")
+            logger.info(f"高级搜索完成，返回 {len(search_responses)} 个结果，阶段耗时: {timer.summary()}")
             return search_responses
             
+        except CustomException:
+            raise
         except Exception as e:
             logger.error(f"高级搜索失败: {e}", exc_info=True)
             return []
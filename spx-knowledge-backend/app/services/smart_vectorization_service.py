@@ -3,11 +3,16 @@ Smart Vectorization Service
 根据文档修改功能设计实现智能向量化策略
 """
 
-from typing import List, Dict, Any, Optional
+import gzip
+import json
+from io import BytesIO
+from typing import List, Dict, Any, Optional, Set
 from sqlalchemy.orm import Session
 from app.models.document import Document
 from app.models.chunk import DocumentChunk
+from app.services.opensearch_service import OpenSearchService, chunk_content_hash
 from app.services.vector_service import VectorService
+from app.config.settings import settings
 from app.core.logging import logger
 from app.core.exceptions import CustomException, ErrorCode
 
@@ -17,6 +22,7 @@ class SmartVectorizationService:
     def __init__(self, db: Session):
         self.db = db
         self.vector_service = VectorService(db)
+        self.opensearch_service = OpenSearchService()
         
         # 设计文档要求的策略阈值
         self.SMALL_DOCUMENT_THRESHOLD = 5    # 小文档阈值
@@ -50,8 +56,188 @@ class SmartVectorizationService:
                 message=f"获取文档大小分类失败: {str(e)}"
             )
     
+    def _load_chunk_meta(self, chunk: DocumentChunk) -> Dict[str, Any]:
+        try:
+            meta = json.loads(chunk.meta) if isinstance(chunk.meta, str) else (chunk.meta or {})
+            return meta if isinstance(meta, dict) else {}
+        except (json.JSONDecodeError, TypeError, ValueError):
+            return {}
+
+    def _load_chunk_texts(self, document_id: int, chunks: List[DocumentChunk]) -> Dict[int, str]:
+        """chunk_id -> 正文：优先取数据库中的正文，缺失时读取一次 MinIO 分块归档；找不到正文的分块不在结果中"""
+        if getattr(settings, 'STORE_CHUNK_TEXT_IN_DB', False):
+            return {c.id: c.content or "" for c in chunks}
+        texts = {c.id: c.content for c in chunks if c.content}
+        missing = [c for c in chunks if not c.content]
+        if not missing:
+            return texts
+
+        from app.services.minio_storage_service import MinioStorageService
+
+        archived: Dict[int, str] = {}
+        try:
+            minio = MinioStorageService()
+            needle = f"/{document_id}/parsed/chunks/chunks.jsonl.gz"
+            target = next(
+                (f["object_name"] for f in minio.list_files("documents/") if f.get("object_name", "").endswith(needle)),
+                None,
+            )
+            if not target:
+                logger.warning(f"未找到 MinIO 分块归档，跳过无正文的分块: document_id={document_id}")
+                return texts
+            with gzip.GzipFile(fileobj=BytesIO(minio.download_file(target)), mode='rb') as gz:
+                for position, line in enumerate(gz):
+                    try:
+                        item = json.loads(line)
+                    except Exception:
+                        continue
+                    index = item.get("index", item.get("chunk_index", position))
+                    archived[int(index)] = item.get("content") or ""
+        except Exception as e:
+            logger.warning(f"从 MinIO 读取分块正文失败，跳过无正文的分块: document_id={document_id}, err={e}")
+            return texts
+        for chunk in missing:
+            if chunk.chunk_index in archived:
+                texts[chunk.id] = archived[chunk.chunk_index]
+        return texts
+
+    def revectorize_chunks(
+        self,
+        document_id: int,
+        chunks: List[DocumentChunk],
+        target_chunk_ids: Optional[Set[int]] = None,
+        extra_metadata: Optional[Dict[str, Any]] = None,
+        force: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        变更感知的重新向量化并写回 OpenSearch
+        - 内容哈希与索引中记录的 content_hash 一致的分块跳过向量生成
+        - 内容变化（或索引中缺失）的分块批量生成向量，一次 bulk 局部更新写入 content / metadata / 向量
+        - target_chunk_ids 中内容未变的分块只局部更新 metadata（如回退标记），其余未变分块不写索引
+        - 正文不存库时从 MinIO 分块归档读取；取不到正文的分块跳过，不覆盖索引中的 content
+        """
+        target_chunk_ids = set(target_chunk_ids) if target_chunk_ids is not None else {c.id for c in chunks}
+        document = self.db.query(Document).filter(Document.id == document_id).first()
+        # 分块写在所属知识库向量配置档对应的物理索引中
+        index = self.opensearch_service.document_index_for(document.knowledge_base_id if document else None)
+
+        indexed_hashes: Dict[int, Optional[str]] = {}
+        if not force:
+            try:
+                indexed_hashes = self.opensearch_service.get_chunk_content_hashes_sync(
+                    [c.id for c in chunks], index=index
+                )
+            except Exception as e:
+                logger.warning(f"读取已索引内容哈希失败，全部重新向量化: document_id={document_id}, err={e}")
+
+        texts = self._load_chunk_texts(document_id, chunks)
+        missing_ids = {c.id for c in chunks if c.id not in texts}
+        changed: List[DocumentChunk] = []
+        metadata_only: List[DocumentChunk] = []
+        for chunk in chunks:
+            if chunk.id in missing_ids:
+                continue
+            indexed = indexed_hashes.get(chunk.id)
+            if force or indexed is None or indexed != chunk_content_hash(texts[chunk.id]):
+                changed.append(chunk)
+            elif chunk.id in target_chunk_ids:
+                metadata_only.append(chunk)
+
+        # 只对真正变化的分块批量生成向量（空内容不生成）
+        embed_chunks = [c for c in changed if texts[c.id].strip()]
+        vectors: Dict[int, List[float]] = {}
+        if embed_chunks:
+            embeddings = self.vector_service.generate_embeddings([texts[c.id] for c in embed_chunks])
+            vectors = {c.id: v for c, v in zip(embed_chunks, embeddings)}
+
+        updates: List[Dict[str, Any]] = []
+        for chunk in changed:
+            metadata = {**self._load_chunk_meta(chunk), **(extra_metadata or {})}
+            updates.append({
+                "document_id": chunk.document_id,
+                "knowledge_base_id": document.knowledge_base_id if document else None,
+                "category_id": document.category_id if document else None,
+                "chunk_id": chunk.id,
+                "content": texts[chunk.id],
+                "chunk_type": chunk.chunk_type or "text",
+                "metadata": metadata,
+                "created_at": chunk.created_at.isoformat() if chunk.created_at else None,
+                "content_vector": vectors.get(chunk.id) or [],
+            })
+        for chunk in metadata_only:
+            updates.append({
+                "chunk_id": chunk.id,
+                "metadata": {**self._load_chunk_meta(chunk), **(extra_metadata or {})},
+            })
+
+        indexed_ids: Set[int] = set()
+        if updates:
+            try:
+                indexed_ids = set(self.opensearch_service.bulk_update_document_chunks_sync(updates, index=index))
+            except Exception as e:
+                logger.error(f"批量更新分块索引失败: document_id={document_id}, err={e}", exc_info=True)
+
+        changed_ids = {c.id for c in changed}
+        vectorization_results = []
+        for chunk in chunks:
+            vector = vectors.get(chunk.id) or []
+            embedded = chunk.id in changed_ids
+            if chunk.id in missing_ids:
+                success = chunk.id not in target_chunk_ids
+            else:
+                success = (not embedded or bool(vector) or not texts[chunk.id].strip()) and (
+                    chunk.id in indexed_ids or not (embedded or chunk.id in target_chunk_ids)
+                )
+            result = {
+                "chunk_id": chunk.id,
+                "chunk_index": chunk.chunk_index,
+                "vector": vector or None,
+                "vector_dimension": len(vector),
+                "success": success,
+                "skipped": not embedded,
+                "is_modified": chunk.id in target_chunk_ids,
+            }
+            if not success:
+                if chunk.id in missing_ids:
+                    result["error"] = "未找到分块正文"
+                else:
+                    result["error"] = "向量生成失败" if embedded and not vector else "索引更新失败"
+            vectorization_results.append(result)
+
+        success_count = sum(1 for r in vectorization_results if r["success"])
+        logger.info(
+            f"重新向量化完成: document_id={document_id}, 分块 {len(chunks)}, 向量生成 {len(embed_chunks)}, "
+            f"跳过 {len(chunks) - len(changed)}（无正文 {len(missing_ids)}）, 索引更新 {len(indexed_ids)}"
+        )
+        return {
+            "document_id": document_id,
+            "total_chunks": len(chunks),
+            "processed_chunks": len(chunks),
+            "embedded_count": len(embed_chunks),
+            "skipped_count": len(chunks) - len(changed),
+            "indexed_count": len(indexed_ids),
+            "success_count": success_count,
+            "failed_count": len(chunks) - success_count,
+            "vectorization_results": vectorization_results,
+        }
+
+    def revectorize_chunk_ids(
+        self,
+        document_id: int,
+        chunk_ids: List[int],
+        extra_metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """按分块ID批量重新向量化（批量编辑/回退后调用一次）"""
+        chunks = self.db.query(DocumentChunk).filter(
+            DocumentChunk.document_id == document_id,
+            DocumentChunk.id.in_(chunk_ids)
+        ).order_by(DocumentChunk.chunk_index).all() if chunk_ids else []
+        result = self.revectorize_chunks(document_id, chunks, extra_metadata=extra_metadata)
+        result["strategy"] = "batch"
+        return result
+
     def full_document_vectorization(self, document_id: int) -> Dict[str, Any]:
-        """全文档向量化 - 根据设计文档实现"""
+        """全文档向量化 - 根据设计文档实现（仅处理内容发生变化的块）"""
         try:
             logger.info(f"开始全文档向量化: document_id={document_id}")
             
@@ -66,54 +252,12 @@ class SmartVectorizationService:
                     message=f"文档 {document_id} 没有找到块"
                 )
             
-            total_chunks = len(chunks)
-            processed_chunks = 0
-            vectorization_results = []
-            
-            logger.info(f"全文档向量化: 处理 {total_chunks} 个块")
-            
-            # 批量向量化所有块
-            for chunk in chunks:
-                try:
-                    # 生成向量
-                    vector = self.vector_service.generate_embedding(chunk.content)
-                    
-                    # 保存向量结果
-                    vectorization_results.append({
-                        "chunk_id": chunk.id,
-                        "vector": vector,
-                        "vector_dimension": len(vector),
-                        "success": True
-                    })
-                    
-                    processed_chunks += 1
-                    
-                    logger.debug(f"块 {chunk.id} 向量化完成，向量维度: {len(vector)}")
-                    
-                except Exception as e:
-                    logger.error(f"块 {chunk.id} 向量化失败: {e}")
-                    vectorization_results.append({
-                        "chunk_id": chunk.id,
-                        "vector": None,
-                        "vector_dimension": 0,
-                        "success": False,
-                        "error": str(e)
-                    })
-            
-            success_count = sum(1 for r in vectorization_results if r["success"])
-            
-            result = {
+            result = self.revectorize_chunks(document_id, chunks)
+            result.update({
                 "strategy": "full_document",
-                "document_id": document_id,
-                "total_chunks": total_chunks,
-                "processed_chunks": processed_chunks,
-                "success_count": success_count,
-                "failed_count": total_chunks - success_count,
-                "vectorization_results": vectorization_results,
-                "message": f"全文档向量化完成，成功 {success_count}/{total_chunks} 个块"
-            }
-            
-            logger.info(f"全文档向量化完成: document_id={document_id}, 成功 {success_count}/{total_chunks}")
+                "message": f"全文档向量化完成，成功 {result['success_count']}/{result['total_chunks']} 个块，"
+                           f"跳过未变化 {result['skipped_count']} 个",
+            })
             return result
             
         except CustomException:
@@ -125,22 +269,24 @@ class SmartVectorizationService:
                 message=f"全文档向量化失败: {str(e)}"
             )
     
+    def _get_modified_chunk(self, document_id: int, modified_chunk_id: int) -> DocumentChunk:
+        modified_chunk = self.db.query(DocumentChunk).filter(
+            DocumentChunk.id == modified_chunk_id,
+            DocumentChunk.document_id == document_id
+        ).first()
+        if not modified_chunk:
+            raise CustomException(
+                code=ErrorCode.VALIDATION_ERROR,
+                message=f"修改的块 {modified_chunk_id} 不存在"
+            )
+        return modified_chunk
+
     def contextual_vectorization(self, document_id: int, modified_chunk_id: int) -> Dict[str, Any]:
-        """上下文向量化 - 根据设计文档实现"""
+        """上下文向量化 - 根据设计文档实现（修改块及前后各2个块，内容未变的相邻块跳过）"""
         try:
             logger.info(f"开始上下文向量化: document_id={document_id}, modified_chunk_id={modified_chunk_id}")
             
-            # 获取修改的块
-            modified_chunk = self.db.query(DocumentChunk).filter(
-                DocumentChunk.id == modified_chunk_id,
-                DocumentChunk.document_id == document_id
-            ).first()
-            
-            if not modified_chunk:
-                raise CustomException(
-                    code=ErrorCode.VALIDATION_ERROR,
-                    message=f"修改的块 {modified_chunk_id} 不存在"
-                )
+            modified_chunk = self._get_modified_chunk(document_id, modified_chunk_id)
             
             # 获取相邻块（前后各2个块）
             adjacent_chunks = self.db.query(DocumentChunk).filter(
@@ -149,59 +295,13 @@ class SmartVectorizationService:
                 DocumentChunk.chunk_index <= modified_chunk.chunk_index + 2
             ).order_by(DocumentChunk.chunk_index).all()
             
-            total_chunks = len(adjacent_chunks)
-            processed_chunks = 0
-            vectorization_results = []
-            
-            logger.info(f"上下文向量化: 处理 {total_chunks} 个相邻块")
-            
-            # 向量化相邻块
-            for chunk in adjacent_chunks:
-                try:
-                    # 生成向量
-                    vector = self.vector_service.generate_embedding(chunk.content)
-                    
-                    # 保存向量结果
-                    vectorization_results.append({
-                        "chunk_id": chunk.id,
-                        "chunk_index": chunk.chunk_index,
-                        "vector": vector,
-                        "vector_dimension": len(vector),
-                        "success": True,
-                        "is_modified": chunk.id == modified_chunk_id
-                    })
-                    
-                    processed_chunks += 1
-                    
-                    logger.debug(f"相邻块 {chunk.id} 向量化完成，向量维度: {len(vector)}")
-                    
-                except Exception as e:
-                    logger.error(f"相邻块 {chunk.id} 向量化失败: {e}")
-                    vectorization_results.append({
-                        "chunk_id": chunk.id,
-                        "chunk_index": chunk.chunk_index,
-                        "vector": None,
-                        "vector_dimension": 0,
-                        "success": False,
-                        "error": str(e),
-                        "is_modified": chunk.id == modified_chunk_id
-                    })
-            
-            success_count = sum(1 for r in vectorization_results if r["success"])
-            
-            result = {
+            result = self.revectorize_chunks(document_id, adjacent_chunks, target_chunk_ids={modified_chunk_id})
+            result.update({
                 "strategy": "contextual",
-                "document_id": document_id,
                 "modified_chunk_id": modified_chunk_id,
-                "total_chunks": total_chunks,
-                "processed_chunks": processed_chunks,
-                "success_count": success_count,
-                "failed_count": total_chunks - success_count,
-                "vectorization_results": vectorization_results,
-                "message": f"上下文向量化完成，成功 {success_count}/{total_chunks} 个相邻块"
-            }
-            
-            logger.info(f"上下文向量化完成: document_id={document_id}, 成功 {success_count}/{total_chunks}")
+                "message": f"上下文向量化完成，成功 {result['success_count']}/{result['total_chunks']} 个相邻块，"
+                           f"跳过未变化 {result['skipped_count']} 个",
+            })
             return result
             
         except CustomException:
@@ -214,66 +314,18 @@ class SmartVectorizationService:
             )
     
     def incremental_vectorization(self, document_id: int, modified_chunk_id: int) -> Dict[str, Any]:
-        """增量向量化 - 根据设计文档实现"""
+        """增量向量化 - 根据设计文档实现（内容未变化时不重新生成向量）"""
         try:
             logger.info(f"开始增量向量化: document_id={document_id}, modified_chunk_id={modified_chunk_id}")
             
-            # 获取修改的块
-            modified_chunk = self.db.query(DocumentChunk).filter(
-                DocumentChunk.id == modified_chunk_id,
-                DocumentChunk.document_id == document_id
-            ).first()
-            
-            if not modified_chunk:
-                raise CustomException(
-                    code=ErrorCode.VALIDATION_ERROR,
-                    message=f"修改的块 {modified_chunk_id} 不存在"
-                )
-            
-            vectorization_results = []
-            
-            try:
-                # 只向量化修改的块
-                vector = self.vector_service.generate_embedding(modified_chunk.content)
-                
-                vectorization_results.append({
-                    "chunk_id": modified_chunk.id,
-                    "chunk_index": modified_chunk.chunk_index,
-                    "vector": vector,
-                    "vector_dimension": len(vector),
-                    "success": True,
-                    "is_modified": True
-                })
-                
-                logger.debug(f"修改块 {modified_chunk.id} 向量化完成，向量维度: {len(vector)}")
-                
-            except Exception as e:
-                logger.error(f"修改块 {modified_chunk.id} 向量化失败: {e}")
-                vectorization_results.append({
-                    "chunk_id": modified_chunk.id,
-                    "chunk_index": modified_chunk.chunk_index,
-                    "vector": None,
-                    "vector_dimension": 0,
-                    "success": False,
-                    "error": str(e),
-                    "is_modified": True
-                })
+            modified_chunk = self._get_modified_chunk(document_id, modified_chunk_id)
             
-            success_count = sum(1 for r in vectorization_results if r["success"])
-            
-            result = {
+            result = self.revectorize_chunks(document_id, [modified_chunk])
+            result.update({
                 "strategy": "incremental",
-                "document_id": document_id,
                 "modified_chunk_id": modified_chunk_id,
-                "total_chunks": 1,
-                "processed_chunks": 1,
-                "success_count": success_count,
-                "failed_count": 1 - success_count,
-                "vectorization_results": vectorization_results,
-                "message": f"增量向量化完成，成功 {success_count}/1 个修改块"
-            }
-            
-            logger.info(f"增量向量化完成: document_id={document_id}, 成功 {success_count}/1")
+                "message": f"增量向量化完成，成功 {result['success_count']}/1 个修改块",
+            })
             return result
             
         except CustomException:
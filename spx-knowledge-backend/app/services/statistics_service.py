@@ -23,7 +23,7 @@ class StatisticsService:
     def __init__(self, db: Session):
         self.db = db
     
-    async def get_personal_statistics(self, user_id: int, period: str = "all") -> Dict[str, Any]:
+    def get_personal_statistics(self, user_id: int, period: str = "all") -> Dict[str, Any]:
         """获取个人数据统计"""
         try:
             # 知识库统计：用户创建的 + 用户作为成员的知识库
@@ -238,7 +238,7 @@ class StatisticsService:
             logger.error(f"获取个人统计数据失败: {e}", exc_info=True)
             raise
     
-    async def get_trends(
+    def get_trends(
         self,
         user_id: int,
         metric: str,
@@ -330,7 +330,7 @@ class StatisticsService:
             logger.error(f"获取趋势数据失败: {e}", exc_info=True)
             raise
     
-    async def get_knowledge_base_heatmap(self, user_id: int) -> List[Dict[str, Any]]:
+    def get_knowledge_base_heatmap(self, user_id: int) -> List[Dict[str, Any]]:
         """获取知识库使用热力图"""
         try:
             # 获取用户的知识库
@@ -0,0 +1,434 @@
+"""
+Suggestion Service
+输入即搜（search-as-you-type）前缀建议：搜索热词、文档标题与目录标题构建进程内前缀索引
+
+- 词条按规范化文本（NFKC + 小写 + 合并空白）去重；热词为全局一组词条，文档标题 / 目录标题按知识库各一组，
+  查询只合并全局热词与用户有权限的知识库，权限过滤不需要逐条判断
+- 每组词条保存为按匹配键排序的紧凑快照（键列表 + 得分数组 + 区间最高分线段树），前缀即 bisect 得到的连续区间；
+  不按字符建节点，每个进程的内存与词条数成正比（约数百字节 / 词条）
+- 得分：热词 SUGGEST_HOTWORD_WEIGHT * log1p(搜索次数) + 来源权重（标题 SUGGEST_TITLE_WEIGHT / 目录 SUGGEST_TOC_WEIGHT 取最大）
+- 查询时多个快照共用一个堆按得分优先拆分区间（best-first），凑满 limit 条即停止
+- 增量刷新：按 updated_at 水位拉取变化的文档（整篇替换其标题与目录词条）与热词，只重建变更过的快照；
+  SUGGEST_FULL_REBUILD_SECONDS 全量重建一次修正漂移
+- 首次查询同步构建，之后过期时后台线程刷新，查询始终读取当前快照
+"""
+
+import heapq
+import itertools
+import math
+import os
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config.settings import settings
+from app.core.logging import logger
+
+SOURCE_TITLE = "title"
+SOURCE_TOC = "toc"
+_TOC_BATCH = 500
+_MAX_CHAR = "\U0010ffff"
+
+
+def normalize(text: Optional[str]) -> str:
+    """建议词条的匹配键：NFKC 归一化、小写、合并空白"""
+    if not text:
+        return ""
+    return " ".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+def title_text(filename: Optional[str]) -> str:
+    """文档标题（去掉扩展名的原始文件名）"""
+    stem, ext = os.path.splitext((filename or "").strip())
+    return stem if stem and ext else (filename or "").strip()
+
+
+def hotword_score(count: int) -> float:
+    return settings.SUGGEST_HOTWORD_WEIGHT * math.log1p(count) if count > 0 else 0.0
+
+
+class _Snapshot:
+    """
+    按匹配键排序的只读词条快照：前缀下的词条是一段连续区间（bisect 定位），
+    区间内最高分的下标由线段树（array 存下标）查询；每个词条只占几个指针 / 数值，不按字符建节点
+    """
+
+    __slots__ = ("keys", "displays", "scores", "tree", "size")
+
+    def __init__(self, items: List[Tuple[str, str, float]]):
+        items.sort(key=lambda item: item[0])
+        self.size = size = len(items)
+        self.keys = [key for key, _, _ in items]
+        self.displays = [display for _, display, _ in items]
+        self.scores = scores = array("d", (score for _, _, score in items))
+        tree = array("i", bytes(8 * size))
+        for i in range(size):
+            tree[size + i] = i
+        for i in range(size - 1, 0, -1):
+            a, b = tree[2 * i], tree[2 * i + 1]
+            tree[i] = a if scores[a] > scores[b] or (scores[a] == scores[b] and a < b) else b
+        self.tree = tree
+
+    def span(self, prefix_key: str) -> Tuple[int, int]:
+        """匹配键以 prefix_key 开头的词条区间 [lo, hi)"""
+        if not prefix_key:
+            return 0, self.size
+        return bisect_left(self.keys, prefix_key), bisect_left(self.keys, prefix_key + _MAX_CHAR)
+
+    def best(self, lo: int, hi: int) -> int:
+        """区间 [lo, hi) 内得分最高的词条下标（同分取靠前者）"""
+        scores, tree = self.scores, self.tree
+        best = -1
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                i = tree[lo]
+                lo += 1
+                if best < 0 or scores[i] > scores[best] or (scores[i] == scores[best] and i < best):
+                    best = i
+            if hi & 1:
+                hi -= 1
+                i = tree[hi]
+                if best < 0 or scores[i] > scores[best] or (scores[i] == scores[best] and i < best):
+                    best = i
+            lo >>= 1
+            hi >>= 1
+        return best
+
+
+def _best_first(spans: List[Tuple[_Snapshot, int, int]], limit: int) -> List[str]:
+    """
+    多个快照共用一个堆按得分优先输出：堆中放区间及其最高分词条，弹出后把区间在该词条两侧拆开继续入堆；
+    同一匹配键只取最先弹出（得分最高）的一条
+    """
+    counter = itertools.count()
+    heap: List[Tuple[float, int, _Snapshot, int, int, int]] = []
+    for snapshot, lo, hi in spans:
+        if lo < hi:
+            i = snapshot.best(lo, hi)
+            heap.append((-snapshot.scores[i], next(counter), snapshot, lo, hi, i))
+    heapq.heapify(heap)
+    results: List[str] = []
+    seen = set()
+    while heap and len(results) < limit:
+        _, _, snapshot, lo, hi, i = heapq.heappop(heap)
+        key = snapshot.keys[i]
+        if key not in seen:
+            seen.add(key)
+            results.append(snapshot.displays[i])
+        for a, b in ((lo, i), (i + 1, hi)):
+            if a < b:
+                j = snapshot.best(a, b)
+                heapq.heappush(heap, (-snapshot.scores[j], next(counter), snapshot, a, b, j))
+    return results
+
+
+class _KbTerms:
+    """单个知识库的标题 / 目录词条：匹配键 -> 引用文档数，展示文本只在与匹配键不同时保存；快照按需重建"""
+
+    __slots__ = ("titles", "tocs", "displays", "snapshot")
+
+    def __init__(self):
+        self.titles: Dict[str, int] = {}
+        self.tocs: Dict[str, int] = {}
+        self.displays: Dict[str, str] = {}
+        self.snapshot: Optional[_Snapshot] = None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.titles or key in self.tocs
+
+    def is_empty(self) -> bool:
+        return not self.titles and not self.tocs
+
+    def add(self, source: str, key: str, display: str) -> None:
+        refs = self.titles if source == SOURCE_TITLE else self.tocs
+        refs[key] = refs.get(key, 0) + 1
+        # 文档标题优先作为展示文本
+        if source == SOURCE_TITLE or (key not in self.titles and key not in self.displays):
+            if display != key:
+                self.displays[key] = display
+            else:
+                self.displays.pop(key, None)
+        self.snapshot = None
+
+    def remove(self, source: str, key: str) -> None:
+        refs = self.titles if source == SOURCE_TITLE else self.tocs
+        count = refs.get(key, 0)
+        if count > 1:
+            refs[key] = count - 1
+        elif count:
+            del refs[key]
+            if key not in self:
+                self.displays.pop(key, None)
+        self.snapshot = None
+
+    def freeze(self, hotword_scores: Dict[str, float]) -> _Snapshot:
+        if self.snapshot is None:
+            title_weight, toc_weight = settings.SUGGEST_TITLE_WEIGHT, settings.SUGGEST_TOC_WEIGHT
+            both = max(title_weight, toc_weight)
+            items = [
+                (key, self.displays.get(key, key), (both if key in self.tocs else title_weight) + hotword_scores.get(key, 0.0))
+                for key in self.titles
+            ]
+            items += [
+                (key, self.displays.get(key, key), toc_weight + hotword_scores.get(key, 0.0))
+                for key in self.tocs
+                if key not in self.titles
+            ]
+            self.snapshot = _Snapshot(items)
+        return self.snapshot
+
+
+class _Tries:
+    """一次构建的全部建议词条（全量重建时整体替换）：全局热词 + 按知识库划分的标题 / 目录词条"""
+
+    def __init__(self):
+        # 热词得分（匹配键 -> 得分），知识库词条同名时叠加；展示文本只在与匹配键不同时保存
+        self.hotword_scores: Dict[str, float] = {}
+        self.hotword_displays: Dict[str, str] = {}
+        self.hotwords: Optional[_Snapshot] = None
+        self.kbs: Dict[int, _KbTerms] = {}
+        # 文档ID -> (知识库ID, 标题匹配键, 目录匹配键)，增量刷新时整篇替换
+        self.doc_keys: Dict[int, Tuple[int, Tuple[str, ...], Tuple[str, ...]]] = {}
+
+    @staticmethod
+    def _key(text: Optional[str]) -> str:
+        key = normalize(text)
+        return sys.intern(key) if key and len(key) <= settings.SUGGEST_MAX_TERM_LENGTH else ""
+
+    def set_hotword(self, text: str, count: int) -> None:
+        key, score = self._key(text), hotword_score(count)
+        if not key:
+            return
+        display = text.strip()
+        if score > 0:
+            if self.hotword_scores.get(key) == score and self.hotword_displays.get(key, key) == display:
+                return
+            self.hotword_scores[key] = score
+            if display != key:
+                self.hotword_displays[key] = display
+            else:
+                self.hotword_displays.pop(key, None)
+        elif self.hotword_scores.pop(key, None) is not None:
+            self.hotword_displays.pop(key, None)
+        else:
+            return
+        self.hotwords = None
+        for terms in self.kbs.values():
+            if key in terms:
+                terms.snapshot = None
+
+    def add_document(self, document_id: int, kb_id: int, title: Optional[str], headings: List[str]) -> None:
+        terms = self.kbs.get(kb_id)
+        if terms is None:
+            terms = self.kbs[kb_id] = _KbTerms()
+        title_keys: List[str] = []
+        toc_keys: List[str] = []
+        for source, texts, keys in ((SOURCE_TITLE, [title] if title else [], title_keys), (SOURCE_TOC, headings, toc_keys)):
+            for text in texts:
+                key = self._key(text)
+                if key:
+                    terms.add(source, key, text.strip())
+                    keys.append(key)
+        if title_keys or toc_keys:
+            self.doc_keys[document_id] = (kb_id, tuple(title_keys), tuple(toc_keys))
+        elif terms.is_empty():
+            del self.kbs[kb_id]
+
+    def remove_document(self, document_id: int) -> None:
+        kb_id, title_keys, toc_keys = self.doc_keys.pop(document_id, (None, (), ()))
+        terms = self.kbs.get(kb_id)
+        if terms is None:
+            return
+        for key in title_keys:
+            terms.remove(SOURCE_TITLE, key)
+        for key in toc_keys:
+            terms.remove(SOURCE_TOC, key)
+        if terms.is_empty():
+            del self.kbs[kb_id]
+
+    def _hotword_snapshot(self) -> _Snapshot:
+        if self.hotwords is None:
+            self.hotwords = _Snapshot(
+                [(key, self.hotword_displays.get(key, key), score) for key, score in self.hotword_scores.items()]
+            )
+        return self.hotwords
+
+    def freeze(self) -> None:
+        """重建变更过的快照（刷新后调用，避免查询时重建）"""
+        self._hotword_snapshot()
+        for terms in self.kbs.values():
+            terms.freeze(self.hotword_scores)
+
+    def top(self, prefix: str, kb_ids: Optional[Iterable[int]], limit: int) -> List[str]:
+        """全局热词与可见知识库中前缀下得分最高的 limit 条（kb_ids 为 None 表示全部知识库）"""
+        prefix_key = normalize(prefix)
+        kbs = self.kbs.values() if kb_ids is None else [self.kbs[k] for k in kb_ids if k in self.kbs]
+        snapshots = [self._hotword_snapshot()] + [terms.freeze(self.hotword_scores) for terms in kbs]
+        return _best_first([(snapshot, *snapshot.span(prefix_key)) for snapshot in snapshots], limit)
+
+
+class SuggestionIndex:
+    """进程级建议索引：持有前缀树与增量水位，负责构建 / 刷新"""
+
+    def __init__(self):
+        self.tries = _Tries()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._doc_watermark = None
+        self._hotword_watermark = None
+        self._built = False
+        self._refreshed_at = 0.0
+        self._rebuilt_at = 0.0
+
+    # ---------------- 查询 ----------------
+
+    def suggest(self, prefix: str, kb_ids: Optional[Iterable[int]], limit: int) -> List[str]:
+        """前缀建议（kb_ids 为用户可见的知识库，None 表示不过滤）"""
+        self.ensure_fresh()
+        with self._lock:
+            return self.tries.top(prefix, kb_ids, limit)
+
+    def ensure_fresh(self) -> None:
+        """
+        构建与刷新都在后台线程执行，查询从不等待数据库（在事件循环中调用）：
+        启动预热完成前查询返回空结果；之后过期时后台刷新，构建失败时按刷新周期重试
+        """
+        if self._refreshed_at and time.monotonic() - self._refreshed_at < settings.SUGGEST_REFRESH_SECONDS:
+            return
+        self.refresh_in_background()
+
+    def refresh_in_background(self) -> None:
+        if self._refresh_lock.locked():
+            return
+        threading.Thread(target=self.refresh, name="suggestion-refresh", daemon=True).start()
+
+    # ---------------- 构建 / 刷新 ----------------
+
+    def refresh(self, full: Optional[bool] = None) -> None:
+        """增量刷新（full=True、尚未构建或到达全量重建周期时重建全部前缀树）"""
+        seen_refresh = self._refreshed_at
+        if not self._refresh_lock.acquire(blocking=not self._built):
+            return
+        if full is None and self._built and self._refreshed_at != seen_refresh:
+            # 等待期间其他线程已完成构建
+            self._refresh_lock.release()
+            return
+        from app.config.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            if full is None:
+                full = not self._built or time.monotonic() - self._rebuilt_at >= settings.SUGGEST_FULL_REBUILD_SECONDS
+            started = time.perf_counter()
+            if full:
+                self._rebuild(db)
+            else:
+                self._refresh_incremental(db)
+            logger.debug(
+                f"[建议] {'全量重建' if full else '增量刷新'}完成: 热词={len(self.tries.hotword_scores)}, "
+                f"知识库={len(self.tries.kbs)}, 耗时={(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+        except Exception as e:
+            # 刷新失败保留现有前缀树，下个周期重试
+            logger.warning(f"[建议] 刷新建议索引失败: {e}", exc_info=True)
+        finally:
+            self._refreshed_at = time.monotonic()
+            db.close()
+            self._refresh_lock.release()
+
+    @staticmethod
+    def _max_time(current, value):
+        return value if value is not None and (current is None or value > current) else current
+
+    @staticmethod
+    def _load_hotwords(db, since=None) -> List[Any]:
+        from app.models.search_history import SearchHotword
+
+        query = db.query(
+            SearchHotword.keyword, SearchHotword.search_count, SearchHotword.is_deleted, SearchHotword.updated_at
+        )
+        if since is not None:
+            query = query.filter(SearchHotword.updated_at >= since)
+        else:
+            query = query.filter(SearchHotword.is_deleted == False)  # noqa: E712
+        return query.all()
+
+    @staticmethod
+    def _load_documents(db, since=None) -> List[Any]:
+        from app.models.document import Document
+
+        query = db.query(
+            Document.id, Document.original_filename, Document.knowledge_base_id, Document.is_deleted, Document.updated_at
+        )
+        if since is not None:
+            query = query.filter(Document.updated_at >= since)
+        else:
+            query = query.filter(Document.is_deleted == False)  # noqa: E712
+        return query.all()
+
+    @staticmethod
+    def _load_headings(db, document_ids: List[int]) -> Dict[int, List[str]]:
+        """一批文档的目录标题（只取 SUGGEST_TOC_MAX_LEVEL 及以上层级）"""
+        from app.models.document_toc import DocumentTOC
+
+        headings: Dict[int, List[str]] = {}
+        for start in range(0, len(document_ids), _TOC_BATCH):
+            rows = (
+                db.query(DocumentTOC.document_id, DocumentTOC.title)
+                .filter(
+                    DocumentTOC.document_id.in_(document_ids[start:start + _TOC_BATCH]),
+                    DocumentTOC.level <= settings.SUGGEST_TOC_MAX_LEVEL,
+                    DocumentTOC.is_deleted == False,  # noqa: E712
+                )
+                .all()
+            )
+            for document_id, title in rows:
+                headings.setdefault(document_id, []).append(title)
+        return headings
+
+    def _rebuild(self, db) -> None:
+        """全量构建新的前缀树后整体替换"""
+        tries = _Tries()
+        hotword_wm = doc_wm = None
+        for row in self._load_hotwords(db):
+            tries.set_hotword(row.keyword, int(row.search_count or 0))
+            hotword_wm = self._max_time(hotword_wm, row.updated_at)
+        documents = self._load_documents(db)
+        headings = self._load_headings(db, [row.id for row in documents])
+        for row in documents:
+            tries.add_document(row.id, row.knowledge_base_id, title_text(row.original_filename), headings.get(row.id, []))
+            doc_wm = self._max_time(doc_wm, row.updated_at)
+        tries.freeze()
+        with self._lock:
+            self.tries = tries
+            self._hotword_watermark, self._doc_watermark = hotword_wm, doc_wm
+        self._built = True
+        self._rebuilt_at = time.monotonic()
+
+    def _refresh_incremental(self, db) -> None:
+        """按 updated_at 水位（闭区间，重复应用幂等）拉取变化的热词与文档；水位为空时读取全部有效行"""
+        hotwords = self._load_hotwords(db, since=self._hotword_watermark)
+        documents = self._load_documents(db, since=self._doc_watermark)
+        headings = self._load_headings(db, [row.id for row in documents if not row.is_deleted])
+        with self._lock:
+            for row in hotwords:
+                self.tries.set_hotword(row.keyword, 0 if row.is_deleted else int(row.search_count or 0))
+                self._hotword_watermark = self._max_time(self._hotword_watermark, row.updated_at)
+            for row in documents:
+                self.tries.remove_document(row.id)
+                if not row.is_deleted:
+                    self.tries.add_document(
+                        row.id, row.knowledge_base_id, title_text(row.original_filename), headings.get(row.id, [])
+                    )
+                self._doc_watermark = self._max_time(self._doc_watermark, row.updated_at)
+            # 只重建变更过的知识库快照与热词快照
+            self.tries.freeze()
+
+
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,115 @@
+"""
+Vector Index Profiles
+kNN 索引配置档：引擎（nmslib / faiss / lucene）、HNSW 参数、向量量化（fp16 / 字节级 sq）与磁盘模式
+
+- 知识库创建时选择配置档（knowledge_bases.vector_profile），之后不可修改
+- default 配置档即现有索引（nmslib + cosinesimil，参数取 HNSW_M / HNSW_EF_CONSTRUCTION），索引名不变；
+  其余配置档各用一组物理索引：<基础索引名>__<配置档名>，检索时按 <基础索引名>,<基础索引名>__* 覆盖全部
+- VECTOR_INDEX_PROFILES 可覆盖或新增配置档（JSON），字段同 BUILTIN_PROFILES
+- 版本要求：default（nmslib）各 2.x 版本均可；faiss 引擎使用 cosinesimil 需 OpenSearch 2.19+，
+  因此 faiss_hnsw / faiss_fp16 / on_disk 均需 2.19+；lucene_sq 需 2.16+。docker/ 下的 compose 为 2.11，只支持 default
+- 创建知识库时预先创建非 default 配置档的索引，集群不支持该引擎 / 量化时直接拒绝，而不是首次写入时才失败
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from app.config.settings import settings
+
+DEFAULT_PROFILE = "default"
+_INDEX_SEP = "__"
+_NAME_RE = re.compile(r"^[a-z0-9_]{1,32}$")
+
+BUILTIN_PROFILES: Dict[str, Dict[str, Any]] = {
+    # 现有行为：全精度 float，nmslib HNSW
+    DEFAULT_PROFILE: {"engine": "nmslib"},
+    # faiss HNSW 全精度
+    "faiss_hnsw": {"engine": "faiss"},
+    # faiss 标量量化为 fp16，向量内存约减半
+    "faiss_fp16": {"engine": "faiss", "encoder": {"name": "sq", "parameters": {"type": "fp16"}}},
+    # lucene HNSW + 字节级标量量化（int7），向量内存约为 1/4
+    "lucene_sq": {"engine": "lucene", "encoder": {"name": "sq", "parameters": {"confidence_interval": 0.0}}},
+    # 磁盘模式：内存中只保留压缩向量（默认 32x），检索后用磁盘上的全精度向量重打分
+    "on_disk": {"engine": "faiss", "mode": "on_disk", "compression_level": "32x"},
+}
+
+
+def available_profiles() -> Dict[str, Dict[str, Any]]:
+    """内置配置档合并 VECTOR_INDEX_PROFILES 覆盖（同名按字段覆盖）"""
+    profiles = {name: dict(profile) for name, profile in BUILTIN_PROFILES.items()}
+    for name, overrides in (settings.VECTOR_INDEX_PROFILES or {}).items():
+        if _NAME_RE.match(name) and isinstance(overrides, dict):
+            profiles[name] = {**profiles.get(name, {}), **overrides}
+    return profiles
+
+
+def get_profile(name: Optional[str]) -> Dict[str, Any]:
+    """按名称取配置档，未知名称退回 default"""
+    profiles = available_profiles()
+    return profiles.get(name or DEFAULT_PROFILE) or profiles[DEFAULT_PROFILE]
+
+
+def resolve_profile_name(name: Optional[str]) -> str:
+    """校验配置档名称（None 时取 VECTOR_INDEX_DEFAULT_PROFILE），未知名称抛 ValueError"""
+    name = (name or settings.VECTOR_INDEX_DEFAULT_PROFILE or DEFAULT_PROFILE).strip().lower()
+    if name not in available_profiles():
+        raise ValueError(f"未知的向量索引配置档: {name}，可选: {', '.join(sorted(available_profiles()))}")
+    return name
+
+
+def profile_index_name(base: str, profile: Optional[str]) -> str:
+    return base if not profile or profile == DEFAULT_PROFILE else f"{base}{_INDEX_SEP}{profile}"
+
+
+def search_target(base: str) -> str:
+    """覆盖基础索引与全部配置档索引的检索目标（多索引 + 通配符，仅用于 search / *_by_query）"""
+    return f"{base},{base}{_INDEX_SEP}*"
+
+
+def knn_vector_mapping(profile: Dict[str, Any], dimension: int) -> Dict[str, Any]:
+    """按配置档生成 knn_vector 字段映射"""
+    parameters: Dict[str, Any] = {
+        "ef_construction": int(profile.get("ef_construction") or settings.HNSW_EF_CONSTRUCTION),
+        "m": int(profile.get("m") or settings.HNSW_M),
+    }
+    if profile.get("encoder"):
+        parameters["encoder"] = profile["encoder"]
+    mapping: Dict[str, Any] = {
+        "type": "knn_vector",
+        "dimension": dimension,
+        "method": {
+            "name": "hnsw",
+            "space_type": profile.get("space_type") or "cosinesimil",
+            "engine": profile.get("engine") or "nmslib",
+            "parameters": parameters,
+        },
+    }
+    if profile.get("mode"):
+        mapping["mode"] = profile["mode"]
+    if profile.get("compression_level"):
+        mapping["compression_level"] = profile["compression_level"]
+    return mapping
+
+
+def knn_index_settings(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """索引级 kNN 设置：nmslib / faiss 的 ef_search（lucene 按查询时 k 决定，不支持该设置）"""
+    if profile.get("ef_search") and (profile.get("engine") or "nmslib") != "lucene":
+        return {"index.knn.algo_param.ef_search": int(profile["ef_search"])}
+    return {}
+
+
+def describe_profiles() -> List[Dict[str, Any]]:
+    """配置档列表（供创建知识库时选择）"""
+    return [
+        {
+            "name": name,
+            "engine": profile.get("engine") or "nmslib",
+            "encoder": (profile.get("encoder") or {}).get("name"),
+            "mode": profile.get("mode") or "in_memory",
+            "compression_level": profile.get("compression_level"),
+            "m": int(profile.get("m") or settings.HNSW_M),
+            "ef_construction": int(profile.get("ef_construction") or settings.HNSW_EF_CONSTRUCTION),
+            "is_default": name == (settings.VECTOR_INDEX_DEFAULT_PROFILE or DEFAULT_PROFILE),
+        }
+        for name, profile in sorted(available_profiles().items())
+    ]
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 import numpy as np
 import requests
 import json
+import logging
 from app.config.settings import settings
 from app.core.logging import logger
 from app.core.exceptions import CustomException, ErrorCode
@@ -27,7 +28,7 @@ class VectorService:
         如果 Ollama 不可用或返回空，降级为返回空列表，让上游继续索引文本（无向量）。
         """
         try:
-            logger.debug(f"开始生成文本向量，文本长度: {len(text)}")
+            logger.debug("开始生成文本向量，文本长度: %s", len(text))
             processed_text = self._preprocess_text(text)
 
             response = requests.post(
@@ -46,7 +47,7 @@ class VectorService:
             if embedding is None:
                 embedding = []
             raw_type = type(embedding).__name__
-            logger.info(f"[Embedding] raw type: {raw_type}")
+            logger.debug("[Embedding] raw type: %s", raw_type)
             # 统一为 List[float]
             try:
                 # 字符串 -> JSON / split
@@ -73,18 +74,13 @@ class VectorService:
             except Exception as _ve:
                 logger.warning(f"向量格式修正失败，将视为无向量: {_ve}")
                 embedding = []
-            # 记录规范化后的关键信息
-            try:
-                preview = embedding[:5] if isinstance(embedding, list) else []
-                logger.info(
-                    f"[Embedding] normalized dim={len(embedding) if isinstance(embedding, list) else 0}, first5={preview}"
-                )
-            except Exception:
-                pass
+            # 记录规范化后的关键信息（逐条调用的热路径，仅 DEBUG 级别输出）
+            if logger.isEnabledFor(logging.DEBUG) and isinstance(embedding, list):
+                logger.debug("[Embedding] normalized dim=%s, first5=%s", len(embedding), embedding[:5])
             if not embedding:
                 logger.warning("Ollama返回空向量，降级为无向量索引")
                 return []
-            logger.debug(f"文本向量生成完成，向量维度: {len(embedding)}")
+            logger.debug("文本向量生成完成，向量维度: %s", len(embedding))
             return embedding
         except requests.exceptions.RequestException as e:
             logger.warning(f"Ollama 不可用，降级为无向量索引: {e}")
@@ -93,6 +89,29 @@ class VectorService:
             logger.warning(f"文本向量生成异常，降级为无向量索引: {e}")
             return []
     
+    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """批量生成文本嵌入向量，结果与输入一一对应。
+        优先使用 Ollama /api/embed 的批量接口，一次请求完成整批；接口不可用时逐条降级，
+        单条失败返回空列表。
+        """
+        if not texts:
+            return []
+        processed = [self._preprocess_text(t or "") for t in texts]
+        try:
+            response = requests.post(
+                f"{self.ollama_url}/api/embed",
+                json={"model": self.embedding_model, "input": processed},
+                timeout=15 + 2 * len(processed),
+            )
+            response.raise_for_status()
+            embeddings = response.json().get("embeddings") or []
+            if len(embeddings) == len(texts):
+                return [[float(x) for x in emb] if emb else [] for emb in embeddings]
+            logger.warning(f"批量向量数量不匹配: 期望 {len(texts)}，实际 {len(embeddings)}，改为逐条生成")
+        except Exception as e:
+            logger.warning(f"批量向量接口不可用，改为逐条生成: {e}")
+        return [self.generate_embedding(t) for t in texts]
+    
     def generate_image_embedding(self, image_path: str) -> List[float]:
         """生成图片嵌入向量 - 使用本地CLIP模型
         
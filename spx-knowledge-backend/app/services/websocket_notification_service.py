@@ -1,23 +1,70 @@
 ﻿"""
 WebSocket Notification Service
 根据文档修改功能设计实现WebSocket实时通知
+
+- 通知经 Redis pub/sub 跨进程扇出（见 notification_bus），本服务只持有并投递本进程的连接
+- 每个连接一个发送队列：同 coalesce_key 的未发送消息只保留最新一条；积压超过 WS_CLIENT_MAX_PENDING
+  或单次发送超过 WS_SEND_TIMEOUT_SECONDS 视为慢客户端，断开连接（客户端重连）
 """
 
+from collections import OrderedDict
 from typing import Dict, Any, List, Optional
-from fastapi import WebSocket, WebSocketDisconnect
+from fastapi import WebSocket, WebSocketDisconnect, status
 import json
 import asyncio
+import itertools
 from datetime import datetime
+from app.config.settings import settings
 from app.core.logging import logger
+from app.services import notification_bus
+
+
+class _Outbox:
+    """单个连接的发送队列（由独立任务按序发送，不阻塞发布方）"""
+
+    _seq = itertools.count()
+
+    def __init__(self, websocket: WebSocket, max_pending: int):
+        self.websocket = websocket
+        self.max_pending = max_pending
+        self.pending: "OrderedDict[Any, str]" = OrderedDict()
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def put(self, text: str, coalesce_key: Optional[str] = None) -> bool:
+        """入队，返回 False 表示积压已满（慢客户端）"""
+        if coalesce_key is not None and coalesce_key in self.pending:
+            self.pending[coalesce_key] = text
+            return True
+        if len(self.pending) >= self.max_pending:
+            return False
+        self.pending[coalesce_key if coalesce_key is not None else ("seq", next(self._seq))] = text
+        self.ready.set()
+        return True
+
+    async def run(self, send_timeout: float) -> None:
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            while self.pending:
+                _, text = self.pending.popitem(last=False)
+                await asyncio.wait_for(self.websocket.send_text(text), timeout=send_timeout)
+
 
 class WebSocketNotificationService:
     """WebSocket通知服务 - 严格按照文档修改功能设计实现"""
     
-    def __init__(self):
+    def __init__(self, max_pending: Optional[int] = None, send_timeout: Optional[float] = None):
         # 存储活跃连接
         self.active_connections: List[WebSocket] = []
         # 存储用户连接映射
         self.user_connections: Dict[str, List[WebSocket]] = {}
+        # 连接 -> 发送队列
+        self._outboxes: Dict[WebSocket, _Outbox] = {}
+        self.max_pending = max_pending or settings.WS_CLIENT_MAX_PENDING
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT_SECONDS
+        self._subscriber: Optional[notification_bus.NotificationSubscriber] = None
+        self._publish_client = None
         
         # 设计文档要求的通知类型
         self.NOTIFICATION_TYPES = {
@@ -31,41 +78,122 @@ class WebSocketNotificationService:
             "performance_alert": "性能告警"
         }
     
-    async def connect(self, websocket: WebSocket, user_id: str = "anonymous"):
-        """接受WebSocket连接 - 根据设计文档实现"""
+    # ---------------- 跨进程扇出 ----------------
+    
+    async def start_fanout(self, client=None) -> None:
+        """订阅 Redis 通知频道（每个进程调用一次，应用启动时）"""
+        if not settings.WS_FANOUT_ENABLED:
+            return
+        if self._subscriber is None:
+            self._subscriber = notification_bus.NotificationSubscriber(self.deliver_local, client=client)
+            # 未指定 client 时发布使用缓存连接池
+            self._publish_client = client
+        await self._subscriber.start()
+    
+    async def stop_fanout(self) -> None:
+        if self._subscriber is not None:
+            await self._subscriber.stop()
+            self._subscriber = None
+    
+    async def _publish(self, message: Dict[str, Any], user_id: Optional[str]) -> None:
+        """已订阅时经 Redis 发布（所有进程的连接都能收到），否则或发布失败时只投递本进程连接"""
+        if self._subscriber is not None and self._subscriber.running:
+            try:
+                await notification_bus.publish(user_id, message, client=self._publish_client)
+                return
+            except Exception as e:
+                logger.warning(f"发布WebSocket通知失败，仅投递本进程连接: {e}")
+        self.deliver_local(user_id, message)
+    
+    def deliver_local(self, user_id: Optional[str], message: Dict[str, Any]) -> int:
+        """投递到本进程连接（user_id 为 None 时投递全部连接），返回入队的连接数"""
+        connections = (
+            list(self.active_connections) if user_id is None
+            else list(self.user_connections.get(str(user_id), []))
+        )
+        if not connections:
+            return 0
+        coalesce_key = message.get("coalesce_key")
+        text = json.dumps(
+            {k: v for k, v in message.items() if k != "coalesce_key"}, ensure_ascii=False, default=str
+        )
+        delivered = 0
+        for websocket in connections:
+            outbox = self._outboxes.get(websocket)
+            if outbox is None:
+                continue
+            if outbox.put(text, coalesce_key):
+                delivered += 1
+            else:
+                logger.warning(f"WebSocket客户端积压超过 {self.max_pending} 条，断开慢连接")
+                asyncio.create_task(self._close_slow(websocket))
+        return delivered
+    
+    async def _close_slow(self, websocket: WebSocket) -> None:
+        self._drop(websocket)
         try:
-            await websocket.accept()
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason="消息积压过多")
+        except Exception:
+            pass
+    
+    async def _run_outbox(self, websocket: WebSocket, outbox: _Outbox) -> None:
+        try:
+            await outbox.run(self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"WebSocket发送失败或超时，断开连接: {type(e).__name__}: {e}")
+            await self._close_slow(websocket)
+    
+    # ---------------- 连接管理 ----------------
+    
+    async def connect(self, websocket: WebSocket, user_id: str = "anonymous", accept: bool = True):
+        """接受WebSocket连接 - 根据设计文档实现（accept=False 表示端点已接受连接，只登记）"""
+        try:
+            if accept:
+                await websocket.accept()
+            user_id = str(user_id)
             self.active_connections.append(websocket)
             
             if user_id not in self.user_connections:
                 self.user_connections[user_id] = []
             self.user_connections[user_id].append(websocket)
             
-            logger.info(f"WebSocket连接建立: user_id={user_id}, 总连接数={len(self.active_connections)}")
+            outbox = _Outbox(websocket, self.max_pending)
+            self._outboxes[websocket] = outbox
+            outbox.task = asyncio.create_task(self._run_outbox(websocket, outbox))
             
-            # 发送连接成功通知
-            await self.send_personal_message({
-                "type": "connection_established",
-                "message": "WebSocket连接已建立",
-                "timestamp": datetime.now().isoformat()
-            }, websocket)
+            logger.info(f"WebSocket连接建立: user_id={user_id}, 总连接数={len(self.active_connections)}")
             
+            if accept:
+                # 发送连接成功通知
+                await self.send_personal_message({
+                    "type": "connection_established",
+                    "message": "WebSocket连接已建立",
+                    "timestamp": datetime.now().isoformat()
+                }, websocket)
+        
         except Exception as e:
             logger.error(f"WebSocket连接错误: {e}", exc_info=True)
     
+    def _drop(self, websocket: WebSocket) -> None:
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+        for user_id, connections in list(self.user_connections.items()):
+            if websocket in connections:
+                connections.remove(websocket)
+                if not connections:
+                    del self.user_connections[user_id]
+        outbox = self._outboxes.pop(websocket, None)
+        if outbox is not None and outbox.task is not None and outbox.task is not asyncio.current_task():
+            outbox.task.cancel()
+    
     def disconnect(self, websocket: WebSocket, user_id: str = "anonymous"):
         """断开WebSocket连接 - 根据设计文档实现"""
         try:
-            if websocket in self.active_connections:
-                self.active_connections.remove(websocket)
-            
-            if user_id in self.user_connections and websocket in self.user_connections[user_id]:
-                self.user_connections[user_id].remove(websocket)
-                if not self.user_connections[user_id]:
-                    del self.user_connections[user_id]
-            
+            self._drop(websocket)
             logger.info(f"WebSocket连接断开: user_id={user_id}, 剩余连接数={len(self.active_connections)}")
-            
+        
         except Exception as e:
             logger.error(f"WebSocket断开错误: {e}", exc_info=True)
     
@@ -77,30 +205,16 @@ class WebSocketNotificationService:
             logger.error(f"发送个人消息错误: {e}", exc_info=True)
     
     async def send_to_user(self, message: Dict[str, Any], user_id: str):
-        """发送给特定用户 - 根据设计文档实现"""
+        """发送给特定用户（该用户在任一进程上的连接） - 根据设计文档实现"""
         try:
-            if user_id in self.user_connections:
-                for websocket in self.user_connections[user_id]:
-                    try:
-                        await websocket.send_text(json.dumps(message, ensure_ascii=False))
-                    except Exception as e:
-                        logger.error(f"发送用户消息错误: {e}", exc_info=True)
-                        # 移除无效连接
-                        self.disconnect(websocket, user_id)
+            await self._publish(message, str(user_id))
         except Exception as e:
             logger.error(f"发送用户消息错误: {e}", exc_info=True)
     
     async def broadcast(self, message: Dict[str, Any]):
         """广播消息 - 根据设计文档实现"""
         try:
-            for connection in self.active_connections:
-                try:
-                    await connection.send_text(json.dumps(message, ensure_ascii=False))
-                except Exception as e:
-                    logger.error(f"广播消息错误: {e}", exc_info=True)
-                    # 移除无效连接
-                    if connection in self.active_connections:
-                        self.active_connections.remove(connection)
+            await self._publish(message, None)
         except Exception as e:
             logger.error(f"广播消息错误: {e}", exc_info=True)
     
@@ -132,7 +246,7 @@ class WebSocketNotificationService:
             await self.send_to_user(message, user_id)
             
             logger.debug(f"修改通知已发送: type={notification_type}, doc_id={document_id}, chunk_id={chunk_id}")
-            
+        
         except Exception as e:
             logger.error(f"发送修改通知错误: {e}", exc_info=True)
     
@@ -143,7 +257,7 @@ class WebSocketNotificationService:
         message: str,
         user_id: str = "user"
     ):
-        """发送进度通知 - 根据设计文档实现"""
+        """发送进度通知 - 根据设计文档实现（同一操作未发出的进度只保留最新）"""
         try:
             notification_data = {
                 "type": "modification_progress",
@@ -151,13 +265,14 @@ class WebSocketNotificationService:
                 "operation_id": operation_id,
                 "progress": progress,
                 "message": message,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": datetime.now().isoformat(),
+                "coalesce_key": f"modification_progress:{operation_id}",
             }
             
             await self.send_to_user(notification_data, user_id)
             
             logger.debug(f"进度通知已发送: operation_id={operation_id}, progress={progress}")
-            
+        
         except Exception as e:
             logger.error(f"发送进度通知错误: {e}", exc_info=True)
     
@@ -184,7 +299,7 @@ class WebSocketNotificationService:
             await self.send_to_user(notification_data, user_id)
             
             logger.debug(f"错误通知已发送: error_type={error_type}, doc_id={document_id}")
-            
+        
         except Exception as e:
             logger.error(f"发送错误通知错误: {e}", exc_info=True)
     
@@ -209,7 +324,7 @@ class WebSocketNotificationService:
             await self.send_to_user(notification_data, user_id)
             
             logger.debug(f"性能告警已发送: alert_type={alert_type}")
-            
+        
         except Exception as e:
             logger.error(f"发送性能告警错误: {e}", exc_info=True)
     
@@ -220,14 +335,16 @@ class WebSocketNotificationService:
                 "total_connections": len(self.active_connections),
                 "user_connections": len(self.user_connections),
                 "connections_by_user": {
-                    user_id: len(connections) 
+                    user_id: len(connections)
                     for user_id, connections in self.user_connections.items()
                 },
+                "pending_messages": sum(len(outbox.pending) for outbox in self._outboxes.values()),
+                "fanout_subscribed": bool(self._subscriber and self._subscriber.running),
                 "timestamp": datetime.now().isoformat()
             }
             
             return stats
-            
+        
         except Exception as e:
             logger.error(f"获取连接统计错误: {e}", exc_info=True)
             return {"error": str(e)}
@@ -2,26 +2,61 @@
 Celery App Configuration
 """
 
+import os
+import sys
+from typing import List, Optional
 from celery import Celery
 from app.config.settings import settings
 from app.core.logging import logger
 
+# 队列 -> 任务模块（与下方 task_routes 保持一致）
+QUEUE_TASK_MODULES = {
+    "document": ["app.tasks.document_tasks"],
+    "vector": ["app.tasks.vector_tasks"],
+    "index": ["app.tasks.index_tasks"],
+    "image": ["app.tasks.image_tasks"],
+    "version": ["app.tasks.version_tasks"],
+    "cleanup": ["app.tasks.cleanup_tasks"],
+    "notification": ["app.tasks.notification_tasks"],
+    "observability": ["app.tasks.observability_tasks"],
+    "security_scan": ["app.tasks.security_scan_tasks"],
+}
+ALL_TASK_MODULES = [module for modules in QUEUE_TASK_MODULES.values() for module in modules]
+
+
+def _worker_queues() -> Optional[List[str]]:
+    """当前 worker 监听的队列：命令行 -Q/--queues 优先，其次 CELERY_QUEUES；无法确定时返回 None"""
+    argv = sys.argv
+    for i, arg in enumerate(argv):
+        if arg in ("-Q", "--queues") and i + 1 < len(argv):
+            return [q.strip() for q in argv[i + 1].split(",") if q.strip()]
+        if arg.startswith("--queues="):
+            return [q.strip() for q in arg.split("=", 1)[1].split(",") if q.strip()]
+    queues = settings.CELERY_QUEUES or os.getenv("CELERY_QUEUES")
+    if queues:
+        return [q.strip() for q in queues.split(",") if q.strip()]
+    return None
+
+
+def task_modules_for_queues(queues: Optional[List[str]]) -> List[str]:
+    """按队列裁剪需要导入的任务模块，未知队列时退回全部模块"""
+    if not settings.CELERY_LAZY_TASK_IMPORTS or not queues:
+        return list(ALL_TASK_MODULES)
+    modules: List[str] = []
+    for queue in queues:
+        for module in QUEUE_TASK_MODULES.get(queue, []):
+            if module not in modules:
+                modules.append(module)
+    return modules or list(ALL_TASK_MODULES)
+
+
 # 创建Celery应用
+# 专用队列的 worker 只导入自身队列的任务模块，避免加载无关的解析器、模型与客户端
 celery_app = Celery(
     "spx-knowledge-backend",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
-    include=[
-        "app.tasks.document_tasks",
-        "app.tasks.vector_tasks",
-        "app.tasks.index_tasks",
-        "app.tasks.image_tasks",
-        "app.tasks.version_tasks",
-        "app.tasks.cleanup_tasks",
-        "app.tasks.notification_tasks",
-        "app.tasks.observability_tasks",
-        "app.tasks.security_scan_tasks",
-    ]
+    include=task_modules_for_queues(_worker_queues()),
 )
 
 # 输出 Redis 连接信息（仅在 Celery Worker/Beat 环境中打印）
@@ -112,6 +147,47 @@ if settings.OBSERVABILITY_ENABLE_SCHEDULE:
         }
     )
 
+# 问答历史写后队列兜底落盘（正常情况下由入队时调度的延迟任务完成）
+if settings.QA_HISTORY_WRITE_BEHIND_ENABLED:
+    celery_app.conf.beat_schedule.update(
+        {
+            "qa-history-flush": {
+                "task": "app.tasks.index_tasks.flush_qa_history_task",
+                "schedule": settings.QA_HISTORY_FLUSH_INTERVAL_SECONDS,
+                "options": {
+                    "expires": settings.QA_HISTORY_FLUSH_INTERVAL_SECONDS,
+                },
+            },
+        }
+    )
+
+if settings.HOTWORD_BUFFER_ENABLED:
+    celery_app.conf.beat_schedule.update(
+        {
+            "search-hotword-flush": {
+                "task": "app.tasks.index_tasks.flush_search_hotwords_task",
+                "schedule": settings.HOTWORD_FLUSH_INTERVAL_SECONDS,
+                "options": {
+                    "expires": settings.HOTWORD_FLUSH_INTERVAL_SECONDS,
+                },
+            },
+        }
+    )
+
+# 知识库聚合统计对账（增量维护之外的兜底，修正漂移）
+if settings.KB_STATS_RECONCILE_INTERVAL_SECONDS > 0:
+    celery_app.conf.beat_schedule.update(
+        {
+            "kb-stats-reconcile": {
+                "task": "app.tasks.cleanup_tasks.reconcile_knowledge_base_stats_task",
+                "schedule": settings.KB_STATS_RECONCILE_INTERVAL_SECONDS,
+                "options": {
+                    "expires": settings.KB_STATS_RECONCILE_INTERVAL_SECONDS,
+                },
+            },
+        }
+    )
+
 # 根据配置决定是否启用自动重试任务
 if getattr(settings, 'ENABLE_AUTO_RETRY', False):
     auto_retry_interval = getattr(settings, 'AUTO_RETRY_INTERVAL_SECONDS', 300)
@@ -149,3 +225,25 @@ else:
             logger.info("   提示: 如需启用，请在 .env 文件中设置 OBSERVABILITY_ENABLE_SCHEDULE=true 并重启 Celery Beat")
     except Exception:
         pass
+
+
+# trace_id 随任务消息头传递：API 请求 → 任务 → 任务内再派发的下游任务
+from app.core.tracing import install_celery_trace_propagation
+
+install_celery_trace_propagation()
+
+
+# 启动剖析：worker 就绪时输出导入耗时/内存报告（celery_worker.worker 会更早安装剖析器）
+if settings.STARTUP_PROFILE_ENABLED:
+    from celery.signals import worker_ready
+    from app.core.startup_profile import start_import_profiling
+
+    _startup_profiler = start_import_profiling()
+
+    @worker_ready.connect
+    def _report_startup_profile(sender=None, **kwargs):
+        _startup_profiler.log_report(
+            "celery worker",
+            budget_ms=settings.STARTUP_IMPORT_BUDGET_MS,
+            rss_budget_mb=settings.STARTUP_RSS_BUDGET_MB,
+        )
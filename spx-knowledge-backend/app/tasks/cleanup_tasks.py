@@ -156,3 +156,18 @@ def cleanup_failed_tasks_task():
     # 暂时跳过具体实现
     
     return {"status": "success", "message": "失败任务清理完成"}
+
+@celery_app.task
+def reconcile_knowledge_base_stats_task(knowledge_base_ids=None):
+    """知识库聚合统计对账任务：按文档/分块/图片重算并修正增量统计的漂移"""
+    from app.services.kb_stats_service import KnowledgeBaseStatsService
+
+    db = SessionLocal()
+    try:
+        result = KnowledgeBaseStatsService(db).reconcile(knowledge_base_ids)
+        return {"status": "success", **result}
+    except Exception as e:
+        db.rollback()
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
@@ -3,7 +3,6 @@
 import os
 import tempfile
 import time
-import hashlib
 import datetime
 import shutil
 import io
@@ -24,20 +23,38 @@ from app.services.minio_storage_service import MinioStorageService
 from app.services.image_service import ImageService
 from app.services.office_converter import convert_office_to_pdf, convert_office_to_html, compress_pdf
 from app.config.settings import settings
+from app.core.tracing import KIND_INGESTION, observe_stage
 from app.models.document import Document
 from app.models.chunk import DocumentChunk
-from app.models.image import DocumentImage
 from sqlalchemy.orm import Session
 from app.config.database import SessionLocal
 from app.core.logging import logger
-from app.core.constants import DOC_STATUS_PARSING, DOC_STATUS_CHUNKING, DOC_STATUS_VECTORIZING, DOC_STATUS_INDEXING, DOC_STATUS_COMPLETED, DOC_STATUS_FAILED
+from app.core.constants import DOC_STATUS_PARSING, DOC_STATUS_CHUNKING, DOC_STATUS_VECTORIZING, DOC_STATUS_COMPLETED, DOC_STATUS_FAILED
+from app.services.document_pipeline_service import DocumentPipelineService, STAGE_PARSE, downstream_backlog
+from app.services.document_recommendation_service import DocumentRecommendationService
+from app.services.kb_stats_service import KnowledgeBaseStatsService
+from app.services.notification_bus import notify_document_progress
 
 # 确保在Celery进程中注册所有模型，解决字符串关系解析问题
 import app.models  # noqa: F401
 
 @celery_app.task(bind=True, ignore_result=True)
-def process_document_task(self, document_id: int):
-    """处理文档任务（DOCX / PDF，完全不使用 Unstructured）"""
+def process_document_task(self, document_id: int, resume: bool = False):
+    """
+    处理文档任务（DOCX / PDF，完全不使用 Unstructured）
+    本任务负责下载、解析、分块与图片持久化，向量化/图片索引/收尾由下游队列的阶段任务完成
+    resume：重新投递前文档处于失败状态（见 DocumentService.reprocess_document），可从失败阶段续跑
+    """
+    # 背压：下游队列积压时推迟接收新文档，避免解析结果在 vector/image 队列堆积
+    saturated = downstream_backlog()
+    if saturated and self.request.retries < settings.DOCUMENT_PIPELINE_BACKPRESSURE_MAX_DEFERRALS:
+        logger.info(f"[任务ID: {self.request.id}] 下游队列积压 {saturated}，文档 {document_id} 延后 "
+                   f"{settings.DOCUMENT_PIPELINE_BACKPRESSURE_COUNTDOWN} 秒处理")
+        raise self.retry(
+            countdown=settings.DOCUMENT_PIPELINE_BACKPRESSURE_COUNTDOWN,
+            max_retries=settings.DOCUMENT_PIPELINE_BACKPRESSURE_MAX_DEFERRALS,
+        )
+
     db = SessionLocal()
     document = None
     task_id = self.request.id if self else "unknown"
@@ -61,6 +78,24 @@ def process_document_task(self, document_id: int):
         logger.info(f"[任务ID: {task_id}] 文档信息: ID={document.id}, 文件名={document.original_filename}, "
                    f"文件类型={document.file_type}, 文件路径={document.file_path}, "
                    f"知识库ID={document.knowledge_base_id}, 文件大小={document.file_size or '未知'} bytes")
+
+        # 上次处理在解析之后的阶段失败且文件未变化：跳过解析，只重新派发未完成的阶段
+        pipeline = DocumentPipelineService(db)
+        resume_state = pipeline.resumable_state(document, resume=resume)
+        if resume_state:
+            logger.info(f"[任务ID: {task_id}] 文档 {document_id} 从失败阶段续跑: "
+                       f"已完成={resume_state.get('completed')}, 失败阶段={resume_state.get('failed_stage')}")
+            document.status = DOC_STATUS_VECTORIZING
+            document.error_message = None
+            db.commit()
+            pipeline.dispatch_downstream(document_id)
+            return {
+                "status": "success",
+                "message": "文档已从失败阶段续跑",
+                "document_id": document_id,
+                "resumed_from": resume_state.get("failed_stage"),
+            }
+        pipeline.reset_state(document)
         
         file_suffix = (document.original_filename or '').split('.')[-1].lower()
         file_type = (document.file_type or '').lower()
@@ -79,6 +114,7 @@ def process_document_task(self, document_id: int):
         document.status = DOC_STATUS_PARSING
         document.processing_progress = 10.0
         db.commit()
+        notify_document_progress(document, "解析中")
         
         current_task.update_state(
             state="PROGRESS",
@@ -93,6 +129,7 @@ def process_document_task(self, document_id: int):
             minio_service = MinioStorageService()
             file_content = minio_service.download_file(document.file_path)
             download_time = time.time() - download_start
+            observe_stage(KIND_INGESTION, "download", download_time)
             logger.info(f"[任务ID: {task_id}] MinIO文件下载成功: 大小={len(file_content)} bytes, 耗时={download_time:.2f}秒")
         except Exception as e:
             logger.error(f"[任务ID: {task_id}] MinIO文件下载失败: {e}", exc_info=True)
@@ -191,6 +228,7 @@ def process_document_task(self, document_id: int):
             parser = TxtService(db)
             parse_result = parser.parse_document(parsed_file_path)
         parse_time = time.time() - parse_start
+        observe_stage(KIND_INGESTION, "parse", parse_time)
         
         # 检查解析结果
         if parse_result is None:
@@ -514,6 +552,7 @@ def process_document_task(self, document_id: int):
         document.status = DOC_STATUS_CHUNKING
         document.processing_progress = 40.0
         db.commit()
+        notify_document_progress(document, "分块中")
         
         # 3. 分块（结构分块）
         chunk_start = time.time()
@@ -809,6 +848,7 @@ def process_document_task(self, document_id: int):
             merged_items = deduped_items
 
             chunk_time = time.time() - chunk_start
+            observe_stage(KIND_INGESTION, "chunk", chunk_time)
             if is_docx:
                 docx_like_name = "DOCX"
             elif is_excel:
@@ -985,6 +1025,7 @@ def process_document_task(self, document_id: int):
                 merged_items = deduped_items
 
                 chunk_time = time.time() - chunk_start
+                observe_stage(KIND_INGESTION, "chunk", chunk_time)
                 file_type_name = "PDF" if is_pdf else "其他格式"
                 logger.info(f"[任务ID: {task_id}] {file_type_name}顺序分块完成（统一处理）: 耗时={chunk_time:.2f}秒, 文本块={len(text_chunks_entries)}, 表格={sum(1 for m in merged_items if m.get('type')=='table')}, 图片={sum(1 for m in merged_items if m.get('type')=='image')}")
             else:
@@ -1012,6 +1053,7 @@ def process_document_task(self, document_id: int):
                     elements=elements_for_chunking
                 )
                 chunk_time = time.time() - chunk_start
+                observe_stage(KIND_INGESTION, "chunk", chunk_time)
 
                 logger.info(
                     f"[任务ID: {task_id}] PDF 分块初步完成（旧逻辑）: 原始块={len(chunks_with_index)}, "
@@ -1575,6 +1617,8 @@ def process_document_task(self, document_id: int):
         logger.info(f"[任务ID: {task_id}] 分块数据已保存到数据库: 共 {len(merged_items)} 条记录（文本块={text_chunks}, 表格块={table_chunks}）")
 
         # 将全文分块归档到 MinIO（同时保存 element_index 信息）
+        chunks_path = None
+        archive_start = time.time()
         try:
             minio = MinioStorageService()
             # 保存带索引信息的分块数据（✅ 新增：包含 coordinates 和 page_number）
@@ -1599,12 +1643,15 @@ def process_document_task(self, document_id: int):
                 if 'coordinates' in meta and meta.get('coordinates'):
                     chunk_data['coordinates'] = meta.get('coordinates')
                 chunks_for_storage.append(chunk_data)
-            minio.upload_chunks(str(document_id), chunks_for_storage)
+            chunks_path = minio.upload_chunks(str(document_id), chunks_for_storage).get("chunks_path")
             logger.info(f"[任务ID: {task_id}] 分块JSON已归档到 MinIO（含element_index）")
         except Exception as e:
             logger.warning(f"[任务ID: {task_id}] 分块归档到 MinIO 失败: {e}")
+        observe_stage(KIND_INGESTION, "archive", time.time() - archive_start)
+
+        # 图片持久化（若解析结果包含图片二进制，则落 MinIO + 入库 + 回填分块；向量化与索引由 image 队列完成）
+        image_entries: List[Dict[str, Any]] = []
 
-        # 图片处理流水线（若解析结果包含图片二进制，则落 MinIO + 入库 + 向量化 + 索引）
         def _process_images():
             images_meta = parse_result.get('images', []) or []
             if not images_meta:
@@ -1624,34 +1671,24 @@ def process_document_task(self, document_id: int):
                 )
 
             img_service = ImageService(db)
-            vector_service = VectorService(db)
-            os_service = OpenSearchService()
             saved = 0
             chunk_meta_dirty = False
 
-            for img in images_meta:
-                data = img.get('data') or img.get('bytes')
-                if not data:
-                    continue
+            # 一次 IN 查询按 SHA256 去重，新图片 flush 取得 ID；图片与分块元数据在循环结束后统一提交
+            images_with_data = [img for img in images_meta if (img.get('data') or img.get('bytes'))]
+            image_rows = img_service.create_images_from_bytes(
+                document_id,
+                [
+                    (img.get('data') or img.get('bytes'), img.get('ext', '.png'), img.get('image_type'))
+                    for img in images_with_data
+                ],
+            )
 
+            for img, image_row in zip(images_with_data, image_rows):
                 element_index = img.get('element_index')
                 page_number = img.get('page_number')
                 doc_order = img.get('doc_order')
                 coordinates = img.get('coordinates')
-                image_sha256 = hashlib.sha256(data).hexdigest()
-
-                existing_image = db.query(DocumentImage).filter(
-                    DocumentImage.sha256_hash == image_sha256,
-                    DocumentImage.is_deleted == False,
-                ).first()
-                is_new_image = existing_image is None
-
-                image_row = img_service.create_image_from_bytes(
-                    document_id,
-                    data,
-                    image_ext=img.get('ext', '.png'),
-                    image_type=img.get('image_type'),
-                )
 
                 # ✅ 更新图片 metadata（element_index, page_number, coordinates 等）
                 if element_index is not None or page_number is not None or doc_order is not None or coordinates:
@@ -1673,7 +1710,6 @@ def process_document_task(self, document_id: int):
                         if coordinates:
                             existing_meta['coordinates'] = coordinates
                         image_row.meta = json.dumps(existing_meta, ensure_ascii=False)
-                        db.commit()
                         logger.debug(
                             f"[任务ID: {task_id}] 图片 {image_row.id} metadata 更新成功: "
                             f"element_index={element_index}, page_number={page_number}"
@@ -1682,91 +1718,17 @@ def process_document_task(self, document_id: int):
                         logger.warning(
                             f"[任务ID: {task_id}] 保存图片 metadata 失败 (image_id={image_row.id}): {meta_exc}"
                         )
-                        db.rollback()
-
-                image_vector = None
-                if not is_new_image:
-                    try:
-                        response = os_service.client.get(
-                            index=os_service.image_index,
-                            id=f"image_{image_row.id}",
-                        )
-                        existing_vector = response.get("_source", {}).get("image_vector")
-                        if existing_vector and len(existing_vector) == 512:
-                            image_vector = existing_vector
-                            logger.info(
-                                f"[任务ID: {task_id}] 图片 {image_row.id} (SHA256: {image_sha256[:8]}...) 已存在，复用向量"
-                            )
-                    except Exception:
-                        logger.debug(
-                            f"[任务ID: {task_id}] 图片 {image_row.id} 未在OpenSearch中找到向量，将生成新向量"
-                        )
-
-                if image_vector is None:
-                    image_vector = vector_service.generate_image_embedding_prefer_memory(data)
-                    logger.info(
-                        f"[任务ID: {task_id}] 图片 {image_row.id} 向量生成完成，维度: {len(image_vector)}"
-                    )
-
-                # ✅ 记录向量化结果到 MySQL，供前端状态展示
-                try:
-                    vector_dim = len(image_vector) if image_vector else None
-                    if vector_dim:
-                        image_row.vector_model = settings.CLIP_MODEL_NAME
-                        image_row.vector_dim = vector_dim
-                    image_row.last_processed_at = datetime.datetime.utcnow()
-                    if image_row.status not in ("completed", "failed"):
-                        image_row.status = "completed"
-                    db.commit()
-                except Exception as db_exc:
-                    logger.warning(f"[任务ID: {task_id}] 回写图片向量信息失败 image_id={image_row.id}: {db_exc}")
-                    db.rollback()
-
-                try:
-                    image_metadata = img.get('metadata', {}) or {}
-                    if element_index is not None:
-                        image_metadata['element_index'] = element_index
-                    if doc_order is not None:
-                        image_metadata['doc_order'] = doc_order
-                    image_metadata['image_path'] = image_row.image_path
-                    image_metadata['image_id'] = image_row.id
-
-                    os_service.index_image_sync(
-                        {
-                            "image_id": image_row.id,
-                            "document_id": document.id,
-                            "knowledge_base_id": document.knowledge_base_id,
-                            "category_id": getattr(document, 'category_id', None),
-                            "image_path": image_row.image_path,
-                            "page_number": page_number,
-                            "coordinates": coordinates,
-                            "width": image_row.width,
-                            "height": image_row.height,
-                            "image_type": image_row.image_type,
-                            "ocr_text": image_row.ocr_text or "",
-                            "description": img.get('description', ''),
-                            "feature_tags": img.get('feature_tags', []),
-                            "image_vector": image_vector,
-                            "element_index": element_index,
-                            "created_at": getattr(image_row, 'created_at', None).isoformat()
-                            if getattr(image_row, 'created_at', None)
-                            else None,
-                            "updated_at": getattr(image_row, 'updated_at', None).isoformat()
-                            if getattr(image_row, 'updated_at', None)
-                            else None,
-                            "metadata": image_metadata,
-                            "processing_status": getattr(image_row, 'status', 'completed'),
-                            "model_version": "1.0",
-                        }
-                    )
-                    logger.info(
-                        f"[任务ID: {task_id}] 图片 {image_row.id} 索引完成（element_index={element_index}）"
-                    )
-                except Exception as idx_exc:
-                    logger.warning(
-                        f"[任务ID: {task_id}] 图片索引失败 image_id={image_row.id}: {idx_exc}"
-                    )
 
+                image_entries.append({
+                    "image_id": image_row.id,
+                    "element_index": element_index,
+                    "page_number": page_number,
+                    "doc_order": doc_order,
+                    "coordinates": coordinates,
+                    "description": img.get('description', ''),
+                    "feature_tags": img.get('feature_tags', []),
+                    "metadata": img.get('metadata', {}) or {},
+                })
                 saved += 1
 
                 # ✅ 回填图片元数据到对应的 DocumentChunk
@@ -1831,465 +1793,68 @@ def process_document_task(self, document_id: int):
             logger.info(
                 f"[任务ID: {task_id}] 图片持久化完成: {saved}/{len(images_meta)}"
             )
-            if chunk_meta_dirty:
-                try:
-                    db.commit()
-                except Exception as commit_err:
-                    logger.warning(
-                        f"[任务ID: {task_id}] 提交图片分块元数据失败: {commit_err}"
-                    )
-                    db.rollback()
+            try:
+                db.commit()
+            except Exception as commit_err:
+                db.rollback()
+                raise RuntimeError(
+                    f"提交图片{'及分块' if chunk_meta_dirty else ''}元数据失败: {commit_err}"
+                ) from commit_err
 
+        image_start = time.time()
         try:
             _process_images()
         except Exception as images_exc:
-            logger.warning(f"[任务ID: {task_id}] 图片持久化失败: {images_exc}")
+            # 图片行未提交：回滚并放弃图片阶段，避免把不存在的图片 ID 交给图片队列
+            db.rollback()
+            image_entries.clear()
+            logger.error(f"[任务ID: {task_id}] 图片持久化失败，跳过图片阶段: {images_exc}")
+        observe_stage(KIND_INGESTION, "image", time.time() - image_start)
 
         current_task.update_state(
             state="PROGRESS",
             meta={"current": 60, "total": 100, "status": "文档分块完成"}
         )
-        
-        # 更新文档状态为向量化中
-        logger.debug(f"[任务ID: {task_id}] 步骤6/7: 开始向量化和索引建立")
+
+        # 解析阶段完成：记录阶段状态后，向量化/图片/收尾交由各自队列的阶段任务处理
+        chunks_count = db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).count()
+        pipeline.mark_stage_done(
+            document,
+            STAGE_PARSE,
+            chunks_path=chunks_path,
+            chunks_count=chunks_count,
+            images=image_entries,
+        )
+
+        logger.debug(f"[任务ID: {task_id}] 步骤6/7: 派发向量化和索引阶段")
         document.status = DOC_STATUS_VECTORIZING
         document.processing_progress = 70.0
         db.commit()
-        
-        # 向量化处理
-        vector_service = VectorService(db)
-        db_chunks = db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).order_by(DocumentChunk.chunk_index).all()
-        
-        logger.info(f"[任务ID: {task_id}] 开始向量化: 共 {len(db_chunks)} 个分块需要处理")
-        if len(db_chunks) == 0:
-            logger.warning(f"[任务ID: {task_id}] 无分块可向量化，跳过向量化与索引阶段")
-            document.status = DOC_STATUS_COMPLETED
-            
-            # 提取文档目录（同步执行，不影响主流程）
-            # 注意：TXT 文件不提取目录（纯文本文件通常没有结构化目录）
-            try:
-                from app.services.document_toc_service import DocumentTOCService
-                import asyncio
-                toc_service = DocumentTOCService(db)
-                if is_pdf and document.file_path:
-                    asyncio.run(toc_service.extract_toc_from_pdf(document_id, document.file_path))
-                elif is_docx and document.file_path:
-                    asyncio.run(toc_service.extract_toc_from_docx(document_id, document.file_path))
-                elif is_md:
-                    # MD 文件从 metadata 中的 heading_structure 提取目录
-                    doc_meta = document.meta or {}
-                    if isinstance(doc_meta, str):
-                        import json as _json
-                        try:
-                            doc_meta = _json.loads(doc_meta)
-                        except Exception:
-                            doc_meta = {}
-                    heading_structure = doc_meta.get('heading_structure', [])
-                    if heading_structure:
-                        asyncio.run(toc_service.extract_toc_from_markdown(document_id, heading_structure))
-                # TXT 文件跳过目录提取（纯文本文件通常没有结构化目录）
-            except Exception as e:
-                logger.warning(f"[任务ID: {task_id}] 提取文档目录失败（不影响主流程）: {e}")
-            document.processing_progress = 100.0
-            db.commit()
-            total_time = time.time() - download_start
-            current_task.update_state(state="SUCCESS", meta={"current": 100, "total": 100, "status": "文档无文本，流程结束"})
-            return {
-                "status": "success",
-                "message": "文档无文本，流程结束",
-                "document_id": document_id,
-                "chunks_count": 0,
-                "text_length": len(text_content),
-                "processing_time": total_time,
-            }
-        vectorize_start = time.time()
-        
-        # 初始化OpenSearch服务
-        opensearch_service = OpenSearchService()
-        
-        # 批量生成向量并存储到OpenSearch
-        success_count = 0
-        error_count = 0
-        
-        # 准备文本迭代器：当不在DB存正文时，从 MinIO 的 chunks.jsonl.gz 流式读取
-        def _stream_chunk_texts_from_minio(doc_id: int):
-            try:
-                minio = MinioStorageService()
-                files = minio.list_files("documents/")
-                needle = f"/{doc_id}/parsed/chunks/chunks.jsonl.gz"
-                target = None
-                for fobj in files:
-                    if fobj.get("object_name", "").endswith(needle):
-                        target = fobj["object_name"]
-                        break
-                if not target:
-                    logger.warning(f"[任务ID: {task_id}] 未找到 MinIO 分块归档，回退使用内存分块")
-                    for t in chunks:
-                        yield t
-                    return
-                import gzip, json
-                response = minio.client.get_object(minio.bucket_name, target)
-                try:
-                    with gzip.GzipFile(fileobj=response, mode='rb') as gz:
-                        for line in gz:
-                            try:
-                                item = json.loads(line)
-                                yield item.get("content", "")
-                            except Exception:
-                                yield ""
-                finally:
-                    try:
-                        response.close(); response.release_conn()
-                    except Exception:
-                        pass
-            except Exception as e:
-                logger.warning(f"[任务ID: {task_id}] 从 MinIO 流式读取分块失败: {e}，回退内存分块")
-                for t in chunks:
-                    yield t
-
-        store_text = getattr(settings, 'STORE_CHUNK_TEXT_IN_DB', False)
-        text_iter = iter([c if isinstance(c, str) else str(c) for c in chunks]) if store_text else _stream_chunk_texts_from_minio(document_id)
-
-        docs_to_index = []
-        for i, chunk in enumerate(db_chunks):
-            chunk_start = time.time()
-            
-            try:
-                # ✅ 跳过图片分块：图片分块不进行文本向量化，图片向量化已在图片处理阶段完成
-                if chunk.chunk_type == 'image':
-                    logger.debug(f"[任务ID: {task_id}] 分块 {chunk.id} 是图片类型，跳过文本向量化（图片向量化已在图片处理阶段完成）")
-                    continue
-                
-                # 获取对应文本，StopIteration 时置空
-                try:
-                    chunk_text = next(text_iter)
-                except StopIteration:
-                    chunk_text = ""
-                
-                # ✅ 优化：对于表格块，从 meta 中提取完整的表格数据并生成完整文本
-                chunk_meta_dict = {}  # 确保在所有情况下都有定义
-                if chunk.chunk_type == 'table' and chunk.meta:
-                    try:
-                        chunk_meta_dict = json.loads(chunk.meta) if isinstance(chunk.meta, str) else chunk.meta
-                        table_data = chunk_meta_dict.get('table_data', {})
-                        
-                        # 优先使用结构化单元格数据生成完整文本
-                        if table_data.get('cells'):
-                            cells = table_data['cells']
-                            text_lines = []
-                            for row in cells:
-                                if isinstance(row, (list, tuple)):
-                                    # 使用制表符分隔，保持列对齐
-                                    row_text = '\t'.join(str(cell) if cell is not None else '' for cell in row)
-                                    text_lines.append(row_text)
-                                else:
-                                    text_lines.append(str(row))
-                            chunk_text = '\n'.join(text_lines)
-                            logger.debug(f"[任务ID: {task_id}] 表格块 {chunk.id}: 从结构化数据生成完整文本 ({len(text_lines)} 行)")
-                        # 如果没有 cells，尝试使用 HTML（至少包含结构化信息）
-                        elif table_data.get('html'):
-                            # ✅ 修复：正确解析 HTML 表格结构，保持行列关系
-                            try:
-                                import re
-                                html_text = table_data['html']
-                                
-                                # 方法1：使用 BeautifulSoup（如果可用）
-                                try:
-                                    from bs4 import BeautifulSoup
-                                    soup = BeautifulSoup(html_text, 'html.parser')
-                                    table = soup.find('table')
-                                    if table:
-                                        text_lines = []
-                                        for tr in table.find_all('tr'):
-                                            row_cells = []
-                                            for td in tr.find_all(['td', 'th']):
-                                                cell_text = td.get_text(strip=True)
-                                                row_cells.append(cell_text)
-                                            if row_cells:
-                                                # 使用制表符分隔同一行的单元格
-                                                text_lines.append('\t'.join(row_cells))
-                                        
-                                        if text_lines:
-                                            # 使用换行符分隔不同行
-                                            chunk_text = '\n'.join(text_lines)
-                                            logger.debug(f"[任务ID: {task_id}] 表格块 {chunk.id}: 从 HTML (BeautifulSoup) 提取文本 ({len(text_lines)} 行)")
-                                except ImportError:
-                                    # 方法2：使用正则表达式解析（兜底方案）
-                                    tr_pattern = r'<tr[^>]*>(.*?)</tr>'
-                                    td_pattern = r'<t[dh][^>]*>(.*?)</t[dh]>'
-                                    
-                                    trs = re.findall(tr_pattern, html_text, re.DOTALL | re.IGNORECASE)
-                                    if trs:
-                                        text_lines = []
-                                        for tr_content in trs:
-                                            tds = re.findall(td_pattern, tr_content, re.DOTALL | re.IGNORECASE)
-                                            if tds:
-                                                row_cells = []
-                                                for td in tds:
-                                                    # 移除内嵌的 HTML 标签
-                                                    cell_text = re.sub(r'<[^>]+>', '', td)
-                                                    # 处理 HTML 实体
-                                                    cell_text = cell_text.replace('&nbsp;', ' ').replace('&amp;', '&')
-                                                    cell_text = ' '.join(cell_text.split()).strip()
-                                                    row_cells.append(cell_text)
-                                                
-                                                if row_cells:
-                                                    text_lines.append('\t'.join(row_cells))
-                                        
-                                        if text_lines:
-                                            chunk_text = '\n'.join(text_lines)
-                                            logger.debug(f"[任务ID: {task_id}] 表格块 {chunk.id}: 从 HTML (正则) 提取文本 ({len(text_lines)} 行)")
-                            except Exception as e:
-                                logger.warning(f"[任务ID: {task_id}] 表格块 {chunk.id}: 从 HTML 提取文本失败: {e}")
-                                chunk_text = None  # 继续使用原始的 table_text
-                        # 如果都没有，使用原始的 table_text（已在上面获取）
-                        if chunk_text:
-                            logger.debug(f"[任务ID: {task_id}] 表格块 {chunk.id} 最终文本长度: {len(chunk_text)}")
-                    except Exception as e:
-                        logger.warning(f"[任务ID: {task_id}] 表格块 {chunk.id} 提取完整内容失败: {e}，使用原始文本")
-                        # 解析失败时确保 chunk_meta_dict 至少是空字典
-                        chunk_meta_dict = {}
-                
-                # 跳过空内容分块
-                if not (chunk_text or "").strip():
-                    logger.warning(f"[任务ID: {task_id}] 分块 {chunk.id} 内容为空，跳过向量化与索引")
-                    continue
-                
-                # ✅ 优化：记录表格块的处理信息
-                if chunk.chunk_type == 'table':
-                    logger.info(f"[任务ID: {task_id}] 表格块 {chunk.id} 向量化: 文本长度={len(chunk_text)}, "
-                               f"包含单元格数据={bool(chunk_meta_dict.get('table_data', {}).get('cells'))}")
-                
-                # 生成向量（Ollama不可用时将返回空列表，允许继续索引文本）
-                vector = vector_service.generate_embedding(chunk_text)
-                vectorize_time = time.time() - chunk_start
-                
-                # 构建索引文档（✅ 新增：包含完整的 metadata 信息）
-                # 从 chunk.meta 中提取完整的 metadata（包含 element_index、page_number、coordinates）
-                # ✅ 注意：对于表格块，chunk_meta_dict 已经在上面提取过，需要确保已定义
-                if chunk.chunk_type != 'table':
-                    # 非表格块，需要重新解析 meta
-                    chunk_meta_dict = {}
-                    if chunk.meta:
-                        try:
-                            chunk_meta_dict = json.loads(chunk.meta) if isinstance(chunk.meta, str) else chunk.meta
-                        except:
-                            pass
-                # 表格块的 chunk_meta_dict 已在上面提取，直接使用
-                
-                # 构建 metadata（包含所有关键信息）
-                chunk_metadata = {
-                    "chunk_index": i
-                }
-                # ✅ 添加 element_index 信息
-                if chunk_meta_dict.get('element_index_start') is not None:
-                    chunk_metadata['element_index_start'] = chunk_meta_dict.get('element_index_start')
-                if chunk_meta_dict.get('element_index_end') is not None:
-                    chunk_metadata['element_index_end'] = chunk_meta_dict.get('element_index_end')
-                # ✅ 添加 page_number
-                if chunk_meta_dict.get('page_number') is not None:
-                    chunk_metadata['page_number'] = chunk_meta_dict.get('page_number')
-                # ✅ 添加 coordinates
-                if chunk_meta_dict.get('coordinates'):
-                    chunk_metadata['coordinates'] = chunk_meta_dict.get('coordinates')
-                
-                chunk_doc = {
-                    "document_id": document_id,
-                    "chunk_id": chunk.id,
-                    "knowledge_base_id": document.knowledge_base_id,
-                    "category_id": document.category_id if hasattr(document, 'category_id') else None,
-                    "content": chunk_text,
-                    "chunk_type": chunk.chunk_type if hasattr(chunk, 'chunk_type') else "text",
-                    "metadata": chunk_metadata,  # ✅ 使用完整的 metadata
-                    "created_at": chunk.created_at.isoformat() if chunk.created_at else None
-                }
-                # 仅当有有效向量时写入
-                if isinstance(vector, list) and len(vector) > 0:
-                    chunk_doc["content_vector"] = vector
-                docs_to_index.append(chunk_doc)
-                
-                index_time = 0.0
-                
-                success_count += 1
-                
-                if (i + 1) % 10 == 0 or i == len(db_chunks) - 1:  # 每10个或最后一个记录日志
-                    logger.info(f"[任务ID: {task_id}] 向量化进度: {i+1}/{len(db_chunks)} "
-                               f"(分块ID={chunk.id}, 向量维度={len(vector)}, "
-                               f"向量化耗时={vectorize_time:.2f}秒, 索引耗时={index_time:.2f}秒)")
-                else:
-                    logger.debug(f"[任务ID: {task_id}] 分块 {chunk.id} 处理完成: "
-                               f"向量维度={len(vector)}, 向量化={vectorize_time:.2f}秒, 索引={index_time:.2f}秒")
-                
-            except Exception as e:
-                error_count += 1
-                logger.error(f"[任务ID: {task_id}] 分块 {chunk.id} (索引 {i+1}/{len(chunks)}) 处理失败: {e}", exc_info=True)
-                continue
-            
-            # 更新任务进度
-            progress = 60 + (i / max(1, len(db_chunks))) * 30
-            current_task.update_state(
-                state="PROGRESS",
-                meta={"current": int(progress), "total": 100, "status": f"向量化中 ({i+1}/{len(chunks)})"}
-            )
-        
-        # 批量索引到 OpenSearch（默认不刷新，提升吞吐）
-        try:
-            bulk_index_start = time.time()
-            opensearch_service.bulk_index_document_chunks_sync(docs_to_index)
-            bulk_index_time = time.time() - bulk_index_start
-            logger.info(f"[任务ID: {task_id}] 批量索引完成，耗时={bulk_index_time:.2f}秒，总文档={len(docs_to_index)}")
-        except Exception as e:
-            logger.error(f"[任务ID: {task_id}] 批量索引失败: {e}", exc_info=True)
-            # 批量索引失败不再抛出，避免任务整体失败
-            pass
-        
-        vectorize_total_time = time.time() - vectorize_start
-        avg_time = (vectorize_total_time / len(db_chunks)) if len(db_chunks) else 0.0
-        logger.info(f"[任务ID: {task_id}] 向量化完成: 成功={success_count}, 失败={error_count}, 总耗时={vectorize_total_time:.2f}秒, 平均耗时={avg_time:.2f}秒/分块")
-        
-        # 自动标签/摘要生成（向量化后、索引前，失败不阻塞）
-        # 检查全局开关和知识库级别配置
-        global_enabled = getattr(settings, 'ENABLE_AUTO_TAGGING', False)
-        kb_enabled = getattr(document.knowledge_base, 'enable_auto_tagging', True) if document.knowledge_base else True
-        
-        if global_enabled and kb_enabled:
-            try:
-                logger.info(f"[任务ID: {task_id}] 开始生成自动标签/摘要（知识库ID={document.knowledge_base_id}, 知识库配置={kb_enabled}）")
-                from app.services.auto_tagging_service import AutoTaggingService
-                import asyncio
-                tagging_service = AutoTaggingService(db)
-                result = asyncio.run(tagging_service.generate_tags_and_summary(document_id))
-                if result:
-                    logger.info(f"[任务ID: {task_id}] 自动标签/摘要生成成功: keywords={result.get('keywords', [])}, summary={result.get('summary', '')[:50]}...")
-                else:
-                    logger.warning(f"[任务ID: {task_id}] 自动标签/摘要生成失败（不影响主流程）")
-            except Exception as e:
-                logger.warning(f"[任务ID: {task_id}] 自动标签/摘要生成异常（不影响主流程）: {e}", exc_info=True)
-        else:
-            logger.debug(f"[任务ID: {task_id}] 自动标签/摘要未启用（全局={global_enabled}, 知识库={kb_enabled}）")
-        
-        current_task.update_state(
-            state="PROGRESS",
-            meta={"current": 90, "total": 100, "status": "向量化完成，索引已建立"}
-        )
-        
-        # 更新文档状态为索引中（OpenSearch索引已在上面的循环中建立）
-        logger.debug(f"[任务ID: {task_id}] 步骤7/7: 完成处理，更新文档状态")
-        document.status = DOC_STATUS_INDEXING
-        
-        # 提取文档目录（同步执行，不影响主流程）
-        # 注意：TXT 文件不提取目录（纯文本文件通常没有结构化目录）
+        notify_document_progress(document, "向量化中")
+        # 分块与图片已落库：按差值更新知识库聚合统计（重新处理时只计入变化量）
         try:
-            from app.services.document_toc_service import DocumentTOCService
-            import asyncio
-            toc_service = DocumentTOCService(db)
-            if is_pdf and document.file_path:
-                toc_items = asyncio.run(toc_service.extract_toc_from_pdf(document_id, document.file_path))
-                if toc_items:
-                    logger.info(f"[任务ID: {task_id}] PDF目录提取成功，共 {len(toc_items)} 个目录项")
-            elif is_docx and document.file_path:
-                toc_items = asyncio.run(toc_service.extract_toc_from_docx(document_id, document.file_path))
-                if toc_items:
-                    logger.info(f"[任务ID: {task_id}] Word目录提取成功，共 {len(toc_items)} 个目录项")
-            elif is_md:
-                # MD 文件从 metadata 中的 heading_structure 提取目录
-                doc_meta = document.meta or {}
-                if isinstance(doc_meta, str):
-                    import json as _json
-                    try:
-                        doc_meta = _json.loads(doc_meta)
-                    except Exception:
-                        doc_meta = {}
-                heading_structure = doc_meta.get('heading_structure', [])
-                if heading_structure:
-                    toc_items = asyncio.run(toc_service.extract_toc_from_markdown(document_id, heading_structure))
-                    if toc_items:
-                        logger.info(f"[任务ID: {task_id}] Markdown目录提取成功，共 {len(toc_items)} 个目录项")
-                else:
-                    logger.debug(f"[任务ID: {task_id}] Markdown文件无标题结构，跳过目录提取")
-            elif is_html:
-                doc_meta = document.meta or {}
-                if isinstance(doc_meta, str):
-                    import json as _json
-                    try:
-                        doc_meta = _json.loads(doc_meta)
-                    except Exception:
-                        doc_meta = {}
-                heading_structure = doc_meta.get('heading_structure', [])
-                if heading_structure:
-                    toc_items = asyncio.run(toc_service.extract_toc_from_html(document_id, heading_structure))
-                    if toc_items:
-                        logger.info(f"[任务ID: {task_id}] HTML目录提取成功，共 {len(toc_items)} 个目录项")
-                else:
-                    logger.debug(f"[任务ID: {task_id}] HTML文件无标题结构，跳过目录提取")
-            elif is_pptx:
-                # PPTX 文件从 metadata 中的 slides 列表提取目录
-                doc_meta = document.meta or {}
-                if isinstance(doc_meta, str):
-                    import json as _json
-                    try:
-                        doc_meta = _json.loads(doc_meta)
-                    except Exception:
-                        doc_meta = {}
-                slides = doc_meta.get('slides', [])
-                if slides:
-                    toc_items = asyncio.run(toc_service.extract_toc_from_pptx(document_id, slides))
-                    if toc_items:
-                        logger.info(f"[任务ID: {task_id}] PPTX目录提取成功，共 {len(toc_items)} 个目录项")
-                else:
-                    logger.debug(f"[任务ID: {task_id}] PPTX文件无幻灯片信息，跳过目录提取")
-            # TXT 文件跳过目录提取（纯文本文件通常没有结构化目录）
-        except Exception as e:
-            logger.warning(f"[任务ID: {task_id}] 提取文档目录失败（不影响主流程）: {e}")
-        document.processing_progress = 95.0
-        db.commit()
-        
-        logger.info(f"[任务ID: {task_id}] OpenSearch索引建立完成: 共索引 {len(docs_to_index)} 个分块")
-        
-        # 更新文档状态为完成
-        document.status = DOC_STATUS_COMPLETED
-        document.processing_progress = 100.0
-        db.commit()
+            KnowledgeBaseStatsService(db).sync_document(document)
+        except Exception as stats_err:
+            db.rollback()
+            logger.warning(f"[任务ID: {task_id}] 知识库统计更新失败: {stats_err}")
+        pipeline.dispatch_downstream(document_id)
 
-        # 若不存在任何文档版本，则创建初始版本 v1（以原始文件为基准）
-        try:
-            from app.models.version import DocumentVersion
-            existing_count = db.query(DocumentVersion).filter(
-                DocumentVersion.document_id == document_id,
-                DocumentVersion.is_deleted == False
-            ).count()
-            if existing_count == 0:
-                initial_version = DocumentVersion(
-                    document_id=document_id,
-                    version_number=1,
-                    version_type="auto",
-                    description="初始版本",
-                    file_path=document.file_path or "",
-                    file_size=document.file_size,
-                    file_hash=document.file_hash,
-                )
-                db.add(initial_version)
-                db.commit()
-                logger.info(f"[任务ID: {task_id}] 已创建文档初始版本 v1 (document_id={document_id})")
-        except Exception as ver_err:
-            logger.warning(f"[任务ID: {task_id}] 创建初始版本失败（不影响主流程）: {ver_err}")
-        
         total_time = time.time() - download_start
-        logger.info(f"[任务ID: {task_id}] ========== 文档 {document_id} 处理完成 ==========")
-        logger.info(f"[任务ID: {task_id}] 处理统计: 总耗时={total_time:.2f}秒, "
-                   f"文件大小={len(file_content)} bytes, 分块数={len(chunks)}, 已索引={len(docs_to_index)}条, "
+        logger.info(f"[任务ID: {task_id}] ========== 文档 {document_id} 解析阶段完成 ==========")
+        logger.info(f"[任务ID: {task_id}] 处理统计: 耗时={total_time:.2f}秒, "
+                   f"文件大小={len(file_content)} bytes, 分块数={chunks_count}, 图片数={len(image_entries)}, "
                    f"文本长度={len(text_content)} 字符")
-        
+
         current_task.update_state(
             state="SUCCESS",
-            meta={"current": 100, "total": 100, "status": "文档处理完成"}
+            meta={"current": 70, "total": 100, "status": "文档解析完成，已进入向量化队列"}
         )
-        
+
         return {
             "status": "success",
-            "message": "文档处理完成",
+            "message": "文档解析完成，已进入向量化队列",
             "document_id": document_id,
-            "chunks_count": len(chunks),
+            "chunks_count": chunks_count,
             "text_length": len(text_content),
             "processing_time": total_time
         }
@@ -2306,6 +1871,8 @@ def process_document_task(self, document_id: int):
                 document.status = DOC_STATUS_FAILED
                 document.error_message = error_msg
                 db.commit()
+                DocumentPipelineService(db).update_state(document, failed_stage=STAGE_PARSE)
+                notify_document_progress(document, "处理失败")
                 logger.debug(f"[任务ID: {task_id}] 文档状态已更新为失败")
             except Exception as db_err:
                 logger.error(f"[任务ID: {task_id}] 更新文档状态失败: {db_err}", exc_info=True)
@@ -2458,6 +2025,11 @@ def reprocess_document_task(self, document_id: int):
         document.status = DOC_STATUS_COMPLETED
         document.processing_progress = 100.0
         db.commit()
+        try:
+            KnowledgeBaseStatsService(db).sync_document(document, ingested=True)
+        except Exception as stats_err:
+            db.rollback()
+            logger.warning(f"文档 {document_id} 知识库统计更新失败: {stats_err}")
         
         return {
             "status": "success",
@@ -2502,7 +2074,9 @@ def delete_document_task(document_id: int):
         if not document:
             return {"status": "error", "message": "文档不存在"}
         
-        # 删除相关数据
+        # 扣除知识库聚合统计后删除相关数据
+        KnowledgeBaseStatsService(db).remove_document(document)
+        DocumentRecommendationService(db).remove_document(document_id)
         db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete()
         
         # 软删除文档
@@ -70,6 +70,18 @@ def batch_process_images_task(image_ids: list):
     return {"status": "success", "message": f"已启动 {len(image_ids)} 个图片处理任务"}
 
 
+@celery_app.task(bind=True)
+def vectorize_document_images_task(self, document_id: int):
+    """文档流水线阶段：文档图片 CLIP 向量化并写入图片索引（image 队列）"""
+    from app.services.document_pipeline_service import DocumentPipelineService, STAGE_IMAGES
+
+    db = SessionLocal()
+    try:
+        return DocumentPipelineService(db).run_stage(document_id, STAGE_IMAGES, self.request.id)
+    finally:
+        db.close()
+
+
 def extract_images_from_document_task(document_id: int) -> List[Dict]:
     """
     仅 DOCX：使用 DocxService 提取图片。
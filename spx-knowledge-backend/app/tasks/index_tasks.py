@@ -2,6 +2,7 @@
 Index Processing Tasks
 """
 
+import os
 from celery import current_task
 from app.tasks.celery_app import celery_app
 from app.services.vector_service import VectorService
@@ -153,3 +154,44 @@ def rebuild_index_task():
         return {"status": "error", "message": str(e)}
     finally:
         db.close()
+
+@celery_app.task
+def flush_qa_history_task():
+    """问答历史写后队列落盘任务"""
+    from app.services.qa_history_writer import QAHistoryWriter
+
+    try:
+        stats = QAHistoryWriter().drain(consumer=f"worker-{os.getpid()}")
+        return {"status": "success", **stats}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@celery_app.task
+def flush_search_hotwords_task():
+    """搜索热词缓冲计数落盘任务"""
+    from app.services.hotword_counter import HotwordCounter
+
+    db = SessionLocal()
+    try:
+        stats = HotwordCounter().flush(db)
+        return {"status": "success", **stats}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
+
+@celery_app.task(bind=True)
+def finalize_document_task(self, stage_results, document_id: int):
+    """文档流水线收尾阶段（index 队列）：文本与图片阶段均成功后执行自动标签、目录提取并标记完成"""
+    from app.services.document_pipeline_service import DocumentPipelineService, STAGE_FINALIZE
+
+    failed = [r for r in (stage_results or []) if isinstance(r, dict) and r.get("status") == "failed"]
+    if failed:
+        # 失败阶段已将文档标记为失败，重新投递文档后从该阶段续跑
+        return {"status": "failed", "document_id": document_id, "failed_stages": [r.get("stage") for r in failed]}
+
+    db = SessionLocal()
+    try:
+        return DocumentPipelineService(db).run_stage(document_id, STAGE_FINALIZE, self.request.id)
+    finally:
+        db.close()
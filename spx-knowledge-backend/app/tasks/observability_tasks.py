@@ -171,7 +171,7 @@ def sync_active_clusters() -> None:
     lock_value = str(uuid.uuid4())  # 生成唯一的锁值
     
     # 尝试获取锁
-    lock_acquired = asyncio.run(cache_manager.acquire_lock(lock_key, timeout=lock_timeout, value=lock_value))
+    lock_acquired = cache_manager.sync.acquire_lock(lock_key, timeout=lock_timeout, value=lock_value)
     if not lock_acquired:
         logger.warning("同步任务已在执行中，跳过本次执行（可能是重复触发）")
         return
@@ -186,7 +186,7 @@ def sync_active_clusters() -> None:
             db.close()
     finally:
         # 释放锁（使用锁的值确保只有持有者才能释放）
-        asyncio.run(cache_manager.release_lock(lock_key, value=lock_value))
+        cache_manager.sync.release_lock(lock_key, value=lock_value)
 
 
 @celery_app.task(
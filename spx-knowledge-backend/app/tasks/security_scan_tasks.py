@@ -11,7 +11,6 @@ from app.models.document import Document
 from sqlalchemy.orm import Session
 from app.config.database import SessionLocal
 from app.core.logging import logger
-from app.tasks.document_tasks import process_document_task
 from app.config.settings import settings
 from datetime import datetime
 import io
@@ -105,7 +104,9 @@ def security_scan_document_task(self, document_id: int):
         # 如果扫描通过（safe或skipped），触发文档处理任务
         if security_scan_status in ("safe", "skipped"):
             logger.info(f"[扫描任务ID: {task_id}] 扫描通过，触发文档处理任务")
-            process_document_task.apply_async(
+            # 按任务名发送，扫描 worker 无需导入文档解析模块
+            celery_app.send_task(
+                "app.tasks.document_tasks.process_document_task",
                 args=(document_id,),
                 queue="document",
                 priority=settings.CELERY_TASK_PRIORITY_DOCUMENT
@@ -85,3 +85,14 @@ def batch_vectorize_task(chunk_ids: list):
         vectorize_chunk_task.delay(chunk_id)
     
     return {"status": "success", "message": f"已启动 {len(chunk_ids)} 个向量化任务"}
+
+@celery_app.task(bind=True)
+def embed_document_chunks_task(self, document_id: int):
+    """文档流水线阶段：文本分块向量化并写入索引（vector 队列）"""
+    from app.services.document_pipeline_service import DocumentPipelineService, STAGE_EMBED
+
+    db = SessionLocal()
+    try:
+        return DocumentPipelineService(db).run_stage(document_id, STAGE_EMBED, self.request.id)
+    finally:
+        db.close()
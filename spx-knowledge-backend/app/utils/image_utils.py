@@ -4,7 +4,6 @@ Image Utils
 
 import os
 from PIL import Image
-import cv2
 import numpy as np
 from typing import Optional, Tuple, List, Dict, Any
 
@@ -66,7 +65,8 @@ def convert_image_format(
 def extract_image_features(image_path: str) -> Optional[np.ndarray]:
     """提取图片特征"""
     try:
-        # 使用OpenCV提取特征
+        # 使用OpenCV提取特征（按需导入，避免模块导入时加载 OpenCV）
+        import cv2
         img = cv2.imread(image_path)
         if img is None:
             return None
@@ -90,6 +90,7 @@ def calculate_image_similarity(features1: np.ndarray, features2: np.ndarray) ->
             return 0.0
         
         # 使用FLANN匹配器
+        import cv2
         FLANN_INDEX_KDTREE = 1
         index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
         search_params = dict(checks=50)
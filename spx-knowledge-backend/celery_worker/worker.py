@@ -25,9 +25,14 @@ _project_root = os.path.dirname(_current_dir)
 if _project_root not in sys.path:
     sys.path.insert(0, _project_root)
 
+# 启动剖析需在导入任何业务模块之前安装，才能统计完整的导入耗时
+from app.core.startup_profile import is_profiling_requested, start_import_profiling
+if is_profiling_requested():
+    start_import_profiling()
+
 # 使用 app.tasks.celery_app 以确保任务路由配置一致
 # 所有任务都定义在 app.tasks.* 中，它们使用 app.tasks.celery_app
-from app.tasks.celery_app import celery_app
+from app.tasks.celery_app import celery_app, task_modules_for_queues
 from app.config.settings import settings
 
 # 配置 Celery Worker 日志
@@ -185,6 +190,11 @@ def main() -> None:
             f"✅ Worker 已正确配置，监听 document 队列"
         )
 
+    # 只导入所监听队列的任务模块（CELERY_LAZY_TASK_IMPORTS=false 时导入全部）
+    task_modules = task_modules_for_queues(configured_queues)
+    celery_app.conf.include = task_modules
+    logging.getLogger("celery").info(f"📦 导入的任务模块: {task_modules}")
+
     try:
         celery_app.worker_main(argv)
     except SystemExit as exc:
@@ -39,6 +39,7 @@ CREATE TABLE IF NOT EXISTS `knowledge_bases` (
     `visibility` VARCHAR(20) NOT NULL DEFAULT 'private' COMMENT '可见性: private/shared/public(预留)',
     `is_active` BOOLEAN DEFAULT TRUE COMMENT '是否激活',
     `enable_auto_tagging` BOOLEAN DEFAULT TRUE COMMENT '是否启用自动标签/摘要（知识库级别配置）',
+    `vector_profile` VARCHAR(32) NULL COMMENT '向量索引配置档（创建时选择，空为 default）',
     `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     `is_deleted` BOOLEAN DEFAULT FALSE COMMENT '是否删除',
@@ -66,6 +67,27 @@ CREATE TABLE IF NOT EXISTS `knowledge_base_members` (
     CONSTRAINT `fk_kb_member_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='知识库成员表';
 
+-- ============================================
+-- 2.2. 知识库聚合统计表
+-- ============================================
+CREATE TABLE IF NOT EXISTS `knowledge_base_stats` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT 'ID',
+    `knowledge_base_id` INT NOT NULL COMMENT '知识库ID',
+    `document_count` INT NOT NULL DEFAULT 0 COMMENT '文档数量（未删除）',
+    `completed_document_count` INT NOT NULL DEFAULT 0 COMMENT '处理完成的文档数量',
+    `chunk_count` INT NOT NULL DEFAULT 0 COMMENT '分块数量',
+    `image_count` INT NOT NULL DEFAULT 0 COMMENT '图片数量',
+    `storage_bytes` BIGINT NOT NULL DEFAULT 0 COMMENT '存储占用（原文件+图片，字节）',
+    `last_ingested_at` DATETIME NULL COMMENT '最近一次文档处理完成时间',
+    `reconciled_at` DATETIME NULL COMMENT '最近一次对账时间',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    `is_deleted` BOOLEAN DEFAULT FALSE COMMENT '是否删除',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_kb_stats_kb` (`knowledge_base_id`),
+    CONSTRAINT `fk_kb_stats_kb` FOREIGN KEY (`knowledge_base_id`) REFERENCES `knowledge_bases` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='知识库聚合统计表';
+
 -- ============================================
 -- 3.1. 文档上传批次表
 -- ============================================
@@ -160,6 +182,41 @@ CREATE TABLE IF NOT EXISTS `documents` (
     CONSTRAINT `fk_doc_category` FOREIGN KEY (`category_id`) REFERENCES `knowledge_base_categories` (`id`) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='文档表';
 
+-- ============================================
+-- 3.3. 分类/标签推荐（文档级向量与质心）
+-- ============================================
+CREATE TABLE IF NOT EXISTS `document_embeddings` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT 'ID',
+    `document_id` INT NOT NULL COMMENT '文档ID',
+    `dim` INT NOT NULL COMMENT '向量维度',
+    `vector` MEDIUMBLOB NOT NULL COMMENT 'L2 归一化后的 float32 向量',
+    `counted_knowledge_base_id` INT NULL COMMENT '已计入质心的知识库ID',
+    `counted_category_id` INT NULL COMMENT '已计入质心的分类ID',
+    `counted_tags` JSON NULL COMMENT '已计入质心的标签列表',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    `is_deleted` BOOLEAN DEFAULT FALSE COMMENT '是否删除',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_doc_embedding_doc` (`document_id`),
+    CONSTRAINT `fk_doc_embedding_doc` FOREIGN KEY (`document_id`) REFERENCES `documents` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='文档级向量表（分类/标签推荐）';
+
+CREATE TABLE IF NOT EXISTS `recommendation_centroids` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT 'ID',
+    `knowledge_base_id` INT NOT NULL COMMENT '知识库ID',
+    `kind` VARCHAR(20) NOT NULL COMMENT '质心类型：category/tag',
+    `key` VARCHAR(255) NOT NULL COMMENT '分类ID或标签名',
+    `dim` INT NOT NULL COMMENT '向量维度',
+    `vector_sum` MEDIUMBLOB NOT NULL COMMENT 'float32 向量和',
+    `doc_count` INT NOT NULL DEFAULT 0 COMMENT '计入的文档数',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    `is_deleted` BOOLEAN DEFAULT FALSE COMMENT '是否删除',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_rec_centroid_kb_kind_key` (`knowledge_base_id`, `kind`, `key`),
+    CONSTRAINT `fk_rec_centroid_kb` FOREIGN KEY (`knowledge_base_id`) REFERENCES `knowledge_bases` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='分类/标签质心表（分类/标签推荐）';
+
 -- ============================================
 -- 4. 文档分块表
 -- ============================================
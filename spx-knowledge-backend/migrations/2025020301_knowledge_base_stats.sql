@@ -0,0 +1,26 @@
+﻿-- Migration: 知识库聚合统计表
+-- 文件：migrations/2025020301_knowledge_base_stats.sql
+-- 创建日期：2025-02-03
+-- 文档/分块/图片数量、存储占用与最近入库时间随文档生命周期增量维护，
+-- 定时对账任务（reconcile_knowledge_base_stats_task）修正漂移；建表后执行一次对账回填存量数据：
+--   python scripts/reconcile_kb_stats.py
+
+USE `spx_knowledge`;
+
+CREATE TABLE IF NOT EXISTS `knowledge_base_stats` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT 'ID',
+    `knowledge_base_id` INT NOT NULL COMMENT '知识库ID',
+    `document_count` INT NOT NULL DEFAULT 0 COMMENT '文档数量（未删除）',
+    `completed_document_count` INT NOT NULL DEFAULT 0 COMMENT '处理完成的文档数量',
+    `chunk_count` INT NOT NULL DEFAULT 0 COMMENT '分块数量',
+    `image_count` INT NOT NULL DEFAULT 0 COMMENT '图片数量',
+    `storage_bytes` BIGINT NOT NULL DEFAULT 0 COMMENT '存储占用（原文件+图片，字节）',
+    `last_ingested_at` DATETIME NULL COMMENT '最近一次文档处理完成时间',
+    `reconciled_at` DATETIME NULL COMMENT '最近一次对账时间',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    `is_deleted` BOOLEAN DEFAULT FALSE COMMENT '是否删除',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_kb_stats_kb` (`knowledge_base_id`),
+    CONSTRAINT `fk_kb_stats_kb` FOREIGN KEY (`knowledge_base_id`) REFERENCES `knowledge_bases` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='知识库聚合统计表';
@@ -0,0 +1,36 @@
+﻿-- Migration: 分类/标签推荐（文档级向量 + 质心）
+-- 文件：migrations/2025020302_document_recommendation_tables.sql
+-- 创建日期：2025-02-03
+-- 文档向量在向量化阶段由分块向量求均值写入；分类/标签变化时增量移动质心。
+-- 存量文档回填：python scripts/backfill_document_embeddings.py
+
+USE `spx_knowledge`;
+
+CREATE TABLE IF NOT EXISTS `document_embeddings` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT 'ID',
+    `document_id` INT NOT NULL COMMENT '文档ID',
+    `dim` INT NOT NULL COMMENT '向量维度',
+    `vector` MEDIUMBLOB NOT NULL COMMENT 'L2 归一化后的 float32 向量',
+    `counted_category_id` INT NULL COMMENT '已计入质心的分类ID',
+    `counted_tags` JSON NULL COMMENT '已计入质心的标签列表',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    `is_deleted` BOOLEAN DEFAULT FALSE COMMENT '是否删除',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_doc_embedding_doc` (`document_id`),
+    CONSTRAINT `fk_doc_embedding_doc` FOREIGN KEY (`document_id`) REFERENCES `documents` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='文档级向量表（分类/标签推荐）';
+
+CREATE TABLE IF NOT EXISTS `recommendation_centroids` (
+    `id` INT NOT NULL AUTO_INCREMENT COMMENT 'ID',
+    `kind` VARCHAR(20) NOT NULL COMMENT '质心类型：category/tag',
+    `key` VARCHAR(255) NOT NULL COMMENT '分类ID或标签名',
+    `dim` INT NOT NULL COMMENT '向量维度',
+    `vector_sum` MEDIUMBLOB NOT NULL COMMENT 'float32 向量和',
+    `doc_count` INT NOT NULL DEFAULT 0 COMMENT '计入的文档数',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    `is_deleted` BOOLEAN DEFAULT FALSE COMMENT '是否删除',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uk_rec_centroid_kind_key` (`kind`, `key`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='分类/标签质心表（分类/标签推荐）';
@@ -0,0 +1,10 @@
+﻿-- Migration: 知识库向量索引配置档
+-- 文件：migrations/2025020303_kb_vector_profile.sql
+-- 创建日期：2025-02-03
+-- 知识库创建时选择 kNN 索引配置档（引擎 / HNSW 参数 / fp16、字节量化 / 磁盘模式），见 app/services/vector_index_profiles.py；
+-- 存量知识库为 NULL，按 default 配置档（现有索引）处理，无需回填
+
+USE `spx_knowledge`;
+
+ALTER TABLE `knowledge_bases`
+    ADD COLUMN `vector_profile` VARCHAR(32) NULL COMMENT '向量索引配置档（创建时选择，空为 default）' AFTER `enable_auto_tagging`;
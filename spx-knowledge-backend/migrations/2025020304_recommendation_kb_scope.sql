@@ -0,0 +1,20 @@
+﻿-- Migration: 分类/标签推荐质心按知识库隔离
+-- 文件：migrations/2025020304_recommendation_kb_scope.sql
+-- 创建日期：2025-02-03
+-- 质心与标签词表只统计文档所在知识库，避免跨知识库泄露标签与内容特征。
+-- 原全局质心无法拆分到各知识库，迁移时清空文档向量与质心，执行后重新回填：
+--   python scripts/backfill_document_embeddings.py
+
+USE `spx_knowledge`;
+
+DELETE FROM `recommendation_centroids`;
+DELETE FROM `document_embeddings`;
+
+ALTER TABLE `document_embeddings`
+    ADD COLUMN `counted_knowledge_base_id` INT NULL COMMENT '已计入质心的知识库ID' AFTER `vector`;
+
+ALTER TABLE `recommendation_centroids`
+    ADD COLUMN `knowledge_base_id` INT NOT NULL COMMENT '知识库ID' AFTER `id`,
+    DROP INDEX `uk_rec_centroid_kind_key`,
+    ADD UNIQUE KEY `uk_rec_centroid_kb_kind_key` (`knowledge_base_id`, `kind`, `key`),
+    ADD CONSTRAINT `fk_rec_centroid_kb` FOREIGN KEY (`knowledge_base_id`) REFERENCES `knowledge_bases` (`id`) ON DELETE CASCADE;
@@ -0,0 +1,98 @@
+"""
+回填文档索引的结构化元数据（meta.* 字段：页码、分块序号、表格组、章节路径）
+用法：
+  python scripts/backfill_chunk_metadata.py
+  python scripts/backfill_chunk_metadata.py --all --batch-size 1000
+先为存量索引补充 meta 映射，再扫描缺少 meta 的分块（含各向量配置档索引），合并索引中的 metadata JSON 与数据库
+document_chunks.metadata 计算 meta 后按批局部更新回分块所在索引（不重新向量化）。完成后设置 OPENSEARCH_STRUCTURED_METADATA=true 启用服务端过滤。
+"""
+
+import argparse
+import json
+from typing import Any, Dict, List
+
+from opensearchpy.helpers import scan
+
+from app.config.database import SessionLocal
+from app.core.logging import logger
+from app.models.chunk import DocumentChunk
+from app.services.opensearch_service import CHUNK_META_PROPERTIES, OpenSearchService, structured_chunk_meta
+
+
+def _parse(meta: Any) -> Dict[str, Any]:
+    if isinstance(meta, str):
+        try:
+            meta = json.loads(meta)
+        except (json.JSONDecodeError, TypeError):
+            return {}
+    return meta if isinstance(meta, dict) else {}
+
+
+def _load_db_meta(chunk_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """一次查询读取一批分块的数据库元数据与 chunk_index"""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(DocumentChunk.id, DocumentChunk.chunk_index, DocumentChunk.meta)
+            .filter(DocumentChunk.id.in_(chunk_ids))
+            .all()
+        )
+        return {row.id: {"chunk_index": row.chunk_index, **_parse(row.meta)} for row in rows}
+    finally:
+        db.close()
+
+
+def _flush(osvc: OpenSearchService, batch: List[Dict[str, Any]], use_db: bool) -> int:
+    db_meta = _load_db_meta([item["chunk_id"] for item in batch]) if use_db else {}
+    updates: Dict[str, List[Dict[str, Any]]] = {}
+    for item in batch:
+        # 索引中的 metadata 优先（写入时的页码等），数据库补充表格组、章节路径
+        merged = {**db_meta.get(item["chunk_id"], {}), **item["metadata"]}
+        meta = {**dict.fromkeys(CHUNK_META_PROPERTIES), **structured_chunk_meta(merged)}
+        updates.setdefault(item["index"], []).append({"chunk_id": item["chunk_id"], "meta": meta})
+    return sum(
+        len(osvc.bulk_update_document_chunks_sync(docs, refresh=False, index=index))
+        for index, docs in updates.items()
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--all", action="store_true", help="重新计算全部分块（默认只处理缺少 meta 的分块）")
+    ap.add_argument("--batch-size", type=int, default=500)
+    ap.add_argument("--no-db", action="store_true", help="只使用索引中的 metadata，不查询数据库")
+    args = ap.parse_args()
+
+    osvc = OpenSearchService()
+    osvc.ensure_chunk_meta_mapping()
+
+    query: Dict[str, Any] = {"match_all": {}}
+    if not args.all:
+        query = {"bool": {"must_not": [{"exists": {"field": "meta"}}]}}
+
+    scanned = updated = 0
+    batch: List[Dict[str, Any]] = []
+    for hit in scan(
+        osvc.client,
+        index=osvc.document_search_index,
+        query={"query": query, "_source": ["chunk_id", "metadata"]},
+        size=args.batch_size,
+    ):
+        src = hit.get("_source") or {}
+        if src.get("chunk_id") is None:
+            continue
+        batch.append({"chunk_id": int(src["chunk_id"]), "metadata": _parse(src.get("metadata")), "index": hit["_index"]})
+        scanned += 1
+        if len(batch) >= args.batch_size:
+            updated += _flush(osvc, batch, not args.no_db)
+            batch = []
+            logger.info(f"[meta 回填] 已扫描 {scanned}，已更新 {updated}")
+    if batch:
+        updated += _flush(osvc, batch, not args.no_db)
+
+    osvc.client.indices.refresh(index=osvc.document_search_index)
+    logger.info(f"[meta 回填] 完成：扫描 {scanned}，更新 {updated}")
+
+
+if __name__ == "__main__":
+    main()
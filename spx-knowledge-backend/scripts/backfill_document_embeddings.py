@@ -0,0 +1,68 @@
+"""
+回填分类 / 标签推荐的文档向量与质心（document_embeddings / recommendation_centroids）
+用法：
+  python scripts/backfill_document_embeddings.py
+  python scripts/backfill_document_embeddings.py --reset        # 清空后全部重建（更换向量模型后使用）
+读取文档索引中已有的分块 content_vector 求均值，不重新向量化；默认只处理尚无文档向量的已完成文档。
+"""
+
+import argparse
+
+from app.config.database import SessionLocal
+from app.core.constants import DOC_STATUS_COMPLETED
+from app.core.logging import logger
+from app.models.document import Document
+from app.models.recommendation import DocumentEmbedding, RecommendationCentroid
+from app.services.document_recommendation_service import DocumentRecommendationService
+from app.services.opensearch_service import OpenSearchService
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reset", action="store_true", help="清空全部文档向量与质心后重建")
+    ap.add_argument("--max-chunks", type=int, default=1000, help="每个文档最多读取的分块向量数")
+    args = ap.parse_args()
+
+    db = SessionLocal()
+    osvc = OpenSearchService()
+    try:
+        if args.reset:
+            db.query(RecommendationCentroid).delete(synchronize_session=False)
+            db.query(DocumentEmbedding).delete(synchronize_session=False)
+            db.commit()
+            logger.info("[推荐] 已清空文档向量与质心")
+
+        doc_ids = [
+            doc_id
+            for (doc_id,) in db.query(Document.id)
+            .outerjoin(DocumentEmbedding, DocumentEmbedding.document_id == Document.id)
+            .filter(
+                Document.is_deleted == False,  # noqa: E712
+                Document.status == DOC_STATUS_COMPLETED,
+                DocumentEmbedding.id.is_(None),
+            )
+            .order_by(Document.id)
+            .all()
+        ]
+        service = DocumentRecommendationService(db)
+        done = skipped = 0
+        for doc_id in doc_ids:
+            document = db.query(Document).filter(Document.id == doc_id).first()
+            try:
+                sources = osvc.get_document_chunk_sources_sync(doc_id, ["content_vector"], size=args.max_chunks)
+                vectors = (src["content_vector"] for src in sources if src.get("content_vector"))
+                if service.record_document_vectors(document, vectors):
+                    done += 1
+                else:
+                    skipped += 1
+            except Exception as e:
+                db.rollback()
+                skipped += 1
+                logger.warning(f"[推荐] 回填文档 {doc_id} 失败: {e}")
+        logger.info(f"[推荐] 回填完成：写入 {done}，跳过 {skipped}（共 {len(doc_ids)} 个文档）")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+通配符 / 正则查询基准：对比直接查询分词后的 content 与规划后的查询（子字段 / 改写 / 拒绝）的延迟
+用法：
+  python scripts/benchmark_pattern_search.py --corpus ./bench_corpus --patterns patterns.txt --subfield ngram
+  python scripts/benchmark_pattern_search.py --patterns patterns.txt          # 直接使用当前文档索引
+--corpus 为 jsonl（每行 {"content": "..."}）或包含 .txt / .md 文件的目录，会写入临时索引 <DOCUMENT_INDEX_NAME>_pattern_bench
+--patterns 每行一个模式，"regex<TAB>模式" 表示正则，其余按通配符处理
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from opensearchpy.helpers import bulk as os_bulk
+
+from app.config.settings import settings
+from app.core.exceptions import CustomException
+from app.services.opensearch_service import OpenSearchService
+from app.services.pattern_query_planner import plan_pattern_query
+
+_CHUNK_CHARS = 800
+
+
+def _iter_corpus(path: str) -> Iterator[str]:
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                if not name.endswith((".txt", ".md")):
+                    continue
+                with open(os.path.join(root, name), "r", encoding="utf-8", errors="ignore") as f:
+                    text = f.read()
+                for i in range(0, len(text), _CHUNK_CHARS):
+                    if text[i:i + _CHUNK_CHARS].strip():
+                        yield text[i:i + _CHUNK_CHARS]
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line).get("content") or ""
+
+
+def _build_bench_index(osvc: OpenSearchService, corpus: str) -> str:
+    index = f"{settings.DOCUMENT_INDEX_NAME}_pattern_bench"
+    osvc.client.indices.delete(index=index, ignore=[400, 404])
+    osvc.client.indices.create(index=index, body={
+        "settings": {"number_of_shards": 1, "number_of_replicas": 0, "analysis": osvc._content_analysis()},
+        "mappings": {"properties": {"chunk_id": {"type": "integer"}, "content": osvc._content_mapping()}},
+    })
+    actions = (
+        {"_index": index, "_id": i, "_source": {"chunk_id": i, "content": text}}
+        for i, text in enumerate(_iter_corpus(corpus))
+    )
+    count, _ = os_bulk(osvc.client, actions, chunk_size=500, request_timeout=300)
+    osvc.client.indices.refresh(index=index)
+    osvc.client.indices.forcemerge(index=index, max_num_segments=1, request_timeout=600)
+    print(f"基准索引 {index}: {count} 个分块")
+    return index
+
+
+def _load_patterns(path: str) -> List[Tuple[str, str]]:
+    patterns = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            kind, sep, pattern = line.partition("\t")
+            patterns.append((kind.strip(), pattern) if sep and kind.strip() in ("wildcard", "regex") else ("wildcard", line))
+    return patterns
+
+
+def _baseline_clause(kind: str, pattern: str) -> Dict[str, Any]:
+    if kind == "regex":
+        return {"regexp": {"content": {"value": pattern.strip("/"), "flags": "ALL"}}}
+    return {"wildcard": {"content": {"value": pattern}}}
+
+
+def _run(osvc: OpenSearchService, index: str, clause: Dict[str, Any], size: int, repeat: int,
+         verifier=None, limit: int = 10) -> Dict[str, Any]:
+    took, wall, hits = [], [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = osvc.client.search(
+            index=index,
+            body={"query": clause, "size": size, "_source": ["content"], "track_total_hits": True, "timeout": "60s"},
+            params={"request_cache": "false"},
+            request_timeout=120,
+        )
+        found = response["hits"]["hits"]
+        if verifier is not None:
+            found = [h for h in found if verifier.search(h["_source"].get("content") or "")][:limit]
+        wall.append((time.perf_counter() - start) * 1000)
+        took.append(response.get("took", 0))
+        hits = len(found) if verifier is not None else response["hits"]["total"]["value"]
+    return {
+        "took_p50": statistics.median(took),
+        "took_max": max(took),
+        "wall_p50": statistics.median(wall),
+        "hits": hits,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--patterns", required=True, help="模式文件")
+    ap.add_argument("--corpus", default=None, help="基准语料（jsonl 或目录）；不提供时使用当前文档索引")
+    ap.add_argument("--subfield", choices=["off", "wildcard", "ngram"], default=None,
+                    help="规划使用的子字段（默认取 CONTENT_PATTERN_SUBFIELD）")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--limit", type=int, default=10)
+    ap.add_argument("--skip-baseline", action="store_true", help="不运行直接查询 content 的基线")
+    ap.add_argument("--keep-index", action="store_true", help="保留基准索引")
+    args = ap.parse_args()
+
+    if args.subfield:
+        settings.CONTENT_PATTERN_SUBFIELD = args.subfield
+    osvc = OpenSearchService()
+    index = _build_bench_index(osvc, args.corpus) if args.corpus else osvc.document_index
+    factor = max(1, settings.PATTERN_NGRAM_CANDIDATE_FACTOR)
+
+    try:
+        print(f"{'kind':<9}{'pattern':<32}{'route':<18}{'took p50/max ms':>18}{'wall p50 ms':>13}{'hits':>8}")
+        for kind, pattern in _load_patterns(args.patterns):
+            rows: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+            if not args.skip_baseline:
+                try:
+                    rows.append(("baseline:content", _run(osvc, index, _baseline_clause(kind, pattern), args.limit, args.repeat)))
+                except Exception as e:
+                    rows.append((f"baseline 失败: {type(e).__name__}", None))
+            try:
+                plan = plan_pattern_query(kind, pattern)
+                size = args.limit * factor if plan.verifier is not None else args.limit
+                rows.append((f"plan:{plan.field}", _run(osvc, index, plan.clause, size, args.repeat, plan.verifier, args.limit)))
+            except CustomException as e:
+                rows.append((f"拒绝: {e.message}", None))
+            for route, stats in rows:
+                if stats is None:
+                    print(f"{kind:<9}{pattern[:30]:<32}{route}")
+                    continue
+                print(
+                    f"{kind:<9}{pattern[:30]:<32}{route:<18}"
+                    f"{stats['took_p50']:>10.1f}/{stats['took_max']:<7.1f}{stats['wall_p50']:>13.1f}{stats['hits']:>8}"
+                )
+    finally:
+        if args.corpus and not args.keep_index:
+            osvc.client.indices.delete(index=index, ignore=[400, 404])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+向量索引配置档基准：按配置档（引擎 / HNSW 参数 / fp16、字节量化 / 磁盘模式）建临时索引，对比召回率、延迟与内存占用
+用法：
+  docker run -d -p 9200:9200 -e discovery.type=single-node -e DISABLE_SECURITY_PLUGIN=true opensearchproject/opensearch:2.19.0
+  python scripts/benchmark_vector_profiles.py --url http://localhost:9200 --num 20000
+  python scripts/benchmark_vector_profiles.py --vectors vectors.jsonl --profiles default,faiss_fp16,lucene_sq
+  python scripts/benchmark_vector_profiles.py --from-index --num 50000      # 使用当前文档索引中已有的 content_vector
+向量来源：--vectors 为 jsonl（每行 {"vector": [...]}）；--from-index 扫描现有分块向量；都不提供时生成随机单位向量
+末尾 --queries 条向量作为查询（不写入索引），召回率以 numpy 精确余弦 top-k 为基准
+临时索引为 <DOCUMENT_INDEX_NAME>_vecbench_<配置档>；创建失败（如 OpenSearch 版本不支持该引擎 / 量化）的配置档跳过
+docker/ 下的 compose 文件为 OpenSearch 2.11，只能测试 default；其余配置档需 2.16+ / 2.19+（见 vector_index_profiles）
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+from opensearchpy import OpenSearch
+from opensearchpy.helpers import bulk as os_bulk
+from opensearchpy.helpers import scan
+
+from app.config.settings import settings
+from app.services.vector_index_profiles import (
+    available_profiles,
+    knn_index_settings,
+    knn_vector_mapping,
+    search_target,
+)
+
+
+def _load_jsonl(path: str, limit: int) -> Iterator[List[float]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if i >= limit:
+                return
+            if line.strip():
+                yield json.loads(line)["vector"]
+
+
+def _load_from_index(client: OpenSearch, limit: int) -> Iterator[List[float]]:
+    hits = scan(
+        client,
+        index=search_target(settings.DOCUMENT_INDEX_NAME),
+        query={"query": {"exists": {"field": "content_vector"}}, "_source": ["content_vector"]},
+        size=500,
+    )
+    for i, hit in enumerate(hits):
+        if i >= limit:
+            return
+        yield hit["_source"]["content_vector"]
+
+
+def _load_vectors(client: OpenSearch, args: argparse.Namespace) -> np.ndarray:
+    total = args.num + args.queries
+    if args.vectors:
+        data = np.asarray(list(_load_jsonl(args.vectors, total)), dtype=np.float32)
+    elif args.from_index:
+        data = np.asarray(list(_load_from_index(client, total)), dtype=np.float32)
+    else:
+        rng = np.random.default_rng(args.seed)
+        data = rng.standard_normal((total, args.dim)).astype(np.float32)
+    if len(data) <= args.queries:
+        raise SystemExit(f"向量数量不足: {len(data)}（需多于 --queries={args.queries}）")
+    norms = np.linalg.norm(data, axis=1, keepdims=True)
+    return data / np.maximum(norms, 1e-12)
+
+
+def _ground_truth(corpus: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    """精确余弦 top-k（向量已归一化，点积即余弦）"""
+    truth = []
+    for start in range(0, len(queries), 256):
+        scores = queries[start:start + 256] @ corpus.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        truth.extend(set(row.tolist()) for row in top)
+    return truth
+
+
+def _build_index(client: OpenSearch, index: str, profile: Dict[str, Any], corpus: np.ndarray) -> float:
+    client.indices.delete(index=index, ignore=[400, 404])
+    client.indices.create(index=index, body={
+        "settings": {"number_of_shards": 1, "number_of_replicas": 0, "index.knn": True, **knn_index_settings(profile)},
+        "mappings": {"properties": {"vector": knn_vector_mapping(profile, corpus.shape[1])}},
+    })
+    start = time.perf_counter()
+    actions = ({"_index": index, "_id": str(i), "_source": {"vector": vec.tolist()}} for i, vec in enumerate(corpus))
+    os_bulk(client, actions, chunk_size=500, request_timeout=600)
+    client.indices.refresh(index=index)
+    client.indices.forcemerge(index=index, max_num_segments=1, request_timeout=1800)
+    elapsed = time.perf_counter() - start
+    try:
+        # 预热：把 native 引擎的图加载进内存，避免首批查询计入加载时间
+        client.transport.perform_request("GET", f"/_plugins/_knn/warmup/{index}")
+    except Exception:
+        pass
+    return elapsed
+
+
+def _run_queries(client: OpenSearch, index: str, queries: np.ndarray, k: int) -> Dict[str, Any]:
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        response = client.search(
+            index=index,
+            body={"size": k, "_source": False, "query": {"knn": {"vector": {"vector": query.tolist(), "k": k}}}},
+            params={"request_cache": "false"},
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({int(hit["_id"]) for hit in response["hits"]["hits"]})
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        "results": results,
+    }
+
+
+def _graph_memory_kb(client: OpenSearch, index: str) -> Optional[float]:
+    """native 引擎（nmslib / faiss）图内存；lucene 引擎在 JVM 堆 / 页缓存中，不在 kNN 统计内"""
+    try:
+        stats = client.transport.perform_request("GET", "/_plugins/_knn/stats")
+    except Exception:
+        return None
+    total, found = 0.0, False
+    for node in (stats.get("nodes") or {}).values():
+        cached = (node.get("indices_in_cache") or {}).get(index)
+        if cached:
+            total += float(cached.get("graph_memory_usage") or 0)
+            found = True
+    return total if found else None
+
+
+def _store_bytes(client: OpenSearch, index: str) -> int:
+    stats = client.indices.stats(index=index, metric="store")
+    return int(stats["indices"][index]["primaries"]["store"]["size_in_bytes"])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default=None, help="OpenSearch 地址（默认 OPENSEARCH_URL）")
+    ap.add_argument("--profiles", default=None, help="逗号分隔的配置档（默认全部）")
+    ap.add_argument("--vectors", default=None, help="向量 jsonl（每行 {\"vector\": [...]}）")
+    ap.add_argument("--from-index", action="store_true", help="从当前文档索引读取已有 content_vector")
+    ap.add_argument("--num", type=int, default=10000, help="写入索引的向量数")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--dim", type=int, default=settings.TEXT_EMBEDDING_DIMENSION, help="随机向量维度")
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--keep-index", action="store_true", help="保留基准索引")
+    args = ap.parse_args()
+
+    client = OpenSearch(
+        hosts=[args.url or settings.OPENSEARCH_URL],
+        use_ssl=settings.OPENSEARCH_USE_SSL,
+        verify_certs=settings.OPENSEARCH_VERIFY_CERTS,
+        timeout=120,
+    )
+    profiles = available_profiles()
+    names = [name.strip() for name in args.profiles.split(",")] if args.profiles else sorted(profiles)
+    unknown = [name for name in names if name not in profiles]
+    if unknown:
+        ap.error(f"未知配置档: {', '.join(unknown)}，可选: {', '.join(sorted(profiles))}")
+
+    data = _load_vectors(client, args)
+    corpus, queries = data[:-args.queries], data[-args.queries:]
+    truth = _ground_truth(corpus, queries, args.k)
+    print(f"向量 {len(corpus)} 条，维度 {corpus.shape[1]}，查询 {len(queries)} 条，k={args.k}")
+    print(f"{'profile':<14}{'engine':<8}{'recall@k':>9}{'p50 ms':>9}{'p95 ms':>9}{'graph MB':>10}{'store MB':>10}{'build s':>9}")
+
+    created: List[str] = []
+    try:
+        for name in names:
+            profile = profiles[name]
+            index = f"{settings.DOCUMENT_INDEX_NAME}_vecbench_{name}"
+            try:
+                build_seconds = _build_index(client, index, profile, corpus)
+            except Exception as e:
+                print(f"{name:<14}跳过（索引创建 / 写入失败）: {e}")
+                client.indices.delete(index=index, ignore=[400, 404])
+                continue
+            created.append(index)
+            run = _run_queries(client, index, queries, args.k)
+            recall = statistics.mean(len(got & want) / args.k for got, want in zip(run["results"], truth))
+            graph_kb = _graph_memory_kb(client, index)
+            graph = f"{graph_kb / 1024:.1f}" if graph_kb is not None else "-"
+            print(
+                f"{name:<14}{profile.get('engine') or 'nmslib':<8}{recall:>9.3f}{run['p50']:>9.1f}{run['p95']:>9.1f}"
+                f"{graph:>10}{_store_bytes(client, index) / 1024 / 1024:>10.1f}{build_seconds:>9.1f}"
+            )
+    finally:
+        if not args.keep_index:
+            for index in created:
+                client.indices.delete(index=index, ignore=[400, 404])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+为文档索引补充通配符 / 正则查询子字段（content.wildcard 或 content.ngram），并回填存量文档
+用法：
+  python scripts/enable_pattern_subfield.py --subfield ngram --populate
+  python scripts/enable_pattern_subfield.py --subfield wildcard --populate --wait
+ngram 需要旧索引补充分析器时会短暂关闭 / 打开索引。回填完成后设置 CONTENT_PATTERN_SUBFIELD 为对应值。
+"""
+
+import argparse
+
+from app.config.settings import settings
+from app.core.logging import logger
+from app.services.opensearch_service import OpenSearchService
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--subfield", choices=["wildcard", "ngram"], default=None,
+                    help="子字段类型（默认取 CONTENT_PATTERN_SUBFIELD）")
+    ap.add_argument("--populate", action="store_true", help="update_by_query 重新索引存量文档以写入子字段")
+    ap.add_argument("--wait", action="store_true", help="等待回填完成（默认后台任务，输出任务 ID）")
+    args = ap.parse_args()
+
+    subfield = args.subfield or (settings.CONTENT_PATTERN_SUBFIELD or "").lower()
+    if subfield not in ("wildcard", "ngram"):
+        ap.error("请通过 --subfield 或 CONTENT_PATTERN_SUBFIELD 指定 wildcard / ngram")
+
+    osvc = OpenSearchService()
+    added = osvc.ensure_content_pattern_subfield(subfield)
+    logger.info(f"content.{subfield} 子字段{'已新增' if added else '已存在'}")
+
+    if args.populate:
+        response = osvc.client.update_by_query(
+            index=osvc.document_index,
+            body={"query": {"match_all": {}}},
+            params={
+                "conflicts": "proceed",
+                "slices": "auto",
+                "refresh": "true",
+                "wait_for_completion": "true" if args.wait else "false",
+            },
+            request_timeout=3600 if args.wait else 60,
+        )
+        if args.wait:
+            logger.info(f"回填完成: updated={response.get('updated')} failures={len(response.get('failures') or [])}")
+        else:
+            logger.info(f"回填任务已提交: task={response.get('task')}（GET _tasks/<task> 查看进度）")
+
+
+if __name__ == "__main__":
+    main()
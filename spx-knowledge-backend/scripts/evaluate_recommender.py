@@ -0,0 +1,81 @@
+"""
+分类 / 标签推荐离线评估：按留出集计算分类 top-1 / top-k 准确率与标签 precision / recall
+用法：
+  python scripts/evaluate_recommender.py --fixtures scripts/fixtures/recommender_eval.jsonl
+  python scripts/evaluate_recommender.py --from-db --holdout 0.2 --seed 7
+--fixtures 为 jsonl（每行 {"text": "...", "category": "...", "tags": [...]}），用当前向量模型生成文档向量
+--from-db 使用 document_embeddings 中已有的文档向量与已计入的分类 / 标签
+"""
+
+import argparse
+import json
+import random
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.config.database import SessionLocal
+from app.models.recommendation import DocumentEmbedding
+from app.services.document_recommendation_service import (
+    decode_vector,
+    evaluate_holdout,
+    mean_embedding,
+    normalize_tags,
+)
+from app.services.vector_service import VectorService
+
+Sample = Tuple[np.ndarray, Optional[str], List[str]]
+
+
+def _load_fixtures(db, path: str) -> List[Sample]:
+    vectors = VectorService(db)
+    samples: List[Sample] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            vector = mean_embedding([vectors.generate_embedding(item["text"])])
+            if vector is None:
+                raise SystemExit("向量模型不可用，无法生成评估向量")
+            category = item.get("category")
+            samples.append((vector, str(category) if category is not None else None, normalize_tags(item.get("tags"))))
+    return samples
+
+
+def _load_from_db(db) -> List[Sample]:
+    samples: List[Sample] = []
+    for row in db.query(DocumentEmbedding).yield_per(500):
+        category = str(row.counted_category_id) if row.counted_category_id is not None else None
+        samples.append((decode_vector(row.vector, row.dim), category, normalize_tags(row.counted_tags)))
+    return samples
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    source = ap.add_mutually_exclusive_group(required=True)
+    source.add_argument("--fixtures", help="评估样本 jsonl")
+    source.add_argument("--from-db", action="store_true", help="使用已入库的文档向量")
+    ap.add_argument("--holdout", type=float, default=0.2, help="留出集比例")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--top-k", type=int, default=3)
+    ap.add_argument("--max-tags", type=int, default=5)
+    args = ap.parse_args()
+
+    db = SessionLocal()
+    try:
+        samples = _load_from_db(db) if args.from_db else _load_fixtures(db, args.fixtures)
+    finally:
+        db.close()
+    if len(samples) < 2:
+        raise SystemExit(f"样本不足：{len(samples)}")
+
+    random.Random(args.seed).shuffle(samples)
+    n_test = min(len(samples) - 1, max(1, int(len(samples) * args.holdout)))
+    metrics = evaluate_holdout(samples[n_test:], samples[:n_test], top_k=args.top_k, max_tags=args.max_tags)
+    for name, value in metrics.items():
+        print(f"{name:<22}{value if value is None or isinstance(value, int) else f'{value:.3f}'}")
+
+
+if __name__ == "__main__":
+    main()
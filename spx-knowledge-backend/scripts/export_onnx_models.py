@@ -0,0 +1,162 @@
+"""
+导出 Rerank / CLIP 模型为 ONNX（可选 int8 动态量化），并校验与 PyTorch 推理结果的一致性
+用法：
+  python scripts/export_onnx_models.py --rerank --clip --check
+  python scripts/export_onnx_models.py --rerank --check-only --samples samples.jsonl
+产物写入 ONNX_MODELS_DIR（rerank/、clip/ 子目录）；校验通过后设置 RERANK_BACKEND=onnx / CLIP_BACKEND=onnx 启用。
+--samples 为 jsonl，每行 {"query": "...", "passage": "..."}；未提供时使用内置样例。
+校验不通过时以非 0 退出码结束。
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import List, Tuple
+
+import numpy as np
+
+from app.config.settings import settings
+from app.core.logging import logger
+from app.services import onnx_backend
+
+_DEFAULT_PAIRS: List[Tuple[str, str]] = [
+    ("如何申请年假", "员工每年享有带薪年假，需提前三个工作日在系统中提交申请并经主管审批。"),
+    ("如何申请年假", "报销单据需在费用发生后三十天内提交，逾期不予受理。"),
+    ("如何申请年假", "年假未休完的部分可顺延至次年第一季度，逾期作废。"),
+    ("服务器 CPU 使用率过高怎么排查", "使用 top 或 pidstat 查看占用最高的进程，再结合 perf 分析热点函数。"),
+    ("服务器 CPU 使用率过高怎么排查", "数据库连接池满时会出现请求排队，需要检查慢查询。"),
+    ("What is the refund policy?", "Refunds are issued within 14 days of purchase if the product is unused."),
+    ("What is the refund policy?", "Our office is open Monday through Friday from 9am to 6pm."),
+    ("What is the refund policy?", "Shipping is free for orders above 50 dollars."),
+]
+
+
+def _rerank_source(explicit: str = None) -> str:
+    """导出源：命令行指定 > RERANK_MODEL_PATH 中的本地模型 > RERANK_MODEL_NAME"""
+    if explicit:
+        return explicit
+    path = settings.RERANK_MODEL_PATH
+    if path and os.path.isdir(path):
+        candidates = [path] + [os.path.join(path, d) for d in sorted(os.listdir(path))]
+        for candidate in candidates:
+            if os.path.exists(os.path.join(candidate, "config.json")):
+                return candidate
+    return settings.RERANK_MODEL_NAME
+
+
+def _load_pairs(samples: str = None) -> List[Tuple[str, str]]:
+    if not samples:
+        return list(_DEFAULT_PAIRS)
+    pairs = []
+    with open(samples, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                pairs.append((item["query"], item["passage"]))
+    return pairs
+
+
+def check_rerank(source: str, pairs: List[Tuple[str, str]], max_diff: float, min_spearman: float) -> bool:
+    from FlagEmbedding import FlagReranker
+
+    reference = FlagReranker(source, use_fp16=False).compute_score([list(p) for p in pairs], normalize=True)
+    reference = [float(x) for x in np.asarray(reference).reshape(-1)]
+    passed = True
+    for quantized in (False, True):
+        try:
+            model = onnx_backend.OnnxReranker(quantized=quantized)
+        except FileNotFoundError as e:
+            logger.warning(f"跳过校验: {e}")
+            continue
+        if quantized and not model.model_path.endswith(onnx_backend.INT8_SUFFIX):
+            continue
+        parity = onnx_backend.score_parity(reference, model.compute_score([list(p) for p in pairs], normalize=True))
+        ok = parity["max_abs_diff"] <= max_diff and parity["spearman"] >= min_spearman
+        passed = passed and ok
+        logger.info(f"[Rerank 校验] {os.path.basename(model.model_path)}: {parity} -> {'通过' if ok else '未通过'}")
+    return passed
+
+
+def _load_torch_clip():
+    settings.CLIP_BACKEND = "torch"
+    from app.services.image_vectorization_service import ImageVectorizationService
+
+    service = ImageVectorizationService()
+    return service.models["clip"], service.transforms["clip"]
+
+
+def check_clip(model, preprocess, pairs: List[Tuple[str, str]], images: List[str], min_cosine: float) -> bool:
+    import open_clip
+    import torch
+    from PIL import Image
+
+    texts = sorted({t for pair in pairs for t in pair})
+    tokens = open_clip.tokenize(texts)
+    if images:
+        batch = torch.stack([preprocess(Image.open(p).convert("RGB")) for p in images])
+    else:
+        size = getattr(model.visual, "image_size", 224)
+        size = size[0] if isinstance(size, (list, tuple)) else size
+        batch = torch.randn(4, 3, size, size, generator=torch.Generator().manual_seed(0))
+    with torch.no_grad():
+        ref_text = model.encode_text(tokens).numpy()
+        ref_image = model.encode_image(batch).numpy()
+
+    passed = True
+    for quantized in (False, True):
+        try:
+            encoder = onnx_backend.OnnxClipEncoder(quantized=quantized)
+        except FileNotFoundError as e:
+            logger.warning(f"跳过校验: {e}")
+            continue
+        if quantized and not encoder.text_path.endswith(onnx_backend.INT8_SUFFIX):
+            continue
+        for name, reference, candidate in (
+            ("text", ref_text, encoder.encode_text(tokens.numpy())),
+            ("image", ref_image, encoder.encode_image(batch.numpy())),
+        ):
+            parity = onnx_backend.embedding_parity(reference, candidate)
+            ok = parity["min_cosine"] >= min_cosine
+            passed = passed and ok
+            label = "int8" if quantized else "fp32"
+            logger.info(f"[CLIP 校验] {name}/{label}: {parity} -> {'通过' if ok else '未通过'}")
+    return passed
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rerank", action="store_true", help="处理 Rerank 模型")
+    ap.add_argument("--clip", action="store_true", help="处理 CLIP 模型")
+    ap.add_argument("--rerank-source", default=None, help="Rerank 模型目录或 HuggingFace 名称")
+    ap.add_argument("--no-quantize", action="store_true", help="只导出 fp32 模型")
+    ap.add_argument("--check", action="store_true", help="导出后校验一致性")
+    ap.add_argument("--check-only", action="store_true", help="只校验已导出的模型")
+    ap.add_argument("--samples", default=None, help="校验样例 jsonl（query / passage）")
+    ap.add_argument("--images", nargs="*", default=[], help="CLIP 校验图片（默认使用随机输入）")
+    ap.add_argument("--max-score-diff", type=float, default=0.05)
+    ap.add_argument("--min-spearman", type=float, default=0.95)
+    ap.add_argument("--min-cosine", type=float, default=0.98)
+    args = ap.parse_args()
+    if not (args.rerank or args.clip):
+        ap.error("请至少指定 --rerank 或 --clip")
+
+    pairs = _load_pairs(args.samples)
+    passed = True
+    if args.rerank:
+        source = _rerank_source(args.rerank_source)
+        if not args.check_only:
+            onnx_backend.export_reranker(source, quantize=not args.no_quantize)
+        if args.check or args.check_only:
+            passed = check_rerank(source, pairs, args.max_score_diff, args.min_spearman) and passed
+    if args.clip:
+        model, preprocess = _load_torch_clip()
+        if not args.check_only:
+            onnx_backend.export_clip(model, settings.CLIP_MODEL_NAME, quantize=not args.no_quantize)
+        if args.check or args.check_only:
+            passed = check_clip(model, preprocess, pairs, args.images, args.min_cosine) and passed
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,29 @@
+"""
+重算知识库聚合统计（knowledge_base_stats），用于建表后回填存量数据或手动修正漂移
+用法：
+  python scripts/reconcile_kb_stats.py
+  python scripts/reconcile_kb_stats.py --kb-id 1 --kb-id 2
+"""
+
+import argparse
+
+from app.config.database import SessionLocal
+from app.core.logging import logger
+from app.services.kb_stats_service import KnowledgeBaseStatsService
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--kb-id", type=int, action="append", default=None, help="只对账指定知识库（可重复）")
+    args = ap.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = KnowledgeBaseStatsService(db).reconcile(args.kb_id)
+        logger.info(f"[知识库统计] 对账完成：检查 {result['checked']}，修正 {result['corrected']}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
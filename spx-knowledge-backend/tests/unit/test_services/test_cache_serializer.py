@@ -0,0 +1,64 @@
+"""
+Test Cache Serializer
+"""
+
+import json
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import CacheSerializer
+
+VALUE = {"query": "检索", "ids": [1, 2, 3], "score": 0.5, "nested": {"ok": True, "none": None}}
+LARGE_VALUE = {"chunks": ["重复的分块内容" * 20 for _ in range(20)]}
+
+
+@pytest.mark.parametrize("value", [VALUE, LARGE_VALUE, [], "text", 0])
+def test_json_round_trip(value):
+    """json 编码往返；超过阈值的值压缩（编码字节大写）"""
+    serializer = CacheSerializer("json", compress_min_bytes=1024)
+    raw = serializer.dumps(value)
+    assert raw[:2] == (b"\x1eJ" if value is LARGE_VALUE else b"\x1ej")
+    assert serializer.loads(raw) == value
+
+
+def test_compression_shrinks_large_values():
+    plain = CacheSerializer("json", compress_min_bytes=0).dumps(LARGE_VALUE)
+    compressed = CacheSerializer("json", compress_min_bytes=1024).dumps(LARGE_VALUE)
+    assert len(compressed) < len(plain)
+
+
+def test_json_without_orjson(monkeypatch):
+    """未安装 orjson 时退回标准库 json，且能读取 orjson 写入的值"""
+    written = CacheSerializer("json", compress_min_bytes=0).dumps(VALUE)
+    monkeypatch.setattr(cache_module, "orjson", None)
+    serializer = CacheSerializer("json", compress_min_bytes=0)
+    assert serializer.loads(written) == VALUE
+    assert serializer.loads(serializer.dumps(VALUE)) == VALUE
+
+
+def test_msgpack_round_trip():
+    pytest.importorskip("msgpack")
+    serializer = CacheSerializer("msgpack", compress_min_bytes=1024)
+    assert serializer.dumps(VALUE)[:2] == b"\x1em"
+    assert serializer.loads(serializer.dumps(VALUE)) == VALUE
+    assert serializer.loads(serializer.dumps(LARGE_VALUE)) == LARGE_VALUE
+    # 切换编码后仍能读取已有缓存
+    assert CacheSerializer("json").loads(serializer.dumps(VALUE)) == VALUE
+
+
+def test_msgpack_missing_falls_back_to_json(monkeypatch):
+    monkeypatch.setattr(cache_module, "msgpack", None)
+    serializer = CacheSerializer("msgpack")
+    assert serializer.dumps(VALUE)[:2] == b"\x1ej"
+    with pytest.raises(RuntimeError):
+        serializer.loads(b"\x1em\x80")
+
+
+def test_loads_legacy_json_text():
+    """兼容历史上直接写入的 JSON 文本（bytes 或 str）"""
+    serializer = CacheSerializer("json")
+    legacy = json.dumps(VALUE, ensure_ascii=False)
+    assert serializer.loads(legacy.encode("utf-8")) == VALUE
+    assert serializer.loads(legacy) == VALUE
+    assert serializer.loads(None) is None
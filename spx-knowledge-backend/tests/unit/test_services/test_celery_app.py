@@ -0,0 +1,42 @@
+"""
+Test Celery App Task Modules
+"""
+
+import pytest
+
+from app.tasks import celery_app as celery_module
+from app.tasks.celery_app import ALL_TASK_MODULES, QUEUE_TASK_MODULES, task_modules_for_queues
+
+
+@pytest.fixture(autouse=True)
+def lazy_imports(monkeypatch):
+    monkeypatch.setattr(celery_module.settings, "CELERY_LAZY_TASK_IMPORTS", True)
+
+
+def test_task_modules_follow_worker_queues():
+    """专用队列 worker 只导入自身队列的任务模块，重复队列去重"""
+    assert task_modules_for_queues(["vector"]) == ["app.tasks.vector_tasks"]
+    assert task_modules_for_queues(["document", "image", "document"]) == [
+        "app.tasks.document_tasks",
+        "app.tasks.image_tasks",
+    ]
+    assert task_modules_for_queues(["vector", "unknown"]) == ["app.tasks.vector_tasks"]
+
+
+@pytest.mark.parametrize("queues", [None, [], ["unknown"]])
+def test_task_modules_fall_back_to_all(queues):
+    """未指定队列或队列均未知时导入全部任务模块"""
+    assert task_modules_for_queues(queues) == ALL_TASK_MODULES
+
+
+def test_task_modules_disabled_imports_everything(monkeypatch):
+    monkeypatch.setattr(celery_module.settings, "CELERY_LAZY_TASK_IMPORTS", False)
+    assert task_modules_for_queues(["vector"]) == ALL_TASK_MODULES
+
+
+def test_queue_modules_match_task_routes():
+    """队列映射与 task_routes 保持一致，避免任务被路由到未导入其模块的 worker"""
+    routes = celery_module.celery_app.conf.task_routes
+    for queue, modules in QUEUE_TASK_MODULES.items():
+        for module in modules:
+            assert routes[f"{module}.*"]["queue"] == queue
@@ -0,0 +1,40 @@
+"""
+Test Diagnosis Data Collector
+"""
+
+import asyncio
+
+from app.services.diagnosis_data_collector import _wait_within
+
+
+async def _value(value, delay=0.0):
+    await asyncio.sleep(delay)
+    return value
+
+
+async def _fail(message):
+    raise ValueError(message)
+
+
+async def test_wait_within_keeps_partial_results_in_order():
+    """截止前完成的结果与异常按传入顺序保留，超时项取消并以 TimeoutError 占位"""
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    outcomes = await _wait_within([slow(), _value("fast"), _fail("boom"), _value([], 0.01)], 0.2)
+
+    assert isinstance(outcomes[0], TimeoutError)
+    assert outcomes[1] == "fast"
+    assert isinstance(outcomes[2], ValueError) and str(outcomes[2]) == "boom"
+    assert outcomes[3] == []
+    assert cancelled.is_set()
+
+
+async def test_wait_within_empty():
+    assert await _wait_within([], 1.0) == []
@@ -0,0 +1,139 @@
+"""
+Test Document Pipeline Service
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.core.constants import DOC_STATUS_FAILED
+from app.models.chunk import DocumentChunk
+from app.models.document import Document
+from app.models.knowledge_base import KnowledgeBase
+from app.services.document_pipeline_service import (
+    STAGE_EMBED,
+    STAGE_IMAGES,
+    STAGE_PARSE,
+    DocumentPipelineService,
+)
+
+
+@pytest.fixture
+def document(db_session):
+    kb = KnowledgeBase(name="流水线测试知识库", user_id=9401)
+    db_session.add(kb)
+    db_session.commit()
+    doc = Document(
+        original_filename="a.txt", knowledge_base_id=kb.id, file_hash="hash-1", status="parsing", meta={}
+    )
+    db_session.add(doc)
+    db_session.commit()
+    yield doc
+    db_session.rollback()
+    db_session.query(DocumentChunk).filter(DocumentChunk.document_id == doc.id).delete(synchronize_session=False)
+    db_session.query(Document).filter(Document.id == doc.id).delete(synchronize_session=False)
+    db_session.query(KnowledgeBase).filter(KnowledgeBase.id == kb.id).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def _fail_after_parse(pipeline, document):
+    pipeline.reset_state(document)
+    pipeline.mark_stage_done(document, STAGE_PARSE, chunks_count=1)
+    pipeline.mark_stage_done(document, STAGE_IMAGES)
+    pipeline.mark_failed(document, STAGE_EMBED, "向量服务不可用")
+
+
+def test_stage_state_transitions(db_session, document):
+    """完成阶段累加；失败记录失败阶段；续跑要求上次失败、解析已完成且文件未变化"""
+    pipeline = DocumentPipelineService(db_session)
+    pipeline.reset_state(document)
+    assert pipeline.resumable_state(document, resume=True) is None  # 解析未完成
+
+    _fail_after_parse(pipeline, document)
+    state = pipeline.get_state(document)
+    assert state["completed"] == [STAGE_PARSE, STAGE_IMAGES]
+    assert state["failed_stage"] == STAGE_EMBED
+    assert document.status == DOC_STATUS_FAILED
+    assert pipeline.resumable_state(document) is not None
+
+    document.status = "reprocessing"
+    assert pipeline.resumable_state(document) is None
+    assert pipeline.resumable_state(document, resume=True) is not None
+
+    document.file_hash = "hash-2"
+    assert pipeline.resumable_state(document, resume=True) is None
+
+    pipeline.mark_stage_done(document, STAGE_EMBED)
+    state = pipeline.get_state(document)
+    assert state["failed_stage"] is None and STAGE_EMBED in state["completed"]
+
+
+def test_reprocess_dispatches_only_unfinished_stages(db_session, document, monkeypatch):
+    """失败文档经 reprocess_document 重新投递：不重新解析，只派发未完成的阶段"""
+    import celery
+
+    from app.services import document_service as document_service_module
+    from app.services.document_service import DocumentService
+    from app.tasks import document_tasks
+    from app.tasks.vector_tasks import embed_document_chunks_task
+
+    _fail_after_parse(DocumentPipelineService(db_session), document)
+
+    dispatched = []
+    monkeypatch.setattr(
+        celery, "chord", lambda header: (lambda callback: dispatched.append([sig.task for sig in header]))
+    )
+    monkeypatch.setattr(document_tasks, "SessionLocal", sessionmaker(bind=db_session.get_bind()))
+    monkeypatch.setattr(document_tasks, "downstream_backlog", lambda: {})
+    monkeypatch.setattr(document_tasks, "current_task", SimpleNamespace(update_state=lambda **kwargs: None))
+    monkeypatch.setattr(document_tasks.settings, "DOCUMENT_PIPELINE_ENABLED", True)
+
+    results = []
+
+    def run_inline(args, kwargs=None, **options):
+        results.append(document_tasks.process_document_task(*args, **(kwargs or {})))
+        return SimpleNamespace(id="inline")
+
+    monkeypatch.setattr(document_service_module.process_document_task, "apply_async", run_inline)
+
+    assert DocumentService(db_session).reprocess_document(document.id)
+    assert results[0]["resumed_from"] == STAGE_EMBED
+    assert dispatched == [[embed_document_chunks_task.name]]
+    db_session.expire_all()
+    assert DocumentPipelineService(db_session).get_state(document)["completed"] == [STAGE_PARSE, STAGE_IMAGES]
+
+
+
+def test_bulk_index_failure_fails_embed_stage(db_session, document, monkeypatch):
+    """批量索引失败时文本阶段记为失败（不标记完成），重新投递可从该阶段续跑"""
+    from app.services import opensearch_service, vector_service
+    from app.services import document_pipeline_service as pipeline_module
+
+    class FakeVectorService:
+        def __init__(self, db):
+            pass
+
+        def generate_embedding(self, text):
+            return [0.1, 0.2]
+
+    class FailingOpenSearch:
+        def bulk_index_document_chunks_sync(self, docs):
+            raise ConnectionError("opensearch down")
+
+    monkeypatch.setattr(vector_service, "VectorService", FakeVectorService)
+    monkeypatch.setattr(opensearch_service, "OpenSearchService", FailingOpenSearch)
+    monkeypatch.setattr(pipeline_module.settings, "STORE_CHUNK_TEXT_IN_DB", True)
+    db_session.add(DocumentChunk(document_id=document.id, chunk_index=0, content="正文", chunk_type="text"))
+    db_session.commit()
+
+    pipeline = DocumentPipelineService(db_session)
+    pipeline.reset_state(document)
+    pipeline.mark_stage_done(document, STAGE_PARSE)
+
+    result = pipeline.run_stage(document.id, STAGE_EMBED, task_id="test")
+    assert result["status"] == "failed"
+    assert "批量索引失败" in result["error"]
+    assert not pipeline.is_stage_done(document, STAGE_EMBED)
+    assert pipeline.get_state(document)["failed_stage"] == STAGE_EMBED
+    assert pipeline.resumable_state(document) is not None
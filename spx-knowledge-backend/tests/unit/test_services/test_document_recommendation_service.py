@@ -0,0 +1,116 @@
+"""
+Test Document Recommendation Service
+"""
+
+import numpy as np
+import pytest
+
+from app.models.document import Document
+from app.models.knowledge_base import KnowledgeBase
+from app.models.recommendation import DocumentEmbedding, RecommendationCentroid
+from app.services.document_recommendation_service import (
+    DocumentRecommendationService,
+    combine_tag_scores,
+    evaluate_holdout,
+    lexical_tag_scores,
+    mean_embedding,
+    rank_centroids,
+    tag_idf,
+)
+
+
+def _unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_rank_centroids_excludes_own_contribution():
+    """文档已计入的质心先扣除自身向量（留一法），只剩自身的质心不参与排序"""
+    doc = _unit(1, 0)
+    centroids = {"own": (doc.copy(), 1), "near": (_unit(1, 0.1) + _unit(1, 0.2), 2), "far": (_unit(0, 1), 1)}
+    ranked = rank_centroids(doc, centroids, exclude=["own"])
+    assert [key for key, _, _ in ranked] == ["near", "far"]
+    assert ranked[0][1] > 0.9
+
+
+def test_tag_scores_combine_semantic_and_lexical():
+    """罕见标签 IDF 更高；正文命中按 TF-IDF 归一化后与质心相似度加权"""
+    idf = tag_idf({"合同": 50, "redis": 2}, n_docs=100)
+    assert idf["redis"] > idf["合同"]
+    lexical = lexical_tag_scores("合同 合同 合同 Redis 缓存；redisson 不算", idf)
+    assert lexical["redis"] == 1.0 and 0 < lexical["合同"] < 1.0
+    combined = combine_tag_scores({"缓存": 0.6}, lexical, semantic_weight=0.5)
+    assert [tag for tag, *_ in combined] == ["redis", "合同", "缓存"]
+
+
+def test_evaluate_holdout_separable_clusters():
+    """两个分离的类簇上留出集分类全部正确"""
+    rng = np.random.default_rng(0)
+
+    def sample(center, category, tags):
+        return mean_embedding([center + rng.normal(0, 0.05, size=2)]), category, tags
+
+    data = [sample(np.array([1.0, 0.0]), "a", ["x"]) for _ in range(6)]
+    data += [sample(np.array([0.0, 1.0]), "b", ["y"]) for _ in range(6)]
+    metrics = evaluate_holdout(data[1:6] + data[7:], [data[0], data[6]], top_k=1, max_tags=1)
+    assert metrics["category_top1"] == 1.0
+    assert metrics["tag_precision@1"] == 1.0
+
+
+class _DictCache:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, expire=None):
+        self.data[key] = value
+
+
+@pytest.fixture
+def kbs(db_session):
+    kbs = [KnowledgeBase(name=f"推荐测试知识库{i}", user_id=9301) for i in range(2)]
+    db_session.add_all(kbs)
+    db_session.commit()
+    yield kbs
+    kb_ids = [kb.id for kb in kbs]
+    doc_ids = [doc_id for (doc_id,) in db_session.query(Document.id).filter(Document.knowledge_base_id.in_(kb_ids)).all()]
+    db_session.query(DocumentEmbedding).filter(DocumentEmbedding.document_id.in_(doc_ids)).delete(synchronize_session=False)
+    db_session.query(RecommendationCentroid).filter(
+        RecommendationCentroid.knowledge_base_id.in_(kb_ids)
+    ).delete(synchronize_session=False)
+    db_session.query(Document).filter(Document.id.in_(doc_ids)).delete(synchronize_session=False)
+    for kb in kbs:
+        db_session.delete(kb)
+    db_session.commit()
+
+
+def test_tag_suggestions_are_scoped_to_the_document_knowledge_base(db_session, kbs, monkeypatch):
+    """标签词表与质心只取文档所在知识库；文档移入后才计入目标知识库"""
+    service = DocumentRecommendationService(db_session, cache=_DictCache())
+    monkeypatch.setattr(service, "_document_text", lambda document_id: "合同 与 机密项目")
+
+    def add(kb, tags, vector):
+        doc = Document(original_filename="a.txt", knowledge_base_id=kb.id, tags=tags, status="completed", meta={})
+        db_session.add(doc)
+        db_session.commit()
+        service.record_document_vectors(doc, [vector])
+        return doc
+
+    add(kbs[0], ["合同"], [1.0, 0.0])
+    other = add(kbs[1], ["机密项目"], [1.0, 0.1])
+    target = add(kbs[0], [], [1.0, 0.05])
+
+    tags = [item["tag_name"] for item in service.suggest_tags(target.id)["suggested_tags"]]
+    assert tags == ["合同"]
+
+    other.knowledge_base_id = kbs[0].id
+    db_session.commit()
+    service.sync_document(other)
+    service.cache.data.clear()
+    tags = [item["tag_name"] for item in service.suggest_tags(target.id)["suggested_tags"]]
+    assert set(tags) == {"合同", "机密项目"}
+    assert not db_session.query(RecommendationCentroid).filter(
+        RecommendationCentroid.knowledge_base_id == kbs[1].id
+    ).count()
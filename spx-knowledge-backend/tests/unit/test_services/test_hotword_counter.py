@@ -0,0 +1,93 @@
+"""
+Test Hotword Counter
+"""
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.models.search_history import SearchHotword
+from app.services.hotword_counter import HotwordCounter
+
+
+def _counter():
+    server = fakeredis.FakeServer()
+    return HotwordCounter(
+        client=fakeredis.FakeRedis(server=server, decode_responses=True),
+        async_client=fakeredis.aioredis.FakeRedis(server=server, decode_responses=True),
+    )
+
+
+def _hotword(db_session, keyword):
+    db_session.expire_all()
+    return db_session.query(SearchHotword).filter(SearchHotword.keyword == keyword).first()
+
+
+async def test_flush_merges_counts_into_existing_rows(db_session):
+    """落盘把缓冲增量累加到已有记录，新词插入；重复落盘不重复计数"""
+    db_session.add(SearchHotword(keyword="热词-已有", search_count=5))
+    db_session.commit()
+    counter = _counter()
+
+    for _ in range(3):
+        await counter.record("热词-已有")
+    await counter.record("  热词-新词 ")
+
+    assert counter.flush(db_session) == {"flushed": 2, "skipped": 0}
+    assert _hotword(db_session, "热词-已有").search_count == 8
+    assert _hotword(db_session, "热词-新词").search_count == 1
+    assert _hotword(db_session, "热词-新词").last_searched_at is not None
+
+    assert counter.flush(db_session)["flushed"] == 0
+    assert _hotword(db_session, "热词-已有").search_count == 8
+
+
+async def test_top_reads_redis_after_seed(db_session):
+    """重建后 Top-N 直接读 Redis：库内次数 + 未落盘增量，按周期过滤"""
+    db_session.add(SearchHotword(keyword="热词-历史", search_count=100))
+    db_session.commit()
+    counter = _counter()
+
+    await counter.record("热词-历史")
+    assert await counter.top(10) is None  # 尚未从数据库重建
+
+    counter.flush(db_session)
+    await counter.record("热词-历史")
+    top = dict((keyword, count) for keyword, count, _ in await counter.top(1000))
+    assert top["热词-历史"] == 102
+    # 最后搜索时间以 Redis 记录为准，刚搜索过的词计入当日热词
+    assert "热词-历史" in [keyword for keyword, _, _ in await counter.top(1000, "day")]
+
+
+async def test_soft_deleted_keywords_stay_hidden(db_session):
+    """数据库中已软删除的热词：落盘不累加，Top-N 不返回"""
+    db_session.add(SearchHotword(keyword="热词-已删除", search_count=50, is_deleted=True))
+    db_session.commit()
+    counter = _counter()
+
+    await counter.record("热词-已删除")
+    counter.flush(db_session)
+    await counter.record("热词-已删除")
+
+    assert "热词-已删除" not in [keyword for keyword, _, _ in await counter.top(1000)]
+    counter.flush(db_session)
+    assert _hotword(db_session, "热词-已删除").search_count == 50
+    assert _hotword(db_session, "热词-已删除").is_deleted
+
+
+async def test_failed_flush_keeps_pending(db_session, monkeypatch):
+    """写库失败时增量保留，下次落盘合并写入"""
+    counter = _counter()
+    await counter.record("热词-重试")
+
+    def fail():
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(db_session, "commit", fail)
+    with pytest.raises(RuntimeError):
+        counter.flush(db_session)
+    monkeypatch.undo()
+
+    await counter.record("热词-重试")
+    counter.flush(db_session)
+    assert _hotword(db_session, "热词-重试").search_count == 2
@@ -0,0 +1,150 @@
+"""
+Test Image Proxy Service
+"""
+
+import os
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+from app.services.image_proxy_service import ImageProxyService, ThumbnailDiskCache, parse_range_header
+
+DATA = b"0123456789"
+ETAG = '"abc123"'
+
+
+class FakeMinio:
+    def stat_file(self, object_name):
+        return SimpleNamespace(
+            etag="abc123",
+            last_modified=datetime(2025, 1, 1, tzinfo=timezone.utc),
+            size=len(DATA),
+            content_type="image/png",
+        )
+
+    def iter_file(self, object_name, offset=0, length=None, chunk_size=4):
+        end = len(DATA) if length is None else offset + length
+        for start in range(offset, end, chunk_size):
+            yield DATA[start:min(start + chunk_size, end)]
+
+
+def _request(**headers):
+    raw = [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+async def _body(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("bytes=0-3", (0, 3)),
+        ("bytes=5-", (5, 9)),
+        ("bytes=-4", (6, 9)),
+        ("bytes=8-100", (8, 9)),
+        ("bytes=0-1,4-5", None),  # 多段请求按完整内容响应
+        ("items=0-3", None),
+    ],
+)
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, 10) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=10-", "bytes=5-2", "bytes=-0", "bytes=a-b"])
+def test_parse_range_header_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range_header(header, 10)
+
+
+async def test_serve_conditional_and_range_requests():
+    """ETag 命中返回 304；Range 返回 206 分段；If-Range 不匹配时返回完整内容；不可满足时 416"""
+    service = ImageProxyService(minio=FakeMinio())
+
+    response = await service.serve(_request(if_none_match=ETAG), "a.png")
+    assert response.status_code == 304
+
+    response = await service.serve(_request(range="bytes=2-5"), "a.png")
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 2-5/10"
+    assert await _body(response) == DATA[2:6]
+
+    response = await service.serve(_request(range="bytes=2-5", if_range=ETAG), "a.png")
+    assert response.status_code == 206
+
+    response = await service.serve(_request(range="bytes=2-5", if_range='"stale"'), "a.png")
+    assert response.status_code == 200
+    assert await _body(response) == DATA
+
+    response = await service.serve(_request(range="bytes=20-"), "a.png")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */10"
+
+
+def test_thumbnail_cache_evicts_least_recently_used(tmp_path):
+    """超过上限时按最近访问时间淘汰到上限的 90%，命中会刷新访问时间"""
+    cache = ThumbnailDiskCache(str(tmp_path), max_bytes=250)
+    cache.put("aa-first", ".jpg", b"x" * 100)
+    cache.put("bb-second", ".jpg", b"x" * 100)
+    os.utime(cache._path("aa-first", ".jpg"), (1000, 1000))
+    os.utime(cache._path("bb-second", ".jpg"), (1001, 1001))
+    assert cache.get("aa-first", ".jpg") == b"x" * 100
+
+    cache.put("cc-third", ".jpg", b"x" * 100)
+    assert cache.get("bb-second", ".jpg") is None
+    assert cache.get("aa-first", ".jpg") is not None
+    assert cache.get("cc-third", ".jpg") is not None
+
+
+async def test_image_file_route_rejects_users_without_view(db_session, monkeypatch):
+    """图片代理接口：无文档所属知识库 doc:view 权限的用户返回 403，而不是被吞掉后继续返回图片"""
+    from fastapi import HTTPException
+
+    from app.api.v1.routes import images as images_routes
+    from app.models.document import Document
+    from app.models.knowledge_base import KnowledgeBase
+    from app.services.permission_service import KnowledgeBasePermissionService
+
+    class NoCache:
+        def get(self, key):
+            return None
+
+        def set(self, key, value, expire=None):
+            return True
+
+    served = []
+
+    class FakeProxy:
+        async def serve(self, request, object_name, size=None):
+            served.append(object_name)
+
+    monkeypatch.setattr(images_routes, "ImageProxyService", FakeProxy)
+    monkeypatch.setattr(
+        images_routes, "KnowledgeBasePermissionService", lambda db: KnowledgeBasePermissionService(db, cache=NoCache())
+    )
+    kb = KnowledgeBase(name="图片代理权限知识库", user_id=9701)
+    db_session.add(kb)
+    db_session.commit()
+    doc = Document(original_filename="img.pdf", knowledge_base_id=kb.id, status="completed", meta={})
+    db_session.add(doc)
+    db_session.commit()
+
+    try:
+        request = _request()
+        request.state.user = {"sub": "9702"}
+        with pytest.raises(HTTPException) as exc:
+            await images_routes.get_image_file(request, f"documents/{doc.id}/images/a.png", None, db_session)
+        assert exc.value.status_code == 403
+        assert served == []
+
+        request.state.user = {"sub": "9701"}
+        await images_routes.get_image_file(request, f"documents/{doc.id}/images/a.png", None, db_session)
+        assert served == [f"documents/{doc.id}/images/a.png"]
+    finally:
+        db_session.query(Document).filter(Document.id == doc.id).delete(synchronize_session=False)
+        db_session.query(KnowledgeBase).filter(KnowledgeBase.id == kb.id).delete(synchronize_session=False)
+        db_session.commit()
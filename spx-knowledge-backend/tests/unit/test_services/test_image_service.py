@@ -0,0 +1,61 @@
+"""
+Test Image Service
+"""
+
+import hashlib
+
+import pytest
+
+from app.models.image import DocumentImage
+from app.services import image_service as image_service_module
+from app.services.image_service import ImageService
+
+EXISTING = b"existing-image-bytes"
+NEW = b"new-image-bytes"
+OTHER = b"other-image-bytes"
+
+
+class FakeMinio:
+    uploads = []
+
+    def upload_bytes(self, object_name, data, content_type=None):
+        FakeMinio.uploads.append(object_name)
+
+
+@pytest.fixture
+def service(db_session, monkeypatch):
+    FakeMinio.uploads = []
+    monkeypatch.setattr(image_service_module, "MinioStorageService", FakeMinio)
+    service = ImageService(db_session)
+    monkeypatch.setattr(service, "_perform_qwen_ocr", lambda data, mime: "识别文本")
+    yield service
+    db_session.rollback()
+    shas = [hashlib.sha256(data).hexdigest() for data in (EXISTING, NEW, OTHER)]
+    db_session.query(DocumentImage).filter(DocumentImage.sha256_hash.in_(shas)).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def test_create_images_from_bytes_dedups_by_sha(db_session, service):
+    """按 SHA256 复用库中已有图片与本批内重复图片，只上传新图片；结果与输入一一对应"""
+    existing = DocumentImage(
+        document_id=1, image_path="documents/1/images/existing.png", sha256_hash=hashlib.sha256(EXISTING).hexdigest()
+    )
+    db_session.add(existing)
+    db_session.commit()
+
+    images = service.create_images_from_bytes(
+        2, [(EXISTING, ".png", None), (NEW, "JPG", None), (NEW, ".jpg", None), (OTHER, ".png", "gif")]
+    )
+
+    assert len(images) == 4
+    assert images[0].id == existing.id
+    assert images[0].image_type == "png"  # 已有图片缺失类型时回填
+    assert images[1] is images[2] and images[1].id is not None
+    assert images[1].image_type == "jpg" and images[1].ocr_text == "识别文本"
+    assert images[3].image_type == "gif"
+    new_sha = hashlib.sha256(NEW).hexdigest()
+    assert FakeMinio.uploads == [f"documents/2/images/{new_sha}.jpg", f"documents/2/images/{hashlib.sha256(OTHER).hexdigest()}.png"]
+
+
+def test_create_images_from_bytes_empty(service):
+    assert service.create_images_from_bytes(1, []) == []
@@ -0,0 +1,50 @@
+"""
+Test Inference Batcher
+"""
+
+from app.services.inference_batcher import MicroBatcher, _Request
+
+
+def _batcher(max_batch_size=4, max_wait_ms=0):
+    return MicroBatcher(
+        name="test",
+        batch_fn=lambda payloads: [p * 2 for p in payloads],
+        max_batch_size=max_batch_size,
+        max_wait_ms=max_wait_ms,
+        weight_fn=lambda payload: payload,
+    )
+
+
+def _enqueue(batcher, *weights):
+    for weight in weights:
+        batcher._queue.put(_Request(weight, weight))
+
+
+def test_collect_respects_weight_limit_and_carries_overflow():
+    """累计权重不超过上限；放不下的请求留作下一批的首个请求"""
+    batcher = _batcher(max_batch_size=4)
+    _enqueue(batcher, 1, 2, 3, 1)
+
+    assert [req.payload for req in batcher._collect()] == [1, 2]
+    assert batcher._carry is not None and batcher._carry.payload == 3
+    assert batcher.stats()["queue_depth"] == 2
+
+    assert [req.payload for req in batcher._collect()] == [3, 1]
+    assert batcher._carry is None
+
+
+def test_collect_oversized_request_runs_alone():
+    """单个请求权重超过上限时单独成批，不会被无限搁置"""
+    batcher = _batcher(max_batch_size=4)
+    _enqueue(batcher, 6, 1)
+
+    assert [req.payload for req in batcher._collect()] == [6]
+    assert [req.payload for req in batcher._collect()] == [1]
+
+
+def test_infer_dispatches_batch_results():
+    """同步调用经后台线程合批执行，按提交顺序拿到各自结果"""
+    batcher = _batcher(max_batch_size=8, max_wait_ms=20)
+    futures = [batcher.submit(weight) for weight in (1, 2, 3)]
+
+    assert [future.result(timeout=5) for future in futures] == [2, 4, 6]
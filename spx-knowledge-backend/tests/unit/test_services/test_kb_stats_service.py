@@ -0,0 +1,95 @@
+"""
+Test Knowledge Base Stats Service
+"""
+
+import pytest
+
+from app.models.chunk import DocumentChunk
+from app.models.document import Document
+from app.models.knowledge_base import KnowledgeBase
+from app.models.knowledge_base_stats import KnowledgeBaseStats
+from app.services.kb_stats_service import KnowledgeBaseStatsService
+
+
+@pytest.fixture
+def kb(db_session):
+    kb = KnowledgeBase(name="统计测试知识库", user_id=9201)
+    db_session.add(kb)
+    db_session.commit()
+    yield kb
+    doc_ids = [doc_id for (doc_id,) in db_session.query(Document.id).filter(Document.knowledge_base_id == kb.id).all()]
+    if doc_ids:
+        db_session.query(DocumentChunk).filter(DocumentChunk.document_id.in_(doc_ids)).delete(synchronize_session=False)
+        db_session.query(Document).filter(Document.id.in_(doc_ids)).delete(synchronize_session=False)
+    db_session.query(KnowledgeBaseStats).filter(KnowledgeBaseStats.knowledge_base_id == kb.id).delete(synchronize_session=False)
+    db_session.delete(kb)
+    db_session.commit()
+
+
+def _add_document(db_session, kb_id, chunks, status="completed", file_size=100):
+    doc = Document(original_filename="a.txt", knowledge_base_id=kb_id, file_size=file_size, status=status, meta={})
+    db_session.add(doc)
+    db_session.commit()
+    db_session.add_all([DocumentChunk(document_id=doc.id, chunk_index=i) for i in range(chunks)])
+    db_session.commit()
+    return doc
+
+
+def test_sync_document_is_idempotent_and_matches_reconcile(db_session, kb):
+    """重复同步不重复计数；删除扣除贡献；增量结果与对账重算一致"""
+    service = KnowledgeBaseStatsService(db_session)
+    first = _add_document(db_session, kb.id, chunks=3)
+    second = _add_document(db_session, kb.id, chunks=2, status="parsing", file_size=50)
+    service.sync_document(first, ingested=True)
+    service.sync_document(first)
+    service.sync_document(second)
+
+    stats = service.get_stats(kb.id)
+    assert stats["document_count"] == 2
+    assert stats["completed_document_count"] == 1
+    assert stats["chunk_count"] == 5
+    assert stats["storage_bytes"] == 150
+    assert stats["last_ingested_at"] is not None
+
+    service.remove_document(second)
+    db_session.query(DocumentChunk).filter(DocumentChunk.document_id == second.id).delete(synchronize_session=False)
+    db_session.query(Document).filter(Document.id == second.id).delete(synchronize_session=False)
+    db_session.commit()
+
+    incremental = service.get_stats(kb.id)
+    assert service.reconcile([kb.id]) == {"checked": 1, "corrected": 0}
+    assert service.get_stats(kb.id)["chunk_count"] == incremental["chunk_count"] == 3
+
+
+def test_remove_subtracts_recorded_contribution(db_session, kb):
+    """删除扣除上次记录的贡献（而非当前大小）；删除后再同步不重复扣除"""
+    service = KnowledgeBaseStatsService(db_session)
+    doc = _add_document(db_session, kb.id, chunks=0)
+    service.sync_document(doc)
+    # 同步后又新增分块（未同步），删除时只扣除已计入的部分
+    db_session.add_all([DocumentChunk(document_id=doc.id, chunk_index=i) for i in range(5)])
+    db_session.commit()
+
+    service.remove_document(doc)
+    doc.is_deleted = True
+    db_session.commit()
+    assert service.get_stats(kb.id)["chunk_count"] == 0
+    assert service.get_stats(kb.id)["document_count"] == 0
+
+    service.sync_document(doc)
+    stats = service.get_stats(kb.id)
+    assert stats["document_count"] == 0
+    assert stats["chunk_count"] == 0
+    assert stats["storage_bytes"] == 0
+
+
+def test_reconcile_fixes_drift(db_session, kb):
+    """统计行漂移后对账修正"""
+    service = KnowledgeBaseStatsService(db_session)
+    _add_document(db_session, kb.id, chunks=4)
+    service.apply_delta(kb.id, {"document_count": 7, "chunk_count": -1})
+
+    assert service.reconcile([kb.id])["corrected"] == 1
+    stats = service.get_stats(kb.id)
+    assert stats["document_count"] == 1
+    assert stats["chunk_count"] == 4
@@ -0,0 +1,52 @@
+"""
+Test Log Triage Service
+"""
+
+import pytest
+
+from app.services.log_triage_service import (
+    LEVEL_ERROR,
+    LEVEL_FATAL,
+    LEVEL_INFO,
+    LEVEL_WARNING,
+    classify_line,
+)
+
+
+@pytest.mark.parametrize(
+    "line, level",
+    [
+        ("2024-05-01 12:00:00,123 ERROR [main] c.e.App - request failed", LEVEL_ERROR),
+        ("[api-0] 2024-05-01T12:00:00Z WARN cache miss storm", LEVEL_WARNING),
+        ("[2024-05-01 12:00:00] [error] upstream timed out", LEVEL_ERROR),
+        ('{"time": "12:00:00", "level": "error", "msg": "db down"}', LEVEL_ERROR),
+        ("ts=12:00:00 level=warning msg=slow", LEVEL_WARNING),
+        ("ERROR:root:connection refused", LEVEL_ERROR),
+        ("panic: runtime error: index out of range", LEVEL_FATAL),
+        ("c.e.Worker FATAL shutting down", LEVEL_FATAL),
+        ("java.lang.NullPointerException: null", LEVEL_ERROR),
+        ("ValueError: invalid literal for int()", LEVEL_ERROR),
+        ('Exception in thread "main" oops', LEVEL_ERROR),
+        ("Traceback (most recent call last):", LEVEL_ERROR),
+        ("container OOMKilled", LEVEL_FATAL),
+    ],
+)
+def test_level_tokens(line, level):
+    assert classify_line(line) == level
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "the terror was here",
+        "Error count: 0",
+        "errors=0 warnings=0",
+        "job finished with no errors",
+        "handling user error messages in the form",
+        "warned the user about quota",
+        "field mirror updated",
+        "INFO retry succeeded after error_budget check",
+    ],
+)
+def test_benign_lines_are_info(line):
+    assert classify_line(line) == LEVEL_INFO
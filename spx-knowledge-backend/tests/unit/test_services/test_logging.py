@@ -0,0 +1,51 @@
+"""
+Test Logging Filters
+"""
+
+import logging
+import queue
+
+from app.core.logging import SamplingFilter, VectorFieldFilter, _LazyQueueHandler, redact_vectors, sampled
+
+
+def _record(msg, args=None, **extra):
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_redact_vectors():
+    """带键名的向量与无键名的长数值数组替换为占位符，普通文本不变"""
+    vector = [0.1] * 20
+    assert redact_vectors(f'{{"content_vector": {vector}, "id": 1}}') == '{"content_vector": "<vector>", "id": 1}'
+    assert redact_vectors(f"query_vector={[1, 2]}") == 'query_vector="<vector>"'
+    assert redact_vectors(f"结果 {vector}") == "结果 <vector>"
+    assert redact_vectors("分块 [1, 2, 3] 完成") == "分块 [1, 2, 3] 完成"
+
+
+def test_vector_field_filter_redacts_args():
+    record = _record("写入 %s", ({"id": 1, "embedding": [0.1] * 768},))
+    VectorFieldFilter().filter(record)
+    assert record.getMessage() == "写入 {'id': 1, 'embedding': '<vector dim=768>'}"
+
+
+def test_sampling_filter_keeps_one_in_n():
+    """同一 key 每 N 条输出 1 条，未标记的日志全部保留"""
+    sampling = SamplingFilter(default_every=3)
+    kept = [sampling.filter(_record("分块完成", **sampled("chunk"))) for _ in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    assert all(sampling.filter(_record("普通日志")) for _ in range(3))
+    assert sampling.filter(_record("逐项", **sampled("once", every=1)))
+
+
+def test_lazy_queue_handler_snapshots_mutable_args():
+    """可变参数在入队时合并为消息，之后修改不影响输出；基本类型参数保持延迟格式化"""
+    handler = _LazyQueueHandler(queue.Queue())
+    payload = {"status": "pending"}
+    handler.emit(_record("任务 %s 状态 %s", (7, payload)))
+    payload["status"] = "done"
+    handler.emit(_record("任务 %s 完成", (8,)))
+
+    mutable, primitive = handler.queue.get_nowait(), handler.queue.get_nowait()
+    assert mutable.msg == "任务 7 状态 {'status': 'pending'}" and mutable.args is None
+    assert primitive.msg == "任务 %s 完成" and primitive.args == (8,)
@@ -0,0 +1,95 @@
+"""
+Test Notification Bus
+"""
+
+import asyncio
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.services.notification_bus import publish_sync
+from app.services.websocket_notification_service import WebSocketNotificationService
+
+
+class FakeWebSocket:
+    """记录发送内容；block=True 时发送阻塞到 gate 打开（模拟慢客户端）"""
+
+    def __init__(self, block: bool = False):
+        self.sent = []
+        self.closed = None
+        self.gate = asyncio.Event()
+        if not block:
+            self.gate.set()
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000, reason=None):
+        self.closed = code
+
+
+async def _wait_for(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "等待超时"
+        await asyncio.sleep(0.01)
+
+
+async def test_fanout_delivers_across_instances():
+    """两个应用实例共享 Redis：任一进程发布的用户消息到达该用户在所有实例上的连接"""
+    server = fakeredis.FakeServer()
+    instances = [WebSocketNotificationService(), WebSocketNotificationService()]
+    for service in instances:
+        await service.start_fanout(client=fakeredis.aioredis.FakeRedis(server=server))
+    a, b = instances
+    ws_a1, ws_b1, ws_b2 = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    try:
+        await a.connect(ws_a1, "1", accept=False)
+        await b.connect(ws_b1, "1", accept=False)
+        await b.connect(ws_b2, "2", accept=False)
+
+        # Celery worker 等同步进程发布，两个订阅进程都收到
+        published = publish_sync(1, {"type": "document_status", "document_id": 7}, client=fakeredis.FakeRedis(server=server))
+        assert published == 2
+        await _wait_for(lambda: ws_a1.sent and ws_b1.sent)
+        assert ws_a1.sent == ws_b1.sent == [{"type": "document_status", "document_id": 7}]
+
+        # 实例 A 上的请求发送给只连接在实例 B 上的用户
+        await a.send_to_user({"type": "modification_completed"}, "2")
+        await _wait_for(lambda: ws_b2.sent)
+        assert ws_b2.sent == [{"type": "modification_completed"}]
+        assert len(ws_a1.sent) == len(ws_b1.sent) == 1
+    finally:
+        for service in instances:
+            for websocket in list(service.active_connections):
+                service.disconnect(websocket)
+            await service.stop_fanout()
+
+
+async def test_progress_coalescing_and_slow_client_backpressure():
+    """发送阻塞期间同 coalesce_key 的进度只保留最新；积压超过上限断开连接"""
+    service = WebSocketNotificationService(max_pending=3)
+    ws = FakeWebSocket(block=True)
+    await service.connect(ws, "1", accept=False)
+    outbox = service._outboxes[ws]
+
+    service.deliver_local("1", {"type": "first"})
+    await _wait_for(lambda: not outbox.pending)
+    for progress in range(10):
+        service.deliver_local("1", {"type": "document_status", "progress": progress, "coalesce_key": "document_status:7"})
+    assert len(outbox.pending) == 1
+    ws.gate.set()
+    await _wait_for(lambda: len(ws.sent) == 2)
+    assert ws.sent[1] == {"type": "document_status", "progress": 9}
+
+    ws.gate.clear()
+    service.deliver_local("1", {"type": "blocked"})
+    await _wait_for(lambda: not outbox.pending)
+    for i in range(4):
+        service.deliver_local("1", {"type": "event", "i": i})
+    await _wait_for(lambda: ws.closed is not None)
+    assert "1" not in service.user_connections
+    assert ws not in service._outboxes
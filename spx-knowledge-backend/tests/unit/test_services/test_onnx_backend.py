@@ -0,0 +1,72 @@
+"""
+Test ONNX Backend Helpers
+"""
+
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.services.onnx_backend import OnnxReranker, embedding_parity, resolve_model_file, score_parity
+
+
+def test_resolve_model_file_prefers_int8(tmp_path):
+    """启用量化且存在 int8 产物时优先使用，否则退回 fp32；都不存在时报错"""
+    (tmp_path / "model.onnx").write_bytes(b"fp32")
+    assert resolve_model_file(str(tmp_path), "model", quantized=True).endswith("model.onnx")
+
+    (tmp_path / "model.int8.onnx").write_bytes(b"int8")
+    assert resolve_model_file(str(tmp_path), "model", quantized=True).endswith("model.int8.onnx")
+    assert resolve_model_file(str(tmp_path), "model", quantized=False).endswith("model.onnx")
+
+    with pytest.raises(FileNotFoundError):
+        resolve_model_file(str(tmp_path), "text_encoder", quantized=True)
+
+
+class FakeTokenizer:
+    def __call__(self, queries, passages, **kwargs):
+        return {
+            "input_ids": np.array([[len(p)] for p in passages], dtype=np.int32),
+            "token_type_ids": np.zeros((len(passages), 1), dtype=np.int32),
+        }
+
+
+class FakeSession:
+    def __init__(self):
+        self.feeds = []
+
+    def run(self, outputs, feed):
+        self.feeds.append(feed)
+        return [feed["input_ids"].astype(np.float32)]
+
+
+def test_reranker_compute_score_batches_and_normalizes():
+    """按 batch_size 分批推理，只传入模型声明的输入；normalize 时做 sigmoid"""
+    reranker = OnnxReranker.__new__(OnnxReranker)
+    reranker.tokenizer = FakeTokenizer()
+    reranker.session = FakeSession()
+    reranker._input_names = {"input_ids"}
+
+    pairs = [("q", "a"), ("q", "bb"), ("q", "ccc")]
+    assert reranker.compute_score(pairs, batch_size=2) == [1.0, 2.0, 3.0]
+    assert len(reranker.session.feeds) == 2
+    assert set(reranker.session.feeds[0]) == {"input_ids"}
+    assert reranker.session.feeds[0]["input_ids"].dtype == np.int64
+
+    assert reranker.compute_score(("q", "a"), normalize=True) == [pytest.approx(1 / (1 + math.exp(-1)))]
+
+
+def test_score_parity():
+    parity = score_parity([0.1, 0.5, 0.9], [0.12, 0.48, 0.95])
+    assert parity["max_abs_diff"] == pytest.approx(0.05)
+    assert parity["spearman"] == pytest.approx(1.0)
+    assert score_parity([0.1, 0.5, 0.9], [0.9, 0.5, 0.1])["spearman"] == pytest.approx(-1.0)
+    assert score_parity([], []) == {"max_abs_diff": 0.0, "spearman": 1.0}
+
+
+def test_embedding_parity():
+    reference = np.array([[1.0, 0.0], [0.0, 2.0]])
+    parity = embedding_parity(reference, np.array([[2.0, 0.0], [1.0, 1.0]]))
+    assert parity["min_cosine"] == pytest.approx(math.sqrt(0.5))
+    assert parity["mean_cosine"] == pytest.approx((1 + math.sqrt(0.5)) / 2)
@@ -0,0 +1,47 @@
+"""
+Test OpenSearch Structured Chunk Meta
+"""
+
+import json
+
+import pytest
+
+from app.services.opensearch_service import CHUNK_META_PROPERTIES, structured_chunk_meta
+
+
+def test_structured_chunk_meta_extracts_typed_fields():
+    """整数字段转换为 int，表格标识转为字符串，标题路径拼接为 section_path"""
+    metadata = {
+        "page_number": "3",
+        "chunk_index": 7,
+        "element_index_start": 12.0,
+        "table_group_uid": 101,
+        "table_uid": "t-1",
+        "heading_path": ["第一章", " 概述 ", ""],
+        "other": "ignored",
+    }
+    meta = structured_chunk_meta(metadata)
+    assert meta == {
+        "page_number": 3,
+        "chunk_index": 7,
+        "element_index_start": 12,
+        "table_group_uid": "101",
+        "table_id": "t-1",
+        "section_path": "第一章 / 概述",
+    }
+    assert set(meta) <= set(CHUNK_META_PROPERTIES)
+    assert structured_chunk_meta(json.dumps(metadata, ensure_ascii=False)) == meta
+
+
+def test_structured_chunk_meta_section_hint_and_bad_values():
+    """无标题路径时使用 section_hint；无法转换或为空的字段不输出"""
+    meta = structured_chunk_meta(
+        {"page_number": "abc", "chunk_index": None, "table_id": "", "heading_path": [], "section_hint": " 附录 "}
+    )
+    assert meta == {"section_path": "附录"}
+    assert structured_chunk_meta({"heading_path": ["  "]}) == {}
+
+
+@pytest.mark.parametrize("metadata", [None, "", "{broken", "[1, 2]", [1, 2], 5])
+def test_structured_chunk_meta_invalid_input(metadata):
+    assert structured_chunk_meta(metadata) == {}
@@ -0,0 +1,42 @@
+"""
+Test Pattern Query Planner
+"""
+
+import pytest
+
+from app.core.exceptions import CustomException
+from app.services.pattern_query_planner import has_lucene_only_syntax, plan_pattern_query, regex_literals
+
+
+@pytest.mark.parametrize("pattern", ["abc<1-9>", "ab@", "foo#", "a.*&.*b", "~(foo)", '"a.b"c'])
+def test_detects_lucene_only_syntax(pattern):
+    assert has_lucene_only_syntax(pattern)
+
+
+@pytest.mark.parametrize("pattern", [r"abc\<1", "[<>@#]abc", r"error\s+\d+"])
+def test_escaped_and_class_characters_are_not_lucene_only(pattern):
+    assert not has_lucene_only_syntax(pattern)
+
+
+def test_numeric_range_is_not_a_literal():
+    runs, prefix = regex_literals("port<1000-1999>")
+    assert runs == ["port"]
+    assert prefix == "port"
+
+
+def test_ngram_mode_falls_back_to_regexp_for_lucene_syntax():
+    plan = plan_pattern_query("regex", "timeout<100-999>ms", mode="ngram")
+    assert plan.field == "content"
+    assert plan.verifier is None
+    assert plan.clause == {"regexp": {"content": {"value": "timeout<100-999>ms", "flags": "ALL", "boost": 1.0}}}
+
+
+def test_ngram_mode_rejects_unanchored_lucene_syntax():
+    with pytest.raises(CustomException):
+        plan_pattern_query("regex", "<1-9>abcdef", mode="ngram")
+
+
+def test_ngram_mode_keeps_plain_regex():
+    plan = plan_pattern_query("regex", r"connection\s+refused", mode="ngram")
+    assert plan.field == "content.ngram"
+    assert plan.verifier.search("Connection   refused by peer")
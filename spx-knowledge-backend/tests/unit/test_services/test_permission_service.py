@@ -0,0 +1,185 @@
+"""
+Test Permission Service
+"""
+
+import pytest
+from sqlalchemy import event
+
+from app.models.knowledge_base import KnowledgeBase
+from app.models.knowledge_base_member import KnowledgeBaseMember
+from app.services.permission_service import KnowledgeBasePermissionService
+
+OWNER_ID = 9101
+MEMBER_ID = 9102
+
+
+class DictCache:
+    """进程内字典缓存，接口与 cache_manager.sync 一致（代替 Redis）"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, expire=None):
+        self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+        return True
+
+
+@pytest.fixture
+def kb_ids(db_session):
+    """OWNER_ID 拥有两个知识库，MEMBER_ID 是第一个知识库的 editor"""
+    kbs = [KnowledgeBase(name=f"权限测试知识库{i}", user_id=OWNER_ID) for i in range(2)]
+    db_session.add_all(kbs)
+    db_session.commit()
+    db_session.add(KnowledgeBaseMember(knowledge_base_id=kbs[0].id, user_id=MEMBER_ID, role="editor"))
+    db_session.commit()
+    yield [kb.id for kb in kbs]
+    db_session.query(KnowledgeBaseMember).filter(
+        KnowledgeBaseMember.knowledge_base_id.in_([kb.id for kb in kbs])
+    ).delete(synchronize_session=False)
+    for kb in kbs:
+        db_session.delete(kb)
+    db_session.commit()
+
+
+@pytest.fixture
+def query_counter(db_session):
+    """统计会话发出的 SQL 语句数"""
+    counter = {"count": 0}
+
+    def on_execute(*args, **kwargs):
+        counter["count"] += 1
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", on_execute)
+    yield counter
+    event.remove(engine, "before_cursor_execute", on_execute)
+
+
+def test_warm_cache_permission_checks_issue_no_queries(db_session, kb_ids, query_counter):
+    """缓存预热后，权限校验与知识库过滤集合不再访问数据库"""
+    cache = DictCache()
+    KnowledgeBasePermissionService(db_session, cache=cache).get_user_kb_roles(OWNER_ID)
+    KnowledgeBasePermissionService(db_session, cache=cache).get_user_kb_roles(MEMBER_ID)
+
+    query_counter["count"] = 0
+    perm = KnowledgeBasePermissionService(db_session, cache=cache)
+    for kb_id in kb_ids:
+        assert perm.ensure_permission(kb_id, OWNER_ID, "doc:view") == "owner"
+    assert perm.get_user_role_for_kb(kb_ids[0], MEMBER_ID) == "editor"
+    assert perm.get_user_role_for_kb(kb_ids[1], MEMBER_ID) is None
+    assert perm.resolve_kb_filter(OWNER_ID) == sorted(kb_ids)
+    assert perm.allowed_kb_ids(MEMBER_ID, "doc:upload") == [kb_ids[0]]
+    assert query_counter["count"] == 0
+
+
+def test_invalidate_users_reloads_membership(db_session, kb_ids, query_counter):
+    """成员变化后失效缓存，下一次校验重新从数据库解析"""
+    cache = DictCache()
+    perm = KnowledgeBasePermissionService(db_session, cache=cache)
+    assert perm.get_user_role_for_kb(kb_ids[1], MEMBER_ID) is None
+
+    db_session.add(KnowledgeBaseMember(knowledge_base_id=kb_ids[1], user_id=MEMBER_ID, role="viewer"))
+    db_session.commit()
+    perm.invalidate_users(MEMBER_ID)
+
+    query_counter["count"] = 0
+    assert KnowledgeBasePermissionService(db_session, cache=cache).get_user_role_for_kb(kb_ids[1], MEMBER_ID) == "viewer"
+    assert query_counter["count"] > 0
+
+
+class FakeIndex:
+    """记录文档移动时的索引同步调用（代替 OpenSearch）"""
+
+    calls = []
+    fail = False
+
+    def move_document_sync(self, document_id, source_kb_id, target_kb_id, category_id):
+        if FakeIndex.fail:
+            raise ConnectionError("opensearch down")
+        FakeIndex.calls.append((document_id, source_kb_id, target_kb_id, category_id))
+
+
+class NoopStats:
+    def __init__(self, db):
+        pass
+
+    def sync_document(self, doc):
+        pass
+
+
+@pytest.fixture
+def move_route(db_session, kb_ids, monkeypatch):
+    """批量移动接口：替换索引、统计与推荐同步，权限缓存使用进程内字典"""
+    from app.api.v1.routes import documents as documents_routes
+    from app.models.document import Document
+
+    FakeIndex.calls, FakeIndex.fail = [], False
+    cache = DictCache()
+    monkeypatch.setattr(documents_routes, "OpenSearchService", FakeIndex)
+    monkeypatch.setattr(
+        documents_routes, "KnowledgeBasePermissionService", lambda db: KnowledgeBasePermissionService(db, cache=cache)
+    )
+    monkeypatch.setattr(documents_routes, "KnowledgeBaseStatsService", NoopStats)
+    monkeypatch.setattr(documents_routes, "_sync_recommendation", lambda db, doc: None)
+
+    doc = Document(original_filename="move.txt", knowledge_base_id=kb_ids[0], status="completed", meta={})
+    db_session.add(doc)
+    db_session.commit()
+
+    async def move(user_id, target_kb_id, category_id=None):
+        from starlette.requests import Request
+
+        request = Request({"type": "http", "method": "POST", "path": "/", "headers": []})
+        request.state.user = {"sub": str(user_id)}
+        body = documents_routes.BatchMoveRequest(
+            document_ids=[doc.id], target_knowledge_base_id=target_kb_id, target_category_id=category_id
+        )
+        return (await documents_routes.batch_move_documents(request, body, db_session))["data"]
+
+    yield doc, move
+    db_session.rollback()
+    db_session.query(Document).filter(Document.id == doc.id).delete(synchronize_session=False)
+    db_session.commit()
+
+
+async def test_batch_move_syncs_index_ownership(db_session, kb_ids, move_route):
+    """跨知识库移动同步索引中的 knowledge_base_id / category_id；仅改分类时同样同步"""
+    doc, move = move_route
+
+    assert (await move(OWNER_ID, kb_ids[1]))["moved_count"] == 1
+    db_session.refresh(doc)
+    assert doc.knowledge_base_id == kb_ids[1]
+    assert FakeIndex.calls == [(doc.id, kb_ids[0], kb_ids[1], None)]
+
+    await move(OWNER_ID, kb_ids[1], category_id=5)
+    assert FakeIndex.calls[-1] == (doc.id, kb_ids[1], kb_ids[1], 5)
+
+
+async def test_batch_move_rolls_back_when_index_sync_fails(db_session, kb_ids, move_route):
+    """索引同步失败时文档保留在原知识库，避免数据库与检索权限不一致"""
+    doc, move = move_route
+    FakeIndex.fail = True
+
+    data = await move(OWNER_ID, kb_ids[1])
+    assert data["failed_ids"] == [doc.id]
+    db_session.refresh(doc)
+    assert doc.knowledge_base_id == kb_ids[0]
+
+
+async def test_batch_move_requires_edit_on_target(kb_ids, move_route):
+    """源知识库的 editor 不能把文档移入无权限的知识库"""
+    from fastapi import HTTPException
+
+    _, move = move_route
+    with pytest.raises(HTTPException) as exc:
+        await move(MEMBER_ID, kb_ids[1])
+    assert exc.value.status_code == 403
+    assert FakeIndex.calls == []
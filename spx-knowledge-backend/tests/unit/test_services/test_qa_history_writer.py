@@ -0,0 +1,75 @@
+"""
+Test QA History Writer
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.services.qa_history_writer import QAHistoryWriter
+
+
+class FakeVectorService:
+    def generate_embeddings(self, texts):
+        # 答案为“向量失败”的记录模拟向量服务返回空结果
+        return [[] if text == "向量失败" else [0.1, 0.2] for text in texts]
+
+
+class FakeHistoryService:
+    INDEX_NAME = "qa_history"
+    ANSWER_INDEX_NAME = "qa_answers"
+
+    def __init__(self):
+        self.indexed = {}
+        self.opensearch_service = SimpleNamespace(bulk_index_documents_sync=self._bulk_index)
+
+    def build_history_documents(self, payload, question_vector, answer_vector):
+        doc = {"question_id": payload["question_id"], "has_vector": bool(question_vector and answer_vector)}
+        return doc, dict(doc)
+
+    def _bulk_index(self, index_name, docs):
+        self.indexed.setdefault(index_name, {}).update(docs)
+        return list(docs)
+
+
+def _writer():
+    writer = QAHistoryWriter(client=fakeredis.FakeRedis(decode_responses=True))
+    writer._schedule_flush = lambda: None
+    return writer
+
+
+def test_write_batch_acks_written_and_keeps_retries():
+    """写入成功的消息确认并删除；向量缺失的消息保持未确认等待重试；无法解析的消息丢弃"""
+    writer = _writer()
+    writer.enqueue({"question_id": "q1", "question_content": "问题一", "answer_content": "答案一"})
+    writer.enqueue({"question_id": "q2", "question_content": "问题二", "answer_content": "向量失败"})
+    writer.redis.xadd(writer.stream_key, {"payload": "{broken"})
+    writer._ensure_group()
+
+    history_service = FakeHistoryService()
+    messages = writer._read_batch("worker", 10)
+    result = writer._write_batch(messages, history_service, FakeVectorService())
+
+    assert result == {"written": 1, "retry": 1, "dropped": 1}
+    assert list(history_service.indexed["qa_history"]) == ["q1"]
+    assert history_service.indexed["qa_history"]["q1"]["has_vector"]
+    assert writer.stats() == {"length": 1, "pending": 1}
+
+
+def test_write_batch_writes_without_vector_after_max_retries(monkeypatch):
+    """超过最大投递次数后不带向量写入，不再无限重试"""
+    from app.services import qa_history_writer as writer_module
+
+    monkeypatch.setattr(writer_module.settings, "QA_HISTORY_MAX_RETRIES", 1)
+    writer = _writer()
+    writer.enqueue({"question_id": "q3", "question_content": "问题三", "answer_content": "向量失败"})
+    writer._ensure_group()
+
+    history_service = FakeHistoryService()
+    result = writer._write_batch(writer._read_batch("worker", 10), history_service, FakeVectorService())
+
+    assert result == {"written": 1, "retry": 0, "dropped": 0}
+    assert not history_service.indexed["qa_history"]["q3"]["has_vector"]
+    assert writer.stats()["length"] == 0
@@ -0,0 +1,65 @@
+"""
+Test QA Service Session List
+"""
+
+import pytest
+
+from app.config.database import to_async_url
+from app.models.qa_session import QASession
+from app.services.qa_service import QAService
+
+USER_ID = 9501
+
+
+@pytest.fixture
+def sessions(db_session):
+    rows = [
+        QASession(session_id="qa-list-1", knowledge_base_id=1, user_id=USER_ID, status="active"),
+        QASession(session_id="qa-list-2", knowledge_base_id=2, user_id=USER_ID, status="active"),
+        QASession(session_id="qa-list-3", knowledge_base_id=1, user_id=USER_ID, status="deleted"),
+        QASession(session_id="qa-list-4", knowledge_base_id=1, user_id=USER_ID + 1, status="active"),
+    ]
+    db_session.add_all(rows)
+    db_session.commit()
+    yield rows
+    db_session.query(QASession).filter(QASession.session_id.like("qa-list-%")).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def _ids(response):
+    return sorted(s["session_id"] for s in response.sessions)
+
+
+def test_get_qa_sessions_filters_user_status_and_kb(db_session, sessions):
+    """只返回当前用户的活跃会话，可按知识库过滤，总数与分页一致"""
+    service = QAService.__new__(QAService)
+    service.db = db_session
+
+    response = service.get_qa_sessions(page=1, size=1, user_id=USER_ID)
+    assert response.pagination["total"] == 2
+    assert response.pagination["total_pages"] == 2
+    assert len(response.sessions) == 1
+
+    response = service.get_qa_sessions(knowledge_base_id=1, user_id=USER_ID)
+    assert _ids(response) == ["qa-list-1"]
+
+
+async def test_get_qa_sessions_async_matches_sync(db_session, sessions):
+    """异步版本与同步版本共用同一查询，结果一致"""
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    engine = create_async_engine(to_async_url(str(db_session.get_bind().url)))
+    try:
+        async with async_sessionmaker(engine)() as session:
+            response = await QAService.get_qa_sessions_async(session, user_id=USER_ID)
+    finally:
+        await engine.dispose()
+    assert _ids(response) == ["qa-list-1", "qa-list-2"]
+    assert response.pagination["total"] == 2
+
+
+def test_to_async_url():
+    assert to_async_url("mysql+pymysql://u:p@db:3306/kb") == "mysql+aiomysql://u:p@db:3306/kb"
+    assert to_async_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+    assert to_async_url("postgresql+asyncpg://u:p@db/kb") == "postgresql+asyncpg://u:p@db/kb"
@@ -0,0 +1,68 @@
+"""
+Test Rate Limit
+"""
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis 执行 Lua 脚本依赖 lupa
+
+from app.core.rate_limit import RateLimiter, RateLimitPolicy, parse_policies
+
+
+def _limiter(**kwargs):
+    kwargs.setdefault("local_lease", 0)
+    kwargs.setdefault("lease_ttl_ms", 10000)
+    return RateLimiter(redis_client=fakeredis.aioredis.FakeRedis(), **kwargs)
+
+
+def test_parse_policies_longest_prefix_first():
+    policies = parse_policies("/api=100/60; /api/qa=30 ;bad;/api/x=abc/60;/api/zero=0/60")
+    assert [prefix for prefix, _ in policies] == ["/api/qa", "/api"]
+    assert policies[0][1] == RateLimitPolicy(30, 60, "/api/qa")
+
+
+async def test_gcra_allows_burst_then_denies():
+    """突发上限内放行并递减剩余令牌，超出后拒绝并给出等待时间；不同身份分别计数"""
+    limiter = _limiter()
+    policy = RateLimitPolicy(limit=3, period=60)
+
+    results = [await limiter.hit("user:1", policy) for _ in range(3)]
+    assert [r.allowed for r in results] == [True, True, True]
+    assert [r.remaining for r in results] == [2, 1, 0]
+
+    denied = await limiter.hit("user:1", policy)
+    assert not denied.allowed
+    assert 19 < denied.retry_after <= 20
+    assert denied.headers()["Retry-After"] == "20"
+
+    assert (await limiter.hit("user:2", policy)).allowed
+
+
+async def test_local_lease_serves_hot_client_without_redis(monkeypatch):
+    """热点客户端一次预扣多个令牌，随后在本进程内消耗，剩余数包含未用完的预取令牌"""
+    limiter = _limiter(local_lease=5)
+    policy = RateLimitPolicy(limit=10, period=60)
+    costs = []
+    original_eval = limiter._eval
+
+    async def counting_eval(key, policy, cost):
+        costs.append(cost)
+        return await original_eval(key, policy, cost)
+
+    monkeypatch.setattr(limiter, "_eval", counting_eval)
+
+    remaining = [(await limiter.hit("user:1", policy)).remaining for _ in range(6)]
+    assert costs == [1, 5]
+    assert remaining == [9, 8, 7, 6, 5, 4]
+
+
+async def test_redis_failure_allows_request():
+    limiter = _limiter()
+
+    async def broken_script(**kwargs):
+        raise ConnectionError("redis down")
+
+    limiter._script = broken_script
+    result = await limiter.hit("user:1", RateLimitPolicy(limit=1))
+    assert result.allowed and result.remaining == 1
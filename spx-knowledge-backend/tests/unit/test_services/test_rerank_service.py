@@ -0,0 +1,53 @@
+"""
+Test Rerank Service Helpers
+"""
+
+from array import array
+
+import pytest
+
+from app.services.rerank_service import RerankService, _PassageTokenCache, _TokenizedPassage, parse_length_buckets
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("128:64,256:32,512:16", [(128, 64), (256, 32), (512, 16)]),
+        ("256:32, 128:64", [(128, 64), (256, 32), (512, 32)]),  # 补齐到模型长度上限
+        ("1024:8,bad,128", [(128, 16), (512, 8)]),  # 超出上限截断，格式错误忽略
+        ("", [(512, 16)]),
+        (None, [(512, 16)]),
+    ],
+)
+def test_parse_length_buckets(spec, expected):
+    assert parse_length_buckets(spec, 512) == expected
+
+
+def _ids(length, hit_positions):
+    return array("l", [1 if i in hit_positions else 0 for i in range(length)])
+
+
+@pytest.mark.parametrize(
+    "hit_positions, budget, expected",
+    [
+        (set(), 6, 0),  # 无命中取开头
+        ({10, 11}, 6, 7),  # 命中区间居中
+        ({18, 19}, 6, 14),  # 居中越界时贴齐末尾
+        ({2, 12, 13, 14}, 4, 11),  # 取命中最密集的窗口
+    ],
+)
+def test_best_window(hit_positions, budget, expected):
+    assert RerankService._best_window(_ids(20, hit_positions), {1}, budget) == expected
+
+
+def test_passage_token_cache_lru():
+    cache = _PassageTokenCache(max_size=2)
+    passage = _TokenizedPassage([1, 2], [(0, 1), (1, 2)])
+    cache.put(("a", 1), passage)
+    cache.put(("b", 2), passage)
+    assert cache.get(("a", 1)) is passage
+    cache.put(("c", 3), passage)
+
+    assert cache.get(("b", 2)) is None
+    assert cache.get(("a", 1)) is passage and cache.get(("c", 3)) is passage
+    assert len(passage) == 2
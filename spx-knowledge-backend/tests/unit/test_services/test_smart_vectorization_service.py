@@ -0,0 +1,128 @@
+"""
+Test Smart Vectorization Service
+"""
+
+import gzip
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.document import Document
+from app.models.knowledge_base import KnowledgeBase
+from app.services import smart_vectorization_service as smart_module
+from app.services.opensearch_service import chunk_content_hash
+from app.services.smart_vectorization_service import SmartVectorizationService
+
+
+class FakeVectorService:
+    def __init__(self):
+        self.calls = []
+
+    def generate_embeddings(self, texts):
+        self.calls.append(list(texts))
+        return [[0.1, 0.2] for _ in texts]
+
+
+class FakeOpenSearch:
+    def __init__(self, indexed_hashes):
+        self.indexed_hashes = indexed_hashes
+        self.updates = []
+
+    def document_index_for(self, knowledge_base_id):
+        return "document_chunks"
+
+    def get_chunk_content_hashes_sync(self, chunk_ids, index=None):
+        return {cid: self.indexed_hashes.get(cid) for cid in chunk_ids}
+
+    def bulk_update_document_chunks_sync(self, updates, index=None):
+        self.updates.extend(updates)
+        return [u["chunk_id"] for u in updates]
+
+
+@pytest.fixture
+def document(db_session):
+    kb = KnowledgeBase(name="向量化测试知识库", user_id=9601)
+    db_session.add(kb)
+    db_session.commit()
+    doc = Document(original_filename="v.txt", knowledge_base_id=kb.id, status="completed", meta={})
+    db_session.add(doc)
+    db_session.commit()
+    yield doc
+    db_session.query(Document).filter(Document.id == doc.id).delete(synchronize_session=False)
+    db_session.query(KnowledgeBase).filter(KnowledgeBase.id == kb.id).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def _chunk(chunk_id, content, chunk_index=None):
+    return SimpleNamespace(
+        id=chunk_id, document_id=1, chunk_index=chunk_index if chunk_index is not None else chunk_id,
+        content=content, chunk_type="text", meta={"page_number": 1}, created_at=None,
+    )
+
+
+def _service(db_session, indexed_hashes):
+    service = SmartVectorizationService.__new__(SmartVectorizationService)
+    service.db = db_session
+    service.vector_service = FakeVectorService()
+    service.opensearch_service = FakeOpenSearch(indexed_hashes)
+    return service
+
+
+def test_revectorize_skips_unchanged_chunks(db_session, document, monkeypatch):
+    """内容哈希未变的分块不生成向量；目标分块只更新 metadata；非目标的未变分块不写索引"""
+    monkeypatch.setattr(smart_module.settings, "STORE_CHUNK_TEXT_IN_DB", True)
+    chunks = [_chunk(1, "未变的目标分块"), _chunk(2, "修改后的内容"), _chunk(3, "未变的其他分块")]
+    service = _service(db_session, {1: chunk_content_hash("未变的目标分块"), 2: chunk_content_hash("旧内容"),
+                                    3: chunk_content_hash("未变的其他分块")})
+
+    result = service.revectorize_chunks(document.id, chunks, target_chunk_ids={1, 2}, extra_metadata={"reverted": True})
+
+    assert service.vector_service.calls == [["修改后的内容"]]
+    assert result["embedded_count"] == 1 and result["skipped_count"] == 2
+    assert result["failed_count"] == 0
+    updates = {u["chunk_id"]: u for u in service.opensearch_service.updates}
+    assert set(updates) == {1, 2}
+    assert updates[1] == {"chunk_id": 1, "metadata": {"page_number": 1, "reverted": True}}
+    assert updates[2]["content_vector"] == [0.1, 0.2]
+    assert updates[2]["knowledge_base_id"] == document.knowledge_base_id
+
+
+def test_revectorize_force_embeds_everything(db_session, document, monkeypatch):
+    monkeypatch.setattr(smart_module.settings, "STORE_CHUNK_TEXT_IN_DB", True)
+    chunks = [_chunk(1, "内容一"), _chunk(2, "内容二")]
+    service = _service(db_session, {1: chunk_content_hash("内容一"), 2: chunk_content_hash("内容二")})
+
+    result = service.revectorize_chunks(document.id, chunks, force=True)
+
+    assert service.vector_service.calls == [["内容一", "内容二"]]
+    assert result["embedded_count"] == 2 and result["indexed_count"] == 2
+
+
+def test_load_chunk_texts_reads_minio_archive_once(db_session, monkeypatch):
+    """正文不存库时，缺失正文的分块从 MinIO 分块归档补齐；归档中没有的分块不在结果中"""
+    from app.services import minio_storage_service
+
+    monkeypatch.setattr(smart_module.settings, "STORE_CHUNK_TEXT_IN_DB", False)
+    archive = gzip.compress(
+        "\n".join(json.dumps({"index": i, "content": f"归档正文{i}"}, ensure_ascii=False) for i in range(3)).encode()
+    )
+    downloads = []
+
+    class FakeMinio:
+        def list_files(self, prefix):
+            return [{"object_name": "documents/2025/01/other/parsed/chunks/chunks.jsonl.gz"},
+                    {"object_name": "documents/2025/01/42/parsed/chunks/chunks.jsonl.gz"}]
+
+        def download_file(self, object_name):
+            downloads.append(object_name)
+            return archive
+
+    monkeypatch.setattr(minio_storage_service, "MinioStorageService", FakeMinio)
+    service = _service(db_session, {})
+    chunks = [_chunk(10, "库内正文", 0), _chunk(11, None, 1), _chunk(12, "", 2), _chunk(13, None, 9)]
+
+    texts = service._load_chunk_texts(42, chunks)
+
+    assert texts == {10: "库内正文", 11: "归档正文1", 12: "归档正文2"}
+    assert downloads == ["documents/2025/01/42/parsed/chunks/chunks.jsonl.gz"]
@@ -0,0 +1,129 @@
+"""
+Test Suggestion Service
+"""
+
+import random
+import threading
+import time
+
+from app.config.settings import settings
+from app.services.suggestion_service import SuggestionIndex, _Tries, hotword_score, normalize, title_text
+
+
+def _tries():
+    tries = _Tries()
+    tries.set_hotword("年度报告", 10)
+    tries.add_document(1, 1, title_text("年度报告 2024.pdf"), ["年度总结", "附录"])
+    tries.add_document(2, 2, title_text("年度计划.docx"), [])
+    return tries
+
+
+def test_prefix_ranking_and_permissions():
+    """热词全局可见，文档标题 / 目录只对有权限的知识库可见"""
+    tries = _tries()
+
+    results = tries.top("年度", [1, 2], 10)
+    # 热词 + 标题 > 标题 > 目录
+    assert results[0] == "年度报告"
+    assert set(results[1:3]) == {"年度计划", "年度报告 2024"}
+    assert results[3] == "年度总结"
+    assert tries.top("年度", [2], 10) == ["年度报告", "年度计划"]
+    assert tries.top("年度", [], 10) == ["年度报告"]
+    assert tries.top("附", [2], 10) == []
+    assert len(tries.top("年度", [1, 2], 2)) == 2
+
+
+def test_normalized_dedup_and_hotword_boost():
+    """同一规范化文本只出现一次，热词得分叠加到标题词条"""
+    tries = _tries()
+    tries.add_document(3, 2, "ＡＢＣ  Guide", [])
+    tries.set_hotword("abc guide", 50)
+
+    assert tries.top("abc", [2], 10) == ["ＡＢＣ  Guide"]
+    assert normalize("ＡＢＣ  Guide") == "abc guide"
+    assert tries.top("", [2], 1) == ["ＡＢＣ  Guide"]
+
+
+def test_incremental_document_replace():
+    """文档更新 / 删除时整篇替换其词条，热词清零后移除"""
+    tries = _tries()
+    tries.remove_document(1)
+    tries.add_document(1, 1, "季度报告", [])
+
+    assert tries.top("年度", [1, 2], 10) == ["年度报告", "年度计划"]
+    assert tries.top("季", [1], 10) == ["季度报告"]
+
+    tries.set_hotword("年度报告", 0)
+    tries.remove_document(2)
+    assert tries.top("年", [1, 2], 10) == []
+    assert 2 not in tries.kbs
+
+
+def test_matches_brute_force_with_many_knowledge_bases():
+    """大量词条、上百个知识库时与逐条计算的结果一致（得分序列相同，且只含可见知识库的词条）"""
+    rng = random.Random(7)
+    alphabet = "知识库文档检索向量索引年度报告总结计划方案设计测试"
+
+    def word():
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(2, 10)))
+
+    tries = _Tries()
+    hotwords = {}
+    for _ in range(2000):
+        text, count = word(), rng.randint(1, 500)
+        tries.set_hotword(text, count)
+        hotwords[text] = hotword_score(count)
+    documents = {}
+    for doc_id in range(1000):
+        documents[doc_id] = (doc_id % 100, word(), [word() for _ in range(5)])
+        tries.add_document(doc_id, *documents[doc_id])
+    for doc_id in rng.sample(range(1000), 100):
+        tries.remove_document(doc_id)
+        del documents[doc_id]
+
+    for _ in range(100):
+        prefix = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 2)))
+        kb_ids = set(rng.sample(range(100), 20))
+        expected = dict(hotwords)
+        for kb_id, title, headings in documents.values():
+            if kb_id not in kb_ids:
+                continue
+            for text, weight in [(title, settings.SUGGEST_TITLE_WEIGHT)] + [(h, settings.SUGGEST_TOC_WEIGHT) for h in headings]:
+                expected[text] = max(expected.get(text, 0.0), weight + hotwords.get(text, 0.0))
+        scores = sorted((score for text, score in expected.items() if text.startswith(prefix)), reverse=True)[:10]
+
+        results = tries.top(prefix, kb_ids, 10)
+        assert len(set(results)) == len(results)
+        assert all(text.startswith(prefix) for text in results)
+        assert [expected[text] for text in results] == scores
+
+
+def test_first_query_does_not_build_synchronously(monkeypatch):
+    """索引尚未构建时查询立即返回空结果，构建转入后台线程；刷新周期内不重复触发"""
+    index = SuggestionIndex()
+    started = threading.Event()
+    release = threading.Event()
+    builds = []
+
+    def slow_refresh(full=None):
+        with index._refresh_lock:
+            builds.append(threading.current_thread().name)
+            started.set()
+            release.wait(5)
+            index.tries = _tries()
+            index._built = True
+            index._refreshed_at = time.monotonic()
+
+    monkeypatch.setattr(index, "refresh", slow_refresh)
+
+    assert index.suggest("年度", [1, 2], 10) == []
+    assert started.wait(5)
+    assert index.suggest("年度", [1, 2], 10) == []  # 构建中不等待、不重复触发
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name == "suggestion-refresh":
+            thread.join(5)
+
+    assert builds == ["suggestion-refresh"]
+    assert index.suggest("年度", [1, 2], 1) == ["年度报告"]
+    assert builds == ["suggestion-refresh"]
@@ -0,0 +1,39 @@
+"""
+Test Tracing
+"""
+
+import logging
+
+from app.core import tracing
+from app.core.logging import TraceIdFilter
+from app.core.tracing import KIND_INGESTION, StageTimer, reset_trace_id, set_trace_id
+
+
+def test_stage_timer_accumulates_repeated_stages(monkeypatch):
+    """start 自动结束上一阶段；同名阶段累加；每段耗时上报一次指标"""
+    observed = []
+    monkeypatch.setattr(tracing, "observe_stage", lambda kind, stage, seconds: observed.append((kind, stage)))
+    clock = iter([0.0, 1.0, 1.0, 1.5, 1.5, 3.5])
+    monkeypatch.setattr(tracing.time, "perf_counter", lambda: next(clock))
+
+    timer = StageTimer(KIND_INGESTION)
+    assert timer.stop() is None
+    timer.start("image").start("parse").start("image")
+    assert timer.stop() == 2.0
+
+    assert timer.durations == {"image": 3.0, "parse": 0.5}
+    assert timer.summary() == "image=3.000s parse=0.500s"
+    assert observed == [(KIND_INGESTION, "image"), (KIND_INGESTION, "parse"), (KIND_INGESTION, "image")]
+
+
+def test_trace_id_filter_reads_context():
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "msg", None, None)
+    token = set_trace_id("trace-abc")
+    try:
+        TraceIdFilter().filter(record)
+        assert record.trace_id == "trace-abc"
+    finally:
+        reset_trace_id(token)
+
+    TraceIdFilter().filter(record)
+    assert record.trace_id == "-"
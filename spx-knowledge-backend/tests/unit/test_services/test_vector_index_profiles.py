@@ -0,0 +1,125 @@
+"""
+Test Vector Index Profiles
+"""
+
+import pytest
+
+from app.config.settings import settings
+from app.services.vector_index_profiles import (
+    get_profile,
+    knn_index_settings,
+    knn_vector_mapping,
+    profile_index_name,
+    resolve_profile_name,
+    search_target,
+)
+
+
+def test_default_profile_keeps_existing_mapping():
+    """default 配置档与原有 content_vector 映射一致，索引名不变"""
+    mapping = knn_vector_mapping(get_profile("default"), 768)
+
+    assert mapping == {
+        "type": "knn_vector",
+        "dimension": 768,
+        "method": {
+            "name": "hnsw",
+            "space_type": "cosinesimil",
+            "engine": "nmslib",
+            "parameters": {"ef_construction": settings.HNSW_EF_CONSTRUCTION, "m": settings.HNSW_M},
+        },
+    }
+    assert profile_index_name("document_content", "default") == "document_content"
+    assert profile_index_name("document_content", None) == "document_content"
+
+
+def test_compressed_profiles():
+    """量化 / 磁盘模式配置档生成对应的 encoder、mode 与 compression_level"""
+    fp16 = knn_vector_mapping(get_profile("faiss_fp16"), 8)
+    assert fp16["method"]["engine"] == "faiss"
+    assert fp16["method"]["parameters"]["encoder"] == {"name": "sq", "parameters": {"type": "fp16"}}
+
+    on_disk = knn_vector_mapping(get_profile("on_disk"), 8)
+    assert on_disk["mode"] == "on_disk"
+    assert on_disk["compression_level"] == "32x"
+
+    assert profile_index_name("document_content", "lucene_sq") == "document_content__lucene_sq"
+    assert search_target("document_content") == "document_content,document_content__*"
+
+
+def test_profile_overrides(monkeypatch):
+    """VECTOR_INDEX_PROFILES 可覆盖 HNSW 参数、新增配置档；lucene 不设置 ef_search"""
+    monkeypatch.setattr(settings, "VECTOR_INDEX_PROFILES", {
+        "faiss_fp16": {"m": 32, "ef_search": 128},
+        "lucene_m8": {"engine": "lucene", "m": 8, "ef_search": 64},
+    })
+
+    fp16 = get_profile("faiss_fp16")
+    assert knn_vector_mapping(fp16, 8)["method"]["parameters"]["m"] == 32
+    assert knn_index_settings(fp16) == {"index.knn.algo_param.ef_search": 128}
+    assert resolve_profile_name("LUCENE_M8") == "lucene_m8"
+    assert knn_index_settings(get_profile("lucene_m8")) == {}
+
+
+def test_resolve_profile_name():
+    assert resolve_profile_name(None) == settings.VECTOR_INDEX_DEFAULT_PROFILE
+    with pytest.raises(ValueError):
+        resolve_profile_name("hnswlib")
+
+
+class FakeOpenSearchClient:
+    def __init__(self):
+        self.calls = []
+
+    def update_by_query(self, index, body, **kwargs):
+        self.calls.append(("update_by_query", index, body))
+
+    def reindex(self, body, **kwargs):
+        self.calls.append(("reindex", body["source"]["index"], body))
+        return {"created": 3, "updated": 0, "failures": []}
+
+    def delete_by_query(self, index, body, **kwargs):
+        self.calls.append(("delete_by_query", index, body))
+
+
+def _opensearch_service(kb_profiles):
+    from app.services.opensearch_service import OpenSearchService
+
+    service = object.__new__(OpenSearchService)
+    service.client = FakeOpenSearchClient()
+    service.document_index, service.image_index = "document_content", "images"
+    service._kb_profiles = dict(kb_profiles)
+    service._ensured_indices = {
+        profile_index_name(base, profile) for base in ("document_content", "images") for profile in kb_profiles.values()
+    }
+    return service
+
+
+def test_move_document_same_profile_updates_in_place():
+    """同一配置档内移动：update_by_query 改写分块与图片的 knowledge_base_id / category_id"""
+    service = _opensearch_service({1: "default", 2: "default"})
+    service.move_document_sync(10, 1, 2, 7)
+
+    assert [(op, index) for op, index, _ in service.client.calls] == [
+        ("update_by_query", "document_content"),
+        ("update_by_query", "images"),
+    ]
+    body = service.client.calls[0][2]
+    assert body["query"] == {"term": {"document_id": 10}}
+    assert body["script"]["params"] == {"knowledge_base_id": 2, "category_id": 7}
+
+
+def test_move_document_across_profiles_reindexes():
+    """跨配置档移动：reindex 到目标配置档的物理索引（同时改写归属字段），再从源索引删除"""
+    service = _opensearch_service({1: "default", 3: "faiss_hnsw"})
+    service.move_document_sync(10, 1, 3, None)
+
+    assert [(op, index) for op, index, _ in service.client.calls] == [
+        ("reindex", "document_content"),
+        ("delete_by_query", "document_content"),
+        ("reindex", "images"),
+        ("delete_by_query", "images"),
+    ]
+    reindex_body = service.client.calls[0][2]
+    assert reindex_body["dest"] == {"index": "document_content__faiss_hnsw"}
+    assert reindex_body["script"]["params"] == {"knowledge_base_id": 3, "category_id": None}